@@ -1,6 +1,7 @@
 from __future__ import absolute_import
 
 import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.sql.expression import exists, select
 
 from scanomatic.io.ccc_data import (
@@ -8,6 +9,8 @@ from scanomatic.io.ccc_data import (
     CellCountCalibration, get_empty_ccc_entry, get_polynomal_entry
 )
 
+MEASUREMENTS_FETCH_SIZE = 500
+
 
 class CalibrationStore(object):
 
@@ -223,38 +226,48 @@ class CalibrationStore(object):
     def set_measurement(
         self, calibrationid, imageid, plateid, col, row, measurement
     ):
-        where = sa.and_(
-            self._measurements.c.calibration_id == calibrationid,
-            self._measurements.c.image_id == imageid,
-            self._measurements.c.plate_id == plateid,
-            self._measurements.c.row == row,
-            self._measurements.c.col == col,
+        self.set_measurements(
+            calibrationid, imageid, plateid, {(col, row): measurement}
         )
-        if self._exists(self._measurements.select().where(where)):
-            self._execute(
-                self._measurements.update().where(where).values(
-                    source_values=measurement[CCCMeasurement.source_values],
-                    source_value_counts=(
-                        measurement[CCCMeasurement.source_value_counts]
-                    ),
-                    cell_count=measurement[CCCMeasurement.cell_count],
-                )
+
+    def set_measurements(self, calibrationid, imageid, plateid, measurements):
+        """Insert or replace the measurements of a plate in one statement.
+
+        `measurements` maps the (col, row) of each colony to its measurement.
+        """
+        if not measurements:
+            return
+        query = insert(self._measurements).values([
+            dict(
+                calibration_id=calibrationid,
+                image_id=imageid,
+                plate_id=plateid,
+                row=row,
+                col=col,
+                source_values=measurement[CCCMeasurement.source_values],
+                source_value_counts=(
+                    measurement[CCCMeasurement.source_value_counts]
+                ),
+                cell_count=measurement[CCCMeasurement.cell_count],
             )
-        else:
-            self._execute(
-                self._measurements.insert().values(
-                    calibration_id=calibrationid,
-                    image_id=imageid,
-                    plate_id=plateid,
-                    row=row,
-                    col=col,
-                    source_values=measurement[CCCMeasurement.source_values],
-                    source_value_counts=(
-                        measurement[CCCMeasurement.source_value_counts]
-                    ),
-                    cell_count=measurement[CCCMeasurement.cell_count],
-                )
+            for (col, row), measurement in measurements.items()
+        ])
+        self._execute(
+            query.on_conflict_do_update(
+                index_elements=[
+                    self._measurements.c.calibration_id,
+                    self._measurements.c.image_id,
+                    self._measurements.c.plate_id,
+                    self._measurements.c.row,
+                    self._measurements.c.col,
+                ],
+                set_=dict(
+                    source_values=query.excluded.source_values,
+                    source_value_counts=query.excluded.source_value_counts,
+                    cell_count=query.excluded.cell_count,
+                ),
             )
+        )
 
     def has_measurements_for_plate(self, calibrationid, imageid, plateid):
         return self._exists(
@@ -273,13 +286,18 @@ class CalibrationStore(object):
         ).order_by(
             self._measurements.c.image_id, self._measurements.c.plate_id,
             self._measurements.c.col, self._measurements.c.row
-        )
-        for row in self._execute(query):
-            yield {
-                CCCMeasurement.source_values: row['source_values'],
-                CCCMeasurement.source_value_counts: row['source_value_counts'],
-                CCCMeasurement.cell_count: row['cell_count'],
-            }
+        ).execution_options(stream_results=True)
+        result = self._execute(query)
+        for rows in iter(
+            lambda: result.fetchmany(MEASUREMENTS_FETCH_SIZE), []
+        ):
+            for row in rows:
+                yield {
+                    CCCMeasurement.source_values: row['source_values'],
+                    CCCMeasurement.source_value_counts:
+                    row['source_value_counts'],
+                    CCCMeasurement.cell_count: row['cell_count'],
+                }
 
     def _execute(self, query):
         try:
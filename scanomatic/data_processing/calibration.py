@@ -6,6 +6,7 @@ import re
 
 import numpy as np
 from scipy.optimize import leastsq
+from scipy.sparse import coo_matrix
 from scipy.stats import linregress
 
 from scanomatic.generics.maths import mid50_mean
@@ -417,37 +418,67 @@ def transform_plate_slice(store, identifier, image_identifier, plate_id):
         return False
 
 
-@_validate_ccc_edit_request
-def set_colony_compressed_data(
-        store, identifier, image_identifier, plate_id, x, y, cell_count,
-        image, blob_filter, background_filter):
+def _get_colony_measurement(cell_count, image, blob_filter, background_filter):
 
     background = mid50_mean(image[background_filter].ravel())
     if np.isnan(background):
         _logger.error(
             "The background had too little information to make mid50 mean")
-        return False
+        return None
 
     colony = image[blob_filter].ravel() - background
 
-    values, counts = zip(
-        *{k: (colony == k).sum() for k in
-          np.unique(colony).tolist()}.iteritems())
+    values, counts = np.unique(colony, return_counts=True)
+    values = tuple(values.tolist())
+    counts = tuple(counts.tolist())
 
     if np.sum(counts) != blob_filter.sum():
         _logger.error(
             "Counting mismatch between compressed format and blob filter")
-        return False
-    measurement = {
+        return None
+    return {
         CCCMeasurement.source_value_counts: counts,
         CCCMeasurement.source_values: values,
         CCCMeasurement.cell_count: cell_count,
     }
+
+
+@_validate_ccc_edit_request
+def set_colony_compressed_data(
+        store, identifier, image_identifier, plate_id, x, y, cell_count,
+        image, blob_filter, background_filter):
+
+    measurement = _get_colony_measurement(
+        cell_count, image, blob_filter, background_filter)
+    if measurement is None:
+        return False
     store.set_measurement(
         identifier, image_identifier, plate_id, x, y, measurement)
     return True
 
 
+@_validate_ccc_edit_request
+def set_plate_compressed_data(
+        store, identifier, image_identifier, plate_id, colonies):
+    """Set the measurements of several colonies of a plate at once
+
+    Args:
+        colonies (dict): The cell count, image, blob filter and
+            background filter of each (x, y) colony position
+
+    Returns: If the colonies were set, none are if any is invalid
+    """
+    measurements = {}
+    for position, colony in colonies.items():
+        measurement = _get_colony_measurement(*colony)
+        if measurement is None:
+            return False
+        measurements[position] = measurement
+    store.set_measurements(
+        identifier, image_identifier, plate_id, measurements)
+    return True
+
+
 def calculate_sizes(data, poly):
     """Get summed population size using a CCC.
 
@@ -474,7 +505,7 @@ def validate_polynomial(slope, p_value, stderr):
     return CalibrationValidation.OK
 
 
-def _collect_all_included_data(store, identifier):
+def _collect_all_included_data(store, identifier, sort_values=True):
     source_values = []
     source_value_counts = []
     target_value = []
@@ -489,6 +520,13 @@ def _collect_all_included_data(store, identifier):
     source_value_counts = [
         source_value_counts[colony] for colony in sort_order
     ]
+    if not sort_values:
+        return CalibrationData(
+            source_values=source_values,
+            source_value_counts=source_value_counts,
+            target_value=np.array(target_value)[sort_order],
+        )
+
     source_value_sorts = [np.argsort(vector) for vector in source_values]
     return CalibrationData(
         source_values=[
@@ -525,6 +563,40 @@ def get_calibration_polynomial_residuals(
     return measurements.target_value - colony_sum_function(measurements, *guess)
 
 
+def get_calibration_matrix(measurements, degree=5):
+    """The sum over each colony's pixels of each power of the pixel values.
+
+    Builds the sparse matrix of pixel counts per colony and distinct pixel
+    value and multiplies it with the Vandermonde matrix of the distinct
+    values, so that the colony sizes of a polynomial are the product of
+    the calibration matrix and the polynomial coefficients.
+
+    Args:
+        measurements (CalibrationData): The colonies
+        degree: The degree of the polynomial
+
+    Returns: Array of shape (colonies, degree + 1), with the highest power
+        first as the polynomial coefficients
+    """
+    lengths = [len(values) for values in measurements.source_values]
+    values = np.concatenate(
+        [np.asarray(values, dtype=np.float) for values in measurements.source_values] + [np.zeros((0,))])
+    counts = np.concatenate(
+        [np.asarray(counts, dtype=np.float) for counts in measurements.source_value_counts] + [np.zeros((0,))])
+
+    distinct_values, columns = np.unique(values, return_inverse=True)
+    histogram = coo_matrix(
+        (counts, (np.repeat(np.arange(len(lengths)), lengths), columns)),
+        shape=(len(lengths), distinct_values.size)).tocsr()
+    return np.asarray(histogram.dot(np.vander(distinct_values, degree + 1)))
+
+
+def get_calibration_matrix_residuals(guess, calibration_matrix, target_values):
+    """Same as `get_calibration_polynomial_residuals` for the colonies of a
+    calibration matrix"""
+    return target_values - calibration_matrix[:, :-1].dot(np.exp(guess))
+
+
 def get_calibration_polynomial(coefficients_array):
 
     return np.poly1d(coefficients_array)
@@ -540,9 +612,29 @@ def poly_as_text(poly):
     return "y = {0}".format(" + ".join(coeffs()))
 
 
-def calculate_polynomial(measurements, degree=5):
+def calculate_polynomial(measurements, degree=5, calibration_matrix=None):
+    """Fits the cell count calibration polynomial.
+
+    The coefficients are fitted as exponents to keep them positive, using
+    the colony sums of each power of the pixel values.
+
+    Args:
+        measurements (CalibrationData): The colonies
+        degree: The degree of the polynomial
+        calibration_matrix: The `get_calibration_matrix` of the
+            measurements, if already known
 
-    fit_function = get_calibration_optimization_function(degree)
+    Returns: The polynomial coefficients, highest power first
+
+    Raises:
+        CCCConstructionError: If there are fewer colonies than coefficients
+            to fit
+    """
+    if len(measurements.target_value) < degree or len(measurements.source_values) < degree:
+        raise CCCConstructionError("Invalid data (probably too little)")
+
+    if calibration_matrix is None:
+        calibration_matrix = get_calibration_matrix(measurements, degree)
 
     p0 = np.zeros((degree,), np.float)
     if degree == 5:
@@ -557,9 +649,9 @@ def calculate_polynomial(measurements, degree=5):
         ])
     try:
         poly_vals, _ = leastsq(
-            get_calibration_polynomial_residuals,
+            get_calibration_matrix_residuals,
             p0,
-            args=(fit_function, measurements)
+            args=(calibration_matrix, np.asarray(measurements.target_value, dtype=np.float)),
         )
     except TypeError:
         raise CCCConstructionError("Invalid data (probably too little)")
@@ -577,16 +669,16 @@ def calculate_polynomial(measurements, degree=5):
 @_validate_ccc_edit_request
 def construct_polynomial(store, identifier, power):
 
-    measurements = _collect_all_included_data(store, identifier)
+    measurements = _collect_all_included_data(store, identifier, sort_values=False)
     try:
-        poly_coeffs = calculate_polynomial(measurements, power).tolist()
+        calibration_matrix = get_calibration_matrix(measurements, power)
+        poly_coeffs = calculate_polynomial(measurements, power, calibration_matrix).tolist()
     except CCCConstructionError:
         return {
             'validation': CalibrationValidation.BadData
         }
-    poly = get_calibration_polynomial(poly_coeffs)
 
-    calculated_sizes = calculate_sizes(measurements, poly)
+    calculated_sizes = calibration_matrix.dot(poly_coeffs).tolist()
     slope, intercept, _, p_value, stderr = linregress(
         measurements.target_value, calculated_sizes)
 
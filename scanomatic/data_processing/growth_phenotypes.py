@@ -2,6 +2,7 @@ from __future__ import absolute_import
 
 from enum import Enum
 from itertools import izip
+import warnings
 
 import numpy as np
 from scipy.optimize import leastsq
@@ -41,17 +42,273 @@ def get_preprocessed_data_for_phenotypes(curve, curve_strided, flat_times, times
 
     curve_logged = np.log2(curve)
     derivative_values_log2, derivative_errors = get_derivative(curve_strided, times_strided)
+    r_squares, params, _ = get_fit_r_squares(flat_times, curve_logged[np.newaxis])
 
     return {
         'curve_smooth_growth_data': np.ma.masked_invalid(curve),
         'index48h': index_for_48h,
-        'chapman_richards_fit': get_fit_r_square(flat_times, curve_logged),
+        'chapman_richards_fit': (r_squares[0], params[0]),
         'derivative_values_log2': np.ma.masked_invalid(derivative_values_log2),
         'derivative_errors': np.ma.masked_invalid(derivative_errors),
         'linregress_extent': position_offset,
         'flat_times': flat_times}
 
 
+def get_derivatives(curves_strided, times_strided):
+    """Vectorized version of `get_derivative` for many curves at once.
+
+    Args:
+        curves_strided (numpy.ndarray): Array of shape
+            (curves, segments, regression size) as produced by
+            `Phenotyper._get_plate_linear_regression_strided`
+        times_strided (numpy.ndarray): Array of shape
+            (segments, regression size)
+
+    Returns:
+        tuple of (curves, segments) arrays with slopes and standard
+        errors of estimate, same as `get_derivative` returns per curve.
+    """
+    log2_strided_curves = np.log2(curves_strided)
+    filters = np.isfinite(log2_strided_curves)
+    min_size = curves_strided.shape[-1] - 1
+    n = filters.sum(axis=-1)
+    times = np.broadcast_to(times_strided, curves_strided.shape)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+
+        x_mean = np.where(filters, times, 0).sum(axis=-1) / n
+        y_mean = np.where(filters, log2_strided_curves, 0).sum(axis=-1) / n
+        x_delta = np.where(filters, times - x_mean[..., np.newaxis], 0)
+        y_delta = np.where(filters, log2_strided_curves - y_mean[..., np.newaxis], 0)
+
+        ssxm = np.square(x_delta).sum(axis=-1) / n
+        ssym = np.square(y_delta).sum(axis=-1) / n
+        ssxym = (x_delta * y_delta).sum(axis=-1) / n
+
+        r_den = np.sqrt(ssxm * ssym)
+        r = np.where(r_den == 0, 0.0, ssxym / r_den).clip(-1, 1)
+
+        slopes = ssxym / ssxm
+        errors = np.where(
+            n == 2, 0.0, np.sqrt((1 - np.square(r)) * ssym / ssxm / (n - 2)))
+
+    invalid = (n < min_size) | ~np.isfinite(slopes)
+    slopes[invalid] = np.nan
+    errors[invalid | ~np.isfinite(errors)] = np.nan
+
+    return slopes, errors
+
+
+def _get_generation_time_indices(derivative_values_log2, rank):
+    """Vectorized `_get_generation_time_index` over (curves, segments)"""
+    masked = np.ma.masked_invalid(derivative_values_log2)
+    finites = masked.count(axis=1)
+    order = masked.argsort(axis=1)
+    position = (finites - 1 - rank).clip(0, None)
+    indices = order[np.arange(order.shape[0]), position]
+    return np.where(finites > np.abs(rank), indices, -1)
+
+
+def _get_windowed_means(curves, finite, nonzero, window):
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        means = (np.where(finite[:, window], curves[:, window], 0).sum(axis=1) /
+                 finite[:, window].sum(axis=1))
+    return np.where(nonzero[:, window].any(axis=1), means, np.nan)
+
+
+def _get_population_sizes_at_indices(curves, finite, indices, linregress_extent):
+
+    n_times = curves.shape[1]
+    positions = indices + linregress_extent
+    starts = np.maximum(0, indices)
+    stops = np.minimum(indices + 2 * linregress_extent + 1, n_times)
+    window = starts[:, np.newaxis] + np.arange(2 * linregress_extent + 1)
+    in_window = window < stops[:, np.newaxis]
+    window = window.clip(0, n_times - 1)
+    rows = np.arange(curves.shape[0])[:, np.newaxis]
+    values = np.where(
+        in_window & finite[rows, window], curves[rows, window], np.nan)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        sizes = np.nanmedian(values, axis=1)
+
+    sizes[positions < 0] = np.nan
+    return sizes
+
+
+def _get_at_indices(values, indices):
+
+    return np.where(
+        (indices >= 0) & (indices < values.shape[1]),
+        values[np.arange(values.shape[0]), indices.clip(0, values.shape[1] - 1)],
+        np.nan)
+
+
+def get_phenotypes_for_curves(curves, curves_strided, flat_times, times_strided, index_for_48h,
+                              position_offset, phenotypes):
+    """Extracts scalar phenotypes for many curves at once.
+
+    This produces the same values as calling each of the `Phenotypes`
+    with the output of `get_preprocessed_data_for_phenotypes` curve by
+    curve, but uses array operations over all curves.
+
+    Args:
+        curves (numpy.ndarray): Smooth growth data (curves, times)
+        curves_strided (numpy.ndarray): The linear regression strided
+            version of the curves (curves, segments, regression size)
+        flat_times (numpy.ndarray): The times of the measurements
+        times_strided (numpy.ndarray): The linear regression strided times
+        index_for_48h (int): Index in times closest to 48h
+        position_offset (int): Half the linear regression size
+        phenotypes: The scalar `Phenotypes` to extract
+
+    Returns:
+        dict of `Phenotypes` to 1D arrays with one value per curve.
+        Curves void of data only have `np.nan` values.
+    """
+    phenotypes = tuple(phenotypes)
+    n_curves, n_times = curves.shape
+    finite = np.isfinite(curves)
+    nonzero = finite & (curves != 0)
+    has_data = finite.any(axis=1)
+
+    baseline = _get_windowed_means(curves, finite, nonzero, slice(None, 3))
+    end_average = _get_windowed_means(curves, finite, nonzero, slice(-3, None))
+    derivative_values_log2, derivative_errors = get_derivatives(curves_strided, times_strided)
+    gt_index = _get_generation_time_indices(derivative_values_log2, 0)
+    gt2_index = _get_generation_time_indices(derivative_values_log2, 1)
+
+    def generation_times(indices):
+        with np.errstate(divide='ignore'):
+            return 1.0 / _get_at_indices(derivative_values_log2, indices)
+
+    def generation_times_when(indices):
+        positions = indices + position_offset
+        return np.where(
+            (positions >= 0) & (positions < flat_times.size),
+            flat_times[positions.clip(0, flat_times.size - 1)],
+            np.nan)
+
+    def population_size_at_generation_time():
+        return _get_population_sizes_at_indices(curves, finite, gt_index, position_offset)
+
+    def low_points():
+        if n_times < 3:
+            return None
+        third = 1. / 3
+        return np.ma.masked_invalid(
+            curves[:, :-2] * third + curves[:, 1:-1] * third + curves[:, 2:] * third)
+
+    def growth_lags():
+        with np.errstate(divide='ignore', invalid='ignore'):
+            delta = np.log2(population_size_at_generation_time()) - np.log2(baseline)
+            delay = (delta / _get_at_indices(derivative_values_log2, gt_index)).clip(0, None)
+        lag = np.interp(np.where(np.isnan(delay), 0, delay), np.arange(n_times), flat_times)
+        return np.where((gt_index >= 0) & (delta > 0), lag, np.nan)
+
+    def monotonicity():
+        last_finite = np.maximum.accumulate(
+            np.where(finite, np.arange(n_times), -1), axis=1)
+        previous = np.hstack((-np.ones((n_curves, 1), dtype=np.int), last_finite[:, :-1]))
+        rows = np.arange(n_curves)[:, np.newaxis]
+        increasing = finite & (previous >= 0) & (curves > curves[rows, previous.clip(0, None)])
+        return increasing.sum(axis=1) / float(n_times - 1)
+
+    results = {}
+    for phenotype in phenotypes:
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+
+            if phenotype is Phenotypes.InitialValue:
+                values = np.where(finite[:, 0], curves[:, 0], np.nan)
+
+            elif phenotype is Phenotypes.ExperimentBaseLine:
+                values = baseline
+
+            elif phenotype is Phenotypes.ExperimentEndAverage:
+                values = end_average
+
+            elif phenotype is Phenotypes.ExperimentFirstTwoAverage:
+                values = _get_windowed_means(curves, finite, nonzero, slice(None, 2))
+
+            elif phenotype is Phenotypes.ColonySize48h:
+                values = _get_at_indices(
+                    np.where(finite, curves, np.nan), np.ones(n_curves, dtype=np.int) * index_for_48h)
+
+            elif phenotype is Phenotypes.GenerationTime48h:
+                values = generation_times(np.ones(n_curves, dtype=np.int) * index_for_48h)
+
+            elif phenotype is Phenotypes.ExperimentGrowthYield:
+                values = end_average - baseline
+
+            elif phenotype is Phenotypes.ExperimentPopulationDoublings:
+                values = np.log2(end_average) - np.log2(baseline)
+
+            elif phenotype is Phenotypes.ResidualGrowth:
+                values = end_average - population_size_at_generation_time()
+
+            elif phenotype is Phenotypes.ResidualGrowthAsPopulationDoublings:
+                values = np.log2(end_average) - np.log2(population_size_at_generation_time())
+
+            elif phenotype is Phenotypes.ExperimentLowPoint:
+                low = low_points()
+                values = np.ones(n_curves) * np.nan if low is None else np.where(
+                    nonzero.any(axis=1), low.min(axis=1).filled(np.nan), np.nan)
+
+            elif phenotype is Phenotypes.ExperimentLowPointWhen:
+                low = low_points()
+                values = np.ones(n_curves) * np.nan if low is None else flat_times[low.argmin(axis=1) + 1]
+
+            elif phenotype is Phenotypes.GenerationTime:
+                values = generation_times(gt_index)
+
+            elif phenotype is Phenotypes.GenerationTime2:
+                values = generation_times(gt2_index)
+
+            elif phenotype is Phenotypes.GenerationTimeWhen:
+                values = generation_times_when(gt_index)
+
+            elif phenotype is Phenotypes.GenerationTime2When:
+                values = generation_times_when(gt2_index)
+
+            elif phenotype is Phenotypes.GenerationTimeStErrOfEstimate:
+                values = _get_at_indices(derivative_errors, gt_index)
+
+            elif phenotype is Phenotypes.GenerationTime2StErrOfEstimate:
+                values = _get_at_indices(derivative_errors, gt2_index)
+
+            elif phenotype is Phenotypes.GenerationTimePopulationSize:
+                values = population_size_at_generation_time()
+
+            elif phenotype is Phenotypes.GrowthLag:
+                values = growth_lags()
+
+            elif phenotype is Phenotypes.Monotonicity:
+                values = monotonicity()
+
+            else:
+                continue
+
+        values = np.array(values, dtype=np.float)
+        values[~has_data] = np.nan
+        results[phenotype] = values
+
+    chapman_richards = tuple(p for p in phenotypes if p in _CHAPMAN_RICHARDS_PARAMETERS)
+    if chapman_richards:
+
+        fits = np.ones((n_curves, 6)) * np.nan
+        r_squares, params, _ = get_fit_r_squares(flat_times, np.log2(curves[has_data]))
+        fits[has_data, 0] = r_squares
+        fits[has_data, 1:] = params
+
+        for phenotype in chapman_richards:
+            results[phenotype] = fits[:, _CHAPMAN_RICHARDS_PARAMETERS.index(phenotype)]
+
+    return results
+
+
 def initial_value(curve_smooth_growth_data, *args, **kwargs):
     return curve_smooth_growth_data[0]
 
@@ -209,6 +466,232 @@ def get_chapman_richards_residuals(cr_params, x_data, y_data):
     return y_data - get_chapman_richards_4parameter_extended_curve(x_data, *cr_params)
 
 
+def _get_chapman_richards_curves_and_jacobians(x_data, params):
+    """Chapman-Richards curves and their parameter derivatives.
+
+    Args:
+        x_data (np.array): The X-data
+        params (np.array): (curves, 5) untransformed parameters
+
+    Returns:
+        Tuple of the (curves, x) curves and the (curves, 5, x) derivatives
+        with regards to the untransformed parameters.
+    """
+    b0, b1, b2, b3, d = (params[:, i, np.newaxis] for i in range(5))
+
+    b0 = np.power(np.e, b0)
+    b2 = np.power(np.e, b2)
+    v = np.power(np.e, b3)
+    b3 = v / (v + 1.0)
+    v = np.power(np.e, b1)
+    s1 = v / (v + 1.0)
+    b1 = s1 * b3 + (1 - b3)
+    power = 1.0 / (1.0 - b3)
+
+    decay = np.exp(-b2 * x_data)
+    base = 1.0 - b1 * decay
+    scaled = b0 * np.power(base, power)
+
+    d_b1 = -power * scaled / base * decay
+    jacobians = np.empty((params.shape[0], 5, x_data.size))
+    jacobians[:, 0] = scaled
+    jacobians[:, 1] = d_b1 * (s1 * (1.0 - s1) * b3)
+    jacobians[:, 2] = d_b1 * (-b1 * b2) * x_data
+    jacobians[:, 3] = (d_b1 * (s1 - 1.0) + scaled * np.log(base) * power * power) * (b3 * (1.0 - b3))
+    jacobians[:, 4] = 1.0
+
+    return d + scaled, jacobians
+
+
+def _get_trust_region_steps(hessians, gradients, scales, radii):
+    """Levenberg-Marquardt steps constrained to trust regions.
+
+    Like MINPACK's `lmpar`, the damping is zero if the Gauss-Newton step
+    is within the trust region, else it is chosen so the scaled step
+    length is within 10% of the trust region radius.
+
+    Args:
+        hessians (np.array): (curves, 5, 5) approximate Hessians
+        gradients (np.array): (curves, 5) gradients
+        scales (np.array): (curves, 5) parameter scales
+        radii (np.array): (curves,) trust region radii
+
+    Returns:
+        Tuple of the steps, their scaled lengths and the damping used.
+    """
+    eigenvalues, eigenvectors = np.linalg.eigh(hessians / scales[:, :, np.newaxis] / scales[:, np.newaxis, :])
+    eigenvalues = eigenvalues.clip(0, None)
+    projections = np.einsum('nij,ni->nj', eigenvectors, gradients / scales)
+
+    def get_length(damping):
+        return np.sqrt(np.square(projections / (eigenvalues + damping[:, np.newaxis])).sum(axis=1))
+
+    damping = np.zeros(radii.shape)
+    length = get_length(damping)
+    constrained = ~(length <= 1.1 * radii)
+    damping[constrained] = 1e-20 * eigenvalues[constrained, -1].clip(1, None)
+    length[constrained] = get_length(damping)[constrained]
+    for _ in range(20):
+        active = constrained & (np.abs(length - radii) > 0.1 * radii)
+        if not active.any():
+            break
+        cubes = (np.square(projections) / np.power(eigenvalues + damping[:, np.newaxis], 3)).sum(axis=1)
+        damping[active] += ((length - radii) / radii * np.square(length) / cubes)[active]
+        damping[active] = damping[active].clip(0, None)
+        length[active] = get_length(damping)[active]
+
+    steps = np.einsum('nij,nj->ni', eigenvectors, projections / (eigenvalues + damping[:, np.newaxis])) / scales
+    return steps, length, damping
+
+
+def get_fit_r_squares(
+        x_data, y_data, p0=np.array([1.64, -0.1, -2.46, 0.1, 15.18], dtype=np.float),
+        tolerance=1.49012e-08, max_evaluations=1200, factor=100):
+    """Fits Chapman-Richards models to many curves at once.
+
+    This is the trust region Levenberg-Marquardt algorithm of MINPACK,
+    used by `scipy.optimize.leastsq` in `get_fit_r_square`, iterated
+    for all curves in parallel with analytical derivatives.
+
+    Args:
+        x_data (np.array): 1D array of times
+        y_data (np.array): (curves, x) log2 growth curves
+        p0 (np.array): Initial parameters, either one set for all curves
+            or one per curve, e.g. from a previous fit or from
+            neighbouring colonies.
+        tolerance (float): The relative reduction in squared residuals
+            and relative parameter change at which a fit has converged.
+        max_evaluations (int): Function evaluations before giving up on
+            a curve, counting each derivative as one evaluation per
+            parameter as `scipy.optimize.leastsq` does.
+        factor (float): Initial trust region radius relative to the
+            scaled initial parameters.
+
+    Returns:
+        Tuple of r-squares, (curves, 5) parameters and a boolean array
+        of which curves converged. As with `get_fit_r_square`, curves
+        that don't converge get the parameters of the last iteration and
+        curves with too few finite values get `np.inf` r-square and `p0`
+        as parameters.
+    """
+    n_curves = y_data.shape[0]
+    finite = np.isfinite(y_data)
+    values = np.where(finite, y_data, 0)
+    params = np.empty((n_curves, 5))
+    params[...] = p0
+    p0 = params.copy()
+    diagonal = np.arange(5)
+    epsilon = np.finfo(np.float).eps
+
+    hessians = np.empty((n_curves, 5, 5))
+    gradients = np.empty((n_curves, 5))
+    scales = np.zeros((n_curves, 5))
+    radii = np.empty((n_curves,))
+    evaluations = np.ones((n_curves,), dtype=np.int)
+    first = np.ones((n_curves,), dtype=bool)
+    converged = np.zeros((n_curves,), dtype=bool)
+
+    with np.errstate(all='ignore'):
+        curves = get_chapman_richards_4parameter_extended_curve(
+            x_data, *(params[:, i, np.newaxis] for i in range(5)))
+        squares = np.square(np.where(finite, values - curves, 0)).sum(axis=1)
+        active = finite.sum(axis=1) >= 5
+        update = active.copy()
+
+        while active.any():
+
+            if update.any():
+                updating = np.flatnonzero(update)
+                curves_fit, jacobians = _get_chapman_richards_curves_and_jacobians(x_data, params[updating])
+                jacobians *= finite[updating, np.newaxis]
+                residuals = np.where(finite[updating], values[updating] - curves_fit, 0)
+                hessian = np.empty((updating.size, 5, 5))
+                for i in range(5):
+                    for j in range(i + 1):
+                        hessian[:, i, j] = hessian[:, j, i] = (jacobians[:, i] * jacobians[:, j]).sum(axis=1)
+                hessians[updating] = hessian
+                gradients[updating] = (jacobians * residuals[:, np.newaxis]).sum(axis=2)
+                evaluations[updating] += 5
+
+                norms = np.sqrt(hessian[:, diagonal, diagonal])
+                norms[(norms == 0) & first[updating, np.newaxis]] = 1
+                scales[updating] = np.maximum(scales[updating], norms)
+                starting = updating[first[updating]]
+                radii[starting] = factor * np.sqrt(np.square(scales[starting] * params[starting]).sum(axis=1))
+                radii[starting[radii[starting] == 0]] = factor
+
+                stationary = updating[(gradients[updating] == 0).all(axis=1) | (squares[updating] == 0)]
+                converged[stationary] = True
+                active[stationary] = False
+                active[updating[~np.isfinite(hessians[updating]).all(axis=(1, 2))]] = False
+                update[:] = False
+
+            fit = np.flatnonzero(active)
+            if not fit.size:
+                break
+
+            steps, lengths, damping = _get_trust_region_steps(
+                hessians[fit], gradients[fit], scales[fit], radii[fit])
+            radii[fit[first[fit]]] = np.minimum(radii[fit[first[fit]]], lengths[first[fit]])
+
+            trial = params[fit] + steps
+            trial_squares = np.square(np.where(
+                finite[fit],
+                values[fit] - get_chapman_richards_4parameter_extended_curve(
+                    x_data, *(trial[:, i, np.newaxis] for i in range(5))),
+                0)).sum(axis=1)
+            evaluations[fit] += 1
+
+            norm = np.sqrt(squares[fit])
+            trial_norm = np.sqrt(trial_squares)
+            actual = np.where(0.1 * trial_norm < norm, 1 - np.square(trial_norm / norm), -1)
+            linear = np.einsum('ni,nij,nj->n', steps, hessians[fit], steps) / squares[fit]
+            dampened = damping * np.square(lengths) / squares[fit]
+            predicted = linear + 2 * dampened
+            directional = -(linear + dampened)
+            ratio = np.where(predicted != 0, actual / predicted, 0)
+
+            shrink = ratio <= 0.25
+            shrinkage = np.where(actual >= 0, 0.5, 0.5 * directional / (directional + 0.5 * actual))
+            shrinkage[(0.1 * trial_norm >= norm) | (shrinkage < 0.1)] = 0.1
+            radii[fit[shrink]] = (shrinkage * np.minimum(radii[fit], lengths / 0.1))[shrink]
+            grow = ~shrink & ((damping == 0) | (ratio >= 0.75))
+            radii[fit[grow]] = lengths[grow] / 0.5
+
+            success = ratio >= 1e-4
+            params[fit[success]] = trial[success]
+            squares[fit[success]] = trial_squares[success]
+            update[fit[success]] = True
+            first[fit[success]] = False
+
+            parameter_norms = np.sqrt(np.square(scales[fit] * params[fit]).sum(axis=1))
+            done = (
+                (np.abs(actual) <= tolerance) & (predicted <= tolerance) & (0.5 * ratio <= 1) |
+                (radii[fit] <= tolerance * parameter_norms))
+            converged[fit[done]] = True
+            stalled = (
+                (evaluations[fit] >= max_evaluations) |
+                (np.abs(actual) <= epsilon) & (predicted <= epsilon) & (0.5 * ratio <= 1) |
+                (radii[fit] <= epsilon * parameter_norms))
+            active[fit[done | stalled]] = False
+
+        curves = get_chapman_richards_4parameter_extended_curve(
+            x_data, *(params[:, i, np.newaxis] for i in range(5)))
+
+    r_squares = np.ones((n_curves,)) * np.inf
+    fitted = finite.sum(axis=1) >= 5
+    params[~fitted] = p0[~fitted]
+    for id_curve in np.flatnonzero(fitted):
+        y = y_data[id_curve][finite[id_curve]]
+        y_hat = curves[id_curve][finite[id_curve]]
+        if y.any():
+            r_squares[id_curve] = 1.0 - np.square(y_hat - y).sum() / np.square(y_hat - y.mean()).sum()
+        else:
+            r_squares[id_curve] = np.nan
+
+    return r_squares, params, converged
+
+
 def generation_time(derivative_values_log2, index, **kwargs):
     if index < 0:
         _logger.warning("No GT because no finite slopes in data")
@@ -524,3 +1007,13 @@ class Phenotypes(Enum):
 
         elif self is Phenotypes.Monotonicity:
             return curve_monotonicity(**kwargs)
+
+
+_CHAPMAN_RICHARDS_PARAMETERS = (
+    Phenotypes.ChapmanRichardsFit,
+    Phenotypes.ChapmanRichardsParam1,
+    Phenotypes.ChapmanRichardsParam2,
+    Phenotypes.ChapmanRichardsParam3,
+    Phenotypes.ChapmanRichardsParam4,
+    Phenotypes.ChapmanRichardsParamXtra,
+)
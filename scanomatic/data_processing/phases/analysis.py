@@ -9,7 +9,8 @@ from scipy.stats import linregress
 from scanomatic.data_processing import growth_phenotypes
 from scanomatic.data_processing.phases.segmentation import (
     DEFAULT_THRESHOLDS, CurvePhases, get_data_needed_for_segmentation,
-    is_detected_linear, is_detected_non_linear, is_undetermined, segment
+    get_linear_non_flat_extensions, is_detected_linear, is_detected_non_linear,
+    is_undetermined, segment
 )
 
 
@@ -107,38 +108,330 @@ def get_phenotypes_tuple(phase):
 
 def _phenotype_phases(model, doublings):
 
-    phenotypes = []
+    return get_phase_table([model]).get_phases_phenotypes(0)
 
-    # noinspection PyTypeChecker
-    for phase in CurvePhases:
 
-        labels, label_count = label(model.phases == phase.value)
-        for id_label in range(1, label_count + 1):
+class PhaseTable(object):
+    """Columnar table of the phases of the curves of a plate.
 
-            if is_undetermined(phase):
-                phenotypes.append((phase, None))
+    Each row is a phase, that is a run of equal `CurvePhases` values of a
+    curve, with the colony, the phase type, the left and exclusive right
+    index and the `CurvePhasePhenotypes` of the phase as columns.
+    Phenotypes that don't apply to the phase type are `nan`, as are all
+    phenotypes of undetermined phases.
+
+    The rows of a colony are consecutive and in the order of the colony's
+    `VectorPhenotypes.PhasesPhenotypes` vector, i.e. the detected phases
+    chronologically followed by the undetermined phases.
+
+    Args:
+        size: The number of colonies
+        colonies: The colony index of each row
+        phases: The `CurvePhases` value of each row
+        phenotypes: dict of the column of each `CurvePhasePhenotypes`
+        lefts: The first index of each phase, `-1` if not known
+        rights: The exclusive last index of each phase, `-1` if not known
+        has_phases: If each colony has been phase analysed, by default
+            all colonies
+        shape: The plate shape of the colonies, by default flat
+    """
+    def __init__(self, size, colonies, phases, phenotypes, lefts=None, rights=None, has_phases=None, shape=None):
+
+        self.size = size
+        self.shape = (size,) if shape is None else tuple(shape)
+        self.colonies = np.asarray(colonies, dtype=np.intp)
+        self.phases = np.asarray(phases, dtype=np.int)
+        self.phenotypes = {
+            phenotype: np.asarray(phenotypes[phenotype], dtype=np.float) for phenotype in CurvePhasePhenotypes}
+        self.lefts = np.ones_like(self.colonies) * -1 if lefts is None else np.asarray(lefts, dtype=np.intp)
+        self.rights = np.ones_like(self.colonies) * -1 if rights is None else np.asarray(rights, dtype=np.intp)
+        self.has_phases = np.ones((size,), dtype=np.bool) if has_phases is None else np.asarray(
+            has_phases, dtype=np.bool).ravel()
+        self.counts = np.bincount(self.colonies, minlength=size)
+        self.offsets = np.cumsum(self.counts) - self.counts
+
+    def __len__(self):
+
+        return self.colonies.size
+
+    @property
+    def positions(self):
+        """The index of each row among the rows of its colony"""
+        return np.arange(len(self)) - self.offsets[self.colonies]
+
+    @classmethod
+    def from_phases_phenotypes(cls, plate):
+        """Makes the table of a plate of `VectorPhenotypes.PhasesPhenotypes`.
+
+        Args:
+            plate: Object array of the phases phenotypes vector of each
+                colony, colonies without a vector aren't phase analysed
+
+        Masked phenotype values are `nan` in the table.
+        """
+        plate = np.asarray(plate, dtype=np.object)
+        has_phases = np.zeros(plate.shape, dtype=np.bool)
+        all_phenotypes = tuple(CurvePhasePhenotypes)
+        undetermined_values = (np.nan,) * len(all_phenotypes)
+        colonies = []
+        phases = []
+        values = []
+        for colony, vector in enumerate(plate.ravel()):
+
+            try:
+                vector = list(vector)
+            except TypeError:
                 continue
 
-            filt = labels == id_label
-            left, right = _locate_segment(filt)
-            time_right = model.times[right - 1]
-            time_left = model.times[left]
-            current_phase_phenotypes = {}
+            has_phases.flat[colony] = True
+            for phase, phase_phenotypes in vector:
+                colonies.append(colony)
+                phases.append(phase.value)
+                if phase_phenotypes is None:
+                    values.append(undetermined_values)
+                else:
+                    values.append(tuple(phase_phenotypes.get(phenotype, np.nan) for phenotype in all_phenotypes))
+
+        values = np.array(values, dtype=np.object).reshape(len(values), len(all_phenotypes))
+        values[np.frompyfunc(lambda value: value is np.ma.masked, 1, 1)(values).astype(np.bool)] = np.nan
+        values = values.astype(np.float)
+        return cls(
+            plate.size, colonies, phases,
+            {phenotype: values[:, i] for i, phenotype in enumerate(all_phenotypes)},
+            has_phases=has_phases, shape=plate.shape)
+
+    def get_phases_phenotypes(self, colony):
+        """The `VectorPhenotypes.PhasesPhenotypes` vector of a colony.
+
+        Returns: list of tuples of the `CurvePhases` and the dict of
+            `CurvePhasePhenotypes` of each phase, `None` for undetermined
+            phases
+        """
+        vector = []
+        for row in range(self.offsets[colony], self.offsets[colony] + self.counts[colony]):
+
+            phase = CurvePhases(self.phases[row])
+            if is_undetermined(phase):
+                vector.append((phase, None))
+            else:
+                vector.append((phase, {
+                    phenotype: self.phenotypes[phenotype][row] for phenotype in get_phenotypes_tuple(phase)}))
+
+        return vector
+
+    def get_count(self, rows):
+        """The number of rows of each colony among a boolean mask of rows"""
+        return np.bincount(self.colonies[rows], minlength=self.size)
+
+    def get_first(self, rows):
+        """The first row of each colony among a boolean mask of rows, `-1`
+        for colonies without rows"""
+        first = np.ones((self.size,), dtype=np.intp) * -1
+        rows = np.flatnonzero(rows)
+        colonies, index = np.unique(self.colonies[rows], return_index=True)
+        first[colonies] = rows[index]
+        return first
+
+    def get_last(self, rows):
+        """The last row of each colony among a boolean mask of rows, `-1`
+        for colonies without rows"""
+        last = np.ones((self.size,), dtype=np.intp) * -1
+        rows = np.flatnonzero(rows)[::-1]
+        colonies, index = np.unique(self.colonies[rows], return_index=True)
+        last[colonies] = rows[index]
+        return last
+
+    def get_ranked(self, rows, key, rank):
+        """The row of each colony with a rank of a key among a boolean
+        mask of rows.
+
+        Ties keep the order of the rows, as in a stable sort, and `nan`
+        ranks highest.
+
+        Args:
+            rows: Boolean mask of the rows to rank
+            key: The value of each row to rank on
+            rank: The index of the row in the sort order of each colony,
+                negative ranks count from the highest
+
+        Returns: The row of each colony, `-1` if the colony has too few
+            rows
+        """
+        rows = np.flatnonzero(rows)
+        rows = rows[np.lexsort((key[rows], self.colonies[rows]))]
+        counts = np.bincount(self.colonies[rows], minlength=self.size)
+        ends = np.cumsum(counts)
+        index = ends - counts + rank if rank >= 0 else ends + rank
+        ranked = np.ones((self.size,), dtype=np.intp) * -1
+        has_rank = (index >= ends - counts) & (index < ends)
+        ranked[has_rank] = rows[index[has_rank]]
+        return ranked
+
+    def get_values(self, phenotype, rows):
+        """The value of a phenotype of a row per colony, `nan` where the
+        row is `-1`"""
+        values = np.ones((self.size,), dtype=np.float) * np.nan
+        values[rows >= 0] = self.phenotypes[phenotype][rows[rows >= 0]]
+        return values
+
+    def reshape(self, values):
+        """Colony values in the plate shape"""
+        return np.asarray(values).reshape(self.shape)
+
+
+def get_phase_table(models, colonies=None, size=None, shape=None):
+    """Phenotypes the phases of segmented curves.
+
+    The phases of all curves are run-length encoded together and the
+    linear models of all linear phases are fitted in closed form. The
+    phenotypes are the same as those of the `assign_*_phase_phenotypes`
+    functions, up to floating point precision, except that masked values
+    are `nan`.
+
+    Args:
+        models (list[scanomatic.models.phases_models.SegmentationModel]):
+            Segmented curves with the same times
+        colonies: The colony index of each model, by default their order
+        size: The number of colonies, by default the number of models
+        shape: See `PhaseTable`
+
+    Returns (PhaseTable): The phases of the models
+    """
+    models = list(models)
+    if colonies is None:
+        colonies = np.arange(len(models))
+    colonies = np.asarray(colonies, dtype=np.intp)
+    if size is None:
+        size = len(models) if shape is None else int(np.prod(shape))
+    has_phases = np.zeros((size,), dtype=np.bool)
+    has_phases[colonies] = True
+
+    if not models:
+        return PhaseTable(
+            size, [], [], {phenotype: [] for phenotype in CurvePhasePhenotypes}, [], [], has_phases, shape)
+
+    times = np.asarray(models[0].times, dtype=np.float)
+    log2_curves = np.array([np.ma.filled(np.ma.asarray(model.log2_curve, dtype=np.float), np.nan) for model in models])
+    dydts = np.array([np.ma.filled(np.ma.asarray(model.dydt, dtype=np.float), np.nan) for model in models])
+    offsets = np.array([model.offset for model in models], dtype=np.intp)
+    curve_phases = np.array([model.phases for model in models], dtype=np.int)
+    size_t = times.size
+
+    # Run-length encoding of the phases
+    changes = np.ones(curve_phases.shape, dtype=np.bool)
+    changes[:, 1:] = curve_phases[:, 1:] != curve_phases[:, :-1]
+    curves, lefts = np.nonzero(changes)
+    rights = np.empty_like(lefts)
+    rights[:-1] = lefts[1:]
+    rights[np.r_[curves[1:] != curves[:-1], True]] = size_t
+    phases = curve_phases[curves, lefts]
+
+    known = np.in1d(phases, [phase.value for phase in CurvePhases])
+    curves, lefts, rights, phases = curves[known], lefts[known], rights[known], phases[known]
+
+    non_linear = np.in1d(phases, [phase.value for phase in CurvePhases if is_detected_non_linear(phase)])
+    linear = np.in1d(phases, [phase.value for phase in CurvePhases if is_detected_linear(phase)])
+    phenotypes = {phenotype: np.ones(phases.shape, dtype=np.float) * np.nan for phenotype in CurvePhasePhenotypes}
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+
+        _set_common_phase_phenotypes(phenotypes, curves, lefts, rights, times, log2_curves)
+        _set_non_linear_phase_phenotypes(
+            phenotypes, non_linear, curves, lefts, rights, times, log2_curves, dydts, offsets)
+        _set_linear_phase_phenotypes(phenotypes, linear, curves, lefts, rights, times, log2_curves)
+
+    undetermined = np.in1d(phases, [phase.value for phase in CurvePhases if is_undetermined(phase)])
+    for phenotype in CurvePhasePhenotypes:
+        phenotypes[phenotype][undetermined] = np.nan
+
+    # Detected phases chronologically, then undetermined phases by type
+    order = np.lexsort((lefts, np.where(undetermined, phases, 0), undetermined, colonies[curves]))
+    unknown_starts = np.isnan(phenotypes[CurvePhasePhenotypes.Start][order]) & ~undetermined[order]
+    for curve in np.unique(curves[order][unknown_starts]):
+        in_curve = curves[order] == curve
+        order[in_curve] = _get_start_sorted_rows(
+            order[in_curve], phases, lefts, phenotypes[CurvePhasePhenotypes.Start], undetermined)
+
+    curves, lefts, rights, phases = curves[order], lefts[order], rights[order], phases[order]
+    phenotypes = {phenotype: values[order] for phenotype, values in phenotypes.iteritems()}
+
+    return PhaseTable(size, colonies[curves], phases, phenotypes, lefts, rights, has_phases, shape)
+
+
+def _get_start_sorted_rows(rows, phases, lefts, starts, undetermined):
+    # The order of `sorted` on starts depends on the initial order when some starts are nan
+    rows = sorted(rows, key=lambda row: (phases[row], lefts[row]))
+    return sorted(rows, key=lambda row: 9999 if undetermined[row] else starts[row])
+
+
+def _set_common_phase_phenotypes(phenotypes, curves, lefts, rights, times, log2_curves):
+    # Same as `assign_common_phase_phenotypes` for all phases
+    size_t = times.size
+    lasts = rights - 1
+    befores = np.maximum(lefts - 1, 0)
+    afters = np.minimum(rights, size_t - 1)
+
+    starts = (times[lefts] + times[befores]) / 2
+    log2_starts = (log2_curves[curves, lefts] + log2_curves[curves, befores]) / 2
+    log2_ends = (log2_curves[curves, lasts] + log2_curves[curves, afters]) / 2
+
+    phenotypes[CurvePhasePhenotypes.Duration] = (times[lasts] + times[afters]) / 2 - starts
+    phenotypes[CurvePhasePhenotypes.PopulationDoublings] = log2_ends - log2_starts
+    phenotypes[CurvePhasePhenotypes.Yield] = np.power(2, log2_ends) - np.power(2, log2_starts)
+    phenotypes[CurvePhasePhenotypes.Start] = starts
+
+    invalid_starts = ~np.isfinite(log2_curves[curves, lefts])
+    invalid = invalid_starts | ~np.isfinite(log2_curves[curves, lasts])
+    phenotypes[CurvePhasePhenotypes.Duration][invalid] = np.nan
+    phenotypes[CurvePhasePhenotypes.PopulationDoublings][invalid] = np.nan
+    phenotypes[CurvePhasePhenotypes.Yield][invalid] = np.nan
+    phenotypes[CurvePhasePhenotypes.Start][invalid_starts] = np.nan
+
+
+def _set_non_linear_phase_phenotypes(phenotypes, rows, curves, lefts, rights, times, log2_curves, dydts, offsets):
+    # Same as `assign_non_linear_phase_phenotypes` for the rows
+    curves, lefts, lasts = curves[rows], lefts[rows], rights[rows] - 1
+    time_lefts = times[lefts]
+    time_rights = times[lasts]
+
+    k1 = dydts[curves, np.maximum(0, lefts - offsets[curves])]
+    k2 = dydts[curves, lasts - offsets[curves]]
+    m1 = log2_curves[curves, lefts] - k1 * time_lefts
+    m2 = log2_curves[curves, lasts] - k2 * time_rights
+    i_x = (m2 - m1) / (k1 - k2)
+    intersections = (i_x - time_lefts) / (time_rights - time_lefts)
+
+    angles = np.arctan2(k2, 1) - np.arctan2(k1, 1)
+    angles = np.where(angles > np.pi, 2 * np.pi - angles, angles)
 
-            if is_detected_non_linear(phase):
+    invalid = ~np.isfinite(k1) | ~np.isfinite(k2)
+    intersections[invalid] = np.nan
+    angles[invalid] = np.nan
 
-                assign_non_linear_phase_phenotypes(current_phase_phenotypes, model, left, right, time_left, time_right)
+    phenotypes[CurvePhasePhenotypes.AsymptoteIntersection][rows] = intersections
+    phenotypes[CurvePhasePhenotypes.AsymptoteAngle][rows] = angles
 
-            elif is_detected_linear(phase):
 
-                assign_linear_phase_phenotypes(current_phase_phenotypes, model, filt)
+def _set_linear_phase_phenotypes(phenotypes, rows, curves, lefts, rights, times, log2_curves):
+    # Same as `assign_linear_phase_phenotypes` for the rows, as closed form least squares of each phase
+    curves, lefts, rights = curves[rows], lefts[rows], rights[rows]
+    lengths = rights - lefts
+    segments = np.repeat(np.arange(lengths.size), lengths)
+    positions = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths - lefts, lengths)
 
-            assign_common_phase_phenotypes(current_phase_phenotypes, model, left, right)
+    x = times[positions]
+    y = log2_curves[curves[segments], positions]
+    x_means = np.bincount(segments, x, minlength=lengths.size) / lengths
+    y_means = np.bincount(segments, y, minlength=lengths.size) / lengths
+    x = x - x_means[segments]
+    y = y - y_means[segments]
 
-            phenotypes.append((phase, current_phase_phenotypes))
+    slopes = np.bincount(segments, x * y, minlength=lengths.size) / np.bincount(
+        segments, x * x, minlength=lengths.size)
 
-    # Phenotypes sorted on phase start rather than type of phase
-    return sorted(phenotypes, key=lambda (t, p): p[CurvePhasePhenotypes.Start] if p is not None else 9999)
+    phenotypes[CurvePhasePhenotypes.LinearModelSlope][rows] = slopes
+    phenotypes[CurvePhasePhenotypes.LinearModelIntercept][rows] = y_means - slopes * x_means
+    phenotypes[CurvePhasePhenotypes.PopulationDoublingTime][rows] = 1 / slopes
 
 
 def assign_common_phase_phenotypes(current_phase_phenotypes, model, left, right):
@@ -231,14 +524,16 @@ def _locate_segment(filt):  # -> (int, int)
         return None, None
 
 
-def get_phase_analysis(phenotyper_object, plate, pos, thresholds=None, experiment_doublings=None):
+def get_phase_analysis(phenotyper_object, plate, pos, thresholds=None, experiment_doublings=None,
+                       model=None, extensions=None):
 
     if thresholds is None:
         thresholds = DEFAULT_THRESHOLDS
 
-    model = get_data_needed_for_segmentation(phenotyper_object, plate, pos, thresholds)
+    if model is None:
+        model = get_data_needed_for_segmentation(phenotyper_object, plate, pos, thresholds)
 
-    for _ in segment(model, thresholds):
+    for _ in segment(model, thresholds, extensions=extensions):
 
         pass
 
@@ -249,3 +544,29 @@ def get_phase_analysis(phenotyper_object, plate, pos, thresholds=None, experimen
 
     # TODO: ensure it isn't unintentionally smoothed dydt that is uses for values, good for location though
     return model.phases, _phenotype_phases(model, experiment_doublings)
+
+
+def get_phase_analyses(phenotyper_object, plate, positions, thresholds=None):
+    """Phase analysis of several positions of a plate.
+
+    Same as `get_phase_analysis` for each position, but the linearity
+    extensions of all curves are scanned together and their phases are
+    phenotyped in one `PhaseTable`.
+
+    Args:
+        positions: The positions to analyse
+
+    Returns: list of the phases and the phase phenotypes of each position
+    """
+    if thresholds is None:
+        thresholds = DEFAULT_THRESHOLDS
+
+    models = [get_data_needed_for_segmentation(phenotyper_object, plate, pos, thresholds) for pos in positions]
+    extensions, _, _ = get_linear_non_flat_extensions(models, thresholds)
+
+    for model, model_extensions in zip(models, extensions):
+        for _ in segment(model, thresholds, extensions=model_extensions):
+            pass
+
+    table = get_phase_table(models)
+    return [(model.phases, table.get_phases_phenotypes(index)) for index, model in enumerate(models)]
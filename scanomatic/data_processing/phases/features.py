@@ -7,10 +7,10 @@ import numpy as np
 
 from scanomatic.data_processing import growth_phenotypes
 from scanomatic.data_processing.phases.analysis import (
-    CurvePhasePhenotypes, get_phenotypes_tuple, number_of_phenotypes
+    CurvePhasePhenotypes, PhaseTable, get_phenotypes_tuple, number_of_phenotypes
 )
 from scanomatic.data_processing.phases.segmentation import (
-    CurvePhases, is_detected_non_linear
+    CurvePhases, is_detected_non_linear, is_undetermined
 )
 from scanomatic.io.logger import Logger
 
@@ -117,126 +117,9 @@ class VectorPhenotypes(Enum):
     """:type : VectorPhenotypes"""
 
 
-def filter_plate_custom_filter(
-        plate,
-        phase=CurvePhases.GrowthAcceleration,
-        measure=CurvePhasePhenotypes.AsymptoteIntersection,
-        phases_requirement=lambda phases: len(phases) == 1,
-        phase_selector=lambda phases: phases[0]):
-
-    def f(phenotype_vector):
-
-        try:
-            phases = tuple(d for t, d in phenotype_vector if t == phase)
-            if phases_requirement(phases):
-                return phase_selector(phases)[measure]
-        except TypeError:
-            pass
-        return np.nan
-
-    return np.frompyfunc(f, 1, 1)(plate).astype(float)
-
-
-def filter_plate_on_phase_id(plate, phases_id, measure):
-
-    def f(phenotype_vector, phase_id):
-        if phase_id < 0:
-            return np.nan
-
-        try:
-            return phenotype_vector[phase_id][1][measure]
-        except (KeyError, TypeError):
-            return np.nan
-
-    return np.frompyfunc(f, 2, 1)(plate, phases_id).astype(np.float)
-
-
-def _get_phase_id(plate, *phases):
-
-    l = len(phases)
-
-    def f(v):
-        try:
-            v = zip(*v)[0]
-            i = 0
-            for id_phase, phase in enumerate(v):
-                if i < l:
-                    if phase is phases[i]:
-                        i += 1
-                        if i == l:
-                            return id_phase
-        except TypeError:
-            pass
-        return -1
-
-    return np.frompyfunc(f, 1, 1)(plate).astype(np.int)
-
-
-def _phase_finder(phase_vector, phase):
-
-    try:
-        return tuple(i for i, (p_type, p_data) in enumerate(phase_vector) if p_type == phase)
-    except TypeError:
-        return tuple()
-
 # REGION: Phase counters
 
 
-def _py_impulse_counter(phase_vector):
-    try:
-        return sum(1 for phase in phase_vector if phase[0] == CurvePhases.Impulse)
-    except TypeError:
-        return -1
-
-_np_impulse_counter = np.frompyfunc(_py_impulse_counter, 1, 1)
-
-
-def _np_ma_impulse_counter(phases):
-
-    data = _np_impulse_counter(phases)
-    data[data < 0] = np.nan
-    return data
-
-
-def _py_inner_impulse_counter(phase_vector):
-
-    try:
-        acc = _phase_finder(phase_vector, CurvePhases.GrowthAcceleration)
-        if not acc:
-            return -1
-        ret = _phase_finder(phase_vector, CurvePhases.GrowthRetardation)
-        if not ret:
-            return -1
-        return _py_impulse_counter(phase_vector[acc[0]: ret[-1]])
-    except TypeError:
-        return -1
-
-_np_inner_impulse_counter = np.frompyfunc(_py_inner_impulse_counter, 1, 1)
-
-
-def _np_ma_inner_impulse_counter(phases):
-
-    data = _np_inner_impulse_counter(phases).astype(float)
-    data[data < 0] = np.nan
-    return data
-
-
-def _py_collapse_counter(phase_vector):
-    try:
-        return sum(1 for phase in phase_vector if phase[0] == CurvePhases.Collapse)
-    except TypeError:
-        return -1
-
-_np_collapse_counter = np.frompyfunc(_py_collapse_counter, 1, 1)
-
-
-def _np_ma_collapse_counter(phases):
-
-    data = _np_collapse_counter(phases)
-    data[data < 0] = np.nan
-    return data
-
-
 def _py_phase_counter(phase_vector):
 
     return sum(1 for t, d in phase_vector if t is not CurvePhases.Undetermined)
@@ -251,7 +134,8 @@ _np_phase_counter = np.frompyfunc(_py_phase_counter, 1, 1)
 def _py_get_major_impulse_for_plate(phases):
     """Locates major impulses
 
-    First the phases sort order based on yield is constructed
+    First the phases sort order based on yield is constructed,
+    ties keep the order of the phases
 
     The indices and sort order of those that are impulses are
     collected.
@@ -272,7 +156,7 @@ def _py_get_major_impulse_for_plate(phases):
             p_data[CurvePhasePhenotypes.PopulationDoublings] if
             p_data is not None and p_data[CurvePhasePhenotypes.PopulationDoublings] else -np.inf
             for p_type, p_data in phases
-        ))
+        ), kind='mergesort')
 
         impulses = np.array(tuple(
             (i, v) for i, v in enumerate(sort_order) if
@@ -296,162 +180,148 @@ def _np_ma_get_major_impulse_indices(phases):
 # END REGION: Major pulse index
 
 
-def _py_get_flanking_angle_relation(phases, major_impulse_index):
+def _get_phase_rows(table, *phases):
 
-    def _flank_angle(flank, impulse):
+    return np.in1d(table.phases, [phase.value for phase in phases])
 
-        if flank is None:
 
-            return np.arctan2(1,
-                              impulse[VectorPhenotypes.PhasesPhenotypes.value][CurvePhasePhenotypes.LinearModelSlope])
+def _get_doublings_sort_key(table):
+    # Phases without population doublings sort first
+    doublings = table.phenotypes[CurvePhasePhenotypes.PopulationDoublings]
+    return np.where(
+        _get_phase_rows(table, *(phase for phase in CurvePhases if is_undetermined(phase))) | (doublings == 0),
+        -np.inf, doublings)
 
-        elif flank[VectorPhenotypes.PhasesClassifications.value] is CurvePhases.Flat:
 
-            return np.pi - np.abs(
-                np.arctan2(1, impulse[VectorPhenotypes.PhasesPhenotypes.value][CurvePhasePhenotypes.LinearModelSlope]) -
-                np.arctan2(1, flank[VectorPhenotypes.PhasesPhenotypes.value][CurvePhasePhenotypes.LinearModelSlope]))
+def _get_major_impulses(table):
+    """The major impulse row of each colony.
 
-        elif is_detected_non_linear(flank[VectorPhenotypes.PhasesClassifications.value]):
+    Same as `_py_get_major_impulse_for_plate` for all colonies of a table.
 
-            return flank[VectorPhenotypes.PhasesPhenotypes.value][CurvePhasePhenotypes.AsymptoteAngle]
+    Returns: The row of each colony, `-1` if there's none
+    """
+    impulses = _get_phase_rows(table, CurvePhases.Impulse)
+    keys = _get_doublings_sort_key(table)
+    sort_orders = np.lexsort((keys, table.colonies)) - table.offsets[table.colonies]
+    major = table.get_ranked(impulses, sort_orders, -1)
 
-        else:
-            return np.inf
+    # A lone first impulse with the first sort order isn't considered
+    lone = (major >= 0) & (table.get_count(impulses) == 1)
+    lone[lone] = (table.positions[major[lone]] == 0) & (sort_orders[major[lone]] == 0)
+    major[lone] = -1
+    return major
 
-    if np.isnan(major_impulse_index) or \
-            phases[major_impulse_index][VectorPhenotypes.PhasesPhenotypes.value] is None:
-        return np.inf
-    if phases[major_impulse_index][VectorPhenotypes.PhasesClassifications.value] is not CurvePhases.Impulse:
-        _l.error("Got index {0} as Impulse but is {1} in {2}".format(
-            major_impulse_index,
-            phases[major_impulse_index][VectorPhenotypes.PhasesClassifications.value],
-            phases))
-        return np.inf
 
-    a1 = _flank_angle(phases[major_impulse_index - 1] if major_impulse_index > 0 else None,
-                      phases[major_impulse_index])
+def _get_flank_angles(table, major, flanks):
+    """The angles between the major impulses and their flanking phases.
 
-    a2 = _flank_angle(phases[major_impulse_index + 1] if major_impulse_index < len(phases) - 1 else None,
-                      phases[major_impulse_index])
+    Args:
+        table: The phase table
+        major: The major impulse row of each colony, all `>= 0`
+        flanks: The flanking row of each colony, `-1` if the impulse
+            has no flanking phase
+    """
+    slopes = table.phenotypes[CurvePhasePhenotypes.LinearModelSlope]
+    impulse_angles = np.arctan2(1, slopes[major])
+    angles = impulse_angles.copy()
 
-    return a2 / a1
+    has_flank = flanks >= 0
+    flank_phases = table.phases[flanks]
+    flat = has_flank & (flank_phases == CurvePhases.Flat.value)
+    angles[flat] = np.pi - np.abs(impulse_angles[flat] - np.arctan2(1, slopes[flanks[flat]]))
 
-_np_get_flanking_angle_relation = np.frompyfunc(_py_get_flanking_angle_relation, 2, 1)
+    non_linear = has_flank & np.in1d(
+        flank_phases, [phase.value for phase in CurvePhases if is_detected_non_linear(phase)])
+    angles[non_linear] = table.phenotypes[CurvePhasePhenotypes.AsymptoteAngle][flanks[non_linear]]
 
+    angles[has_flank & ~flat & ~non_linear] = np.inf
+    return angles
 
-def extract_phenotypes(plate, meta_phenotype, phenotypes):
 
-    if meta_phenotype == CurvePhaseMetaPhenotypes.MajorImpulseYieldContribution or \
-            meta_phenotype == CurvePhaseMetaPhenotypes.FirstMinorImpulseYieldContribution:
+def _get_flanking_angle_relations(table):
 
-        index = -1 if meta_phenotype == CurvePhaseMetaPhenotypes.MajorImpulseYieldContribution else -2
-        phase_need = 1 if meta_phenotype == CurvePhaseMetaPhenotypes.MajorImpulseYieldContribution else 2
+    major = _get_major_impulses(table)
+    relations = np.ones((table.size,), dtype=np.float) * np.inf
+    has_major = major >= 0
+    major = major[has_major]
+    positions = table.positions[major]
+    counts = table.counts[table.colonies[major]]
 
-        return filter_plate_custom_filter(
-            plate,
-            phase=CurvePhases.Impulse,
-            measure=CurvePhasePhenotypes.PopulationDoublings,
-            phases_requirement=lambda phases: len(phases) >= phase_need,
-            phase_selector=lambda phases:
-            phases[np.argsort(tuple(
-                phase[CurvePhasePhenotypes.PopulationDoublings] if
-                phase[CurvePhasePhenotypes.PopulationDoublings] else -np.inf for phase in phases))[index]])
+    left_angles = _get_flank_angles(table, major, np.where(positions > 0, major - 1, -1))
+    right_angles = _get_flank_angles(table, major, np.where(positions < counts - 1, major + 1, -1))
+    relations[has_major] = right_angles / left_angles
+    return relations
 
-    elif (meta_phenotype == CurvePhaseMetaPhenotypes.MajorImpulseAveragePopulationDoublingTime or
-            meta_phenotype == CurvePhaseMetaPhenotypes.FirstMinorImpulseAveragePopulationDoublingTime):
 
-        index = -1 if meta_phenotype == CurvePhaseMetaPhenotypes.MajorImpulseAveragePopulationDoublingTime else -2
-        phase_need = 1 if meta_phenotype == CurvePhaseMetaPhenotypes.MajorImpulseAveragePopulationDoublingTime else 2
+def _get_lag(table, impulses):
 
-        return filter_plate_custom_filter(
-            plate,
-            phase=CurvePhases.Impulse,
-            measure=CurvePhasePhenotypes.PopulationDoublingTime,
-            phases_requirement=lambda phases: len(phases) >= phase_need,
-            phase_selector=lambda phases:
-            phases[np.argsort(tuple(
-                phase[CurvePhasePhenotypes.PopulationDoublings] if
-                phase[CurvePhasePhenotypes.PopulationDoublings] else -np.inf for phase in phases))[index]])
+    flats = table.get_first(_get_phase_rows(table, CurvePhases.Flat))
+    flat_slope = table.get_values(CurvePhasePhenotypes.LinearModelSlope, flats)
+    flat_intercept = table.get_values(CurvePhasePhenotypes.LinearModelIntercept, flats)
+    impulse_slope = table.get_values(CurvePhasePhenotypes.LinearModelSlope, impulses)
+    impulse_intercept = table.get_values(CurvePhasePhenotypes.LinearModelIntercept, impulses)
+
+    lag = (impulse_intercept - flat_intercept) / (flat_slope - impulse_slope)
+    lag[lag < 0] = np.nan
+    return lag
 
-    elif meta_phenotype == CurvePhaseMetaPhenotypes.InitialLag:
 
-        flat_slope = filter_plate_custom_filter(
-            plate, phase=CurvePhases.Flat, measure=CurvePhasePhenotypes.LinearModelSlope,
-            phases_requirement=lambda phases: len(phases) > 0,
-            phase_selector=lambda phases: phases[0])
+def _get_counts(table, rows):
 
-        flat_intercept = filter_plate_custom_filter(
-            plate, phase=CurvePhases.Flat, measure=CurvePhasePhenotypes.LinearModelIntercept,
-            phases_requirement=lambda phases: len(phases) > 0,
-            phase_selector=lambda phases: phases[0])
+    counts = table.get_count(rows).astype(np.float)
+    counts[~table.has_phases] = np.nan
+    return counts
 
-        impulses_phase = _get_phase_id(plate, CurvePhases.Flat, CurvePhases.Impulse)
 
-        impulse_slope = filter_plate_on_phase_id(
-            plate, impulses_phase, measure=CurvePhasePhenotypes.LinearModelSlope)
+def extract_phenotypes(plate, meta_phenotype, phenotypes):
+    """Extracts a meta phenotype of all colonies of a plate.
 
-        impulse_intercept = filter_plate_on_phase_id(
-            plate, impulses_phase, measure=CurvePhasePhenotypes.LinearModelIntercept)
+    The meta phenotypes are group-bys over the rows of each colony in
+    the phase table of the plate.
 
-        lag = (impulse_intercept - flat_intercept) / (flat_slope - impulse_slope)
-        lag[lag < 0] = np.nan
-        return lag
+    Args:
+        plate: The `PhaseTable` of the plate or the plate of
+            `VectorPhenotypes.PhasesPhenotypes` to make it from
+        meta_phenotype (CurvePhaseMetaPhenotypes): The meta phenotype
+        phenotypes: The scalar phenotypes of the plate
 
-    elif meta_phenotype == CurvePhaseMetaPhenotypes.TimeBeforeMajorGrowth:
+    Returns: Array of the meta phenotype in the plate shape
+    """
+    table = plate if isinstance(plate, PhaseTable) else PhaseTable.from_phases_phenotypes(plate)
+    impulses = _get_phase_rows(table, CurvePhases.Impulse)
 
-        flat_slope = filter_plate_custom_filter(
-            plate, phase=CurvePhases.Flat, measure=CurvePhasePhenotypes.LinearModelSlope,
-            phases_requirement=lambda phases: len(phases) > 0,
-            phase_selector=lambda phases: phases[0])
+    if meta_phenotype == CurvePhaseMetaPhenotypes.MajorImpulseYieldContribution or \
+            meta_phenotype == CurvePhaseMetaPhenotypes.FirstMinorImpulseYieldContribution:
+
+        rank = -1 if meta_phenotype == CurvePhaseMetaPhenotypes.MajorImpulseYieldContribution else -2
+        rows = table.get_ranked(impulses, _get_doublings_sort_key(table), rank)
+        return table.reshape(table.get_values(CurvePhasePhenotypes.PopulationDoublings, rows))
+
+    elif (meta_phenotype == CurvePhaseMetaPhenotypes.MajorImpulseAveragePopulationDoublingTime or
+            meta_phenotype == CurvePhaseMetaPhenotypes.FirstMinorImpulseAveragePopulationDoublingTime):
 
-        flat_intercept = filter_plate_custom_filter(
-            plate, phase=CurvePhases.Flat, measure=CurvePhasePhenotypes.LinearModelIntercept,
-            phases_requirement=lambda phases: len(phases) > 0,
-            phase_selector=lambda phases: phases[0])
+        rank = -1 if meta_phenotype == CurvePhaseMetaPhenotypes.MajorImpulseAveragePopulationDoublingTime else -2
+        rows = table.get_ranked(impulses, _get_doublings_sort_key(table), rank)
+        return table.reshape(table.get_values(CurvePhasePhenotypes.PopulationDoublingTime, rows))
 
-        impulses_phase = _np_ma_get_major_impulse_indices(plate)
+    elif meta_phenotype == CurvePhaseMetaPhenotypes.InitialLag:
 
-        impulse_slope = filter_plate_on_phase_id(
-            plate, impulses_phase, measure=CurvePhasePhenotypes.LinearModelSlope)
+        # The first impulse after the first flat phase
+        flats = table.get_first(_get_phase_rows(table, CurvePhases.Flat))
+        first_flats = flats[table.colonies]
+        rows = table.get_first(impulses & (first_flats >= 0) & (np.arange(len(table)) > first_flats))
+        return table.reshape(_get_lag(table, rows))
 
-        impulse_intercept = filter_plate_on_phase_id(
-            plate, impulses_phase, measure=CurvePhasePhenotypes.LinearModelIntercept)
+    elif meta_phenotype == CurvePhaseMetaPhenotypes.TimeBeforeMajorGrowth:
 
-        lag = (impulse_intercept - flat_intercept) / (flat_slope - impulse_slope)
-        lag[lag < 0] = np.nan
-        return lag
+        return table.reshape(_get_lag(table, _get_major_impulses(table)))
 
     elif meta_phenotype == CurvePhaseMetaPhenotypes.InitialLagAlternativeModel:
 
-        impulse_slope = filter_plate_custom_filter(
-            plate,
-            phase=CurvePhases.Impulse,
-            measure=CurvePhasePhenotypes.LinearModelSlope,
-            phases_requirement=lambda phases: len(phases) > 0,
-            phase_selector=lambda phases:
-            phases[np.argsort(tuple(
-                phase[CurvePhasePhenotypes.PopulationDoublings] if
-                phase[CurvePhasePhenotypes.PopulationDoublings] else -np.inf for phase in phases))[-1]])
-
-        impulse_intercept = filter_plate_custom_filter(
-            plate,
-            phase=CurvePhases.Impulse,
-            measure=CurvePhasePhenotypes.LinearModelIntercept,
-            phases_requirement=lambda phases: len(phases) > 0,
-            phase_selector=lambda phases:
-            phases[np.argsort(tuple(
-                phase[CurvePhasePhenotypes.PopulationDoublings] if
-                phase[CurvePhasePhenotypes.PopulationDoublings] else -np.inf for phase in phases))[-1]])
-
-        impulse_start = filter_plate_custom_filter(
-            plate,
-            phase=CurvePhases.Impulse,
-            measure=CurvePhasePhenotypes.Start,
-            phases_requirement=lambda phases: len(phases) > 0,
-            phase_selector=lambda phases:
-            phases[np.argsort(tuple(
-                phase[CurvePhasePhenotypes.PopulationDoublings] if
-                phase[CurvePhasePhenotypes.PopulationDoublings] else -np.inf for phase in phases))[-1]])
+        rows = table.get_ranked(impulses, _get_doublings_sort_key(table), -1)
+        impulse_slope = table.reshape(table.get_values(CurvePhasePhenotypes.LinearModelSlope, rows))
+        impulse_intercept = table.reshape(table.get_values(CurvePhasePhenotypes.LinearModelIntercept, rows))
+        impulse_start = table.reshape(table.get_values(CurvePhasePhenotypes.Start, rows))
 
         flat_slope = 0
         flat_intercept = phenotypes[growth_phenotypes.Phenotypes.ExperimentLowPoint]
@@ -465,63 +335,50 @@ def extract_phenotypes(plate, meta_phenotype, phenotypes):
 
     elif meta_phenotype == CurvePhaseMetaPhenotypes.InitialAccelerationAsymptoteAngle:
 
-        return filter_plate_custom_filter(
-            plate,
-            phase=CurvePhases.GrowthAcceleration,
-            measure=CurvePhasePhenotypes.AsymptoteAngle,
-            phases_requirement=lambda phases: len(phases) > 0,
-            phase_selector=lambda phases: phases[0]
-        )
+        rows = table.get_first(_get_phase_rows(table, CurvePhases.GrowthAcceleration))
+        return table.reshape(table.get_values(CurvePhasePhenotypes.AsymptoteAngle, rows))
 
     elif meta_phenotype == CurvePhaseMetaPhenotypes.FinalRetardationAsymptoteAngle:
 
-        return filter_plate_custom_filter(
-            plate,
-            phase=CurvePhases.GrowthRetardation,
-            measure=CurvePhasePhenotypes.AsymptoteAngle,
-            phases_requirement=lambda phases: len(phases) > 0,
-            phase_selector=lambda phases: phases[-1]
-        )
+        rows = table.get_last(_get_phase_rows(table, CurvePhases.GrowthRetardation))
+        return table.reshape(table.get_values(CurvePhasePhenotypes.AsymptoteAngle, rows))
 
     elif meta_phenotype == CurvePhaseMetaPhenotypes.InitialAccelerationAsymptoteIntersect:
-        return filter_plate_custom_filter(
-            plate,
-            phase=CurvePhases.GrowthAcceleration,
-            measure=CurvePhasePhenotypes.AsymptoteIntersection,
-            phases_requirement=lambda phases: len(phases) > 0,
-            phase_selector=lambda phases: phases[0]
-        )
+
+        rows = table.get_first(_get_phase_rows(table, CurvePhases.GrowthAcceleration))
+        return table.reshape(table.get_values(CurvePhasePhenotypes.AsymptoteIntersection, rows))
 
     elif meta_phenotype == CurvePhaseMetaPhenotypes.FinalRetardationAsymptoteIntersect:
 
-        return filter_plate_custom_filter(
-            plate,
-            phase=CurvePhases.GrowthRetardation,
-            measure=CurvePhasePhenotypes.AsymptoteIntersection,
-            phases_requirement=lambda phases: len(phases) > 0,
-            phase_selector=lambda phases: phases[-1]
-        )
+        rows = table.get_last(_get_phase_rows(table, CurvePhases.GrowthRetardation))
+        return table.reshape(table.get_values(CurvePhasePhenotypes.AsymptoteIntersection, rows))
 
     elif meta_phenotype == CurvePhaseMetaPhenotypes.Modalities:
 
-        return _np_ma_impulse_counter(plate)
+        return table.reshape(_get_counts(table, impulses))
 
     elif meta_phenotype == CurvePhaseMetaPhenotypes.ModalitiesAlternativeModel:
 
-        return _np_ma_inner_impulse_counter(plate)
+        # Impulses from the first acceleration up to the last retardation
+        accelerations = table.get_first(_get_phase_rows(table, CurvePhases.GrowthAcceleration))
+        retardations = table.get_last(_get_phase_rows(table, CurvePhases.GrowthRetardation))
+        rows = np.arange(len(table))
+        counts = _get_counts(
+            table, impulses & (rows >= accelerations[table.colonies]) & (rows < retardations[table.colonies]))
+        counts[(accelerations < 0) | (retardations < 0)] = np.nan
+        return table.reshape(counts)
 
     elif meta_phenotype == CurvePhaseMetaPhenotypes.Collapses:
 
-        return _np_ma_collapse_counter(plate)
+        return table.reshape(_get_counts(table, _get_phase_rows(table, CurvePhases.Collapse)))
 
     elif meta_phenotype == CurvePhaseMetaPhenotypes.MajorImpulseFlankAsymmetry:
 
-        indices = _np_ma_get_major_impulse_indices(plate)
-        return _np_get_flanking_angle_relation(plate, indices).astype(np.float)
+        return table.reshape(_get_flanking_angle_relations(table))
 
     else:
         _l.error("Not implemented phenotype extraction: {0}".format(meta_phenotype))
-        return np.ones_like(plate) * np.nan
+        return np.ones(table.shape) * np.nan
 
 
 def get_phase_assignment_data(phenotypes, plate):
@@ -12,6 +12,9 @@ from scanomatic.models.phases_models import SegmentationModel
 
 __EMPTY_FILT = np.array([]).astype(bool)
 
+# Max number of tangent tests made at once when scanning linearity extensions
+LINEARITY_SCAN_MAX_SIZE = 2 ** 22
+
 
 class CurvePhases(Enum):
     """Phases of curves recognized
@@ -157,7 +160,7 @@ def is_undetermined(phase_type):
                           CurvePhases.Multiple)
 
 
-def segment(segmentation_model, thresholds=None):
+def segment(segmentation_model, thresholds=None, extensions=None):
     """Iteratively segments a log2_curve into its component CurvePhases
 
     Args:
@@ -165,13 +168,18 @@ def segment(segmentation_model, thresholds=None):
             A data model with information
         thresholds:
             The thresholds dictionary to be used.
+        extensions:
+            The linearity extension lengths of the model, if they were
+            scanned together with other curves by
+            `get_linear_non_flat_extensions`
     """
 
     if thresholds is None:
         thresholds = DEFAULT_THRESHOLDS
 
     # IMPORTANT, should be before having set flat so that there are no edge conditions.
-    extensions, _ = get_linear_non_flat_extension_per_position(segmentation_model, thresholds)
+    if extensions is None:
+        extensions, _ = get_linear_non_flat_extension_per_position(segmentation_model, thresholds)
 
     # Mark all flats
     _set_flat_segments(segmentation_model, thresholds)
@@ -791,39 +799,87 @@ def _custom_filt(v, max_gap=3, min_length=3):
     return (np.where(diff < 0)[0] - np.where(diff > 0)[0]).max() >= min_length
 
 
-def get_linear_non_flat_extension_per_position(model, thresholds):
-
-    filt = (model.phases != CurvePhases.Flat.value)
-    if isinstance(filt, np.ma.masked_array):
-        filt = filt.filled(False)
-
-    extension_lengths = np.zeros_like(filt, dtype=np.int)
-    extension_borders = {}
+def _get_linear_non_flat_extension_runs(log2_curves, dydts, times, filts, thresholds):
+    """The tangent proximity run of each position of each curve.
 
-    for loc in range(extension_lengths.size):
+    For every position the tangent proximity of all positions is tested
+    at once, giving an array of shape (curves, positions, times), which
+    is bridged and searched for the run through the position.
 
-        if not filt[loc]:
-            continue
+    Returns: tuple of the first and the exclusive last index of the run
+        through each position, equal if there is no run
+    """
+    values = log2_curves.data
+    slopes = dydts.data
+    with np.errstate(invalid='ignore'):
+        tangents = (times - times[:, np.newaxis])[np.newaxis] * slopes[:, :, np.newaxis]
+        tangents += values[:, :, np.newaxis]
+        candidates = np.abs(values[:, np.newaxis, :] - tangents) < np.abs(
+            thresholds[Thresholds.LinearModelExtension] * slopes)[:, :, np.newaxis]
+    del tangents
+
+    candidates &= (filts & ~np.ma.getmaskarray(log2_curves))[:, np.newaxis, :]
+    candidates &= (filts & ~np.ma.getmaskarray(log2_curves) & ~np.ma.getmaskarray(dydts))[:, :, np.newaxis]
+    candidates |= binary_closing(candidates, structure=np.ones((1, 1, 5), dtype=bool))
+
+    positions = np.arange(values.shape[1])
+    on_run = candidates[:, positions, positions]
+    lefts = np.where(candidates, -1, positions)
+    np.maximum.accumulate(lefts, axis=2, out=lefts)
+    lefts = lefts[:, positions, positions] + 1
+    rights = np.where(candidates, values.shape[1], positions)[:, :, ::-1]
+    np.minimum.accumulate(rights, axis=2, out=rights)
+    rights = rights[:, :, ::-1][:, positions, positions]
+
+    rights[~on_run] = lefts[~on_run]
+    return lefts, rights
+
+
+def get_linear_non_flat_extensions(models, thresholds):
+    """The linearity extension of each position of several curves.
+
+    Same as `get_linear_non_flat_extension_per_position` for each model,
+    but scanning all positions of many curves together. The curves are
+    scanned in chunks of at most `LINEARITY_SCAN_MAX_SIZE` tangent tests.
 
-        candidates = get_tangent_proximity(model, loc, thresholds)
+    Args:
+        models (list[scanomatic.models.phases_models.SegmentationModel]):
+            Data containers for curves with the same times
+        thresholds (dict):
+            Set of thresholds to be used.
 
-        candidates &= filt
+    Returns: tuple of arrays of shape (models, times) of the extension
+        lengths and the first and exclusive last index of the extensions
+    """
+    models = list(models)
+    if not models:
+        return np.zeros((0, 0), dtype=np.int), np.zeros((0, 0), dtype=np.int), np.zeros((0, 0), dtype=np.int)
+
+    times = np.asarray(models[0].times, dtype=np.float)
+    log2_curves = np.ma.array([model.log2_curve for model in models])
+    dydts = np.ma.array([model.dydt for model in models])
+    filts = np.array([np.ma.filled(model.phases != CurvePhases.Flat.value, False) for model in models])
+
+    lefts = np.zeros(filts.shape, dtype=np.int)
+    rights = np.zeros(filts.shape, dtype=np.int)
+    chunk = max(1, LINEARITY_SCAN_MAX_SIZE // max(1, times.size ** 2))
+    for start in range(0, len(models), chunk):
+        part = slice(start, start + chunk)
+        lefts[part], rights[part] = _get_linear_non_flat_extension_runs(
+            log2_curves[part], dydts[part], times, filts[part], thresholds)
 
-        candidates = _bridge_canditates(candidates)
-        candidates, n_found = label(candidates)
+    return rights - lefts, lefts, rights
 
-        # Verify that there's actually still a candidate at the peak value
-        if n_found == 0 or not candidates[loc]:
-            continue
 
-        elected = candidates == candidates[loc]
+def get_linear_non_flat_extension_per_position(model, thresholds):
 
-        # Count length of linear phase
-        extension_lengths[loc] = elected.sum()
+    extension_lengths, lefts, rights = get_linear_non_flat_extensions([model], thresholds)
+    extension_lengths = extension_lengths[0]
 
-        #
-        # e_where = np.where(extension_lengths)[0]
-        extension_borders[loc] = elected  # (e_where[0], e_where[-1] + 1)
+    positions = np.arange(extension_lengths.size)
+    extension_borders = {
+        loc: (positions >= lefts[0, loc]) & (positions < rights[0, loc])
+        for loc in np.flatnonzero(extension_lengths)}
 
     return extension_lengths, extension_borders
 
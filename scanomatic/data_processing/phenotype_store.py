@@ -0,0 +1,267 @@
+"""Dense storage of the phenotypes of plates.
+
+The phenotypes of a plate are kept in one array of shape
+`(phenotypes, rows, columns)` together with a table of which layer holds
+which phenotype. The plates of a project may differ in shape, so each
+plate has its own array.
+
+`PlatePhenotypes` behaves like the dict of phenotype to plate array it
+replaces, so plates can still be read and written per phenotype, but it
+is saved as plain arrays in a `.npz`-file instead of being pickled.
+"""
+from __future__ import absolute_import
+
+from collections import Mapping, MutableMapping
+
+from enum import Enum
+import numpy as np
+
+from scanomatic.data_processing.growth_phenotypes import Phenotypes
+from scanomatic.data_processing.phases.features import (
+    CurvePhaseMetaPhenotypes, VectorPhenotypes
+)
+from scanomatic.generics.phenotype_filter import Filter
+
+_PHENOTYPE_TYPES = {
+    phenotype_type.__name__: phenotype_type for phenotype_type in
+    (Phenotypes, CurvePhaseMetaPhenotypes, VectorPhenotypes)}
+
+_PLATES_KEY = 'plates'
+_NO_PLATES = -1
+_DATA_KEY = 'plate_{0}'
+_PHENOTYPES_KEY = 'plate_{0}_phenotypes'
+
+
+class PlatePhenotypes(MutableMapping):
+    """The phenotypes of a plate as layers of one array.
+
+    Args:
+        dtype: The data type of the phenotypes
+        fill_value: The value of positions that haven't been set when
+            adding a phenotype
+
+    Getting a phenotype returns a view of its layer, so assigning
+    positions of it changes the stored data. Adding a phenotype copies
+    the data, after which previously returned views no longer refer to
+    the stored data.
+    """
+    def __init__(self, dtype=np.float, fill_value=np.nan):
+
+        self._data = np.empty((0, 0, 0), dtype=dtype)
+        self._fill_value = fill_value
+        self._phenotypes = []
+        self._index = {}
+
+    @classmethod
+    def from_data(cls, phenotypes, data, fill_value=np.nan):
+        """Creates a plate from an array of phenotype layers.
+
+        Args:
+            phenotypes: The phenotype of each layer
+            data: Array of shape `(phenotypes, rows, columns)`
+            fill_value: See `PlatePhenotypes`
+        """
+        plate = cls(data.dtype, fill_value)
+        plate._data = data
+        plate._phenotypes = list(phenotypes)
+        plate._index = {phenotype: index for index, phenotype in enumerate(plate._phenotypes)}
+        return plate
+
+    @classmethod
+    def from_dict(cls, phenotypes, dtype=np.float, fill_value=np.nan):
+        """Creates a plate from a dict of phenotype to plate array.
+
+        All arrays must have the same shape.
+        """
+        plate = cls(dtype, fill_value)
+        if phenotypes:
+            keys = list(phenotypes.keys())
+            plate._data = np.array([phenotypes[key] for key in keys], dtype=dtype)
+            if plate._data.ndim != 3:
+                raise ValueError("Phenotypes don't have the same two dimensional shape")
+            plate._phenotypes = keys
+            plate._index = {phenotype: index for index, phenotype in enumerate(keys)}
+        return plate
+
+    @property
+    def data(self):
+        """Array of shape `(phenotypes, rows, columns)`"""
+        return self._data
+
+    @property
+    def phenotypes(self):
+        """The phenotype of each layer of `data`"""
+        return tuple(self._phenotypes)
+
+    @property
+    def shape(self):
+        """The shape of the plate"""
+        return self._data.shape[1:]
+
+    @property
+    def size(self):
+
+        return self._data.size
+
+    def __getitem__(self, phenotype):
+
+        return self._data[self._index[phenotype]]
+
+    def __setitem__(self, phenotype, value):
+
+        value = np.asarray(value)
+        if phenotype not in self._index:
+
+            if not self._phenotypes:
+                self._data = np.empty((0,) + value.shape, dtype=self._data.dtype)
+            elif value.shape != self.shape:
+                raise ValueError("Phenotype {0} of shape {1} doesn't fit plate of shape {2}".format(
+                    phenotype, value.shape, self.shape))
+
+            layer = np.empty((1,) + self.shape, dtype=self._data.dtype)
+            layer.fill(self._fill_value)
+            self._data = np.concatenate((self._data, layer))
+            self._index[phenotype] = len(self._phenotypes)
+            self._phenotypes.append(phenotype)
+
+        self._data[self._index[phenotype]] = value
+
+    def __delitem__(self, phenotype):
+
+        index = self._index[phenotype]
+        self._data = np.delete(self._data, index, axis=0)
+        del self._phenotypes[index]
+        self._index = {phenotype: index for index, phenotype in enumerate(self._phenotypes)}
+
+    def __iter__(self):
+
+        return iter(self._phenotypes)
+
+    def __len__(self):
+
+        return len(self._phenotypes)
+
+    def __contains__(self, phenotype):
+
+        return phenotype in self._index
+
+
+def get_plates_array(plates):
+    """Object array of plates.
+
+    `numpy.array` would try to read `PlatePhenotypes` as sequences.
+    """
+    plates = list(plates)
+    data = np.empty((len(plates),), dtype=np.object)
+    for index, plate in enumerate(plates):
+        data[index] = plate
+    return data
+
+
+def as_plate_phenotypes(plates, dtype=np.float, fill_value=np.nan):
+    """Converts plates of dicts of phenotypes to `PlatePhenotypes`.
+
+    Args:
+        plates: Plates of dicts, plates that are already `PlatePhenotypes`
+            or `None` for missing plates
+        dtype: See `PlatePhenotypes`
+        fill_value: See `PlatePhenotypes`
+
+    Returns:
+        Object array of the plates or `None` if there are no plates
+    """
+    if plates is None:
+        return None
+
+    return get_plates_array(
+        plate if plate is None or isinstance(plate, PlatePhenotypes) else
+        PlatePhenotypes.from_dict(plate, dtype=dtype, fill_value=fill_value)
+        for plate in plates)
+
+
+def as_plate_filters(plates):
+    """Converts plates of dicts of phenotype filters to `PlatePhenotypes`."""
+    return as_plate_phenotypes(plates, dtype=np.uint8, fill_value=Filter.OK.value)
+
+
+def is_plate_phenotypes(plate):
+    """If the plate is a dict or `PlatePhenotypes` of phenotypes."""
+    return isinstance(plate, Mapping)
+
+
+def _get_phenotype_name(phenotype):
+
+    if not isinstance(phenotype, Enum) or type(phenotype).__name__ not in _PHENOTYPE_TYPES:
+        raise ValueError("Can't save {0} as a phenotype".format(phenotype))
+    return "{0}.{1}".format(type(phenotype).__name__, phenotype.name)
+
+
+def _get_phenotype(name):
+
+    phenotype_type, _, phenotype = name.partition('.')
+    try:
+        return _PHENOTYPE_TYPES[phenotype_type][phenotype]
+    except KeyError:
+        return None
+
+
+def save_plates(fh, plates):
+    """Saves plates of `PlatePhenotypes` as a `.npz`-file.
+
+    Args:
+        fh: Open file or path
+        plates: Plates of `PlatePhenotypes` or `None` for missing plates,
+            or `None` if there are no plates
+    """
+    if plates is None:
+        np.savez(fh, **{_PLATES_KEY: np.array(_NO_PLATES)})
+        return
+
+    arrays = {_PLATES_KEY: np.array(len(plates))}
+    for id_plate, plate in enumerate(plates):
+        if plate is not None:
+            arrays[_DATA_KEY.format(id_plate)] = plate.data
+            arrays[_PHENOTYPES_KEY.format(id_plate)] = np.array(
+                [_get_phenotype_name(phenotype) for phenotype in plate.phenotypes], dtype=np.str)
+    np.savez(fh, **arrays)
+
+
+def load_plates(path, fill_value=np.nan):
+    """Loads plates saved with `save_plates`.
+
+    Phenotypes that are no longer known are dropped.
+
+    Args:
+        path: Path to the file
+        fill_value: See `PlatePhenotypes`
+
+    Returns:
+        Object array of `PlatePhenotypes` and `None` for missing plates,
+        or `None` if there were no plates
+    """
+    with np.load(path) as npz:
+
+        if int(npz[_PLATES_KEY]) == _NO_PLATES:
+            return None
+
+        plates = []
+        for id_plate in range(int(npz[_PLATES_KEY])):
+
+            if _DATA_KEY.format(id_plate) not in npz:
+                plates.append(None)
+                continue
+
+            data = npz[_DATA_KEY.format(id_plate)]
+            phenotypes = [_get_phenotype(name) for name in npz[_PHENOTYPES_KEY.format(id_plate)]]
+            known = [index for index, phenotype in enumerate(phenotypes) if phenotype is not None]
+            if len(known) < len(phenotypes):
+                data = data[known]
+                phenotypes = [phenotypes[index] for index in known]
+            plates.append(PlatePhenotypes.from_data(phenotypes, data, fill_value=fill_value))
+
+    return get_plates_array(plates)
+
+
+def load_plate_filters(path):
+    """Loads plates of phenotype filters saved with `save_plates`."""
+    return load_plates(path, fill_value=Filter.OK.value)
@@ -7,6 +7,7 @@ import csv
 from enum import Enum
 import glob
 from itertools import chain, izip, product
+from multiprocessing import Pool
 import os
 from types import StringTypes
 import zipfile
@@ -23,26 +24,33 @@ from scipy.stats import norm
 from . import mock_numpy_interface
 from scanomatic.data_processing.growth_phenotypes import (
     Phenotypes, get_chapman_richards_4parameter_extended_curve, get_derivative,
-    get_preprocessed_data_for_phenotypes
+    get_phenotypes_for_curves
 )
 from scanomatic.data_processing.norm import (
     Offsets, get_normalized_data, get_reference_positions, norm_by_diff,
     norm_by_log2_diff, norm_by_log2_diff_corr_scaled, norm_by_signal_to_noise
 )
-from scanomatic.data_processing.phases.analysis import get_phase_analysis
+from scanomatic.data_processing.phases.analysis import PhaseTable, get_phase_analyses
 from scanomatic.data_processing.phases.features import (
     CurvePhaseMetaPhenotypes, VectorPhenotypes, extract_phenotypes
 )
+from scanomatic.data_processing.phases.segmentation import CurvePhases
+from scanomatic.data_processing.phenotype_store import (
+    PlatePhenotypes, as_plate_filters, as_plate_phenotypes, get_plates_array, is_plate_phenotypes,
+    load_plate_filters, load_plates, save_plates
+)
 from scanomatic.data_processing.phenotypes import (
     PhenotypeDataType, infer_phenotype_from_name
 )
+from scanomatic.data_processing.smoothing import SlidingWindowPolynomials
 from scanomatic.data_processing.strain_selector import StrainSelector
 from scanomatic.generics.phenotype_filter import Filter, FilterArray
+from scanomatic.generics.worker_pool import get_usable_workers
 import scanomatic.io.image_data as image_data
 import scanomatic.io.logger as logger
 from scanomatic.io.meta_data import MetaData2 as MetaData
 import scanomatic.io.paths as paths
-from scanomatic.io.pickler import unpickle, unpickle_with_unpickler
+from scanomatic.io.pickler import load_numpy, unpickle
 
 # TODO: Something is wrong with phase features again
 
@@ -50,6 +58,31 @@ from scanomatic.io.pickler import unpickle, unpickle_with_unpickler
 
 _logger = logger.Logger("Phenotyper")
 
+_SHARED_PHENOTYPER = None
+""":type : Phenotyper"""
+
+
+def _set_shared_phenotyper(phenotyper):
+    """Initializes a worker process with the phenotyper to extract from.
+
+    Setting it once per worker spares sending the growth data with
+    each task.
+    """
+    global _SHARED_PHENOTYPER
+    _SHARED_PHENOTYPER = phenotyper
+
+
+def _get_phenotypes_for_rows_in_worker(task):
+    """Extracts phenotypes for a block of rows in a worker process."""
+    id_plate, (id0, id1) = task
+    return id_plate, (id0, id1), _SHARED_PHENOTYPER._get_phenotypes_for_rows(id_plate, slice(id0, id1))
+
+
+def _get_phenotypes_for_positions_in_worker(task):
+    """Extracts phenotypes for some positions of a plate in a worker process."""
+    id_plate, positions = task
+    return id_plate, positions, _SHARED_PHENOTYPER._get_phenotypes_for_positions(id_plate, positions)
+
 
 def time_based_gaussian_weighted_mean(data, time, sigma=1):
     center = (time.size - time.size % 2) / 2
@@ -197,6 +230,33 @@ def merge_convolve(arr1, arr2, edge_condition_mode=EdgeCondition.Reflect, kernel
         edge_condition(arr2, mode=edge_condition_mode, kernel_size=kernel_size)))
 
 
+def get_smoothing_update_window(times, first_new, index_reach, time_reach=0):
+    """The part of curves that must be smoothed again after measurements
+    have been appended to them.
+
+    Args:
+        times: The times of all measurements, including the new ones
+        first_new: Index of the first new measurement
+        index_reach: How many measurements before and after a measurement
+            the smoothing of it uses, in addition to `time_reach`
+        time_reach: How long before and after a measurement the smoothing
+            of it uses measurements
+
+    Returns:
+        tuple of the index of the first smooth value that may change and
+        the index of the first measurement needed to smooth it again
+    """
+    changed = np.searchsorted(times, times[max(0, first_new - index_reach - 1)] - time_reach)
+    start = max(0, np.searchsorted(times, times[changed] - time_reach) - index_reach - 1)
+
+    # Edge conditions of curves not starting at the first measurement
+    # reflect times around zero
+    if times[changed] - time_reach < max(times[0], 0):
+        start = 0
+
+    return changed, start
+
+
 def get_phenotype(name):
 
     try:
@@ -223,22 +283,49 @@ def path_has_saved_project_state(directory_path, require_phenotypes=True):
         return False
 
     _p = paths.Paths()
+    required = [_p.phenotypes_input_data, _p.phenotype_times, _p.phenotypes_input_smooth,
+                _p.phenotypes_extraction_params]
 
-    if require_phenotypes:
-        try:
-            unpickle_with_unpickler(np.load, os.path.join(directory_path, _p.phenotypes_raw_npy))
-        except IOError:
-            return False
-
-    try:
-        unpickle_with_unpickler(np.load, os.path.join(directory_path,  _p.phenotypes_input_data))
-        unpickle_with_unpickler(np.load, os.path.join(directory_path, _p.phenotype_times))
-        unpickle_with_unpickler(np.load, os.path.join(directory_path, _p.phenotypes_input_smooth))
-        unpickle_with_unpickler(np.load, os.path.join(directory_path, _p.phenotypes_extraction_params))
-    except IOError:
+    if require_phenotypes and not any(
+            os.path.isfile(os.path.join(directory_path, path))
+            for path in (_p.phenotypes_raw_store, _p.phenotypes_raw_npy)):
         return False
 
-    return True
+    return all(os.path.isfile(os.path.join(directory_path, path)) for path in required)
+
+
+def _get_state_file_names(_p):
+
+    return (_p.phenotypes_input_data, _p.phenotype_times, _p.phenotypes_input_smooth,
+            _p.phenotypes_extraction_params, _p.phenotypes_filter, _p.phenotypes_filter_store,
+            _p.phenotypes_filter_undo, _p.phenotypes_filter_journal, _p.phenotypes_meta_data,
+            _p.normalized_phenotypes, _p.normalized_phenotypes_store, _p.vector_phenotypes_raw,
+            _p.vector_meta_phenotypes_raw, _p.vector_meta_phenotypes_raw_store, _p.phenotypes_reference_offsets)
+
+
+def get_project_state_signature(directory_path):
+    """Modification times and sizes of the saved state files.
+
+    Unlike `get_project_dates` access times are not used, so only
+    saving the state changes the signature.
+
+    Args:
+        directory_path: Path to the directory holding the state
+
+    Returns:
+        tuple of modification time and size of each file, `None` for missing files
+    """
+    _p = paths.Paths()
+    signature = []
+    for path in (_p.phenotypes_raw_store, _p.phenotypes_raw_npy) + _get_state_file_names(_p):
+        try:
+            stat_result = os.stat(os.path.join(directory_path, path))
+        except OSError:
+            signature.append(None)
+        else:
+            signature.append((stat_result.st_mtime, stat_result.st_size))
+
+    return tuple(signature)
 
 
 def get_project_dates(directory_path):
@@ -250,19 +337,19 @@ def get_project_dates(directory_path):
     analysis_date = None
     _p = paths.Paths()
     image_data_files = glob.glob(os.path.join(directory_path, _p.image_analysis_img_data.format("*")))
+    image_data_files += glob.glob(os.path.join(directory_path, _p.image_analysis_growth_store_index))
     if image_data_files:
         analysis_date = max(most_recent(os.stat(p)) for p in image_data_files)
-    try:
-        phenotype_date = most_recent(os.stat(os.path.join(directory_path, _p.phenotypes_raw_npy)))
-    except OSError:
-        phenotype_date = None
+    phenotype_date = None
+    for path in (_p.phenotypes_raw_store, _p.phenotypes_raw_npy):
+        try:
+            phenotype_date = max(phenotype_date, most_recent(os.stat(os.path.join(directory_path, path))))
+        except OSError:
+            pass
 
     state_date = phenotype_date
 
-    for path in (_p.phenotypes_input_data, _p.phenotype_times, _p.phenotypes_input_smooth,
-                 _p.phenotypes_extraction_params, _p.phenotypes_filter, _p.phenotypes_filter_undo,
-                 _p.phenotypes_meta_data, _p.normalized_phenotypes, _p.vector_phenotypes_raw,
-                 _p.vector_meta_phenotypes_raw, _p.phenotypes_reference_offsets):
+    for path in _get_state_file_names(_p):
 
         try:
             state_date = max(state_date, most_recent(os.stat(os.path.join(directory_path, path))))
@@ -277,10 +364,7 @@ def remove_state_from_path(directory_path):
     _p = paths.Paths()
     n = 0
 
-    for path in (_p.phenotypes_input_data, _p.phenotype_times, _p.phenotypes_input_smooth,
-                 _p.phenotypes_extraction_params, _p.phenotypes_filter, _p.phenotypes_filter_undo,
-                 _p.phenotypes_meta_data, _p.normalized_phenotypes, _p.vector_phenotypes_raw,
-                 _p.vector_meta_phenotypes_raw, _p.phenotypes_reference_offsets):
+    for path in _get_state_file_names(_p):
 
         file_path = os.path.join(directory_path, path)
         try:
@@ -290,10 +374,151 @@ def remove_state_from_path(directory_path):
         else:
             n += 1
 
+    for pattern in (_p.phenotypes_input_data_plate, _p.phenotypes_input_smooth_plate):
+        for file_path in _get_plate_paths(directory_path, pattern):
+            os.remove(file_path)
+            n += 1
+
     if n:
         _logger.info("Removed {0} pre-existing phenotype state files".format(n))
 
 
+def _get_plate_paths(directory_path, pattern):
+
+    plate_paths = []
+    while os.path.isfile(os.path.join(directory_path, pattern.format(len(plate_paths)))):
+        plate_paths.append(os.path.join(directory_path, pattern.format(len(plate_paths))))
+    return plate_paths
+
+
+def _get_plain_plates(data):
+    """Object array of the plates as plain arrays, so memory-mapped
+    plates are pickled as any other array.
+    """
+    if data is None or not isinstance(data, np.ndarray) or data.dtype != np.object or data.ndim != 1:
+        return data
+
+    plates = np.empty(data.shape, dtype=np.object)
+    for id_plate, plate in enumerate(data):
+        plates[id_plate] = np.asarray(plate) if isinstance(plate, np.memmap) else plate
+    return plates
+
+
+def _save_atomically(file_path, save_function, data):
+    """Saves data to a temporary file that then replaces the target, so
+    that an interrupted save never leaves a partially written file.
+
+    Args:
+        file_path: The target path
+        save_function: Function taking an open file and the data
+        data: The data to save
+    """
+    with open(file_path + '.tmp', 'wb') as fh:
+        save_function(fh, data)
+    os.rename(file_path + '.tmp', file_path)
+
+
+def _pickle_to_file(fh, data):
+
+    pickle.dump(data, fh)
+
+
+def _load_phenotype_plates(directory_path, store_name, legacy_name, load_store=load_plates):
+    """Loads plates of phenotypes, or the pickled plates of phenotype dicts
+    saved by earlier versions if there is no phenotype store.
+    """
+    store_path = os.path.join(directory_path, store_name)
+    if os.path.isfile(store_path):
+        return load_store(store_path)
+
+    return load_numpy(os.path.join(directory_path, legacy_name))
+
+
+def _append_to_plates(plates, new_plates, size):
+    """Appends measurements to the end of the curves of each plate.
+
+    Args:
+        plates: The plates of curves, with time as last dimension
+        new_plates: The plates of the new measurements, `None` for plates
+            without new measurements
+        size: The number of new measurements
+
+    Raises:
+        ValueError: If the new measurements don't fit the plates
+    """
+    if len(plates) != len(new_plates):
+        raise ValueError("Expected new measurements for {0} plates, got {1}".format(len(plates), len(new_plates)))
+
+    appended = []
+    for id_plate, (plate, new_plate) in enumerate(izip(plates, new_plates)):
+
+        if plate is None:
+            appended.append(None)
+            continue
+
+        shape = plate.shape[:2] + (size,)
+        if new_plate is None:
+            new_plate = np.full(shape, np.nan)
+        elif new_plate.shape != shape:
+            raise ValueError("New measurements of plate {0} have shape {1}, expected {2}".format(
+                id_plate + 1, new_plate.shape, shape))
+
+        appended.append(np.concatenate((plate, new_plate), axis=2))
+
+    return np.array(appended)
+
+
+def _save_memory_mappable_plates(directory_path, pattern, data):
+    """Saves each plate as a numeric `.npy`-file that can be memory-mapped.
+
+    Missing plates are saved as empty arrays. A plate that is memory-mapped
+    from its target file is unchanged and is only touched so it remains as
+    recent as the pickled data. Files are replaced by renaming so that
+    other instances mapping the previous file are unaffected.
+
+    If the data isn't plates of numeric arrays no plate files are kept.
+    """
+    plates = data if isinstance(data, np.ndarray) and data.ndim > 0 else ()
+    if any(plate is not None and (not isinstance(plate, np.ndarray) or plate.dtype == np.object)
+           for plate in plates):
+        plates = ()
+
+    for id_plate, plate in enumerate(plates):
+
+        file_path = os.path.join(directory_path, pattern.format(id_plate))
+        if isinstance(plate, np.memmap) and plate.filename == os.path.abspath(file_path):
+            os.utime(file_path, None)
+            continue
+
+        _save_atomically(file_path, np.save, np.empty((0,)) if plate is None else np.asarray(plate))
+
+    for file_path in _get_plate_paths(directory_path, pattern)[len(plates):]:
+        os.remove(file_path)
+
+
+def _load_memory_mapped_plates(directory_path, pattern, pickled_path):
+    """Memory-maps plates saved by `_save_memory_mappable_plates`.
+
+    Returns:
+        Object array of read only memory-mapped plates, or `None` if there
+        are no plate files or they are older than the pickled data, e.g.
+        because it was saved by an older version.
+    """
+    plate_paths = _get_plate_paths(directory_path, pattern)
+    if not plate_paths:
+        return None
+
+    if (os.path.isfile(pickled_path) and
+            min(os.path.getmtime(p) for p in plate_paths) < os.path.getmtime(pickled_path)):
+        return None
+
+    plates = np.empty((len(plate_paths),), dtype=np.object)
+    for id_plate, file_path in enumerate(plate_paths):
+        plate = np.load(file_path, mmap_mode='r')
+        plates[id_plate] = plate if plate.size else None
+    return plates
+
+
 class Smoothing(Enum):
     Keep = 0
     """:type : Smoothing"""
@@ -303,6 +528,8 @@ class Smoothing(Enum):
     """:type : Smoothing"""
     PolynomialWeightedMulti = 3
     """:type : Smoothing"""
+    PolynomialWeightedMultiBatched = 4
+    """:type : Smoothing"""
 
 
 class SaveData(Enum):
@@ -366,6 +593,39 @@ class NormState(Enum):
 # TODO: Phenotypes should possibly not be indexed based on enum value either and use dict like the undo/filter
 
 
+class _LazyStateAttribute(object):
+    """Instance attribute that is loaded from a saved state on first use.
+
+    `Phenotyper.LoadFromState` registers loaders for the parts of the state
+    that aren't needed to construct the instance. Both reading and
+    assigning the attribute first runs its loader, so that assignments
+    are never overwritten by a later load.
+
+    Assigning the attribute also marks it as changed, so that
+    `Phenotyper.save_state` knows it needs to be saved again.
+    """
+    def __init__(self, name):
+
+        self._name = name
+
+    def __get__(self, instance, owner):
+
+        if instance is None:
+            return self
+
+        instance._load_lazy_state(self._name)
+        try:
+            return instance.__dict__[self._name]
+        except KeyError:
+            raise AttributeError(self._name)
+
+    def __set__(self, instance, value):
+
+        instance._load_lazy_state(self._name)
+        instance.__dict__[self._name] = value
+        instance._changed_state.add(self._name)
+
+
 class Phenotyper(mock_numpy_interface.NumpyArrayInterface):
     """The Phenotyper class is a class for producing phenotypes
     based on growth curves as well as storing and easy displaying them.
@@ -393,6 +653,21 @@ class Phenotyper(mock_numpy_interface.NumpyArrayInterface):
     """
 
     UNDO_HISTORY_LENGTH = 50
+    FILTER_JOURNAL_LENGTH = 100
+    EXTRACTION_TASKS_PER_WORKER = 4
+    SMOOTHING_BATCH_SIZE = 128
+
+    _raw_growth_data = _LazyStateAttribute('_raw_growth_data')
+    _times_data = _LazyStateAttribute('_times_data')
+    _smooth_growth_data = _LazyStateAttribute('_smooth_growth_data')
+    _phenotypes = _LazyStateAttribute('_phenotypes')
+    _vector_phenotypes = _LazyStateAttribute('_vector_phenotypes')
+    _vector_meta_phenotypes = _LazyStateAttribute('_vector_meta_phenotypes')
+    _normalized_phenotypes = _LazyStateAttribute('_normalized_phenotypes')
+    _phenotype_filter = _LazyStateAttribute('_phenotype_filter')
+    _phenotype_filter_undo = _LazyStateAttribute('_phenotype_filter_undo')
+    _reference_surface_positions = _LazyStateAttribute('_reference_surface_positions')
+    _meta_data = _LazyStateAttribute('_meta_data')
 
     def __init__(self, raw_growth_data, times_data=None,
                  median_kernel_size=5,
@@ -403,11 +678,20 @@ class Phenotyper(mock_numpy_interface.NumpyArrayInterface):
                  base_name=None, run_extraction=False, phenotypes=None,
                  phenotypes_inclusion=PhenotypeDataType.Trusted):
 
+        self._lazy_state_loaders = {}
+        self._changed_state = set()
+        self._changed_filter_plates = set()
+        self._state_directory = None
+        self._filter_journal_size = 0
+        self._filter_journal_records = 0
         self._logger = logger.Logger("Phenotyper")
         self._paths = paths.Paths()
 
         self._raw_growth_data = raw_growth_data
         self._smooth_growth_data = None
+        self._smoothing = None
+        self._smoothing_coeffs = {}
+        self._changed_curves = None
 
         self._phenotypes = phenotypes
         self._vector_phenotypes = None
@@ -538,6 +822,10 @@ class Phenotyper(mock_numpy_interface.NumpyArrayInterface):
         """Creates an instance based on previously saved phenotyper state
         in specified directory.
 
+        Growth data saved as plate files is memory-mapped and all parts of
+        the state except the growth data and the times are only loaded
+        when first used.
+
         Args:
 
             directory_path (str):
@@ -549,41 +837,18 @@ class Phenotyper(mock_numpy_interface.NumpyArrayInterface):
         """
         _p = paths.Paths()
 
-        raw_growth_data = unpickle_with_unpickler(np.load, os.path.join(directory_path,  _p.phenotypes_input_data))
+        raw_growth_data = _load_memory_mapped_plates(
+            directory_path, _p.phenotypes_input_data_plate,
+            os.path.join(directory_path, _p.phenotypes_input_data))
+        if raw_growth_data is None:
+            raw_growth_data = load_numpy(os.path.join(directory_path,  _p.phenotypes_input_data))
 
-        times = unpickle_with_unpickler(np.load, os.path.join(directory_path, _p.phenotype_times))
+        times = load_numpy(os.path.join(directory_path, _p.phenotype_times))
 
         phenotyper = cls(raw_growth_data, times, run_extraction=False, base_name=directory_path)
 
         try:
-            phenotypes = unpickle_with_unpickler(np.load, os.path.join(directory_path, _p.phenotypes_raw_npy))
-        except (IOError, ValueError):
-            phenotyper._logger.warning(
-                "Could not load Phenotypes, probably too old extraction, please rerun!")
-            phenotypes = None
-
-        try:
-            vector_phenotypes = unpickle_with_unpickler(
-                np.load, os.path.join(directory_path, _p.vector_phenotypes_raw))
-        except (IOError, ValueError):
-            phenotyper._logger.warning(
-                "Could not load Vector Phenotypes, probably too old extraction, please rerun!")
-            vector_phenotypes = None
-
-        try:
-            vector_meta_phenotypes = unpickle_with_unpickler(
-                np.load, os.path.join(directory_path, _p.vector_meta_phenotypes_raw))
-        except (IOError, ValueError):
-            phenotyper._logger.warning(
-                "Could not load Vector Meta Phenotypes, probably too old extraction, please rerun!")
-            vector_meta_phenotypes = None
-
-        smooth_growth_data = unpickle_with_unpickler(
-            np.load, os.path.join(directory_path, _p.phenotypes_input_smooth))
-
-        try:
-            extraction_params = unpickle_with_unpickler(
-                np.load, os.path.join(directory_path, _p.phenotypes_extraction_params))
+            extraction_params = load_numpy(os.path.join(directory_path, _p.phenotypes_extraction_params))
         except IOError:
             phenotyper._logger.warning(
                 "Could not find stored extraction parameters, assuming defaults were used")
@@ -596,14 +861,14 @@ class Phenotyper(mock_numpy_interface.NumpyArrayInterface):
                     if inclusion_name is None:
                         inclusion_name = 'Trusted'
                     phenotyper.set_phenotype_inclusion_level(PhenotypeDataType[inclusion_name])
-                elif extraction_params.size == 6:
+                elif extraction_params.size in (6, 8):
 
                     median_filt_size,\
                         gauss_sigma, \
                         linear_reg_size, \
                         inclusion_name, \
                         no_growth_monotonicity_threshold, \
-                        no_growth_pop_doublings_threshold = extraction_params
+                        no_growth_pop_doublings_threshold = extraction_params[:6]
 
                     if inclusion_name is None:
                         inclusion_name = 'Trusted'
@@ -613,6 +878,12 @@ class Phenotyper(mock_numpy_interface.NumpyArrayInterface):
 
                     phenotyper.set_phenotype_inclusion_level(PhenotypeDataType[inclusion_name])
 
+                    if extraction_params.size == 8:
+                        smoothing_name, smoothing_coeffs = extraction_params[6:]
+                        if smoothing_name is not None:
+                            phenotyper._smoothing = Smoothing[smoothing_name]
+                            phenotyper._smoothing_coeffs = dict(smoothing_coeffs)
+
                 else:
                     raise ValueError("Stored parameters in {0} can't be understood".format(
                         os.path.join(directory_path, _p.phenotypes_extraction_params)))
@@ -621,46 +892,119 @@ class Phenotyper(mock_numpy_interface.NumpyArrayInterface):
                 phenotyper._gaussian_filter_sigma = float(gauss_sigma)
                 phenotyper._linear_regression_size = int(linear_reg_size)
 
-        phenotyper.set('smooth_growth_data', smooth_growth_data)
-        phenotyper.set('phenotypes', phenotypes)
-        phenotyper.set('vector_phenotypes', vector_phenotypes)
-        phenotyper.set('vector_meta_phenotypes', vector_meta_phenotypes)
+        def load_smooth_growth_data():
 
-        filter_path = os.path.join(directory_path, _p.phenotypes_filter)
-        if os.path.isfile(filter_path):
-            phenotyper._logger.info("Loading previous filter {0}".format(filter_path))
-            try:
-                phenotyper.set("phenotype_filter", unpickle_with_unpickler(np.load, filter_path))
-            except (ValueError, IOError):
-                phenotyper._logger.warning(
-                    "Could not load QC Filter, probably too old extraction, please rerun!")
+            smooth_growth_data = _load_memory_mapped_plates(
+                directory_path, _p.phenotypes_input_smooth_plate,
+                os.path.join(directory_path, _p.phenotypes_input_smooth))
+            if smooth_growth_data is None:
+                phenotyper.set(
+                    'smooth_growth_data', load_numpy(os.path.join(directory_path, _p.phenotypes_input_smooth)))
+            else:
+                # Checking that there is data would read all of it
+                phenotyper._smooth_growth_data = smooth_growth_data
 
-        offsets_path = os.path.join(directory_path, _p.phenotypes_reference_offsets)
-        if os.path.isfile(offsets_path):
-            phenotyper.set("reference_offsets", unpickle_with_unpickler(np.load, offsets_path))
+        def load_phenotypes():
 
-        normalized_phenotypes = os.path.join(directory_path, _p.normalized_phenotypes)
-        if os.path.isfile(normalized_phenotypes):
             try:
-                phenotyper.set("normalized_phenotypes", unpickle_with_unpickler(np.load, normalized_phenotypes))
-            except (ValueError, IOError):
+                phenotypes = _load_phenotype_plates(directory_path, _p.phenotypes_raw_store, _p.phenotypes_raw_npy)
+            except (IOError, ValueError):
                 phenotyper._logger.warning(
-                    "Could not load Normalized Phenotypes, probably too old extraction, please rerun!")
+                    "Could not load Phenotypes, probably too old extraction, please rerun!")
+                phenotypes = None
 
-        filter_undo_path = os.path.join(directory_path, _p.phenotypes_filter_undo)
-        if os.path.isfile(filter_undo_path):
             try:
-                phenotyper.set("phenotype_filter_undo", unpickle(filter_undo_path))
-            except EOFError:
-                phenotyper._logger.warning("Could not load saved undo, file corrupt!")
+                vector_meta_phenotypes = _load_phenotype_plates(
+                    directory_path, _p.vector_meta_phenotypes_raw_store, _p.vector_meta_phenotypes_raw)
+            except (IOError, ValueError):
+                phenotyper._logger.warning(
+                    "Could not load Vector Meta Phenotypes, probably too old extraction, please rerun!")
+                vector_meta_phenotypes = None
+
+            phenotyper.set('phenotypes', phenotypes)
+            phenotyper.set('vector_meta_phenotypes', vector_meta_phenotypes)
+
+            if any(os.path.isfile(os.path.join(directory_path, path))
+                   for path in (_p.phenotypes_filter_store, _p.phenotypes_filter)):
+                phenotyper._logger.info("Loading previous filter from {0}".format(directory_path))
+                try:
+                    phenotyper.set("phenotype_filter", _load_phenotype_plates(
+                        directory_path, _p.phenotypes_filter_store, _p.phenotypes_filter,
+                        load_store=load_plate_filters))
+                except (ValueError, IOError):
+                    phenotyper._logger.warning(
+                        "Could not load QC Filter, probably too old extraction, please rerun!")
+
+            offsets_path = os.path.join(directory_path, _p.phenotypes_reference_offsets)
+            if os.path.isfile(offsets_path):
+                phenotyper.set("reference_offsets", load_numpy(offsets_path))
+
+            if any(os.path.isfile(os.path.join(directory_path, path))
+                   for path in (_p.normalized_phenotypes_store, _p.normalized_phenotypes)):
+                # Setting the normalized phenotypes resets offsets that don't match the phenotypes
+                phenotyper._init_default_offsets()
+
+            filter_undo_path = os.path.join(directory_path, _p.phenotypes_filter_undo)
+            if os.path.isfile(filter_undo_path):
+                try:
+                    phenotyper.set("phenotype_filter_undo", unpickle(filter_undo_path))
+                except EOFError:
+                    phenotyper._logger.warning("Could not load saved undo, file corrupt!")
+
+            phenotyper._replay_filter_journal(os.path.join(directory_path, _p.phenotypes_filter_journal))
+
+        def load_vector_phenotypes():
 
-        meta_data_path = os.path.join(directory_path, _p.phenotypes_meta_data)
-        if os.path.isfile(meta_data_path):
             try:
-                phenotyper.set("meta_data", unpickle(meta_data_path))
-            except EOFError:
-                phenotyper._logger.warning("Could not load saved meta-data, file corrupt!")
+                vector_phenotypes = load_numpy(os.path.join(directory_path, _p.vector_phenotypes_raw))
+            except (IOError, ValueError):
+                phenotyper._logger.warning(
+                    "Could not load Vector Phenotypes, probably too old extraction, please rerun!")
+                vector_phenotypes = None
 
+            # The filter and offsets were already set up when the phenotypes were loaded
+            phenotyper._vector_phenotypes = (
+                None if phenotyper._data_lacks_data(vector_phenotypes) else vector_phenotypes)
+
+        def load_normalized_phenotypes():
+
+            if any(os.path.isfile(os.path.join(directory_path, path))
+                   for path in (_p.normalized_phenotypes_store, _p.normalized_phenotypes)):
+                try:
+                    normalized_phenotypes = _load_phenotype_plates(
+                        directory_path, _p.normalized_phenotypes_store, _p.normalized_phenotypes)
+                except (ValueError, IOError):
+                    phenotyper._logger.warning(
+                        "Could not load Normalized Phenotypes, probably too old extraction, please rerun!")
+                else:
+                    # The offsets were already set up when the phenotypes were loaded
+                    phenotyper._normalized_phenotypes = (
+                        None if phenotyper._data_lacks_data(normalized_phenotypes) else
+                        as_plate_phenotypes(normalized_phenotypes))
+
+        def load_meta_data():
+
+            meta_data_path = os.path.join(directory_path, _p.phenotypes_meta_data)
+            if os.path.isfile(meta_data_path):
+                try:
+                    phenotyper.set("meta_data", unpickle(meta_data_path))
+                except EOFError:
+                    phenotyper._logger.warning("Could not load saved meta-data, file corrupt!")
+
+        phenotyper._lazy_state_loaders.update({
+            '_smooth_growth_data': load_smooth_growth_data,
+            '_phenotypes': load_phenotypes,
+            '_vector_meta_phenotypes': load_phenotypes,
+            '_phenotype_filter': load_phenotypes,
+            '_phenotype_filter_undo': load_phenotypes,
+            '_reference_surface_positions': load_phenotypes,
+            '_vector_phenotypes': load_vector_phenotypes,
+            '_normalized_phenotypes': load_normalized_phenotypes,
+            '_meta_data': load_meta_data,
+        })
+
+        phenotyper._changed_state.clear()
+        phenotyper._state_directory = os.path.abspath(directory_path)
         return phenotyper
 
     @classmethod
@@ -728,8 +1072,8 @@ class Phenotyper(mock_numpy_interface.NumpyArrayInterface):
 
                 times_data_path += ".npy"
 
-        return cls(unpickle_with_unpickler(np.load, data_directory),
-                   unpickle_with_unpickler(np.load, times_data_path),
+        return cls(load_numpy(data_directory),
+                   load_numpy(times_data_path),
                    base_name=path, run_extraction=True, **kwargs)
 
     @staticmethod
@@ -820,7 +1164,7 @@ class Phenotyper(mock_numpy_interface.NumpyArrayInterface):
         return StrainSelector(self, tuple((zip(*s) if plates is None or i in plates else tuple())
                                           for i, s in enumerate(selection)))
 
-    def iterate_extraction(self, keep_filter=False):
+    def iterate_extraction(self, keep_filter=False, workers=1):
 
         self._logger.info(
             "Iteration started, will extract {0} phenotypes".format(
@@ -835,12 +1179,147 @@ class Phenotyper(mock_numpy_interface.NumpyArrayInterface):
 
         self.wipe_extracted_phenotypes(keep_filter)
 
-        for x in self._calculate_phenotypes():
+        for x in self._calculate_phenotypes(workers=workers):
             self._logger.debug("Phenotype extraction iteration")
             yield x
 
         self._init_remove_filter_and_undo_actions()
 
+    def iterate_update(self, workers=1):
+        """Iterates updating the phenotypes after growth data was appended.
+
+        Phenotypes describe whole curves, so the curves whose smooth data
+        changed when growth data was appended are phenotyped anew, while
+        the other curves keep their phenotypes. The curve marks are kept.
+        If there are no phenotypes that can be updated, all phenotypes are
+        extracted keeping the marks.
+
+        Args:
+            workers: Optional number of processes to extract phenotypes in.
+
+        See Also:
+            Phenotyper.append_growth_data: Appending growth data
+        """
+        if not self._can_update_phenotypes():
+            self._logger.info("No phenotypes to update, extracting all phenotypes")
+            for x in self.iterate_extraction(keep_filter=True, workers=workers):
+                yield x
+            return
+
+        if self._changed_curves is None:
+            self._logger.info("No curves changed, phenotypes are up to date")
+            return
+
+        changed_positions = [
+            (id_plate, zip(*np.nonzero(plate_changed)))
+            for id_plate, plate_changed in enumerate(self._changed_curves)
+            if plate_changed is not None and plate_changed.any()]
+
+        total_curves = float(sum(len(positions) for _, positions in changed_positions))
+        self._logger.info("Updating phenotypes of {0} changed curves".format(int(total_curves)))
+
+        workers = get_usable_workers(workers, self._logger)
+        positions_per_task = max(1, int(np.ceil(total_curves / (workers * self.EXTRACTION_TASKS_PER_WORKER))))
+        tasks = [
+            (id_plate, positions[index: index + positions_per_task])
+            for id_plate, positions in changed_positions
+            for index in xrange(0, len(positions), positions_per_task)]
+
+        if workers > 1:
+            pool = Pool(workers, initializer=_set_shared_phenotyper, initargs=(self,))
+            results = pool.imap(_get_phenotypes_for_positions_in_worker, tasks)
+        else:
+            pool = None
+            results = (
+                (id_plate, positions, self._get_phenotypes_for_positions(id_plate, positions))
+                for id_plate, positions in tasks)
+
+        curves_done = 0
+        try:
+            for id_plate, positions, (phenotypes, vector_phenotypes) in results:
+
+                index = tuple(np.transpose(positions))
+                for phenotype, phenotype_data in phenotypes.iteritems():
+                    self._phenotypes[id_plate][phenotype][index] = phenotype_data
+
+                for phenotype, phenotype_data in vector_phenotypes.iteritems():
+                    plate_vector_phenotype = self._vector_phenotypes[id_plate][phenotype]
+                    for pos, value in izip(positions, phenotype_data):
+                        plate_vector_phenotype[pos] = value
+
+                curves_done += len(positions)
+                yield curves_done / total_curves
+
+            if pool is not None:
+                pool.close()
+
+        finally:
+
+            if pool is not None:
+                pool.terminate()
+                pool.join()
+
+        if self._vector_meta_phenotypes is None:
+            self._vector_meta_phenotypes = get_plates_array(None for _ in self._phenotypes)
+
+        for id_plate, vector_phenotypes in enumerate(self._vector_phenotypes):
+            if vector_phenotypes is not None:
+                self._extend_curve_phases(id_plate)
+
+        for id_plate, _ in changed_positions:
+
+            vector_meta_phenotypes = PlatePhenotypes()
+            self._calculate_vector_meta_phenotypes(
+                id_plate, self._phenotypes[id_plate], self._vector_phenotypes[id_plate], vector_meta_phenotypes)
+            self._vector_meta_phenotypes[id_plate] = vector_meta_phenotypes
+
+        self._changed_curves = None
+        self._changed_state.update(('_phenotypes', '_vector_phenotypes', '_vector_meta_phenotypes'))
+        self._normalized_phenotypes = None
+        self._init_remove_filter_and_undo_actions()
+        self._logger.info("Phenotype Update Done")
+
+    def _can_update_phenotypes(self):
+        """If there are phenotypes of all included phenotypes for all
+        plates with smooth data."""
+        if (not self.has_smooth_growth_data or self._phenotypes is None or self._vector_phenotypes is None or
+                len(self._phenotypes) != len(self._smooth_growth_data) or
+                len(self._vector_phenotypes) != len(self._smooth_growth_data)):
+            return False
+
+        phenotypes_inclusion = self._phenotypes_inclusion
+        included_phenotypes = [p for p in Phenotypes if phenotypes_inclusion(p) and PhenotypeDataType.Scalar(p)]
+        included_vector_phenotypes = [p for p in VectorPhenotypes if phenotypes_inclusion(p)]
+
+        for plate, phenotypes, vector_phenotypes in izip(
+                self._smooth_growth_data, self._phenotypes, self._vector_phenotypes):
+
+            if plate is None:
+                continue
+
+            if (phenotypes is None or vector_phenotypes is None or phenotypes.shape != plate.shape[:2] or
+                    any(p not in phenotypes for p in included_phenotypes) or
+                    any(p not in vector_phenotypes for p in included_vector_phenotypes)):
+                return False
+
+        return True
+
+    def _extend_curve_phases(self, id_plate):
+        """Sets the phases of measurements appended after the phases of
+        curves that weren't updated were classified as undetermined."""
+        vector_phenotypes = self._vector_phenotypes[id_plate]
+        if VectorPhenotypes.PhasesClassifications not in vector_phenotypes:
+            return
+
+        times = self._times_data.size
+        classifications = vector_phenotypes[VectorPhenotypes.PhasesClassifications]
+        for pos in product(*(range(d) for d in classifications.shape)):
+
+            phases = classifications[pos]
+            if isinstance(phases, np.ma.masked_array) and phases.size < times:
+                classifications[pos] = np.ma.concatenate(
+                    (phases, np.full((times - phases.size,), CurvePhases.Undetermined.value, dtype=phases.dtype)))
+
     def wipe_extracted_phenotypes(self, keep_filter=False):
         """ This clears all extracted phenotypes but keeps the log2_curve data
 
@@ -873,7 +1352,8 @@ class Phenotyper(mock_numpy_interface.NumpyArrayInterface):
                 self._logger.info("Removing filter undo history")
             self._phenotype_filter_undo = None
 
-    def extract_phenotypes(self, keep_filter=False, smoothing=Smoothing.PolynomialWeightedMulti, smoothing_coeffs={}):
+    def extract_phenotypes(self, keep_filter=False, smoothing=Smoothing.PolynomialWeightedMulti, smoothing_coeffs={},
+                           workers=1):
         """Extract phenotypes given the current inclusion level
 
         Args:
@@ -889,9 +1369,15 @@ class Phenotyper(mock_numpy_interface.NumpyArrayInterface):
                 Or `Smoothing.Polynomial` for polynomial smoothing, or
                 `Smoothing.PolynomialWeightedMulti` if fancy weighting of
                 all relevant polynomials should be used.
+                `Smoothing.PolynomialWeightedMultiBatched` gives the same
+                result as `Smoothing.PolynomialWeightedMulti` but fits
+                all curves of a plate at once.
             smoothing_coeffs:
                 Optional dict of key-value parameters for the smoothing
                 to override default values.
+            workers:
+                Optional number of processes to extract phenotypes in.
+                Default is to extract in the current process.
 
         See Also:
             Phenotyper.set_phenotype_inclusion_level:
@@ -909,20 +1395,204 @@ class Phenotyper(mock_numpy_interface.NumpyArrayInterface):
             self._logger.warning(
                 "There was no previous smooth data but setting was to keep previous, will run default.")
             self._poly_smoothen_raw_growth_weighted(**smoothing_coeffs)
-        elif smoothing is Smoothing.MedianGauss:
-            self._smoothen()
-        elif smoothing is Smoothing.Polynomial:
-            self._poly_smoothen_raw_growth(**smoothing_coeffs)
-        elif smoothing is Smoothing.PolynomialWeightedMulti:
-            self._poly_smoothen_raw_growth_weighted(**smoothing_coeffs)
+        else:
+            self._smooth(smoothing, smoothing_coeffs)
 
-        for _ in self._calculate_phenotypes():
+        for _ in self._calculate_phenotypes(workers=workers):
             pass
 
         self._init_remove_filter_and_undo_actions()
 
         self._logger.info("Phenotypes extracted")
 
+    def append_growth_data(self, raw_growth_data, times):
+        """Appends new measurements to the end of all curves.
+
+        If the curves are smooth, only the trailing part of each smooth
+        curve that the new measurements can change is smoothed again
+        with the smoothing that made the curves smooth, which gives the
+        same smooth curves as smoothing all data anew. Smoothings that
+        can't be updated, or that aren't known because the state was
+        saved by an older version, smooth all data anew.
+
+        Phenotypes aren't updated until `iterate_update` is run, which
+        extracts the phenotypes of the curves that changed.
+
+        Args:
+            raw_growth_data:
+                Plates of the new measurements with time as the last
+                dimension, `None` for plates without new measurements
+            times:
+                The times of the new measurements
+
+        Raises:
+            ValueError: If the times don't follow the current times or
+                the measurements don't fit the plates
+        """
+        times = np.asarray(times, dtype=np.float)
+        if times.size == 0:
+            return
+
+        first_new = self._times_data.size
+        if times.ndim != 1 or (first_new and times[0] <= self._times_data[-1]):
+            raise ValueError("Appended times must come after the current times")
+
+        has_smooth_growth_data = self.has_smooth_growth_data
+        self._raw_growth_data = _append_to_plates(self._raw_growth_data, raw_growth_data, times.size)
+        self._data = self._raw_growth_data
+        self.times = np.r_[self._times_data, times]
+
+        self._logger.info("Appended {0} measurements to the {1} previous".format(times.size, first_new))
+
+        if not has_smooth_growth_data:
+            self._changed_curves = None
+            return
+
+        previous_smooth_data = self._smooth_growth_data
+        times = self._times_data
+        smoothing = self._smoothing
+        smoothing_coeffs = self._smoothing_coeffs
+        edge_condition = smoothing_coeffs.get('edge_condition', EdgeCondition.Reflect)
+
+        if smoothing is Smoothing.MedianGauss:
+
+            # The gaussian filter uses two measurements on each side
+            changed, start = get_smoothing_update_window(times, first_new, self._median_kernel_size // 2 + 2)
+            smooth_data = []
+            for plate in self._raw_growth_data:
+                if plate is None:
+                    smooth_data.append(None)
+                    continue
+                smooth_plate = np.array(plate[..., start:], dtype=np.float)
+                self._median_gauss_smoothen_plate(smooth_plate, times[start:])
+                smooth_data.append(smooth_plate)
+
+        elif ((smoothing is Smoothing.PolynomialWeightedMulti or
+               smoothing is Smoothing.PolynomialWeightedMultiBatched) and
+              (edge_condition is EdgeCondition.Reflect or edge_condition is EdgeCondition.Symmetric)):
+
+            changed, start = get_smoothing_update_window(
+                times, first_new,
+                self._median_kernel_size // 2 if smoothing_coeffs.get('apply_median', True) else 0,
+                2 * smoothing_coeffs.get('time_delta', 5.1))
+            smooth_data = self._get_poly_smooth_plates_batched(
+                times[start:], [None if plate is None else plate[..., start:] for plate in self._raw_growth_data],
+                **smoothing_coeffs)
+
+        else:
+
+            if smoothing is None:
+                self._logger.warning("The smoothing of the curves is unknown, all data will be smoothed anew")
+                self._smoothen()
+            else:
+                self._logger.warning("Can't update {0} smoothing, all data will be smoothed anew".format(smoothing))
+                self._smooth(smoothing, smoothing_coeffs)
+
+            self._add_changed_curves(previous_smooth_data, 0)
+            return
+
+        self._smooth_growth_data = np.array([
+            None if smooth_plate is None else
+            np.concatenate((previous[..., :changed], smooth_plate[..., changed - start:]), axis=2)
+            for previous, smooth_plate in izip(previous_smooth_data, smooth_data)])
+
+        self._add_changed_curves(previous_smooth_data, changed)
+        self._logger.info("Smoothed the last {0} of {1} measurements again".format(times.size - changed, times.size))
+
+    def _add_changed_curves(self, previous_smooth_data, changed):
+        """Marks the curves whose smooth data changed from index `changed`
+        or that have new smooth values, as changed since their phenotypes
+        were extracted.
+        """
+        changed_curves = []
+        for id_plate, (previous, smooth_plate) in enumerate(izip(previous_smooth_data, self._smooth_growth_data)):
+
+            if smooth_plate is None:
+                changed_curves.append(None)
+                continue
+
+            first_new = previous.shape[2]
+            before = np.asarray(previous[..., changed:])
+            after = smooth_plate[..., changed:first_new]
+            plate_changed = (
+                ((before != after) & ~(np.isnan(before) & np.isnan(after))).any(axis=2) |
+                np.isfinite(smooth_plate[..., first_new:]).any(axis=2))
+
+            if self._changed_curves is not None and self._changed_curves[id_plate] is not None:
+                plate_changed |= self._changed_curves[id_plate]
+            changed_curves.append(plate_changed)
+
+        self._changed_curves = changed_curves
+
+    def update_from_image_data(self, path='.'):
+        """Updates the growth data with the image data of a project.
+
+        The image data of images analysed after the current measurements
+        is appended. If the image data of the current measurements has
+        changed, e.g. because the project was analysed anew, all growth
+        data is replaced instead. That leaves no phenotypes to update, so
+        `iterate_update` extracts all phenotypes keeping the curve marks.
+
+        Args:
+            path: optional, default is current directory
+
+        Returns: The number of new measurements
+        """
+        times, data = image_data.ImageData.read_image_data_and_time(path)
+        if times is None or data is None:
+            return 0
+
+        previous = self._times_data.size
+        if self._starts_growth_data(data, times):
+            self.append_growth_data(
+                [None if plate is None else plate[..., previous:] for plate in data], times[previous:])
+        else:
+            self._logger.warning(
+                "Image data of the {0} current measurements changed, replacing all growth data".format(previous))
+            self.replace_growth_data(data, times)
+
+        return max(times.size - previous, 0)
+
+    def replace_growth_data(self, raw_growth_data, times):
+        """Replaces all growth data, keeping the curve marks.
+
+        The smooth growth data is removed, so `iterate_update` extracts
+        all phenotypes anew.
+
+        Args:
+            raw_growth_data: Plates of the measurements with time as the
+                last dimension
+            times: The times of the measurements
+        """
+        self._raw_growth_data = raw_growth_data
+        self._data = raw_growth_data
+        self.times = times
+        self._smooth_growth_data = None
+        self._changed_curves = None
+
+    def _starts_growth_data(self, raw_growth_data, times):
+        """If the current growth data is the start of other growth data."""
+        previous = self._times_data.size
+        if times.size < previous or not np.array_equal(times[:previous], self._times_data):
+            return False
+        elif len(raw_growth_data) != len(self._raw_growth_data):
+            return False
+
+        for plate, other_plate in izip(self._raw_growth_data, raw_growth_data):
+            if plate is None or other_plate is None:
+                if plate is not other_plate:
+                    return False
+                continue
+
+            other_plate = other_plate[..., :previous]
+            if plate.shape != other_plate.shape:
+                return False
+            same = (plate == other_plate) | (np.isnan(plate) & np.isnan(other_plate))
+            if not same.all():
+                return False
+
+        return True
+
     @property
     def has_smooth_growth_data(self):
 
@@ -967,6 +1637,8 @@ class Phenotyper(mock_numpy_interface.NumpyArrayInterface):
             smooth_data.append(smooth_plate.reshape(plate.shape))
 
         self._smooth_growth_data = np.array(smooth_data)
+        self._smoothing = Smoothing.Polynomial
+        self._smoothing_coeffs = dict(power=power, time_delta=time_delta)
 
         self._logger.info("Completed Polynomial smoothing")
 
@@ -1039,9 +1711,114 @@ class Phenotyper(mock_numpy_interface.NumpyArrayInterface):
             smooth_data.append(np.array(smooth_plate).reshape(plate.shape))
 
         self._smooth_growth_data = np.array(smooth_data)
+        self._smoothing = Smoothing.PolynomialWeightedMulti
+        self._smoothing_coeffs = dict(
+            power=power, time_delta=time_delta, gauss_sigma=gauss_sigma, apply_median=apply_median,
+            edge_condition=edge_condition)
 
         self._logger.info("Completed Weighted Multi-Polynomial smoothing")
 
+    def _poly_smoothen_raw_growth_weighted_batched(
+            self, power=3, time_delta=5.1, gauss_sigma=1.5, apply_median=True,
+            edge_condition=EdgeCondition.Reflect):
+
+        assert power > 1, "Power must be 2 or greater"
+
+        if edge_condition is not EdgeCondition.Reflect and edge_condition is not EdgeCondition.Symmetric:
+            self._logger.warning(
+                "Batched smoothing only supports Reflect and Symmetric edge conditions, using unbatched")
+            self._poly_smoothen_raw_growth_weighted(
+                power=power, time_delta=time_delta, gauss_sigma=gauss_sigma, apply_median=apply_median,
+                edge_condition=edge_condition)
+            return
+
+        self._logger.info(
+            "Starting Batched Weighted Multi-Polynomial smoothing"
+            " (Power {0}; Time delta {1}h; Gauss sigma {2}h; {3}; {4}".format(
+                power, time_delta, gauss_sigma, "Median filter" if apply_median else "No median filter",
+                edge_condition
+        ))
+
+        self._smooth_growth_data = np.array(self._get_poly_smooth_plates_batched(
+            self.times, self._raw_growth_data, power, time_delta, gauss_sigma, apply_median, edge_condition))
+        self._smoothing = Smoothing.PolynomialWeightedMultiBatched
+        self._smoothing_coeffs = dict(
+            power=power, time_delta=time_delta, gauss_sigma=gauss_sigma, apply_median=apply_median,
+            edge_condition=edge_condition)
+
+        self._logger.info("Completed Batched Weighted Multi-Polynomial smoothing")
+
+    def _get_poly_smooth_plates_batched(self, times, plates, power=3, time_delta=5.1, gauss_sigma=1.5,
+                                        apply_median=True, edge_condition=EdgeCondition.Reflect):
+        """Batched Weighted Multi-Polynomial smoothing of plates of curves
+
+        Args:
+            times: The times of the curves
+            plates: The plates of curves, with time as last dimension,
+                or `None` for plates without data
+            power: The polynomial degree
+            time_delta: The half width in hours of the polynomial windows
+            gauss_sigma: Sigma in hours of the window weighting
+            apply_median: If the curves are median filtered first
+            edge_condition: Either `EdgeCondition.Reflect` or
+                `EdgeCondition.Symmetric`
+
+        Returns: List of the smooth plates
+        """
+        median_kernel = np.ones((1, self._median_kernel_size))
+        smooth_data = []
+        n_times = times.size
+        left_filt, right_filt = get_edge_condition_timed_filter(times, time_delta, edge_condition)
+        left = left_filt.sum()
+        edge_index = filter_edge_condition(np.arange(times.size), left_filt, right_filt, edge_condition)
+        times = filter_edge_condition(times, left_filt, right_filt, edge_condition, extrapolate_values=True)
+
+        time_diffs = np.subtract.outer(times, times)
+        polynomials = SlidingWindowPolynomials(
+            times, (time_diffs < time_delta) & (time_diffs > -time_delta), power)
+        windows = slice(left, left + n_times)
+
+        for id_plate, plate in enumerate(plates):
+            if plate is None:
+                smooth_data.append(None)
+                self._logger.info("Plate {0} has no data".format(id_plate + 1))
+                continue
+
+            log2_data = np.log2(plate).reshape(np.prod(plate.shape[:2]), plate.shape[-1])
+            epsilon = np.finfo(log2_data.dtype).eps
+
+            if apply_median:
+                log2_data[...] = median_filter(log2_data, footprint=median_kernel, mode='reflect')
+
+            smooth_plate = np.empty_like(log2_data)
+            for id0 in xrange(0, log2_data.shape[0], self.SMOOTHING_BATCH_SIZE):
+                batch = slice(id0, id0 + self.SMOOTHING_BATCH_SIZE)
+                smooth_plate[batch], r, r0 = polynomials.smooth(
+                    log2_data[batch][:, edge_index], gauss_sigma, windows)
+
+                with np.errstate(invalid='ignore'):
+                    corrupt = (r0 < epsilon).any(axis=1)
+                    overfitted = (r == 0).any(axis=1)
+
+                for id_curve in np.flatnonzero(corrupt):
+                    self._logger.warning(
+                        "Curve {0} has long stretches of (near) identical data and is probably corrupt".format(
+                            np.unravel_index(id0 + id_curve, plate.shape[:2])
+                        ))
+
+                for id_curve in np.flatnonzero(overfitted):
+                    self._logger.warning(
+                        "Curve {0} is probably overfitted somewhere because polynomial residual was 0".format(
+                            np.unravel_index(id0 + id_curve, plate.shape[:2])
+                    ))
+
+            self._logger.info("Plate {0} data polynomial smoothed ({1} curves, {2} data-points per curve)".format(
+                id_plate + 1, smooth_plate.shape[0], smooth_plate.shape[1]))
+
+            smooth_data.append(smooth_plate.reshape(plate.shape))
+
+        return smooth_data
+
     @staticmethod
     def _multi_poly_smooth(times, polys, r, r0, filt, gauss_sigma):
 
@@ -1108,60 +1885,73 @@ class Phenotyper(mock_numpy_interface.NumpyArrayInterface):
             else:
                 yield np.power(2, np.poly1d(p)(t))
 
+    def _smooth(self, smoothing, smoothing_coeffs):
+
+        if smoothing is Smoothing.MedianGauss:
+            self._smoothen()
+        elif smoothing is Smoothing.Polynomial:
+            self._poly_smoothen_raw_growth(**smoothing_coeffs)
+        elif smoothing is Smoothing.PolynomialWeightedMulti:
+            self._poly_smoothen_raw_growth_weighted(**smoothing_coeffs)
+        elif smoothing is Smoothing.PolynomialWeightedMultiBatched:
+            self._poly_smoothen_raw_growth_weighted_batched(**smoothing_coeffs)
+
     def _smoothen(self):
 
-        self.set("smooth_growth_data", self._raw_growth_data.copy())
+        # Plates are copied so memory-mapped or object array plates of the
+        # raw data aren't smoothed in place
+        self.set("smooth_growth_data", get_plates_array(
+            None if plate is None else np.array(plate, dtype=np.float) for plate in self._raw_growth_data))
         self._logger.info("Smoothing Started")
-        median_kernel = np.ones((1, self._median_kernel_size))
         times = self.times
 
-        # This conversion is done to reflect that previous filter worked on
-        # indices and expected ratio to hours is 1:3.
-        gauss_kwargs = {
-            'sigma':
-                self._gaussian_filter_sigma / 3.0 if self._gaussian_filter_sigma == 5 else self._gaussian_filter_sigma}
-
         for plate_id, plate in enumerate(self._smooth_growth_data):
 
             if plate is None:
                 self._logger.info("Plate {0} has no data, skipping".format(plate_id + 1))
                 continue
 
-            plate_as_flat = np.lib.stride_tricks.as_strided(
-                plate,
-                shape=(plate.shape[0] * plate.shape[1], plate.shape[2]),
-                strides=(plate.strides[1], plate.strides[2]))
-
-            plate_as_flat[...] = median_filter(
-                plate_as_flat, footprint=median_kernel, mode='reflect')
-
-            plate_as_flat[...] = tuple(
-                merge_convolve(v, times, func_kwargs=gauss_kwargs) for v in plate_as_flat
-            )
+            self._median_gauss_smoothen_plate(plate, times)
 
             self._logger.info("Smoothing of plate {0} done".format(plate_id + 1))
 
+        self._smoothing = Smoothing.MedianGauss
+        self._smoothing_coeffs = {}
         self._logger.info("Smoothing Done")
 
-    def _calculate_phenotypes(self):
+    def _median_gauss_smoothen_plate(self, plate, times):
+        """Median and gaussian filters the curves of a plate in place"""
+        median_kernel = np.ones((1, self._median_kernel_size))
+
+        # This conversion is done to reflect that previous filter worked on
+        # indices and expected ratio to hours is 1:3.
+        gauss_kwargs = {
+            'sigma':
+                self._gaussian_filter_sigma / 3.0 if self._gaussian_filter_sigma == 5 else self._gaussian_filter_sigma}
+
+        plate_as_flat = np.lib.stride_tricks.as_strided(
+            plate,
+            shape=(plate.shape[0] * plate.shape[1], plate.shape[2]),
+            strides=(plate.strides[1], plate.strides[2]))
+
+        plate_as_flat[...] = median_filter(
+            plate_as_flat, footprint=median_kernel, mode='reflect')
+
+        plate_as_flat[...] = tuple(
+            merge_convolve(v, times, func_kwargs=gauss_kwargs) for v in plate_as_flat
+        )
+
+    def _calculate_phenotypes(self, workers=1):
 
         if self._times_data.shape[0] - (self._linear_regression_size - 1) <= 0:
             self._logger.error(
                 "Refusing phenotype extractions since number of scans are less than used in the linear regression")
             return
 
-        times_strided = self.times_strided
-
-        flat_times = self._times_data
-
-        index_for_48h = np.abs(np.subtract.outer(self._times_data, [48])).argmin()
-
         all_phenotypes = []
         all_vector_phenotypes = []
         all_vector_meta_phenotypes = []
 
-        regression_size = self._linear_regression_size
-        position_offset = (regression_size - 1) / 2
         phenotypes_count = self.get_number_of_phenotypes()
 
         total_curves = float(self.number_of_curves)
@@ -1169,14 +1959,13 @@ class Phenotyper(mock_numpy_interface.NumpyArrayInterface):
         self._logger.info("Phenotypes (N={0}), extraction started for {1} curves".format(
             phenotypes_count, int(total_curves)))
 
-        curves_in_completed_plates = 0
         phenotypes_inclusion = self._phenotypes_inclusion
 
         if phenotypes_inclusion is not PhenotypeDataType.Trusted:
             self._logger.warning("Will extract phenotypes beyond those that are trusted, this is not recommended!" +
                                  " It is your responsibility to verify the validity of those phenotypes!")
 
-        for id_plate, plate in enumerate(self._smooth_growth_data):
+        for plate in self._smooth_growth_data:
 
             if plate is None:
                 all_phenotypes.append(None)
@@ -1184,106 +1973,246 @@ class Phenotyper(mock_numpy_interface.NumpyArrayInterface):
                 all_vector_meta_phenotypes.append(None)
                 continue
 
-            plate_flat_regression_strided = self._get_plate_linear_regression_strided(plate)
+            included_phenotypes = [p for p in Phenotypes if phenotypes_inclusion(p)]
+            all_phenotypes.append(PlatePhenotypes.from_data(
+                included_phenotypes,
+                np.full((len(included_phenotypes),) + plate.shape[:2], np.nan, dtype=np.float)))
+
+            all_vector_phenotypes.append({
+                p: np.zeros(plate.shape[:2], dtype=np.object) * np.nan
+                for p in VectorPhenotypes if phenotypes_inclusion(p)})
 
-            phenotypes = {
-                p: np.zeros(plate.shape[:2], dtype=np.float) * np.nan
-                for p in Phenotypes if phenotypes_inclusion(p)}
+            all_vector_meta_phenotypes.append(PlatePhenotypes())
+
+        if get_usable_workers(workers, self._logger) > 1:
+            calculation = self._calculate_phenotypes_in_pool(
+                all_phenotypes, all_vector_phenotypes, all_vector_meta_phenotypes, workers)
+        else:
+            calculation = self._calculate_phenotypes_in_sequence(
+                all_phenotypes, all_vector_phenotypes, all_vector_meta_phenotypes)
+
+        for curves_done in calculation:
+            yield curves_done / total_curves
+
+        self._phenotypes = get_plates_array(all_phenotypes)
+        self._vector_phenotypes = np.array(all_vector_phenotypes)
+        self._vector_meta_phenotypes = get_plates_array(all_vector_meta_phenotypes)
+        self._normalized_phenotypes = None
+        self._changed_curves = None
+        self._logger.info("Phenotype Extraction Done")
+
+    def _calculate_phenotypes_in_sequence(self, all_phenotypes, all_vector_phenotypes, all_vector_meta_phenotypes):
+
+        curves_in_completed_plates = 0
+
+        for id_plate, plate in enumerate(self._smooth_growth_data):
+
+            if plate is None:
+                continue
 
             plate_size = np.prod(plate.shape[:2])
             self._logger.info("Plate {0} has {1} curves".format(id_plate + 1, plate_size))
 
-            vector_phenotypes = {
-                p: np.zeros(plate.shape[:2], dtype=np.object) * np.nan
-                for p in VectorPhenotypes if phenotypes_inclusion(p)}
+            phenotypes = all_phenotypes[id_plate]
+            for phenotype, phenotype_data in self._get_scalar_phenotypes(id_plate).iteritems():
+                phenotypes[phenotype][...] = phenotype_data
 
-            vector_meta_phenotypes = {}
+            for id0 in xrange(plate.shape[0]):
 
-            all_phenotypes.append(phenotypes)
-            all_vector_phenotypes.append(vector_phenotypes)
-            all_vector_meta_phenotypes.append(vector_meta_phenotypes)
+                rows = slice(id0, id0 + 1)
+                for phenotype, phenotype_data in self._get_phases_phenotypes(id_plate, rows).iteritems():
+                    all_vector_phenotypes[id_plate][phenotype][rows] = phenotype_data
 
-            for pos_index, pos_data in enumerate(plate_flat_regression_strided):
+                self._logger.debug("Done plate {0} pos {1} {2}".format(id_plate, id0, 0))
 
-                id1 = pos_index % plate.shape[1]
-                id0 = pos_index / plate.shape[1]
+                self._logger.info("Plate {1} growth phenotypes {0:.1f}% done".format(
+                    100.0 * (id0 * plate.shape[1] + 1.0) / plate_size,
+                    id_plate + 1,
+                ))
 
-                curve_data = get_preprocessed_data_for_phenotypes(
-                    curve=plate[id0, id1],
-                    curve_strided=pos_data,
-                    flat_times=flat_times,
-                    times_strided=times_strided,
-                    index_for_48h=index_for_48h,
-                    position_offset=position_offset)
+                yield curves_in_completed_plates + id0 * plate.shape[1] + 1.0
 
-                curve_has_data = True
+            self._calculate_vector_meta_phenotypes(
+                id_plate, all_phenotypes[id_plate], all_vector_phenotypes[id_plate],
+                all_vector_meta_phenotypes[id_plate])
 
-                if curve_data['curve_smooth_growth_data'].mask.all():
+            curves_in_completed_plates += plate_size
 
-                    self._logger.warning("Position ({0}, {1}) on plate {2} seems void of data".format(
-                        id0, id1, id_plate + 1
-                    ))
-                    curve_has_data = False
+    def _calculate_phenotypes_in_pool(
+            self, all_phenotypes, all_vector_phenotypes, all_vector_meta_phenotypes, workers):
 
-                else:
+        total_rows = sum(plate.shape[0] for plate in self._smooth_growth_data if plate is not None)
+        rows_per_task = max(1, int(np.ceil(float(total_rows) / (workers * self.EXTRACTION_TASKS_PER_WORKER))))
+        tasks = [
+            (id_plate, (id0, min(id0 + rows_per_task, plate.shape[0])))
+            for id_plate, plate in enumerate(self._smooth_growth_data) if plate is not None
+            for id0 in xrange(0, plate.shape[0], rows_per_task)]
 
-                    for phenotype in Phenotypes:
+        remaining_tasks = {}
+        for id_plate, _ in tasks:
+            remaining_tasks[id_plate] = remaining_tasks.get(id_plate, 0) + 1
 
-                        if not phenotypes_inclusion(phenotype):
-                            continue
+        self._logger.info("Extracting phenotypes in {0} processes using {1} tasks of {2} rows".format(
+            workers, len(tasks), rows_per_task))
 
-                        if PhenotypeDataType.Scalar(phenotype):
-                            phenotypes[phenotype][id0, id1] = phenotype(**curve_data)
+        pool = Pool(workers, initializer=_set_shared_phenotyper, initargs=(self,))
+        curves_done = 0
 
-                if curve_has_data and (
-                            phenotypes_inclusion(VectorPhenotypes.PhasesClassifications) or
-                            phenotypes_inclusion(VectorPhenotypes.PhasesPhenotypes)):
+        try:
+            for id_plate, (id0, id1), (phenotypes, vector_phenotypes) in pool.imap(
+                    _get_phenotypes_for_rows_in_worker, tasks):
 
-                    phases, phases_phenotypes = get_phase_analysis(
-                        self, id_plate, (id0, id1),
-                        experiment_doublings=phenotypes[Phenotypes.ExperimentPopulationDoublings][id0, id1])
+                rows = slice(id0, id1)
+                for phenotype, phenotype_data in phenotypes.iteritems():
+                    all_phenotypes[id_plate][phenotype][rows] = phenotype_data
 
-                    if phenotypes_inclusion(VectorPhenotypes.PhasesClassifications):
-                        vector_phenotypes[VectorPhenotypes.PhasesClassifications][id0, id1] = phases
-                    if phenotypes_inclusion(VectorPhenotypes.PhasesPhenotypes):
-                        vector_phenotypes[VectorPhenotypes.PhasesPhenotypes][id0, id1] = phases_phenotypes
+                for phenotype, phenotype_data in vector_phenotypes.iteritems():
+                    all_vector_phenotypes[id_plate][phenotype][rows] = phenotype_data
 
-                if id1 == 0:
+                remaining_tasks[id_plate] -= 1
+                if remaining_tasks[id_plate] == 0:
+                    self._calculate_vector_meta_phenotypes(
+                        id_plate, all_phenotypes[id_plate], all_vector_phenotypes[id_plate],
+                        all_vector_meta_phenotypes[id_plate])
 
-                    self._logger.debug("Done plate {0} pos {1} {2}".format(id_plate, id0, id1))
+                curves_done += (id1 - id0) * self._smooth_growth_data[id_plate].shape[1]
+                yield curves_done
 
-                    self._logger.info("Plate {1} growth phenotypes {0:.1f}% done".format(
-                        100.0 * (pos_index + 1.0) / plate_size,
-                        id_plate + 1,
-                    ))
+            pool.close()
 
-                    yield (curves_in_completed_plates + pos_index + 1.0) / total_curves
+        finally:
 
-            for phenotype in CurvePhaseMetaPhenotypes:
+            pool.terminate()
+            pool.join()
 
-                self._logger.info("Extracting {0} for plate {1}".format(phenotype.name, id_plate + 1))
+    def _get_phenotypes_for_rows(self, id_plate, rows):
 
-                if not phenotypes_inclusion(phenotype):
-                    continue
+        phenotypes = self._get_scalar_phenotypes(id_plate, rows)
+        return phenotypes, self._get_phases_phenotypes(id_plate, rows)
 
-                if not phenotypes_inclusion(VectorPhenotypes.PhasesPhenotypes):
-                    self._logger.warning("Can't extract {0} because {1} has not been included.".format(
-                        phenotype, VectorPhenotypes.PhasesPhenotypes))
-                    continue
+    def _get_phenotypes_for_positions(self, id_plate, positions):
+        """Extracts the phenotypes of some positions of a plate.
 
-                phenotype_data = extract_phenotypes(
-                    vector_phenotypes[VectorPhenotypes.PhasesPhenotypes], phenotype, phenotypes)
+        Returns:
+            tuple of dicts of the scalar and of the vector phenotypes,
+            with the values of the positions in order
+        """
+        plate = self._smooth_growth_data[id_plate]
+        curves = np.array([plate[pos] for pos in positions], dtype=np.float)
+        phenotypes = self._get_curves_scalar_phenotypes(curves[np.newaxis])
+        return phenotypes, self._get_phases_phenotypes_for_positions(id_plate, positions)
 
-                vector_meta_phenotypes[phenotype] = phenotype_data.astype(np.float)
+    def _get_scalar_phenotypes(self, id_plate, rows=slice(None)):
 
-            self._logger.info("Plate {0} Done".format(id_plate + 1))
-            curves_in_completed_plates += 0 if plate is None else plate_flat_regression_strided.shape[0]
+        plate = self._smooth_growth_data[id_plate][rows]
+        return {p: v.reshape(plate.shape[:2]) for p, v in self._get_curves_scalar_phenotypes(plate).iteritems()}
 
-        self._phenotypes = np.array(all_phenotypes)
-        self._vector_phenotypes = np.array(all_vector_phenotypes)
-        self._vector_meta_phenotypes = np.array(all_vector_meta_phenotypes)
-        self._normalized_phenotypes = None
-        self._logger.info("Phenotype Extraction Done")
+    def _get_curves_scalar_phenotypes(self, plate):
+        """Scalar phenotypes of the curves of a plate, as flat arrays"""
+        plate_size = np.prod(plate.shape[:2])
+        phenotypes_inclusion = self._phenotypes_inclusion
+
+        return get_phenotypes_for_curves(
+            curves=plate.reshape(plate_size, plate.shape[2]),
+            curves_strided=self._get_plate_linear_regression_strided(plate),
+            flat_times=self._times_data,
+            times_strided=self.times_strided,
+            index_for_48h=np.abs(np.subtract.outer(self._times_data, [48])).argmin(),
+            position_offset=(self._linear_regression_size - 1) / 2,
+            phenotypes=(p for p in Phenotypes if phenotypes_inclusion(p) and PhenotypeDataType.Scalar(p)))
+
+    def _get_phases_phenotypes(self, id_plate, rows):
+        """Phase analysis for a block of rows
+
+        Args:
+            id_plate: The plate index
+            rows: The rows slice
+        """
+        shape = self._smooth_growth_data[id_plate][rows].shape[:2]
+        first_row = rows.start or 0
+        positions = [(first_row + id0, id1) for id0, id1 in product(*(range(d) for d in shape))]
+        vector_phenotypes = {}
+
+        for phenotype, values in self._get_phases_phenotypes_for_positions(id_plate, positions).iteritems():
+
+            phenotype_data = np.zeros(shape, dtype=np.object) * np.nan
+            for (id0, id1), value in izip(positions, values):
+                phenotype_data[id0 - first_row, id1] = value
+            vector_phenotypes[phenotype] = phenotype_data
+
+        return vector_phenotypes
+
+    def _get_phases_phenotypes_for_positions(self, id_plate, positions):
+        """Phase analysis for some positions of a plate
+
+        Args:
+            id_plate: The plate index
+            positions: The positions
+
+        Returns:
+            dict of the vector phenotypes to lists of the values of the
+            positions, `np.nan` for positions void of data
+        """
+        plate = self._smooth_growth_data[id_plate]
+        phenotypes_inclusion = self._phenotypes_inclusion
+        vector_phenotypes = {p: [np.nan] * len(positions) for p in VectorPhenotypes if phenotypes_inclusion(p)}
+
+        do_phases = (
+            phenotypes_inclusion(VectorPhenotypes.PhasesClassifications) or
+            phenotypes_inclusion(VectorPhenotypes.PhasesPhenotypes))
+
+        with_data = []
+
+        for index, pos in enumerate(positions):
+
+            if not np.isfinite(plate[pos]).any():
+
+                self._logger.warning("Position ({0}, {1}) on plate {2} seems void of data".format(
+                    pos[0], pos[1], id_plate + 1
+                ))
+                continue
+
+            with_data.append(index)
+
+        if do_phases and with_data:
+
+            # The linearity extensions of all curves are scanned together
+            analyses = get_phase_analyses(self, id_plate, [positions[index] for index in with_data])
+
+            for index, (phases, phases_phenotypes) in zip(with_data, analyses):
+
+                if phenotypes_inclusion(VectorPhenotypes.PhasesClassifications):
+                    vector_phenotypes[VectorPhenotypes.PhasesClassifications][index] = phases
+                if phenotypes_inclusion(VectorPhenotypes.PhasesPhenotypes):
+                    vector_phenotypes[VectorPhenotypes.PhasesPhenotypes][index] = phases_phenotypes
+
+        return vector_phenotypes
+
+    def _calculate_vector_meta_phenotypes(self, id_plate, phenotypes, vector_phenotypes, vector_meta_phenotypes):
+
+        phenotypes_inclusion = self._phenotypes_inclusion
+        phase_table = None
+
+        for phenotype in CurvePhaseMetaPhenotypes:
+
+            self._logger.info("Extracting {0} for plate {1}".format(phenotype.name, id_plate + 1))
+
+            if not phenotypes_inclusion(phenotype):
+                continue
+
+            if not phenotypes_inclusion(VectorPhenotypes.PhasesPhenotypes):
+                self._logger.warning("Can't extract {0} because {1} has not been included.".format(
+                    phenotype, VectorPhenotypes.PhasesPhenotypes))
+                continue
+
+            if phase_table is None:
+                phase_table = PhaseTable.from_phases_phenotypes(vector_phenotypes[VectorPhenotypes.PhasesPhenotypes])
+
+            phenotype_data = extract_phenotypes(phase_table, phenotype, phenotypes)
+
+            vector_meta_phenotypes[phenotype] = phenotype_data.astype(np.float)
+
+        self._logger.info("Plate {0} Done".format(id_plate + 1))
 
     def _get_plate_linear_regression_strided(self, plate):
 
@@ -1409,6 +2338,7 @@ class Phenotyper(mock_numpy_interface.NumpyArrayInterface):
             self._reference_surface_positions = [offset() for _ in self.enumerate_plates]
         else:
             self._reference_surface_positions[plate] = offset()
+            self._changed_state.add('_reference_surface_positions')
 
     def get_control_surface_offset(self, plate):
 
@@ -1428,7 +2358,7 @@ class Phenotyper(mock_numpy_interface.NumpyArrayInterface):
             Phenotyper.set_phenotype_inclusion_level: Setting which phenotypes are extracted.
         """
         if self._normalized_phenotypes is None:
-            self._normalized_phenotypes = np.array([{} for _ in self.enumerate_plates], dtype=np.object)
+            self._normalized_phenotypes = get_plates_array(PlatePhenotypes() for _ in self.enumerate_plates)
 
         norm_method = norm_by_log2_diff
         if method == NormalizationMethod.SignalToNoise:
@@ -1464,6 +2394,8 @@ class Phenotyper(mock_numpy_interface.NumpyArrayInterface):
 
                 self._normalized_phenotypes[id_plate][phenotype] = plate
 
+        self._changed_state.add('_normalized_phenotypes')
+
     @property
     def number_of_curves(self):
 
@@ -1792,7 +2724,7 @@ class Phenotyper(mock_numpy_interface.NumpyArrayInterface):
                 return False
             elif isinstance(p, np.ndarray):
                 return _arr_tester(p)
-            elif isinstance(p, dict):
+            elif is_plate_phenotypes(p):
                 return any(
                     False if v is None else _arr_tester(v) for v in p.values()
                 )
@@ -1814,7 +2746,7 @@ class Phenotyper(mock_numpy_interface.NumpyArrayInterface):
         if self._data_lacks_data(data):
             self._phenotypes = None
         else:
-            self._phenotypes = self._convert_phenotype_to_current(data)
+            self._phenotypes = as_plate_phenotypes(self._convert_phenotype_to_current(data))
             allowed = True
         self._init_remove_filter_and_undo_actions()
         self._init_default_offsets()
@@ -1825,7 +2757,7 @@ class Phenotyper(mock_numpy_interface.NumpyArrayInterface):
         if self._data_lacks_data(data):
             self._normalized_phenotypes = None
         else:
-            self._normalized_phenotypes = data
+            self._normalized_phenotypes = as_plate_phenotypes(data)
             allowed = True
         self._init_default_offsets()
         return allowed
@@ -1846,7 +2778,7 @@ class Phenotyper(mock_numpy_interface.NumpyArrayInterface):
         if self._data_lacks_data(data):
             self._vector_meta_phenotypes = None
         else:
-            self._vector_meta_phenotypes = data
+            self._vector_meta_phenotypes = as_plate_phenotypes(data)
             allowed = True
 
         self._init_remove_filter_and_undo_actions()
@@ -1879,17 +2811,18 @@ class Phenotyper(mock_numpy_interface.NumpyArrayInterface):
             (data.size == 0 or data.size == 1 and not data.shape)
         ):
             self._phenotype_filter = None
-        elif all(
-            True if plate is None else isinstance(plate, dict)
-            for plate in data
-        ):
-            self._phenotype_filter = data
-            allowed = True
         else:
-            self._phenotype_filter = (
-                self._convert_to_current_phenotype_filter(data)
-            )
-            allowed = True
+            if not all(
+                True if plate is None else is_plate_phenotypes(plate)
+                for plate in data
+            ):
+                data = self._convert_to_current_phenotype_filter(data)
+            try:
+                self._phenotype_filter = as_plate_filters(data)
+                allowed = True
+            except ValueError:
+                self._logger.warning("Phenotype filter not understood, filter will be rewritten")
+                self._phenotype_filter = None
         self._init_remove_filter_and_undo_actions()
         return allowed
 
@@ -1901,6 +2834,21 @@ class Phenotyper(mock_numpy_interface.NumpyArrayInterface):
             self._logger.warning("Not a valid meta data type")
             return False
 
+    def _load_lazy_state(self, attribute):
+
+        loader = self._lazy_state_loaders.get(attribute)
+        if loader is None:
+            return
+
+        for name, other_loader in self._lazy_state_loaders.items():
+            if other_loader is loader:
+                del self._lazy_state_loaders[name]
+
+        # What is loaded is already saved
+        changed_state = set(self._changed_state)
+        loader()
+        self._changed_state = changed_state
+
     def set(self, data_type, data):
 
         if data_type == 'phenotypes':
@@ -1935,7 +2883,7 @@ class Phenotyper(mock_numpy_interface.NumpyArrayInterface):
             if plate is None:
                 store.append(None)
 
-            if not isinstance(plate, dict):
+            if not is_plate_phenotypes(plate):
 
                 new_plate = {}
                 store.append(new_plate)
@@ -2022,6 +2970,7 @@ class Phenotyper(mock_numpy_interface.NumpyArrayInterface):
 
     def _init_plate_filter(self, plate_index, phenotype, phenotype_data, growth_filter):
 
+        self._changed_state.add('_phenotype_filter')
         self._phenotype_filter[plate_index][phenotype] = np.zeros(
             self._raw_growth_data[plate_index].shape[:2], dtype=np.int8)
 
@@ -2047,7 +2996,8 @@ class Phenotyper(mock_numpy_interface.NumpyArrayInterface):
         if self._phenotype_filter is None or len(self._phenotypes) != len(self._phenotype_filter):
 
             self._logger.warning("Filter doesn't match number of plates. Rewriting...")
-            self._phenotype_filter = np.array([{} for _ in self._phenotypes], dtype=np.object)
+            self._phenotype_filter = get_plates_array(
+                PlatePhenotypes(np.uint8, Filter.OK.value) for _ in self._phenotypes)
             self._phenotype_filter_undo = tuple(deque() for _ in self._phenotypes)
 
         elif self._phenotype_filter_undo is None or len(self._phenotypes) != len(self._phenotype_filter_undo):
@@ -2096,9 +3046,11 @@ class Phenotyper(mock_numpy_interface.NumpyArrayInterface):
                                             phenotype_data[plate_index],
                                             growth_filter[plate_index])
 
-                elif self._phenotype_filter[plate_index][phenotype].shape != phenotype_data[0].shape:
+                elif self._phenotype_filter[plate_index][phenotype].shape != phenotype_data[plate_index].shape:
 
                     self._logger.warning("The phenotype filter doesn't match plate {0} shape!".format(plate_index + 1))
+                    # All phenotypes of a plate filter share the plate's shape
+                    self._phenotype_filter[plate_index] = PlatePhenotypes(np.uint8, Filter.OK.value)
                     self._init_plate_filter(plate_index, phenotype,
                                             phenotype_data[plate_index],
                                             growth_filter[plate_index])
@@ -2130,6 +3082,8 @@ class Phenotyper(mock_numpy_interface.NumpyArrayInterface):
 
                         self._phenotype_filter[plate][phenotype][template_filt[plate] == mark.value] = mark.value
 
+        self._changed_state.add('_phenotype_filter')
+
     def get_curve_qc_filter(self, plate, threshold=0.8):
 
         filt = self._phenotype_filter[plate]
@@ -2237,12 +3191,14 @@ class Phenotyper(mock_numpy_interface.NumpyArrayInterface):
         self._phenotype_filter[id_plate][phenotype][positions] = (
             position_mark.value
         )
+        self._changed_filter_plates.add(id_plate)
 
         if undoable:
             self._add_undo(id_plate, positions, phenotype, previous_state)
 
     def _add_undo(self, plate, position_list, phenotype, previous_state):
 
+        self._changed_filter_plates.add(plate)
         self._phenotype_filter_undo[plate].append((position_list, phenotype, previous_state))
         while len(self._phenotype_filter_undo[plate]) > self.UNDO_HISTORY_LENGTH:
             self._phenotype_filter_undo[plate].popleft()
@@ -2260,6 +3216,7 @@ class Phenotyper(mock_numpy_interface.NumpyArrayInterface):
             self._logger.info("No more actions to undo")
             return False
 
+        self._changed_filter_plates.add(plate)
         position_list, phenotype, previous_state = self._phenotype_filter_undo[plate].pop()
         self._logger.info("Setting {0} for positions {1} to state {2}".format(
             phenotype,
@@ -2423,6 +3380,11 @@ class Phenotyper(mock_numpy_interface.NumpyArrayInterface):
     def save_state(self, dir_path, ask_if_overwrite=True):
         """Save the `Phenotyper` instance's state for future work.
 
+        When saving to the directory the state was loaded from or last
+        saved to, only the parts that changed since are written. Changed
+        QC-marks are then appended to a journal, which is merged into the
+        saved filter once it has `Phenotyper.FILTER_JOURNAL_LENGTH` records.
+
         Args:
             dir_path: Directory where state should be saved
             ask_if_overwrite: Optional, default is `True`
@@ -2430,66 +3392,187 @@ class Phenotyper(mock_numpy_interface.NumpyArrayInterface):
         if not os.path.isdir(dir_path):
             os.makedirs(dir_path)
 
-        p = os.path.join(dir_path, self._paths.phenotypes_raw_npy)
-        if not ask_if_overwrite or not os.path.isfile(p) or self._do_ask_overwrite(p):
-            np.save(p, self._phenotypes)
-
-        p = os.path.join(dir_path, self._paths.vector_phenotypes_raw)
-        if not ask_if_overwrite or not os.path.isfile(p) or self._do_ask_overwrite(p):
-            np.save(p, self._vector_phenotypes)
-
-        p = os.path.join(dir_path, self._paths.vector_meta_phenotypes_raw)
-        if not ask_if_overwrite or not os.path.isfile(p) or self._do_ask_overwrite(p):
-            np.save(p, self._vector_meta_phenotypes)
-
-        p = os.path.join(dir_path, self._paths.normalized_phenotypes)
-        if not ask_if_overwrite or not os.path.isfile(p) or self._do_ask_overwrite(p):
-            np.save(p, self._normalized_phenotypes)
+        dir_path = os.path.abspath(dir_path)
+        incremental = dir_path == self._state_directory
+        unsaved = set()
 
-        p = os.path.join(dir_path, self._paths.phenotypes_input_data)
-        if not ask_if_overwrite or not os.path.isfile(p) or self._do_ask_overwrite(p):
-            np.save(p, self._raw_growth_data)
+        def get_path(file_name, attribute):
 
-        p = os.path.join(dir_path, self._paths.phenotypes_input_smooth)
-        if not ask_if_overwrite or not os.path.isfile(p) or self._do_ask_overwrite(p):
-            np.save(p, self._smooth_growth_data)
+            if incremental and attribute not in self._changed_state:
+                return None
 
-        p = os.path.join(dir_path, self._paths.phenotypes_filter)
-        if not ask_if_overwrite or not os.path.isfile(p) or self._do_ask_overwrite(p):
-            np.save(p, self._phenotype_filter)
+            p = os.path.join(dir_path, file_name)
+            if not ask_if_overwrite or not os.path.isfile(p) or self._do_ask_overwrite(p):
+                return p
 
-        p = os.path.join(dir_path, self._paths.phenotypes_reference_offsets)
-        if not ask_if_overwrite or not os.path.isfile(p) or self._do_ask_overwrite(p):
-            np.save(p, self._reference_surface_positions)
+            unsaved.add(attribute)
+            return None
 
-        p = os.path.join(dir_path, self._paths.phenotypes_filter_undo)
-        if not ask_if_overwrite or not os.path.isfile(p) or self._do_ask_overwrite(p):
+        def remove_legacy(file_name):
+
+            # Otherwise this would be loaded if the new file is removed
+            p = os.path.join(dir_path, file_name)
+            if os.path.isfile(p):
+                os.remove(p)
+
+        p = get_path(self._paths.phenotypes_raw_store, '_phenotypes')
+        if p:
+            _save_atomically(p, save_plates, self._phenotypes)
+            remove_legacy(self._paths.phenotypes_raw_npy)
+
+        p = get_path(self._paths.vector_phenotypes_raw, '_vector_phenotypes')
+        if p:
+            _save_atomically(p, np.save, self._vector_phenotypes)
+
+        p = get_path(self._paths.vector_meta_phenotypes_raw_store, '_vector_meta_phenotypes')
+        if p:
+            _save_atomically(p, save_plates, self._vector_meta_phenotypes)
+            remove_legacy(self._paths.vector_meta_phenotypes_raw)
+
+        p = get_path(self._paths.normalized_phenotypes_store, '_normalized_phenotypes')
+        if p:
+            _save_atomically(p, save_plates, self._normalized_phenotypes)
+            remove_legacy(self._paths.normalized_phenotypes)
+
+        p = get_path(self._paths.phenotypes_input_data, '_raw_growth_data')
+        if p:
+            _save_atomically(p, np.save, _get_plain_plates(self._raw_growth_data))
+            _save_memory_mappable_plates(dir_path, self._paths.phenotypes_input_data_plate, self._raw_growth_data)
+
+        p = get_path(self._paths.phenotypes_input_smooth, '_smooth_growth_data')
+        if p:
+            _save_atomically(p, np.save, _get_plain_plates(self._smooth_growth_data))
+            _save_memory_mappable_plates(dir_path, self._paths.phenotypes_input_smooth_plate, self._smooth_growth_data)
+
+        filter_changed = (
+            not incremental or not self._changed_state.isdisjoint(('_phenotype_filter', '_phenotype_filter_undo')))
+        if (not filter_changed and self._changed_filter_plates and
+                self._filter_journal_records < self.FILTER_JOURNAL_LENGTH):
+            self._append_filter_journal(
+                os.path.join(dir_path, self._paths.phenotypes_filter_journal), self._changed_filter_plates)
+            self._changed_filter_plates = set()
+        elif filter_changed or self._changed_filter_plates:
+            if self._save_filter_state(dir_path, incremental, ask_if_overwrite):
+                self._changed_filter_plates = set()
+            else:
+                unsaved.add('_phenotype_filter')
 
-            with open(p, 'w') as fh:
-                pickle.dump(self._phenotype_filter_undo, fh)
+        p = get_path(self._paths.phenotypes_reference_offsets, '_reference_surface_positions')
+        if p:
+            _save_atomically(p, np.save, self._reference_surface_positions)
 
-        p = os.path.join(dir_path, self._paths.phenotype_times)
-        if not ask_if_overwrite or not os.path.isfile(p) or self._do_ask_overwrite(p):
-            np.save(p, self._times_data)
+        p = get_path(self._paths.phenotype_times, '_times_data')
+        if p:
+            _save_atomically(p, np.save, self._times_data)
 
-        p = os.path.join(dir_path, self._paths.phenotypes_meta_data)
-        if not ask_if_overwrite or not os.path.isfile(p) or self._do_ask_overwrite(p):
-            with open(p, 'w') as fh:
-                pickle.dump(self._meta_data, fh)
+        p = get_path(self._paths.phenotypes_meta_data, '_meta_data')
+        if p:
+            _save_atomically(p, _pickle_to_file, self._meta_data)
 
         p = os.path.join(dir_path, self._paths.phenotypes_extraction_params)
         if not ask_if_overwrite or not os.path.isfile(p) or self._do_ask_overwrite(p):
-            np.save(
+            _save_atomically(
                 p,
+                np.save,
                 [self._median_kernel_size,
                  self._gaussian_filter_sigma,
                  self._linear_regression_size,
                  None if self._phenotypes_inclusion is None else self._phenotypes_inclusion.name,
                  self._no_growth_monotonicity_threshold,
-                 self._no_growth_pop_doublings_threshold])
+                 self._no_growth_pop_doublings_threshold,
+                 None if self._smoothing is None else self._smoothing.name,
+                 self._smoothing_coeffs])
 
+        self._changed_state = unsaved
+        self._state_directory = dir_path
         self._logger.info("State saved to '{0}'".format(dir_path))
 
+    def _save_filter_state(self, dir_path, incremental, ask_if_overwrite):
+        """Saves the full QC filter and undo and removes the journal.
+
+        Returns:
+            bool, If the filter was saved
+        """
+        filter_path = os.path.join(dir_path, self._paths.phenotypes_filter_store)
+        journal_path = os.path.join(dir_path, self._paths.phenotypes_filter_journal)
+
+        if ask_if_overwrite and os.path.isfile(filter_path) and not self._do_ask_overwrite(filter_path):
+            return False
+
+        if os.path.isfile(journal_path):
+            if incremental and self._phenotype_filter is not None:
+                # Replaying the journal can't undo anything if saving is interrupted before it is removed
+                self._append_filter_journal(journal_path, range(len(self._phenotype_filter)))
+            else:
+                os.remove(journal_path)
+
+        _save_atomically(filter_path, save_plates, self._phenotype_filter)
+        if os.path.isfile(os.path.join(dir_path, self._paths.phenotypes_filter)):
+            os.remove(os.path.join(dir_path, self._paths.phenotypes_filter))
+        _save_atomically(
+            os.path.join(dir_path, self._paths.phenotypes_filter_undo), _pickle_to_file, self._phenotype_filter_undo)
+
+        if os.path.isfile(journal_path):
+            os.remove(journal_path)
+
+        self._filter_journal_size = 0
+        self._filter_journal_records = 0
+        return True
+
+    def _append_filter_journal(self, journal_path, plates):
+        """Appends the QC filter and undo of the plates to the journal.
+
+        Anything after the last complete record, e.g. from an interrupted
+        save, is dropped first.
+        """
+        record = {
+            plate: (self._phenotype_filter[plate], tuple(self._phenotype_filter_undo[plate]))
+            for plate in plates}
+
+        if os.path.isfile(journal_path):
+            fh = open(journal_path, 'r+b')
+            fh.seek(min(self._filter_journal_size, os.path.getsize(journal_path)))
+            fh.truncate()
+        else:
+            fh = open(journal_path, 'wb')
+
+        with fh:
+            pickle.dump(record, fh, pickle.HIGHEST_PROTOCOL)
+            fh.flush()
+            os.fsync(fh.fileno())
+            self._filter_journal_size = fh.tell()
+
+        self._filter_journal_records += 1
+
+    def _replay_filter_journal(self, journal_path):
+        """Applies the QC filter and undo saved in the journal, ignoring
+        any incomplete last record."""
+        self._filter_journal_size = 0
+        self._filter_journal_records = 0
+
+        if (self._phenotype_filter is None or self._phenotype_filter_undo is None or
+                not os.path.isfile(journal_path)):
+            return
+
+        with open(journal_path, 'rb') as fh:
+            while True:
+                try:
+                    record = pickle.load(fh)
+                except (EOFError, ValueError, pickle.UnpicklingError):
+                    break
+
+                for plate, (plate_filter, plate_undo) in record.items():
+                    if plate < len(self._phenotype_filter):
+                        self._phenotype_filter[plate] = plate_filter
+                        self._phenotype_filter_undo[plate].clear()
+                        self._phenotype_filter_undo[plate].extend(plate_undo)
+
+                self._filter_journal_size = fh.tell()
+                self._filter_journal_records += 1
+
+        if self._filter_journal_size < os.path.getsize(journal_path):
+            self._logger.warning("Ignoring incomplete end of QC journal '{0}'".format(journal_path))
+
     def save_state_to_zip(self, target=None):
 
         def zipit(save_functions, data, zip_paths):
@@ -2530,8 +3613,8 @@ class Phenotyper(mock_numpy_interface.NumpyArrayInterface):
         zip_paths = []
 
         # Phenotypes
-        zip_paths.append(os.path.join(dir_path, self._paths.phenotypes_raw_npy))
-        save_functions.append(np.save)
+        zip_paths.append(os.path.join(dir_path, self._paths.phenotypes_raw_store))
+        save_functions.append(save_plates)
         data.append(self._phenotypes)
 
         # Vector phenotypes
@@ -2540,28 +3623,28 @@ class Phenotyper(mock_numpy_interface.NumpyArrayInterface):
         data.append(self._vector_phenotypes)
 
         # Meta phenotypes
-        zip_paths.append(os.path.join(dir_path, self._paths.vector_meta_phenotypes_raw))
-        save_functions.append(np.save)
+        zip_paths.append(os.path.join(dir_path, self._paths.vector_meta_phenotypes_raw_store))
+        save_functions.append(save_plates)
         data.append(self._vector_meta_phenotypes)
 
         # Normalized phenotypes
-        zip_paths.append(os.path.join(dir_path, self._paths.normalized_phenotypes))
-        save_functions.append(np.save)
+        zip_paths.append(os.path.join(dir_path, self._paths.normalized_phenotypes_store))
+        save_functions.append(save_plates)
         data.append(self._normalized_phenotypes)
 
         # Raw growth data
         zip_paths.append(os.path.join(dir_path, self._paths.phenotypes_input_data))
         save_functions.append(np.save)
-        data.append(self._raw_growth_data)
+        data.append(_get_plain_plates(self._raw_growth_data))
 
         # Smooth growth data
         zip_paths.append(os.path.join(dir_path, self._paths.phenotypes_input_smooth))
         save_functions.append(np.save)
-        data.append(self._smooth_growth_data)
+        data.append(_get_plain_plates(self._smooth_growth_data))
 
         # Phenotypes filter (qc-markings)
-        zip_paths.append(os.path.join(dir_path, self._paths.phenotypes_filter))
-        save_functions.append(np.save)
+        zip_paths.append(os.path.join(dir_path, self._paths.phenotypes_filter_store))
+        save_functions.append(save_plates)
         data.append(self._phenotype_filter)
 
         # Reference surface positions
@@ -2593,7 +3676,9 @@ class Phenotyper(mock_numpy_interface.NumpyArrayInterface):
                  self._linear_regression_size,
                  None if self._phenotypes_inclusion is None else self._phenotypes_inclusion.name,
                  self._no_growth_monotonicity_threshold,
-                 self._no_growth_pop_doublings_threshold])
+                 self._no_growth_pop_doublings_threshold,
+                 None if self._smoothing is None else self._smoothing.name,
+                 self._smoothing_coeffs])
 
         zip_stream = zipit(save_functions, data, zip_paths)
         if target:
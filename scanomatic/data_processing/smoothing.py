@@ -0,0 +1,132 @@
+from __future__ import absolute_import
+
+import numpy as np
+from scipy.stats import norm
+
+
+class SlidingWindowPolynomials(object):
+    """Least squares polynomials of every time window for many curves at once
+
+    The windows only depend on the times, so each window's polynomial
+    is fitted in a coordinate system centered on the window's own time
+    point and the pseudo-inverse of its Vandermonde matrix is computed
+    once. Windows where all values of a curve are finite are then fitted
+    for all curves by a single matrix product, windows with gaps solve
+    their normal equations in one batch and windows with fewer values
+    than the polynomial has coefficients use `np.polyfit` so they give
+    the same under-determined solution as the per-curve smoothing.
+
+    Args:
+        times: 1D array of time points (including any edge condition)
+        filt: Square boolean array, where each row marks the times
+            included in the window of the corresponding time point.
+        power: The polynomial degree.
+    """
+    def __init__(self, times, filt, power):
+
+        self._times = times
+        self._order = power + 1
+        sizes = filt.sum(axis=1)
+        self._index = np.zeros((times.size, sizes.max()), dtype=np.intp)
+        self._valid = np.zeros(self._index.shape, dtype=bool)
+        for id_window, window in enumerate(filt):
+            self._index[id_window, :sizes[id_window]] = np.flatnonzero(window)
+            self._valid[id_window, :sizes[id_window]] = True
+
+        offsets = np.where(self._valid, times[self._index] - times[:, np.newaxis], 0)
+        self._vandermonde = np.power(offsets[..., np.newaxis], np.arange(self._order))
+        self._vandermonde *= self._valid[..., np.newaxis]
+        self._pseudo_inverses = np.array([np.linalg.pinv(v) for v in self._vandermonde])
+
+    def fit(self, curves):
+        """Fit polynomials to all windows of all curves.
+
+        Args:
+            curves: 2D array of curves, NaN or inf where values are missing.
+
+        Returns:
+            Tuple of the polynomial coefficients (curves x windows x
+            order, in increasing powers of the time relative to the
+            window's time point), the mean squared residuals and the
+            variance of each window and a boolean array of which windows
+            had any values. Windows without enough values to have a
+            residual get residual 0 and variance 1.
+        """
+        values = curves[:, self._index]
+        finite = np.isfinite(values) & self._valid
+        values = np.where(finite, values, 0)
+        counts = finite.sum(axis=-1)
+
+        coeffs = np.einsum('wkl,nwl->nwk', self._pseudo_inverses, values)
+
+        gapped = (counts != self._valid.sum(axis=-1)) & (counts >= self._order)
+        if gapped.any():
+            vandermonde = self._vandermonde[np.nonzero(gapped)[1]] * finite[gapped][..., np.newaxis]
+            coeffs[gapped] = np.linalg.solve(
+                np.einsum('glk,glm->gkm', vandermonde, vandermonde),
+                np.einsum('glk,gl->gk', vandermonde, values[gapped]))
+
+        for id_curve, id_window in zip(*np.nonzero((counts > 0) & (counts < self._order))):
+            window = finite[id_curve, id_window]
+            index = self._index[id_window][window]
+            shifted = np.polyval(
+                np.polyfit(self._times[index], values[id_curve, id_window][window], self._order - 1),
+                np.poly1d([1., self._times[id_window]])).coeffs[::-1]
+            coeffs[id_curve, id_window] = 0
+            coeffs[id_curve, id_window, :shifted.size] = shifted
+
+        fitted = np.einsum('wlk,nwk->nwl', self._vandermonde, coeffs)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            means = values.sum(axis=-1) / counts
+            residuals = np.where(finite, values - fitted, 0)
+            residuals = (residuals ** 2).sum(axis=-1) / counts
+            deviations = np.where(finite, values - means[..., np.newaxis], 0)
+            variances = (deviations ** 2).sum(axis=-1) / counts
+
+        determined = counts > self._order
+        residuals[~determined] = 0
+        variances[~determined] = 1
+
+        return coeffs, residuals, variances, counts > 0
+
+    def smooth(self, curves, gauss_sigma, windows=slice(None)):
+        """Weighted average of all overlapping window polynomials.
+
+        Each window's value is the average of the polynomials of the
+        windows it includes, evaluated at the mean time of those windows,
+        weighted by a gaussian of their time distance and how well each
+        polynomial explained its data. Windows without any fitted
+        polynomial are 0, like in the per-curve smoothing.
+
+        Args:
+            curves: 2D array of log2 curves
+            gauss_sigma: Sigma of the time distance weighting.
+            windows: Optional slice of which windows to return.
+
+        Returns:
+            Tuple of the 2D array of smoothed curves in linear scale,
+            and the residuals and variances of the fitted windows.
+        """
+        coeffs, residuals, variances, included = self.fit(curves)
+        index = self._index[windows]
+        times = self._times[index]
+        members = self._valid[windows] & included[:, index]
+
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            t = np.where(members, times, 0).sum(axis=-1) / members.sum(axis=-1)
+            offsets = t[..., np.newaxis] - times
+            values = coeffs[:, index, -1]
+            for power in range(self._order - 2, -1, -1):
+                values = values * offsets + coeffs[:, index, power]
+
+            weights = norm.pdf(times, loc=t[..., np.newaxis], scale=gauss_sigma)
+            weights *= 1 - residuals[:, index] / variances[:, index]
+            weights = np.where(members, weights, 0)
+            smooth = (
+                np.where(members, weights * np.power(2, values), 0).sum(axis=-1) /
+                weights.sum(axis=-1))
+        smooth[~members.any(axis=-1)] = 0
+
+        residuals[~included] = np.nan
+        variances[~included] = np.nan
+        return smooth, residuals, variances
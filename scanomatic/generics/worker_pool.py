@@ -0,0 +1,21 @@
+from __future__ import absolute_import
+
+from multiprocessing import current_process
+
+
+def get_usable_workers(workers, logger):
+    """The number of worker processes that can be used.
+
+    Daemonic processes aren't allowed to have children, so from within
+    one the work has to be done serially.
+
+    Args:
+        workers: The number of worker processes asked for
+        logger: Warned if the workers can't be used
+    """
+    if workers > 1 and current_process().daemon:
+        logger.warning(
+            "Can't start {0} worker processes from daemonic process '{1}', working serially instead".format(
+                workers, current_process().name))
+        return 1
+    return workers
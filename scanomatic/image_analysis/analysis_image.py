@@ -37,16 +37,26 @@ def _get_init_features(grid_arrays):
     :rtype : list[None|dict[str|object]]
     """
 
+    return get_features({index: grid_arr.features for index, grid_arr in grid_arrays.iteritems()})
+
+
+def get_features(plate_features, index=0):
+    """Combines the features of the plates of an image.
+
+    :type plate_features: dict[int|scanomatic.models.analysis_model.AnalysisFeatures]
+    :rtype : scanomatic.models.analysis_model.AnalysisFeatures
+    """
+
     def length_needed(keys):
 
         return max(keys) + 1
 
-    size = length_needed(grid_arrays.keys()) if grid_arrays else 0
+    size = length_needed(plate_features.keys()) if plate_features else 0
 
     features = AnalysisFeaturesFactory.create(
         shape=(size,),
-        data=tuple(grid_arrays[i].features if i in grid_arrays else None for i in range(size)),
-        index=0)
+        data=tuple(plate_features[i] if i in plate_features else None for i in range(size)),
+        index=index)
 
     return features
 
@@ -81,6 +91,10 @@ class ProjectImage(object):
     def active_plates(self):
         return len(self._grid_arrays)
 
+    @property
+    def plate_indices(self):
+        return sorted(self._grid_arrays.keys())
+
     def __getitem__(self, key):
 
         return self._grid_arrays[key]
@@ -394,29 +408,28 @@ class ProjectImage(object):
         for grid_array in self._grid_arrays.itervalues():
             grid_array.clear_features()
 
-    def analyse(self, image_model):
-
-        """
+    def get_plate_images(self, image_model):
+        """Loads an image and gets the sections of it of the plates that
+        should be analysed.
 
         :type image_model: scanomatic.models.compile_project_model.CompileImageAnalysisModel
+        :return: The plate images by plate index or None if the image
+            can't be analysed
+        :rtype: dict[int, numpy.ndarray] | None
         """
         self.load_image(image_model.image.path)
         self._logger.info("Image loaded")
         if self._im_loaded is False:
-            self.clear_features()
-            return
+            return None
 
         if not image_model.fixture.grayscale.values or not is_valid_grayscale(
                 getGrayscale(image_model.fixture.grayscale.name)['targets'],
                 image_model.fixture.grayscale.values):
 
             self._logger.warning("Not a valid grayscale")
-            self.clear_features()
-            return
+            return None
 
-        self.features.index = image_model.image.index
-        grid_arrays_processed = set()
-        # threads = set()
+        plate_images = {}
         for plate in image_model.fixture.plates:
 
             if plate.index in self._grid_arrays:
@@ -427,25 +440,43 @@ class ProjectImage(object):
                     ))
                     continue
 
-                if not self._grid_arrays[plate.index].has_grid:
-                    self.set_grid_plates([plate.index], image_model)
-
-                grid_arrays_processed.add(plate.index)
-                im = self.get_im_section(plate)
-                grid_arr = self._grid_arrays[plate.index]
-                """:type: scanomatic.image_analysis.grid_array.GridArray"""
-                grid_arr.analyse(im, image_model)
-                """
-                t = Thread(target=grid_arr.analyse, args=(im, image_model))
-                t.start()
-                threads.add(t)
-
-        while threads:
-            threads = set(t for t in threads if t.is_alive())
-            sleep(0.01)
+                plate_images[plate.index] = self.get_im_section(plate)
+
+        return plate_images
+
+    def analyse_plates(self, image_model, plate_images, plate_indices=None):
+        """Analyses plate images, clearing the features of the other plates.
+
+        :type image_model: scanomatic.models.compile_project_model.CompileImageAnalysisModel
+        :param plate_images: The plate images by plate index
+        :param plate_indices: The plates to analyse or clear, all if None
+        """
+        if plate_indices is None:
+            plate_indices = self.plate_indices
+
+        for index in plate_indices:
+
+            grid_arr = self._grid_arrays[index]
+            """:type: scanomatic.image_analysis.grid_array.GridArray"""
+            if index in plate_images:
+                if not grid_arr.has_grid:
+                    self.set_grid_plates([index], image_model)
+                grid_arr.analyse(plate_images[index], image_model)
+            else:
+                grid_arr.clear_features()
+
+    def analyse(self, image_model):
+
+        """
+
+        :type image_model: scanomatic.models.compile_project_model.CompileImageAnalysisModel
         """
-        for index, grid_array in self._grid_arrays.iteritems():
-            if index not in grid_arrays_processed:
-                grid_array.clear_features()
+        plate_images = self.get_plate_images(image_model)
+        if plate_images is None:
+            self.clear_features()
+            return
+
+        self.features.index = image_model.image.index
+        self.analyse_plates(image_model, plate_images)
 
         self._logger.info("Image {0} processed".format(image_model.image.index))
@@ -0,0 +1,225 @@
+"""Pipelined analysis of the images of a project.
+
+The analysis is split in stages connected by bounded queues:
+
+1. A prefetch thread loads the next images and cuts out their plates.
+2. Worker processes analyse the plates. Each plate is always analysed
+   by the same worker since the analysis of a plate depends on the
+   previous images of that plate.
+3. The features of each image are combined and handed back in the order
+   the images were given, so that the caller can write them out.
+
+The workers are forked from the process holding the gridded project
+image, so gridding must be done before the pipeline is started. Where
+worker processes can't be started, e.g. from a daemonic process, all
+plates are analysed by a single worker thread instead.
+"""
+from __future__ import absolute_import
+
+from collections import deque
+from multiprocessing import Pipe, Process, Queue as ProcessQueue
+from Queue import Empty, Full, Queue
+from threading import Event, Thread
+
+from .analysis_image import get_features
+from scanomatic.generics.worker_pool import get_usable_workers
+from scanomatic.io.logger import Logger
+
+PREFETCH_IMAGES = 2
+_POLL_INTERVAL = 0.5
+_STOP_TIMEOUT = 5
+
+
+def get_worker_plates(plate_indices, workers):
+    """Distributes plates over workers.
+
+    :return: The plate indices of each worker that got any plates
+    :rtype: list[list[int]]
+    """
+    workers = max(1, min(workers, len(plate_indices)))
+    return [list(plate_indices[worker::workers]) for worker in range(workers)]
+
+
+def _analyse_plates_in_worker(project_image, plate_indices, tasks, connection):
+    """Analyses the plates of each image task in order and sends back the
+    plate features.
+
+    :type project_image: scanomatic.image_analysis.analysis_image.ProjectImage
+    """
+    logger = Logger("Analysis Worker")
+    for image_model, plate_images in iter(tasks.get, None):
+
+        try:
+            if plate_images is None:
+                for index in plate_indices:
+                    project_image[index].clear_features()
+            else:
+                project_image.analyse_plates(image_model, plate_images, plate_indices)
+        except Exception:
+            logger.exception("Failed to analyse plates {0} of image {1}".format(
+                plate_indices, image_model.image.index))
+            connection.send(None)
+            return
+
+        # Sending pickles the features before the next image changes them
+        connection.send({index: project_image[index].features for index in plate_indices})
+
+    connection.close()
+
+
+class AnalysisPipeline(object):
+    """Iterates over the analysed images of a project.
+
+    Args:
+        project_image: The gridded project image
+        image_models: Iterable of the image models to analyse, in the
+            order they should be analysed
+        workers: The max number of worker processes
+        prefetch: The number of images loaded in advance and the number
+            of images analysed concurrently
+
+    Yields: tuple of image model and its features
+    """
+    def __init__(self, project_image, image_models, workers=1, prefetch=PREFETCH_IMAGES):
+
+        self._logger = Logger("Analysis Pipeline")
+        self._project_image = project_image
+        self._image_models = image_models
+        self._prefetch = max(1, prefetch)
+        self._stop = Event()
+        self._loaded = Queue(maxsize=self._prefetch)
+        self._loader = None
+        self._workers = []
+        workers = get_usable_workers(workers, self._logger)
+        self._in_processes = workers > 1
+        self._worker_plates = get_worker_plates(project_image.plate_indices, workers)
+
+    def __iter__(self):
+
+        self.start()
+        in_flight = deque()
+        loaded = self._get_loaded_images()
+
+        try:
+            for image_model, plate_images in loaded:
+
+                self._submit(image_model, plate_images)
+                in_flight.append(image_model)
+                if len(in_flight) >= self._prefetch:
+                    image_model = in_flight.popleft()
+                    yield image_model, self._collect(image_model)
+
+            while in_flight:
+                image_model = in_flight.popleft()
+                yield image_model, self._collect(image_model)
+
+        finally:
+
+            self.close()
+
+    def start(self):
+
+        if self._loader is not None:
+            return
+
+        # Workers are forked before any other threads of the pipeline start
+        for plate_indices in self._worker_plates:
+            tasks = ProcessQueue() if self._in_processes else Queue()
+            connection, worker_connection = Pipe(duplex=False)
+            worker = (Process if self._in_processes else Thread)(
+                target=_analyse_plates_in_worker,
+                args=(self._project_image, plate_indices, tasks, worker_connection))
+            worker.daemon = True
+            worker.start()
+            if self._in_processes:
+                worker_connection.close()
+            self._workers.append((worker, tasks, connection))
+
+        self._logger.info("Analysing plates {0} in {1} {2}".format(
+            self._worker_plates, len(self._workers), "processes" if self._in_processes else "thread"))
+
+        self._loader = Thread(target=self._load_images)
+        self._loader.daemon = True
+        self._loader.start()
+
+    def close(self):
+
+        self._stop.set()
+
+        for process, tasks, connection in self._workers:
+            tasks.put(None)
+
+        for worker, tasks, connection in self._workers:
+            worker.join(_STOP_TIMEOUT)
+            if worker.is_alive() and self._in_processes:
+                self._logger.warning("Terminating analysis worker {0}".format(worker.name))
+                worker.terminate()
+                worker.join()
+            elif worker.is_alive():
+                self._logger.warning("Abandoning analysis worker {0}".format(worker.name))
+            connection.close()
+            if self._in_processes:
+                tasks.close()
+
+        self._workers = []
+
+    def _load_images(self):
+
+        try:
+            for image_model in self._image_models:
+
+                item = (image_model, self._project_image.get_plate_images(image_model))
+                if not self._put_loaded(item):
+                    return
+
+        except Exception:
+            self._logger.exception("Failed to load images for analysis")
+
+        self._put_loaded(None)
+
+    def _put_loaded(self, item):
+
+        while not self._stop.is_set():
+            try:
+                self._loaded.put(item, timeout=_POLL_INTERVAL)
+                return True
+            except Full:
+                pass
+        return False
+
+    def _get_loaded_images(self):
+
+        while True:
+            try:
+                item = self._loaded.get(timeout=_POLL_INTERVAL)
+            except Empty:
+                if self._loader.is_alive():
+                    continue
+                return
+            if item is None:
+                return
+            yield item
+
+    def _submit(self, image_model, plate_images):
+
+        for (_, tasks, _), plate_indices in zip(self._workers, self._worker_plates):
+            tasks.put((image_model, None if plate_images is None else {
+                index: plate_images[index] for index in plate_indices if index in plate_images}))
+
+    def _collect(self, image_model):
+
+        plate_features = {}
+        for worker, _, connection in self._workers:
+
+            try:
+                worker_features = connection.recv()
+            except EOFError:
+                worker_features = None
+
+            if worker_features is None:
+                raise RuntimeError("Analysis worker {0} failed on image {1}".format(
+                    worker.name, image_model.image.index))
+
+            plate_features.update(worker_features)
+
+        return get_features(plate_features, index=image_model.image.index)
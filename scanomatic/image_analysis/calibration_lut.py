@@ -0,0 +1,125 @@
+"""Lookup tables of the calibrations of 8-bit plate images.
+
+The grayscale calibration transposes each pixel value of an image with a
+polynomial and the cell count calibration (CCC) maps each pixel's
+difference to its grid-cell's background with another polynomial. As the
+pixels only take a few discrete values, both are evaluated once per
+value instead of once per pixel:
+
+- The grayscale table holds the transposed value of every level of the
+  image and is made once per image.
+- The cell estimate tables hold the calibrated estimate of every level
+  of each grid-cell, as the estimates depend on the background of the
+  grid-cell, and are made once per image for all grid-cells at once.
+
+Images that are not 8-bit are quantized to `resolution` levels per unit,
+which makes the tables approximate. `CalibrationLUT.get_max_error`
+compares the tables to evaluating the polynomials exactly, so that the
+resolution can be tuned.
+"""
+from __future__ import absolute_import
+
+import numpy as np
+
+MAX_VALUE = 255
+DEFAULT_RESOLUTION = 1
+
+
+class CalibrationLUT(object):
+    """Lookup tables of the calibrations of an image.
+
+    Args:
+        transpose_polynomial: The grayscale calibration of the image, e.g.
+            an `image_basics.Image_Transpose`, or `None` to keep the pixel
+            values
+        resolution: The number of levels per unit of pixel value
+        max_value: The highest pixel value, higher values are clipped
+
+    Calling the lookup table transposes an image just as the
+    `transpose_polynomial` would.
+    """
+    def __init__(self, transpose_polynomial=None, resolution=DEFAULT_RESOLUTION, max_value=MAX_VALUE):
+
+        self._transpose_polynomial = transpose_polynomial
+        self._resolution = resolution
+        self._max_value = max_value
+        values = np.arange(int(np.ceil(max_value * resolution)) + 1) / float(resolution)
+        self._table = values if transpose_polynomial is None else transpose_polynomial(values)
+
+    @property
+    def table(self):
+        """The transposed value of each level"""
+        return self._table
+
+    def get_levels(self, im):
+        """The level of each pixel of an image"""
+        im = np.asarray(im)
+        if im.dtype == np.uint8 and self._resolution == 1 and self._table.size > MAX_VALUE:
+            return im
+        levels = np.clip(im, 0, self._max_value) * self._resolution
+        return np.rint(levels, out=levels).astype(np.intp)
+
+    def __call__(self, im):
+
+        return self._table[self.get_levels(im)]
+
+    def get_cell_estimate_tables(self, background_means, polynomial_coeffs=None, min_threshold=0):
+        """The cell estimate of each level of each grid-cell.
+
+        See `grid_cell.GridCell.set_new_data_source_space`
+
+        Args:
+            background_means: The transposed background mean of each
+                grid-cell
+            polynomial_coeffs: The cell count calibration polynomial
+            min_threshold: The lowest difference to the background
+
+        Returns: Array of shape (grid-cells, levels)
+        """
+        tables = np.asarray(background_means, dtype=np.float64)[:, np.newaxis] - self._table
+        tables[tables < min_threshold] = min_threshold
+        if polynomial_coeffs is not None:
+            tables = np.polyval(polynomial_coeffs, tables)
+        return tables
+
+    def get_cell_estimates(self, stack, background_means, polynomial_coeffs=None, min_threshold=0):
+        """Calibrated cell estimates of a stack of grid-cell images.
+
+        Args:
+            stack: The untransposed images or their levels, with the
+                grid-cells along the first axis
+            background_means: See `get_cell_estimate_tables`
+            polynomial_coeffs: See `get_cell_estimate_tables`
+            min_threshold: See `get_cell_estimate_tables`
+        """
+        tables = self.get_cell_estimate_tables(background_means, polynomial_coeffs, min_threshold)
+        cells = np.arange(tables.shape[0]).reshape((-1,) + (1,) * (np.ndim(stack) - 1))
+        return tables[cells, self.get_levels(stack)]
+
+    def get_max_error(self, im, background_means=None, polynomial_coeffs=None, min_threshold=0):
+        """The largest absolute difference between using the lookup tables
+        and evaluating the polynomials for each pixel.
+
+        Args:
+            im: The untransposed image, or stack of grid-cell images if
+                `background_means` are given
+            background_means: If given the error of the cell estimates
+                is measured, else that of the transposed image
+            polynomial_coeffs: See `get_cell_estimate_tables`
+            min_threshold: See `get_cell_estimate_tables`
+        """
+        im = np.asarray(im)
+        exact = np.clip(im, 0, self._max_value).astype(np.float64)
+        if self._transpose_polynomial is not None:
+            exact = self._transpose_polynomial(exact)
+
+        if background_means is None:
+            return np.abs(self(im) - exact).max()
+
+        exact = np.asarray(background_means, dtype=np.float64).reshape(
+            (-1,) + (1,) * (exact.ndim - 1)) - exact
+        exact[exact < min_threshold] = min_threshold
+        if polynomial_coeffs is not None:
+            exact = np.polyval(polynomial_coeffs, exact)
+        return np.abs(
+            self.get_cell_estimates(im, background_means, polynomial_coeffs, min_threshold) - exact).max()
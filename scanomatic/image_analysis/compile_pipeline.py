@@ -0,0 +1,170 @@
+"""Parallel first pass analysis of the images of a project.
+
+A process pool runs `first_pass.analyse` on several images at once while
+a single writer thread hands the results to the caller in the order the
+images were submitted, so they can be appended to the compilation as if
+the images had been analysed one by one.
+
+The caller decides when to submit images, which lets it pause by not
+submitting any more. At most `in_flight` images are submitted but not
+yet written.
+
+Where worker processes can't be started, e.g. from a daemonic process,
+the images are analysed one at a time in a thread instead.
+"""
+from __future__ import absolute_import
+
+from multiprocessing import Pool
+from multiprocessing.pool import ThreadPool
+from Queue import Queue
+from threading import Event, Thread
+
+from scanomatic.generics.worker_pool import get_usable_workers
+from scanomatic.image_analysis import first_pass
+from scanomatic.io.logger import Logger
+
+IN_FLIGHT_PER_WORKER = 2
+_POLL_INTERVAL = 0.5
+
+# Fixture settings of a worker, set by `_set_shared_fixture_settings`
+_SHARED_FIXTURE_SETTINGS = None
+
+
+def _set_shared_fixture_settings(fixture_settings):
+    """Initializes a worker with the fixture settings to analyse with."""
+    global _SHARED_FIXTURE_SETTINGS
+    _SHARED_FIXTURE_SETTINGS = fixture_settings
+
+
+def _analyse_in_worker(compile_image_model):
+    """First pass analysis of an image.
+
+    :return: tuple of the compile image analysis model, the issues of the
+        image and the error if the markers weren't detected or the image
+        couldn't be read
+    """
+    issues = {}
+    try:
+        image_model = first_pass.analyse(compile_image_model, _SHARED_FIXTURE_SETTINGS, issues=issues)
+    except (first_pass.MarkerDetectionFailed, IOError) as error:
+        return None, issues, error
+    return image_model, issues, None
+
+
+class CompilePipeline(object):
+    """Analyses images in a process pool and writes them in order.
+
+    Args:
+        fixture_settings: The fixture settings to analyse the images with
+        write: Called from the writer thread for each image, in the order
+            the images were submitted, with the compile image model, the
+            compile image analysis model, the dict of issues and the
+            `first_pass.MarkerDetectionFailed` or `IOError` raised by the
+            analysis, if any, in which case there is no analysis model
+        workers: The number of worker processes
+        in_flight: The max number of images submitted but not written,
+            by default `IN_FLIGHT_PER_WORKER` per worker
+    """
+    def __init__(self, fixture_settings, write, workers, in_flight=None):
+
+        self._logger = Logger("Compile Pipeline")
+        self._fixture_settings = fixture_settings
+        self._write = write
+        self._workers = max(1, workers)
+        self._in_flight = in_flight if in_flight else self._workers * IN_FLIGHT_PER_WORKER
+        self._pool = None
+        self._writer = None
+        self._pending = Queue()
+        self._stop = Event()
+        self._submitted = 0
+        self._written = 0
+        self._failed = False
+
+    @property
+    def written(self):
+        """The number of written images"""
+        return self._written
+
+    @property
+    def failed(self):
+        """If analysing or writing an image failed"""
+        return self._failed
+
+    @property
+    def can_submit(self):
+
+        return not self._failed and not self._stop.is_set() and self._submitted - self._written < self._in_flight
+
+    def start(self):
+
+        if self._pool is not None:
+            return
+
+        initargs = (self._fixture_settings,)
+        if get_usable_workers(self._workers, self._logger) > 1:
+            self._pool = Pool(self._workers, initializer=_set_shared_fixture_settings, initargs=initargs)
+            self._logger.info("Compiling in {0} processes with at most {1} images in flight".format(
+                self._workers, self._in_flight))
+        else:
+            self._pool = ThreadPool(1, initializer=_set_shared_fixture_settings, initargs=initargs)
+            self._logger.info("Compiling in a thread with at most {0} images in flight".format(self._in_flight))
+
+        self._writer = Thread(target=self._write_results)
+        self._writer.daemon = True
+        self._writer.start()
+
+    def submit(self, compile_image_model):
+        """Submits an image for analysis.
+
+        :type compile_image_model: scanomatic.models.compile_project_model.CompileImageModel
+        """
+        self.start()
+        self._pending.put((
+            compile_image_model, self._pool.apply_async(_analyse_in_worker, (compile_image_model,))))
+        self._submitted += 1
+
+    def close(self, wait=True):
+        """Stops the pipeline.
+
+        Args:
+            wait: If submitted images should be written before stopping,
+                otherwise only the image being written is completed
+        """
+        if self._pool is None:
+            return
+
+        if not wait:
+            self._stop.set()
+
+        self._pending.put(None)
+        self._writer.join()
+        self._stop.set()
+
+        if wait and not self._failed:
+            self._pool.close()
+        else:
+            self._pool.terminate()
+        self._pool.join()
+        self._pool = None
+
+    def _write_results(self):
+
+        for compile_image_model, result in iter(self._pending.get, None):
+
+            while not result.ready():
+                if self._stop.is_set():
+                    return
+                result.wait(_POLL_INTERVAL)
+
+            if self._stop.is_set():
+                return
+
+            try:
+                self._write(compile_image_model, *result.get())
+            except Exception:
+                self._logger.exception("Failed to compile image {0}".format(compile_image_model.path))
+                self._failed = True
+                self._stop.set()
+                return
+
+            self._written += 1
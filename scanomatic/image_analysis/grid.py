@@ -9,14 +9,64 @@ except ImportError:
 
 from scipy import ndimage
 
+from scanomatic.image_analysis.grid_cell_bulk import get_otsu_thresholds
+
 #
 # FUNCTIONS
 #
 
 
+def get_block_threshold(im, segments=100):
+    """Gives a 2D surface of threshold based on the Otsu threshold of blocks
+
+    The image is divided into about `segments` equally sized square-ish
+    blocks, centred on the image, and the threshold of each block centre
+    is interpolated bilinearly between the block centres. Beyond the
+    outermost block centres the threshold is constant. Blocks with only
+    one value use that value as threshold.
+
+    Cost is linear in image size and the result is deterministic.
+    """
+    block_side = max(1.0, np.sqrt(im.size / float(segments)))
+    blocks = [max(1, int(round(size / block_side))) for size in im.shape]
+    block_shape = [size // n for size, n in zip(im.shape, blocks)]
+    offsets = [(size - n * block) // 2 for size, n, block in zip(im.shape, blocks, block_shape)]
+
+    stack = im[
+        offsets[0]: offsets[0] + blocks[0] * block_shape[0],
+        offsets[1]: offsets[1] + blocks[1] * block_shape[1]
+    ].reshape(blocks[0], block_shape[0], blocks[1], block_shape[1]).swapaxes(1, 2).reshape(
+        blocks[0] * blocks[1], block_shape[0], block_shape[1])
+
+    thresholds = get_otsu_thresholds(stack)
+    single_valued = np.isnan(thresholds)
+    if single_valued.any():
+        thresholds[single_valued] = stack[single_valued, 0, 0]
+    thresholds = thresholds.reshape(blocks)
+
+    lower0, upper0, weights0 = _get_interpolation(im.shape[0], blocks[0], block_shape[0], offsets[0])
+    lower1, upper1, weights1 = _get_interpolation(im.shape[1], blocks[1], block_shape[1], offsets[1])
+
+    weights0 = weights0[:, np.newaxis]
+    rows = thresholds[lower0] * (1 - weights0) + thresholds[upper0] * weights0
+    return rows[:, lower1] * (1 - weights1) + rows[:, upper1] * weights1
+
+
+def _get_interpolation(size, blocks, block_size, offset):
+    """Neighbouring block centres and the weight of the upper one for each
+    position along an axis"""
+    positions = np.clip((np.arange(size) + 0.5 - offset) / float(block_size) - 0.5, 0, blocks - 1)
+    lower = positions.astype(np.intp)
+    upper = np.minimum(lower + 1, blocks - 1)
+    return lower, upper, positions - lower
+
+
 def get_adaptive_threshold(im, threshold_filter=None, segments=60,
-                           sigma=None, *args, **kwargs):
-    """Gives a 2D surface of threshold based on smoothed local measures"""
+                           sigma=None, seed=None, *args, **kwargs):
+    """Gives a 2D surface of threshold based on smoothed local measures
+
+    Segments are placed randomly, a `seed` gives reproducible thresholds.
+    """
 
     if threshold_filter is None:
         threshold_filter = ski_filter.threshold_otsu
@@ -33,7 +83,8 @@ def get_adaptive_threshold(im, threshold_filter=None, segments=60,
         segmented_image[im.shape[0] / 2, im.shape[1] / 2] = 1
     else:
         p = 1 - np.float(segments) / im.size
-        segmented_image = (np.random.random(im.shape) > p).astype(np.uint8)
+        random = np.random if seed is None else np.random.RandomState(seed)
+        segmented_image = (random.random_sample(im.shape) > p).astype(np.uint8)
 
     labled, labels = _get_sectioned_image(segmented_image)
 
@@ -450,15 +501,25 @@ def get_grid(
         expected_center=(100, 100),
         dev_reduce_grid_data_fraction=None,
         validate_parameters=False,
-        grid_correction=None):
-    """Detects grid candidates and constructs a grid"""
+        grid_correction=None,
+        legacy_threshold=False,
+        threshold_seed=None):
+    """Detects grid candidates and constructs a grid
+
+    Candidates are found using `get_block_threshold` or, if
+    `legacy_threshold`, the randomly segmented `get_adaptive_threshold`
+    seeded with `threshold_seed`.
+    """
 
     adjusted_values = True
     center = expected_center
     spacings = expected_spacing
 
-    adaptive_threshold = get_adaptive_threshold(
-        im, threshold_filter=None, segments=100, sigma=30)
+    if legacy_threshold:
+        adaptive_threshold = get_adaptive_threshold(
+            im, threshold_filter=None, segments=100, sigma=30, seed=threshold_seed)
+    else:
+        adaptive_threshold = get_block_threshold(im, segments=100)
 
     im_filtered = get_denoise_segments(im < adaptive_threshold, iterations=3)
     del adaptive_threshold
@@ -4,6 +4,7 @@
 
 from __future__ import absolute_import
 
+from collections import Counter
 import os
 
 import numpy as np
@@ -15,13 +16,14 @@ import numpy as np
 from scanomatic.image_analysis.grayscale import getGrayscale
 import scanomatic.io.logger as logger
 import scanomatic.io.paths as paths
-from scanomatic.io.pickler import unpickle_with_unpickler
+from scanomatic.io.pickler import load_numpy
 from scanomatic.models.analysis_model import IMAGE_ROTATIONS
 from scanomatic.models.factories.analysis_factories import (
     AnalysisFeaturesFactory
 )
-from . import grid, image_basics
+from . import calibration_lut, grid, image_basics
 from .grid_cell import GridCell
+from .grid_cell_bulk import GridCellBulk
 
 
 #
@@ -210,6 +212,8 @@ class GridArray(object):
         self._grid = None
         self._valid_grid = False
         self._grid_cell_corners = None
+        self._grid_cell_bulk = None
+        self._separately_analysed_grid_cells = []
 
         self._features = AnalysisFeaturesFactory.create(
             index=self._identifier[-1], shape=tuple(pinning), data=set())
@@ -276,7 +280,7 @@ class GridArray(object):
                 grid_correction=offset)
 
         try:
-            grid = unpickle_with_unpickler(np.load, grid)
+            grid = load_numpy(grid)
         except IOError:
             self._LOGGER.error("No grid file named '{0}'".format(grid))
             self._LOGGER.info("Invoking grid detection instead")
@@ -468,6 +472,38 @@ class GridArray(object):
 
             grid_cell.set_grid_coordinates(self._grid_cell_corners)
 
+        self._grid_cell_bulk = None
+
+    def _set_grid_cell_bulk(self, im):
+        """Grid cells with windows of the same shape inside the image are
+        analysed together, while extra monitored positions and grid cells
+        with other windows are analysed separately."""
+
+        windows = {}
+        self._separately_analysed_grid_cells = []
+
+        for grid_cell in self._grid_cells.itervalues():
+
+            if (grid_cell.save_extra_data or len(grid_cell.xy1) != 2 or len(grid_cell.xy2) != 2 or
+                    (grid_cell.xy1 < 0).any() or (grid_cell.xy2 > im.shape).any()):
+
+                self._separately_analysed_grid_cells.append(grid_cell)
+
+            else:
+
+                windows[grid_cell] = tuple(grid_cell.xy2 - grid_cell.xy1)
+
+        shape = Counter(windows.itervalues()).most_common(1)[0][0] if windows else None
+        bulk_grid_cells = []
+        for grid_cell, window in windows.iteritems():
+
+            if window == shape:
+                bulk_grid_cells.append(grid_cell)
+            else:
+                self._separately_analysed_grid_cells.append(grid_cell)
+
+        self._grid_cell_bulk = GridCellBulk(bulk_grid_cells, self._analysis_model.cell_count_calibration)
+
     def _init_grid_cells(self, dimension_order=(0, 1)):
 
         self._pinning_matrix = (
@@ -480,6 +516,8 @@ class GridArray(object):
         self._grid = None
         self._grid_cell_size = None
         self._grid_cells.clear()
+        self._grid_cell_bulk = None
+        self._separately_analysed_grid_cells = []
         self._features.data.clear()
 
         focus_position = (
@@ -532,6 +570,9 @@ class GridArray(object):
 
             transpose_polynomial = None
 
+        # 8-bit images are transposed and calibrated through lookup tables
+        calibration = calibration_lut.CalibrationLUT(transpose_polynomial) if im.dtype == np.uint8 else None
+
         if self._grid is None:
             if not self.detect_grid(im):
                 self.clear_features()
@@ -539,7 +580,20 @@ class GridArray(object):
 
         m = self._analysis_model
 
-        for grid_cell in self._grid_cells.itervalues():
+        if self._grid_cell_bulk is None:
+            self._set_grid_cell_bulk(im)
+
+        if calibration is not None:
+            self._grid_cell_bulk.analyse(im, index, calibration)
+            # The lookup table transposes just as the polynomial
+            transpose_polynomial = calibration
+        else:
+            plate = im.astype(np.float64)
+            if transpose_polynomial is not None:
+                plate = transpose_polynomial(plate)
+            self._grid_cell_bulk.analyse(plate, index)
+
+        for grid_cell in self._separately_analysed_grid_cells:
 
             if grid_cell.save_extra_data:
                 self._LOGGER.info(
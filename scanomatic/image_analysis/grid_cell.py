@@ -98,7 +98,7 @@ class GridCell(object):
 
             if bg_sub_source is not None:
 
-                feature_array = self.source[np.where(bg_sub_source)]
+                feature_array = self.source[bg_sub_source]
                 # bg_sub = tmean(feature_array,
                 #                mquantiles(feature_array, prob=[0.25, 0.75]))
                 bg_sub = iqr_mean(feature_array)
@@ -181,6 +181,14 @@ class GridCell(object):
         np.save(base_path + ".blob.trash.current.npy", blob.trash_array)
         np.save(base_path + ".blob.trash.old.npy", blob.old_trash)
 
+    def set_measures(self, item_name, measures):
+        """Set the measures of a cell item that was analysed outside the
+        grid cell."""
+
+        data = self._analysis_items[item_name].features.data
+        data.clear()
+        data.update(measures)
+
     def clear_features(self):
 
         for item in self._analysis_items.itervalues():
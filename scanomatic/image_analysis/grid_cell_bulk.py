@@ -0,0 +1,445 @@
+"""
+Part of the analysis work-flow that analyses all grid-cells of a plate at
+once.
+
+Every step gives the same result as the corresponding step of analysing
+one grid-cell at a time with `GridCell` and the cell items of
+`grid_cell_extra`, but operates on a stack of all grid-cell images.
+"""
+
+#
+# DEPENDENCIES
+#
+
+from __future__ import absolute_import
+
+import numpy as np
+from scipy.ndimage import (
+    binary_dilation, binary_erosion, find_objects, generate_binary_structure,
+    label, median_filter)
+
+#
+# SCANNOMATIC LIBRARIES
+#
+
+from scanomatic.image_analysis.grid_cell_extra import (
+    get_overlap_slices, has_bad_filter_change
+)
+from scanomatic.io.logger import Logger
+from scanomatic.models.analysis_model import COMPARTMENTS, MEASURES
+
+_logger = Logger("Grid Cell Bulk")
+
+#
+# Structures only connecting pixels within the same grid-cell
+#
+
+_CELL_STRUCTURE = np.zeros((3, 3, 3), dtype=np.bool)
+_CELL_STRUCTURE[1] = generate_binary_structure(2, 1)
+
+OTSU_BINS = 256
+BLOB_THRESHOLD_UNIT_ADJUST = 0.5
+BLOB_DILATION_ITERATIONS = 2
+BACKGROUND_EROSION_ITERATIONS = 3
+MAX_BLOB_CHANGE_THRESHOLD = 8
+
+#
+# FUNCTIONS
+#
+
+
+def get_cell_windows(im, origins, shape):
+    """Extract equally sized windows of an image.
+
+    The windows are taken from a strided view of all possible windows so
+    that only the requested ones are copied.
+
+    Args:
+        im: The image
+        origins: Array of the upper left corner of each window with shape
+            (windows, 2)
+        shape: The window shape
+
+    Returns: Array with shape (windows,) + shape
+    """
+    im = np.ascontiguousarray(im)
+    view = np.lib.stride_tricks.as_strided(
+        im,
+        shape=(im.shape[0] - shape[0] + 1, im.shape[1] - shape[1] + 1) + tuple(shape),
+        strides=im.strides * 2,
+        writeable=False)
+    return view[origins[:, 0], origins[:, 1]]
+
+
+def get_otsu_thresholds(stack, bins=OTSU_BINS):
+    """Otsu thresholds of each image in a stack.
+
+    Gives the same thresholds as `skimage.filters.threshold_otsu` on each
+    image, using the same histogram bins as `numpy.histogram`.
+
+    Returns: Array of thresholds, NaN where an image has only one value
+    """
+    data = stack.reshape(stack.shape[0], -1)
+    rows = np.arange(data.shape[0])[:, np.newaxis]
+    first_edge = data.min(axis=1)[:, np.newaxis] + 0.0
+    last_edge = data.max(axis=1)[:, np.newaxis] + 0.0
+    single_valued = (first_edge == last_edge).ravel()
+    first_edge[single_valued] -= 0.5
+    last_edge[single_valued] += 0.5
+
+    edges = np.arange(bins + 1, dtype=np.float) * ((last_edge - first_edge) / bins)
+    edges += first_edge
+    edges[:, -1] = last_edge[:, 0]
+
+    indices = ((data - first_edge) * (bins / (last_edge - first_edge))).astype(np.intp)
+    indices[indices == bins] -= 1
+    indices[data < edges[rows, indices]] -= 1
+    indices[(data >= edges[rows, indices + 1]) & (indices != bins - 1)] += 1
+
+    hist = np.bincount(
+        (indices + rows * bins).ravel(), minlength=data.shape[0] * bins
+    ).reshape(data.shape[0], bins).astype(np.float)
+    bin_centers = (edges[:, :-1] + edges[:, 1:]) / 2.
+
+    weight1 = np.cumsum(hist, axis=1)
+    weight2 = np.cumsum(hist[:, ::-1], axis=1)[:, ::-1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean1 = np.cumsum(hist * bin_centers, axis=1) / weight1
+        mean2 = (np.cumsum((hist * bin_centers)[:, ::-1], axis=1) / weight2[:, ::-1])[:, ::-1]
+    variance12 = weight1[:, :-1] * weight2[:, 1:] * (mean1[:, :-1] - mean2[:, 1:]) ** 2
+
+    thresholds = bin_centers[rows[:, 0], np.argmax(variance12, axis=1)]
+    thresholds[single_valued] = np.nan
+    return thresholds
+
+
+def _get_best_blobs(candidates):
+    """Keep the best candidate blob of each grid-cell together with the
+    candidates centred on it, the remaining candidates being trash.
+
+    See `grid_cell_extra.Blob.keep_best_blob`
+    """
+    labels, number_of_labels = label(candidates, structure=_CELL_STRUCTURE)
+    blobs = np.zeros(candidates.shape, dtype=np.bool)
+    trash = np.zeros(candidates.shape, dtype=np.bool)
+    if number_of_labels == 0:
+        return blobs, trash
+
+    _, row, column = np.nonzero(labels)
+    flat_labels = labels[labels > 0] - 1
+    area = np.bincount(flat_labels, minlength=number_of_labels)
+    com_row = np.bincount(flat_labels, weights=row, minlength=number_of_labels) / area
+    com_column = np.bincount(flat_labels, weights=column, minlength=number_of_labels) / area
+    label_cell = np.zeros((number_of_labels,), dtype=np.intp)
+    extents = np.zeros((number_of_labels, 2), dtype=np.float)
+    for index, (cell_slice, row_slice, column_slice) in enumerate(
+            find_objects(labels, number_of_labels)):
+        label_cell[index] = cell_slice.start
+        extents[index] = (row_slice.stop - row_slice.start, column_slice.stop - column_slice.start)
+
+    quality = area * extents.min(axis=1) / extents.max(axis=1)
+    label_values = np.arange(1, number_of_labels + 1)
+
+    # Highest quality per cell, with ties resolved to the highest label
+    order = np.lexsort((label_values, quality, label_cell))
+    is_last = np.ones(order.shape, dtype=np.bool)
+    is_last[:-1] = label_cell[order[:-1]] != label_cell[order[1:]]
+    best = np.zeros((labels.shape[0],), dtype=labels.dtype)
+    best[label_cell[order[is_last]]] = label_values[order[is_last]]
+
+    centre = labels[
+        label_cell,
+        np.floor(com_row + 0.5).astype(np.intp),
+        np.floor(com_column + 0.5).astype(np.intp)]
+    in_blob = np.zeros((number_of_labels + 1,), dtype=np.bool)
+    in_blob[1:] = centre == best[label_cell]
+    in_blob[best[best > 0]] = True
+    is_trash = ~in_blob
+    is_trash[0] = False
+
+    return in_blob[labels], is_trash[labels]
+
+
+def detect_blobs(stack):
+    """Detect the blob and trash of each grid-cell image in a stack.
+
+    See `grid_cell_extra.Blob.default_detect`
+
+    Returns: tuple of blob filters and trash filters
+    """
+    smoothed = np.ascontiguousarray(stack, dtype=np.float64).copy()
+    median_filter(smoothed, size=(1, 3, 3), mode="nearest", output=smoothed)
+
+    thresholds = get_otsu_thresholds(smoothed)
+    has_threshold = np.isfinite(thresholds)
+    if not has_threshold.all():
+        _logger.warning("Otsu method failed for {0} grid-cells".format((~has_threshold).sum()))
+
+    candidates = smoothed < (thresholds + BLOB_THRESHOLD_UNIT_ADJUST)[:, np.newaxis, np.newaxis]
+    candidates[~has_threshold] = False
+    candidates = binary_dilation(candidates, structure=_CELL_STRUCTURE, iterations=BLOB_DILATION_ITERATIONS)
+    return _get_best_blobs(candidates)
+
+
+def _get_centres_of_mass(filters):
+
+    counts = filters.sum(axis=(1, 2)).astype(np.float)
+    return np.column_stack((
+        filters.sum(axis=2).dot(np.arange(filters.shape[1])) / counts,
+        filters.sum(axis=1).dot(np.arange(filters.shape[2])) / counts))
+
+
+def apply_blob_history(blobs, old_blobs, max_change_threshold=MAX_BLOB_CHANGE_THRESHOLD):
+    """Revert blobs that changed too much since they were last detected.
+
+    See `grid_cell_extra.Blob.detect` and
+    `grid_cell_extra.has_bad_filter_change`
+
+    Args:
+        blobs: The detected blob filters, updated in place
+        old_blobs: The previously detected blob filters
+        max_change_threshold: The max number of differing pixels divided
+            by the square root of the previous blob size.
+
+    Returns: Boolean array of the grid-cells whose blobs were reverted
+    """
+    empty = ~blobs.any(axis=(1, 2))
+    blobs[empty] = old_blobs[empty]
+
+    old_sizes = old_blobs.sum(axis=(1, 2))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sqrt_of_old_sizes = np.sqrt(old_sizes)
+        reverted = np.logical_xor(old_blobs, blobs).sum(axis=(1, 2)) / sqrt_of_old_sizes > max_change_threshold
+
+    # Changed blobs are only kept if they mostly overlap the old blobs
+    # when superimposed using their centres of mass
+    shifted = np.flatnonzero(reverted & (old_sizes > 0) & blobs.any(axis=(1, 2)))
+    if shifted.size:
+        offsets = np.trunc(
+            _get_centres_of_mass(old_blobs[shifted]) - _get_centres_of_mass(blobs[shifted])).astype(np.intp)
+        groups, group_index = np.unique(offsets, axis=0, return_inverse=True)
+        for group, (row_offset, column_offset) in enumerate(groups):
+            cells = shifted[group_index == group]
+            old_rows, rows = get_overlap_slices(row_offset, blobs.shape[1])
+            old_columns, columns = get_overlap_slices(column_offset, blobs.shape[2])
+            with np.errstate(divide='ignore', invalid='ignore'):
+                reverted[cells] = np.logical_xor(
+                    old_blobs[cells, old_rows, old_columns], blobs[cells, rows, columns]
+                ).sum(axis=(1, 2)) / sqrt_of_old_sizes[cells] > max_change_threshold
+
+    blobs[reverted] = old_blobs[reverted]
+    return reverted
+
+
+def detect_backgrounds(blobs, trash):
+    """Detect the background of each grid-cell as what is neither blob
+    nor trash, with a margin.
+
+    See `grid_cell_extra.Background.detect`
+    """
+    return binary_erosion(
+        ~(blobs | trash), structure=_CELL_STRUCTURE, iterations=BACKGROUND_EROSION_ITERATIONS, border_value=1)
+
+
+def _get_sorted_values(stack, filters):
+    """The sorted finite values of the filtered part of each grid-cell
+    image, padded with inf, and the number of values of each.
+    """
+    values = np.where(filters & np.isfinite(stack), stack, np.inf).reshape(stack.shape[0], -1)
+    values.sort(axis=1)
+    return values, np.isfinite(values).sum(axis=1)
+
+
+def _polyval(coeffs, values):
+    """Same as `numpy.polyval` but evaluated in place"""
+
+    values = np.asarray(values)
+    result = np.zeros_like(values)
+    for coeff in coeffs:
+        result *= values
+        result += coeff
+    return result
+
+
+def _get_mid50_means(sorted_values, counts):
+    """See `scanomatic.generics.maths.mid50_mean`"""
+
+    means = np.full(counts.shape, np.nan)
+    flanks = (counts - counts // 2) // 2
+    for index in np.flatnonzero(flanks > 0):
+        means[index] = sorted_values[index, flanks[index]: counts[index] - flanks[index]].mean()
+    return means
+
+
+def get_cell_estimates(stack, backgrounds, polynomial_coeffs=None, min_threshold=0,
+                       levels=None, calibration=None):
+    """Convert grid-cell images to cell estimates relative to their
+    background.
+
+    See `grid_cell.GridCell.set_new_data_source_space`
+
+    If a `calibration_lut.CalibrationLUT` and the untransposed grid-cell
+    images are given, the estimates are looked up instead of calculated.
+    """
+    background_means = _get_mid50_means(*_get_sorted_values(stack, backgrounds))
+    no_mean = ~np.isfinite(background_means)
+    if no_mean.any():
+        for index in np.flatnonzero(no_mean):
+            background_means[index] = np.mean(stack[index][backgrounds[index]])
+        _logger.warning("{0} grid-cells caused background means due to inf".format(no_mean.sum()))
+
+    if calibration is not None:
+        return calibration.get_cell_estimates(levels, background_means, polynomial_coeffs, min_threshold)
+
+    estimates = background_means[:, np.newaxis, np.newaxis] - stack
+    estimates[estimates < min_threshold] = min_threshold
+    if polynomial_coeffs is not None:
+        estimates = _polyval(polynomial_coeffs, estimates)
+    return estimates
+
+
+def get_measures(stack, filters, centroid=False):
+    """Measures of the filtered part of each grid-cell image.
+
+    See `grid_cell_extra.CellItem.do_analysis`
+
+    Returns: list with a dict of measures for each grid-cell, empty if
+        the measures couldn't be made
+    """
+    counts = filters.sum(axis=(1, 2))
+    sums = np.where(filters, stack, 0).sum(axis=(1, 2))
+    sorted_values, finite_counts = _get_sorted_values(stack, filters)
+    has_nonfinite = finite_counts != counts
+    rows = np.arange(counts.size)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        means = sums / counts
+        lower_middle = sorted_values[rows, np.maximum((counts - 1) // 2, 0)]
+        upper_middle = sorted_values[rows, np.minimum(counts // 2, sorted_values.shape[1] - 1)]
+        medians = np.where(counts % 2, upper_middle, (lower_middle + upper_middle) / 2.)
+        quartile_index = finite_counts // 4
+        lower_quartile = sorted_values[rows, quartile_index]
+        upper_quartile = sorted_values[rows, np.where(
+            quartile_index > 0, finite_counts - quartile_index, 0)]
+        mid50_means = _get_mid50_means(sorted_values, finite_counts)
+
+        if centroid:
+            centroids = _get_centres_of_mass(filters)
+
+    measures = []
+    for index in rows:
+        if counts[index] == 0 or counts[index] == sums[index]:
+            measures.append({})
+            continue
+
+        data = {
+            MEASURES.Count: counts[index],
+            MEASURES.Sum: sums[index],
+            MEASURES.Mean: means[index],
+            MEASURES.Median: (
+                np.median(stack[index][filters[index]]) if has_nonfinite[index] else medians[index]),
+            MEASURES.IQR: (lower_quartile[index], upper_quartile[index]),
+            MEASURES.IQR_Mean: mid50_means[index],
+        }
+        if centroid:
+            data[MEASURES.Centroid] = tuple(centroids[index])
+            data[MEASURES.Perimeter] = None
+        measures.append(data)
+
+    return measures
+
+
+#
+# CLASS: GridCellBulk
+#
+
+
+class GridCellBulk(object):
+    """Analyses equally sized grid-cells of a plate together.
+
+    Each grid-cell remembers its blob and the data its next blob
+    detection is made on between images just as `GridCell` does.
+
+    Args:
+        grid_cells: The grid-cells, all with windows of the same shape
+            inside the plate image
+        polynomial_coeffs: The cell count calibration polynomial
+    """
+    def __init__(self, grid_cells, polynomial_coeffs):
+
+        self._grid_cells = list(grid_cells)
+        self._polynomial_coeffs = polynomial_coeffs
+        self._origins = np.array([grid_cell.xy1 for grid_cell in self._grid_cells], dtype=np.intp)
+        self._shape = tuple(self._grid_cells[0].xy2 - self._grid_cells[0].xy1) if self._grid_cells else (0, 0)
+        self._detection_source = None
+        self._old_blobs = None
+
+    def __len__(self):
+
+        return len(self._grid_cells)
+
+    def analyse(self, im, image_index, calibration=None):
+        """Analyse the grid-cells of a plate image.
+
+        Args:
+            im: The plate image, transposed to grayscale target values if
+                possible, or untransposed if there is a calibration
+            image_index: The index of the image
+            calibration: The `calibration_lut.CalibrationLUT` of the
+                image, transposing and calibrating it through lookup
+                tables
+        """
+        if not self._grid_cells:
+            return
+
+        overflow = np.maximum(self._origins.max(axis=0) + self._shape - im.shape, 0)
+        if overflow.any():
+            _logger.warning("Image is {0} pixels too small for the grid-cells, extending its edges".format(
+                tuple(overflow)))
+            im = np.pad(im, ((0, overflow[0]), (0, overflow[1])), mode='edge')
+
+        if calibration is None:
+            levels = None
+            stack = get_cell_windows(im, self._origins, self._shape).astype(np.float64)
+        else:
+            levels = get_cell_windows(im, self._origins, self._shape)
+            stack = calibration(levels)
+
+        if self._detection_source is None:
+            # The cell items only hold the features of grid-cells analysed
+            # in bulk so they don't need their images
+            for grid_cell in self._grid_cells:
+                grid_cell.source = np.zeros((0, 0), dtype=np.float64)
+                grid_cell.attach_analysis(blob=True, background=True, cell=True, run_detect=False)
+                grid_cell.source = None
+            self._detection_source = stack.copy()
+
+        blobs, trash = detect_blobs(self._detection_source)
+        if self._old_blobs is not None:
+            apply_blob_history(blobs, self._old_blobs)
+        self._old_blobs = blobs.copy()
+
+        backgrounds = detect_backgrounds(blobs, trash)
+        has_background = backgrounds.any(axis=(1, 2))
+
+        estimates = get_cell_estimates(
+            stack[has_background], backgrounds[has_background], self._polynomial_coeffs,
+            levels=None if levels is None else levels[has_background], calibration=calibration)
+        self._detection_source[has_background] = estimates
+
+        measures = {
+            COMPARTMENTS.Total: get_measures(
+                estimates, np.ones(estimates.shape, dtype=np.bool)),
+            COMPARTMENTS.Blob: get_measures(estimates, blobs[has_background], centroid=True),
+            COMPARTMENTS.Background: get_measures(estimates, backgrounds[has_background]),
+        }
+
+        analysed = 0
+        for grid_cell, cell_has_background in zip(self._grid_cells, has_background):
+            grid_cell.image_index = image_index
+            if cell_has_background:
+                for compartment, compartment_measures in measures.iteritems():
+                    grid_cell.set_measures(compartment, compartment_measures[analysed])
+                analysed += 1
+            else:
+                grid_cell.clear_features()
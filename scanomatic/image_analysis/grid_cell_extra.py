@@ -5,11 +5,10 @@
 from __future__ import absolute_import
 
 from enum import Enum
-import operator
 
 import numpy as np
 from scipy.ndimage import (
-    binary_erosion, center_of_mass, label, gaussian_filter)
+    binary_erosion, center_of_mass, find_objects, label, gaussian_filter)
 #
 # SCANNOMATIC LIBRARIES
 #
@@ -154,6 +153,34 @@ def get_array_subtraction(array_one, array_two, offset, output=None):
             array_one[o1_low: o1_high, o2_low: o2_high] - \
             array_two[b1_low: b1_high, b2_low: b2_high]
 
+
+def get_overlap_slices(offset, size):
+    """The parts of an old and a new array that overlap when the new is
+    shifted by an offset along a dimension of the given size.
+
+    Returns: tuple of the slice of the old and the slice of the new array
+    """
+    return (slice(max(offset, 0), size + min(offset, 0)),
+            slice(max(-offset, 0), max(size - max(offset, 0), 0)))
+
+
+def _get_buffer(buffer, shape, dtype=np.bool):
+    """The buffer if it has the shape and type, else a new buffer"""
+
+    if buffer is None or buffer.shape != shape or buffer.dtype != dtype:
+        return np.zeros(shape, dtype=dtype)
+    return buffer
+
+
+def _copy_to_buffer(buffer, array):
+    """Copy an array into a buffer of the same shape and type, or into a
+    new buffer if there is no such buffer.
+    """
+    if buffer is None or buffer is array or buffer.shape != array.shape or buffer.dtype != array.dtype:
+        return array.copy()
+    np.copyto(buffer, array)
+    return buffer
+
 #
 # CLASSES Cell_Item
 #
@@ -203,6 +230,7 @@ class CellItem(object):
         self.features.shape = (len(self._features_key_list),)
 
         self.old_filter = None
+        self._values = None
 
     #
     # SET functions
@@ -217,6 +245,24 @@ class CellItem(object):
             self.filter_array = np.zeros(self.grid_array.shape,
                                          dtype=np.bool)
 
+    #
+    # GET functions
+    #
+
+    def _get_filtered_values(self):
+        """The image values within the filter, in a buffer reused between
+        analyses.
+        """
+        count = np.count_nonzero(self.filter_array)
+        if (self._values is None or self._values.size < count or
+                self._values.dtype != self.grid_array.dtype):
+
+            self._values = np.empty((self.grid_array.size,), dtype=self.grid_array.dtype)
+
+        values = self._values[:count]
+        np.compress(np.ravel(self.filter_array), np.ravel(self.grid_array), out=values)
+        return values
+
     #
     # DO functions
     #
@@ -244,10 +290,9 @@ class CellItem(object):
 
             return
 
-        feature_array = None
-        feature_data[MEASURES.Count] = self.filter_array.sum()
-
-        feature_data[MEASURES.Sum] = self.grid_array[np.where(self.filter_array)].sum()
+        values = self._get_filtered_values()
+        feature_data[MEASURES.Count] = values.size
+        feature_data[MEASURES.Sum] = values.sum()
 
         if feature_data[MEASURES.Count] == feature_data[MEASURES.Sum] or feature_data[MEASURES.Count] == 0:
 
@@ -266,28 +311,15 @@ class CellItem(object):
             feature_data[MEASURES.Mean] = feature_data[MEASURES.Sum] / \
                 feature_data[MEASURES.Count]
 
-            if (MEASURES.Median in self._features_key_list or
-                        MEASURES.IQR in self._features_key_list or
-                        MEASURES.IQR_Mean in self._features_key_list):
-
-                feature_array = self.grid_array[np.where(self.filter_array)]
+            # All order statistics are taken from one in place sort
+            values.sort()
+            if np.isfinite(values[0]) and np.isfinite(values[-1]):
 
-            if MEASURES.Median in self._features_key_list:
-                feature_data[MEASURES.Median] = np.median(feature_array)
+                self._set_sorted_measures(feature_data, values)
 
-            if MEASURES.IQR in self._features_key_list or MEASURES.IQR_Mean in self._features_key_list:
-                feature_data[MEASURES.IQR] = quantiles_stable(feature_array)
-                # mquantiles(feature_array, prob=[0.25, 0.75])
-
-                try:
-
-                    feature_data[MEASURES.IQR_Mean] = iqr_mean(feature_array)
-                    # tmean(feature_array, feature_data['IQR'])
-
-                except:
+            else:
 
-                    feature_data[MEASURES.IQR_Mean] = None
-                    feature_data[MEASURES.IQR] = None
+                self._set_measures(feature_data, values)
 
             if MEASURES.Centroid in self._features_key_list:
 
@@ -302,6 +334,40 @@ class CellItem(object):
             if MEASURES.Perimeter in self._features_key_list:
                 feature_data[MEASURES.Perimeter] = None
 
+    def _set_sorted_measures(self, feature_data, values):
+        """Sets the order statistics of sorted finite values, same as
+        `numpy.median`, `quantiles_stable` and `iqr_mean` would.
+        """
+        size = values.size
+
+        if MEASURES.Median in self._features_key_list:
+            feature_data[MEASURES.Median] = values[(size - 1) // 2: size // 2 + 1].mean()
+
+        if MEASURES.IQR in self._features_key_list or MEASURES.IQR_Mean in self._features_key_list:
+            quartile = size // 4
+            feature_data[MEASURES.IQR] = (values[quartile], values[-quartile])
+            flank = (size - size // 2) // 2
+            feature_data[MEASURES.IQR_Mean] = values[flank: -flank].mean()
+
+    def _set_measures(self, feature_data, values):
+        """Sets the order statistics of values that aren't all finite."""
+
+        if MEASURES.Median in self._features_key_list:
+            feature_data[MEASURES.Median] = np.median(values)
+
+        if MEASURES.IQR in self._features_key_list or MEASURES.IQR_Mean in self._features_key_list:
+
+            feature_data[MEASURES.IQR] = quantiles_stable(values)
+
+            try:
+
+                feature_data[MEASURES.IQR_Mean] = iqr_mean(values)
+
+            except:
+
+                feature_data[MEASURES.IQR_Mean] = None
+                feature_data[MEASURES.IQR] = None
+
 #
 # CLASS Blob
 #
@@ -337,6 +403,41 @@ def get_onion_values(array, array_filter, layer_size):
     return np.asarray(onion)
 
 
+def has_bad_filter_change(old_filter, filter_array, max_change_threshold):
+    """
+    has_bad_filter_change evaluates if a detected blob differs too much
+    from the previously detected blob, also when the two are superimposed
+    using their centres of mass.
+
+    The change is the number of differing pixels divided by the square
+    root of the number of pixels in the old filter.
+    """
+
+    blob_diff = np.count_nonzero(old_filter != filter_array)
+
+    sqrt_of_oldsum = np.sqrt(np.count_nonzero(old_filter))
+
+    if blob_diff / sqrt_of_oldsum > max_change_threshold:
+
+        if not filter_array.any() or not old_filter.any():
+
+            return True
+
+        old_com = center_of_mass(old_filter)
+        new_com = center_of_mass(filter_array)
+
+        old_rows, rows = get_overlap_slices(int(old_com[0] - new_com[0]), filter_array.shape[0])
+        old_columns, columns = get_overlap_slices(int(old_com[1] - new_com[1]), filter_array.shape[1])
+
+        blob_diff = np.count_nonzero(old_filter[old_rows, old_columns] != filter_array[rows, columns])
+
+        if blob_diff / sqrt_of_oldsum > max_change_threshold:
+
+            return True
+
+    return False
+
+
 class BlobDetectionTypes(Enum):
 
     DEFAULT = 0
@@ -580,7 +681,8 @@ class Blob(CellItem):
 
         if self.filter_array is not None:
 
-            self.trash_array = np.zeros(self.filter_array.shape, dtype=np.bool)
+            self.trash_array = _get_buffer(self.trash_array, self.filter_array.shape)
+            self.trash_array[...] = False
 
         if detect_type is None:
 
@@ -605,102 +707,26 @@ class Blob(CellItem):
 
         if self.old_filter is not None:
 
-            if self.filter_array.sum() == 0:
-                self.filter_array = self.old_filter.copy()
-
-            blob_diff = (np.abs(self.old_filter - self.filter_array)).sum()
-
-            sqrt_of_oldsum = self.old_filter.sum() ** 0.5
-
-            if blob_diff / float(sqrt_of_oldsum) > max_change_threshold:
-
-                bad_diff = False
-
-                if self.filter_array.sum() == 0 or self.old_filter.sum() == 0:
-
-                    bad_diff = True
-
-                else:
-
-                    old_com = center_of_mass(self.old_filter)
-                    new_com = center_of_mass(self.filter_array)
-
-                    dim_1_offset = int(old_com[0] - new_com[0])
-                    dim_2_offset = int(old_com[1] - new_com[1])
-
-                    if dim_1_offset > 0 and dim_2_offset > 0:
-
-                        diff_filter = \
-                            self.old_filter[dim_1_offset:, dim_2_offset:] -\
-                            self.filter_array[:-dim_1_offset, :-dim_2_offset]
-
-                    elif dim_1_offset < 0 and dim_2_offset < 0:
-
-                        diff_filter = \
-                            self.old_filter[: dim_1_offset, : dim_2_offset] - \
-                            self.filter_array[-dim_1_offset:, -dim_2_offset:]
-
-                    elif dim_1_offset > 0 > dim_2_offset:
-
-                        diff_filter = \
-                            self.old_filter[dim_1_offset:, : dim_2_offset] - \
-                            self.filter_array[:-dim_1_offset, -dim_2_offset:]
-
-                    elif dim_1_offset < 0 < dim_2_offset:
-
-                        diff_filter = \
-                            self.old_filter[: dim_1_offset, dim_2_offset:] - \
-                            self.filter_array[-dim_1_offset:, :-dim_2_offset]
-
-                    elif dim_1_offset == 0 and dim_2_offset < 0:
-
-                        diff_filter = \
-                            self.old_filter[:, : dim_2_offset] -\
-                            self.filter_array[:, -dim_2_offset:]
-
-                    elif dim_1_offset == 0 and dim_2_offset > 0:
-
-                        diff_filter = \
-                            self.old_filter[:, dim_2_offset:] -\
-                            self.filter_array[:, :-dim_2_offset]
+            if not self.filter_array.any():
+                self.filter_array = _copy_to_buffer(self.filter_array, self.old_filter)
 
-                    elif dim_1_offset < 0 and dim_2_offset == 0:
+            if has_bad_filter_change(self.old_filter, self.filter_array, max_change_threshold):
 
-                        diff_filter = \
-                            self.old_filter[: dim_1_offset, :] -\
-                            self.filter_array[-dim_1_offset:, :]
+                self.filter_array = _copy_to_buffer(self.filter_array, self.old_filter)
 
-                    elif dim_1_offset > 0 == dim_2_offset:
-                        diff_filter = \
-                            self.old_filter[dim_1_offset:, :] -\
-                            self.filter_array[:-dim_1_offset, :]
+                if self.old_trash is not None:
 
-                    else:
-                        diff_filter = self.old_filter - self.filter_array
-
-                    blob_diff = diff_filter.sum()
-
-                    if blob_diff / float(sqrt_of_oldsum) > max_change_threshold:
-
-                        bad_diff = True
-
-                if bad_diff:
-
-                    self.filter_array = self.old_filter.copy()
-
-                    if self.old_trash is not None:
-
-                        self.trash_array = self.old_trash.copy()
+                    self.trash_array = _copy_to_buffer(self.trash_array, self.old_trash)
 
         if remember_filter:
 
-            self.old_filter = self.filter_array.copy()
+            self.old_filter = _copy_to_buffer(self.old_filter, self.filter_array)
 
         if remember_trash:
 
             if self.trash_array is not None:
 
-                self.old_trash = self.trash_array.copy()
+                self.old_trash = _copy_to_buffer(self.old_trash, self.trash_array)
 
     def iterative_threshold_detect(self):
 
@@ -739,15 +765,15 @@ class Blob(CellItem):
 
             color_logic = self.image_color_logic
 
-        self.filter_array[...] = False
+        self.filter_array = _get_buffer(self.filter_array, im.shape)
 
         if color_logic == "inv":
 
-            self.filter_array[np.where(im < self.threshold)] = True
+            np.less(im, self.threshold, out=self.filter_array)
 
         else:
 
-            self.filter_array[np.where(im > self.threshold)] = True
+            np.greater(im, self.threshold, out=self.filter_array)
 
     def manual_detect(self, center, radius):
 
@@ -798,65 +824,59 @@ class Blob(CellItem):
             self.BLOB_RECIPE.analyse(self.grid_array, self.filter_array)
             self.keep_best_blob()
 
-    def get_candidate_blob_ranks(self):
+    def _get_candidate_blobs(self):
+        """Labels the candidate blobs of the filter.
 
+        Returns: tuple of the number of labels, the label array and, with
+            one row per label, the qualities and the centres of mass
+        """
         label_array, number_of_labels = label(self.filter_array)
-        qualities = {}
-        centre_of_masses = {}
-
-        if number_of_labels > 0:
-
-            for label_value in xrange(1, number_of_labels + 1):
-
-                current_label_filter = label_array == label_value
+        if number_of_labels == 0:
+            return number_of_labels, label_array, np.zeros((0,)), np.zeros((0, 2))
 
-                if current_label_filter.sum() == 0:
-                    continue
+        areas = np.bincount(label_array.ravel(), minlength=number_of_labels + 1)[1:]
+        rows, columns = np.indices(label_array.shape)
+        centre_of_masses = np.column_stack([
+            np.bincount(label_array.ravel(), weights=positions.ravel(), minlength=number_of_labels + 1)[1:] / areas
+            for positions in (rows, columns)])
 
-                centre_of_masses[label_value] = center_of_mass(current_label_filter)
+        extents = np.array([
+            (row_slice.stop - row_slice.start, column_slice.stop - column_slice.start)
+            for row_slice, column_slice in find_objects(label_array, number_of_labels)], dtype=np.float)
+        qualities = areas * extents.min(axis=1) / extents.max(axis=1)
 
-                area = np.sum(current_label_filter)
+        return number_of_labels, label_array, qualities, centre_of_masses
 
-                dim_extents = [-1, -1]
-                for dim in range(2):
-                    over_axis_sum = np.where(np.sum(current_label_filter, axis=dim) > 0)
-                    dim_extents[dim] = max(*over_axis_sum) - min(*over_axis_sum) + 1.0
+    def get_candidate_blob_ranks(self):
 
-                qualities[label_value] = (area * min(dim_extents) / max(dim_extents))
+        number_of_labels, label_array, qualities, centre_of_masses = self._get_candidate_blobs()
+        label_values = range(1, number_of_labels + 1)
 
-        return number_of_labels, qualities, centre_of_masses, label_array
+        return (number_of_labels, dict(zip(label_values, qualities)),
+                dict(zip(label_values, map(tuple, centre_of_masses))), label_array)
 
-    # noinspection PyTypeChecker
     def keep_best_blob(self):
         """Evaluates all blobs detected and keeps the best one"""
 
-        _, qualities, centre_of_masses, label_array = self.get_candidate_blob_ranks()
-
-        if qualities:
-
-            quality_order = zip(*sorted(qualities.iteritems(), key=operator.itemgetter(1)))[0][::-1]
-            best_quality_label = quality_order[0]
-
-            self.filter_array = label_array == best_quality_label
-
-            composite_blob = [best_quality_label]
-            composite_trash = []
-
-            for item_label in quality_order[1:]:
+        number_of_labels, label_array, qualities, centre_of_masses = self._get_candidate_blobs()
 
-                if self.filter_array[tuple(map(int, map(round, centre_of_masses[item_label])))]:
+        if number_of_labels:
 
-                    composite_blob.append(item_label)
+            # Highest quality, with ties resolved to the highest label
+            best_quality_label = number_of_labels - np.argmax(qualities[::-1])
 
-                else:
+            # Blobs centred on the best blob are part of it, the rest is trash
+            centres = np.floor(centre_of_masses + 0.5).astype(np.intp)
+            composite_blob = np.zeros((number_of_labels + 1,), dtype=np.bool)
+            composite_blob[1:] = label_array[centres[:, 0], centres[:, 1]] == best_quality_label
+            composite_blob[best_quality_label] = True
+            composite_trash = ~composite_blob
+            composite_trash[0] = False
 
-                    composite_trash.append(item_label)
-
-            self.filter_array = np.in1d(
-                label_array, np.array(composite_blob)).reshape(self.filter_array.shape)
-
-            self.trash_array = np.in1d(
-                label_array, np.array(composite_trash)).reshape(self.filter_array.shape)
+            self.filter_array = _get_buffer(self.filter_array, label_array.shape)
+            self.trash_array = _get_buffer(self.trash_array, label_array.shape)
+            np.take(composite_blob, label_array, out=self.filter_array, mode='clip')
+            np.take(composite_trash, label_array, out=self.trash_array, mode='clip')
 
 #
 # CLASSES Background (inverse blob area)
@@ -877,6 +897,8 @@ class Background(CellItem):
 
             self.blob = None
 
+        self._not_blob = None
+
         if run_detect:
 
             self.detect()
@@ -894,14 +916,22 @@ class Background(CellItem):
 
         if self.blob and self.blob.filter_array is not None:
 
-            self.filter_array[...] = True
+            shape = self.blob.filter_array.shape
+            self._not_blob = _get_buffer(self._not_blob, shape)
+            self.filter_array = _get_buffer(self.filter_array, shape)
 
-            self.filter_array[np.where(self.blob.filter_array)] = False
+            if self.blob.trash_array is None:
+
+                np.logical_not(self.blob.filter_array, out=self._not_blob)
+
+            else:
 
-            self.filter_array[np.where(self.blob.trash_array)] = False
+                np.logical_or(self.blob.filter_array, self.blob.trash_array, out=self._not_blob)
+                np.logical_not(self._not_blob, out=self._not_blob)
 
-            self.filter_array = binary_erosion(
-                self.filter_array, iterations=3, border_value=1)
+            binary_erosion(
+                self._not_blob, iterations=3, border_value=1,
+                output=self.filter_array)
 
         else:
 
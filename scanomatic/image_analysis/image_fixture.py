@@ -3,8 +3,8 @@ from __future__ import absolute_import
 import os
 
 import numpy as np
+from scipy.fftpack import next_fast_len
 from scipy.ndimage import center_of_mass
-from scipy.signal import fftconvolve
 
 #
 # INTERNAL DEPENDENCIES
@@ -14,6 +14,134 @@ from . import image_basics
 from .image_basics import load_image_to_numpy
 import scanomatic.io.logger as logger
 
+#
+# GLOBALS
+#
+
+MARKER_SEARCH_DOWNSCALE = 4
+_MARKER_SEARCH_EXTRA_CANDIDATES = 3
+_PATTERN_CACHE_SIZE = 4
+_PATTERN_FFT_CACHE_SIZE = 16
+_GAUSS_CACHE_SIZE = 16
+
+_patterns = {}
+_pattern_ffts = {}
+_gausses = {}
+
+#
+# METHODS
+#
+
+
+def _load_pattern(path):
+    """Loads the first channel of a pattern image.
+
+    Patterns are cached per path and modification time, replacing
+    the patterns of earlier modification times, the returned array is
+    read-only.
+
+    :return: tuple of the cache key and the pattern
+    """
+    if not os.path.isfile(path):
+        raise IOError("No pattern image at {0}".format(path))
+
+    key = (path, os.path.getmtime(path))
+    pattern = _patterns.get(key)
+    if pattern is None:
+
+        pattern = load_image_to_numpy(path, dtype=np.uint8)
+        if len(pattern.shape) > 2:
+            pattern = pattern[:, :, 0]
+        pattern = np.ascontiguousarray(pattern)
+        pattern.setflags(write=False)
+        for other_key in _patterns.keys():
+            if other_key[0] == path:
+                del _patterns[other_key]
+        if len(_patterns) >= _PATTERN_CACHE_SIZE:
+            _patterns.clear()
+        _patterns[key] = pattern
+
+    return key, pattern
+
+
+def _get_signed(thresholded):
+
+    return thresholded.astype(np.int8) * 2 - 1
+
+
+def _downscale(image, factor):
+    """Mean of each `factor` by `factor` block, dropping incomplete blocks"""
+    rows, columns = image.shape[0] // factor, image.shape[1] // factor
+    blocks = image[: rows * factor, : columns * factor].reshape(rows, factor, columns, factor)
+    return blocks.sum(axis=3).sum(axis=1) / float(factor ** 2)
+
+
+def _get_fft_shape(image_shape, pattern_shape):
+
+    return tuple(next_fast_len(image + pattern - 1) for image, pattern in zip(image_shape, pattern_shape))
+
+
+def _get_pattern_fft(pattern_key, signed_pattern, fft_shape, downscale=1):
+    """The padded FFT of a pattern, cached per pattern, downscale and
+    FFT shape unless the pattern has no key"""
+    key = (pattern_key, downscale, fft_shape)
+    pattern_fft = _pattern_ffts.get(key) if pattern_key is not None else None
+    if pattern_fft is None:
+
+        pattern_fft = np.fft.rfftn(signed_pattern, fft_shape)
+        if pattern_key is not None:
+            if len(_pattern_ffts) >= _PATTERN_FFT_CACHE_SIZE:
+                _pattern_ffts.clear()
+            _pattern_ffts[key] = pattern_fft
+
+    return pattern_fft
+
+
+def _convolve_same(image, pattern_fft, pattern_shape, fft_shape):
+    """Convolution of the image and the pattern, centered and of the
+    image's shape as `scipy.signal.fftconvolve` with `mode='same'`"""
+    full = np.fft.irfftn(np.fft.rfftn(image, fft_shape) * pattern_fft, fft_shape)
+    start = [(size - 1) // 2 for size in pattern_shape]
+    return full[start[0]: start[0] + image.shape[0], start[1]: start[1] + image.shape[1]]
+
+
+def _get_peaks(conv_img, stencil_size, n):
+    """The positions of the `n` highest values at least a stencil apart"""
+    conv_img = conv_img.copy()
+    half_stencil_size = [size // 2 + 1 for size in stencil_size]
+    peaks = []
+    for _ in range(n):
+
+        peak = np.unravel_index(conv_img.argmax(), conv_img.shape)
+        peaks.append(peak)
+        conv_img[max(0, peak[0] - half_stencil_size[0]): peak[0] + half_stencil_size[0] + 1,
+                 max(0, peak[1] - half_stencil_size[1]): peak[1] + half_stencil_size[1] + 1] = -np.inf
+
+    return peaks
+
+
+def _get_gauss(size, fwhm, center):
+    """A gaussian along an axis, scaled by a factor that depends on the
+    center but not on the position.
+
+    Since `exp(-k (x - c) ** 2)` is `exp(-k x ** 2) * exp(2 k c x)`
+    times `exp(-k c ** 2)`, the first factor and the exponent slope
+    `2 k x` are cached per size and FWHM.
+    """
+    key = (size, fwhm)
+    gauss = _gausses.get(key)
+    if gauss is None:
+
+        k = 4 * np.log(2) / fwhm ** 2
+        x = np.arange(size, dtype=float)
+        gauss = np.exp(-k * x ** 2), 2 * k * x
+        if len(_gausses) >= _GAUSS_CACHE_SIZE:
+            _gausses.clear()
+        _gausses[key] = gauss
+
+    base, slope = gauss
+    return base * np.exp(slope * center)
+
 #
 # CLASSES
 #
@@ -27,6 +155,7 @@ class FixtureImage(object):
         self._path = path
         self._img = None
         self._pattern_img = None
+        self._pattern_key = None
         self._load_error = None
         self._transformed = False
         self._conversion_factor = 1.0 / scale
@@ -44,7 +173,7 @@ class FixtureImage(object):
 
             try:
 
-                pattern_img = load_image_to_numpy(pattern_image_path, dtype=np.uint8)
+                self._pattern_key, self._pattern_img = _load_pattern(pattern_image_path)
 
             except IOError:
 
@@ -54,14 +183,6 @@ class FixtureImage(object):
 
                 self._load_error = True
 
-            if self._load_error is not True:
-
-                if len(pattern_img.shape) > 2:
-
-                    pattern_img = pattern_img[:, :, 0]
-
-                self._pattern_img = pattern_img
-
         if image is not None:
 
             self._img = np.asarray(image)
@@ -136,22 +257,6 @@ class FixtureImage(object):
         :rtype : (int, int)
         """
 
-        def make_2d_guass_filter(size, fwhm, center):
-            """ Make a square gaussian kernel.
-
-            size is the length of a side of the square
-            fwhm is full-width-half-maximum, which
-            can be thought of as an effective radius.
-            """
-
-            x = np.arange(0, size, 1, float)
-            y = x[:,np.newaxis]
-
-            x0 = center[1]
-            y0 = center[0]
-
-            return np.exp(-4*np.log(2) * ((x-x0)**2 + (y-y0)**2) / fwhm**2)
-
         if coordinates is None:
             image_slice = conv_img
         else:
@@ -159,37 +264,99 @@ class FixtureImage(object):
                                    int(round(coordinates['d1_min'])): int(round(coordinates['d1_max']))]
 
         gauss_size = max(image_slice.shape)
+        fwhm = gauss_size / gaussian_weight_size_fraction
 
-        gauss = make_2d_guass_filter(gauss_size, gauss_size / gaussian_weight_size_fraction, local_hit)
+        # The 2D gaussian is the outer product of the gaussians along each axis,
+        # their scaling doesn't move the center of mass
+        gauss = _get_gauss(image_slice.shape[0], fwhm, local_hit[0])[:, np.newaxis] * \
+            _get_gauss(image_slice.shape[1], fwhm, local_hit[1])
 
-        return np.array(center_of_mass(image_slice * gauss[: image_slice.shape[0], : image_slice.shape[1]])) - \
-            local_hit
+        return np.array(center_of_mass(image_slice * gauss)) - local_hit
 
     def get_convolution(self, threshold=127):
 
-        t_img = (self._img > threshold).astype(np.int8) * 2 - 1
-        marker = self._pattern_img
+        t_img = _get_signed(self._img > threshold)
+        t_mrk = _get_signed(self._pattern_img > 0)
+        fft_shape = _get_fft_shape(t_img.shape, t_mrk.shape)
 
-        if len(marker.shape) == 3:
+        # The convolution is integer valued, rounding makes equal hits equal regardless of FFT shape
+        return np.rint(_convolve_same(
+            t_img, _get_pattern_fft(self._pattern_key, t_mrk, fft_shape), t_mrk.shape, fft_shape))
 
-            marker = marker[:, :, 0]
+    def get_marker_convolution(self, markings, threshold=127, downscale=MARKER_SEARCH_DOWNSCALE):
+        """Convolution around the most likely positions of the markings.
 
-        t_mrk = (marker > 0) * 2 - 1
+        The convolution of a downscaled image gives candidate positions,
+        a few more than the number of markings. The convolution at full
+        resolution is only calculated within two stencils of each
+        candidate, the rest of the returned convolution is lower than
+        any calculated value.
 
-        return fftconvolve(t_img, t_mrk, mode='same')
+        Falls back to `get_convolution` if the image is too small for
+        the candidate areas to be smaller than the image.
+        """
+        t_img = _get_signed(self._img > threshold)
+        t_mrk = _get_signed(self._pattern_img > 0)
+        radius = np.array(t_mrk.shape) + downscale * 2
+        window_shape = radius * 2 + 1
+        candidates = int(markings) + _MARKER_SEARCH_EXTRA_CANDIDATES
+
+        if downscale < 2 or min(t_mrk.shape) < downscale * 2 or \
+                candidates * np.prod(window_shape + np.array(t_mrk.shape) * 2) >= t_img.size:
+
+            return self.get_convolution(threshold=threshold)
+
+        small_img = _downscale(t_img, downscale)
+        small_mrk = _downscale(t_mrk, downscale)
+        fft_shape = _get_fft_shape(small_img.shape, small_mrk.shape)
+        small_conv = _convolve_same(
+            small_img, _get_pattern_fft(self._pattern_key, small_mrk, fft_shape, downscale),
+            small_mrk.shape, fft_shape)
+
+        # All windows use the same FFT shape so the pattern FFT is reused
+        fft_shape = _get_fft_shape(window_shape + np.array(t_mrk.shape) * 2, t_mrk.shape)
+        pattern_fft = _get_pattern_fft(self._pattern_key, t_mrk, fft_shape)
+        conv_img = np.empty(t_img.shape, dtype=float)
+        conv_img.fill(-np.inf)
+
+        for peak in _get_peaks(small_conv, small_mrk.shape, candidates):
+
+            center = np.array(peak) * downscale + downscale // 2
+            lower = np.clip(center - radius, 0, t_img.shape)
+            upper = np.clip(center + radius + 1, 0, t_img.shape)
+            # Convolving the window with a margin of a stencil gives the same values as the whole image
+            img_lower = np.clip(lower - t_mrk.shape, 0, t_img.shape)
+            img_upper = np.clip(upper + t_mrk.shape, 0, t_img.shape)
+
+            window_conv = _convolve_same(
+                t_img[img_lower[0]: img_upper[0], img_lower[1]: img_upper[1]],
+                pattern_fft, t_mrk.shape, fft_shape)
+
+            conv_img[lower[0]: upper[0], lower[1]: upper[1]] = np.rint(window_conv[
+                lower[0] - img_lower[0]: upper[0] - img_lower[0],
+                lower[1] - img_lower[1]: upper[1] - img_lower[1]])
+
+        outside = np.isinf(conv_img)
+        conv_img[outside] = conv_img[~outside].min() - 1
+        return conv_img
 
     @staticmethod
     def get_best_location(conv_img, stencil_size, refine_hit_gauss_weight_size_fraction=2.0,
                           max_refinement_iterations=20, min_refinement_sq_distance=0.0001):
         """This whas hidden and should be taken care of, is it needed"""
 
-        hit = np.where(conv_img == conv_img.max())
+        if conv_img.size == 0:
+
+            return None, conv_img
+
+        # First position of the max, undefined if there are nan values
+        hit = np.unravel_index(conv_img.argmax(), conv_img.shape)
 
-        if len(hit[0]) == 0:
+        if np.isnan(conv_img[hit]):
 
             return None, conv_img
 
-        hit = np.array((hit[0][0], hit[1][0]), dtype=float)
+        hit = np.array(hit, dtype=float)
 
         #Zeroing out hit
         half_stencil_size = map(lambda x: x / 2.0, stencil_size)
@@ -250,7 +417,7 @@ class FixtureImage(object):
 
         if self.get_loaded():
 
-            c1 = self.get_convolution(threshold=img_threshold)
+            c1 = self.get_marker_convolution(markings, threshold=img_threshold)
 
             m1 = np.array(self.get_best_locations(
                 c1, self._pattern_img.shape,
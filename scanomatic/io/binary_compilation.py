@@ -0,0 +1,329 @@
+"""Binary storage of compiled images.
+
+The compiled images of a project are stored next to its text based
+`.project.compilation` file in two files. The first is a log of binary
+records, one per compiled image, that is only ever appended to. The
+second is an index of fixed size rows holding the image index, the time
+stamp and the location of each record in the log, so that the index can
+be read as one numpy array and any record be read without parsing the
+others.
+
+A record is only listed in the index once it has been completely
+written, so readers never see partial records.
+"""
+from __future__ import absolute_import
+
+import os
+import struct
+
+import numpy as np
+
+from scanomatic.io.logger import Logger
+from scanomatic.io.paths import Paths
+from scanomatic.models.compile_project_model import (
+    CompileImageAnalysisModel, CompileImageModel
+)
+from scanomatic.models.factories.compile_project_factory import (
+    CompileImageAnalysisFactory
+)
+from scanomatic.models.fixture_models import (
+    FixtureModel, FixturePlateModel, GrayScaleAreaModel
+)
+
+INDEX_DTYPE = np.dtype([
+    ('index', '<i8'), ('time_stamp', '<f8'), ('offset', '<i8'), ('size', '<i8')])
+
+_RECORD_HEAD = struct.Struct('<qddd?5q')
+_GRAYSCALE = struct.Struct('<dd4q')
+_STRING_SIZE = struct.Struct('<i')
+_PLATE_FIELDS = ('index', 'x1', 'x2', 'y1', 'y2')
+_MISSING = -1
+
+_logger = Logger("Binary Compilation")
+
+
+def get_paths(compilation_path):
+    """The binary record log and index paths of a compilation file.
+
+    Args:
+        compilation_path: Path to the `.project.compilation` file
+
+    Returns: tuple of record log path and index path
+    """
+    paths = Paths()
+    return (paths.project_compilation_binary_pattern.format(compilation_path),
+            paths.project_compilation_binary_index_pattern.format(compilation_path))
+
+
+def is_current(compilation_path):
+    """If there's a binary compilation that is at least as recent as the
+    text based compilation file.
+    """
+    _, index_path = get_paths(compilation_path)
+    try:
+        index_time = os.path.getmtime(index_path)
+    except OSError:
+        return False
+
+    try:
+        return index_time >= os.path.getmtime(compilation_path)
+    except OSError:
+        return True
+
+
+def _pack_string(value):
+
+    if value is None:
+        return _STRING_SIZE.pack(_MISSING)
+    value = value.encode('utf-8') if isinstance(value, unicode) else str(value)
+    return _STRING_SIZE.pack(len(value)) + value
+
+
+def _pack_array(values, dtype):
+
+    return b'' if values is None else np.asarray(values, dtype=dtype).tobytes()
+
+
+def _get_size(values):
+
+    return _MISSING if values is None else len(values)
+
+
+def pack(model):
+    """Encodes a compiled image as a binary record.
+
+    :type model: scanomatic.models.compile_project_model.CompileImageAnalysisModel
+    :rtype: bytes
+    """
+    fixture = model.fixture
+    grayscale = fixture.grayscale
+    values = None if grayscale is None else grayscale.values
+    plates = fixture.plates if fixture.plates is not None else ()
+
+    parts = [_RECORD_HEAD.pack(
+        model.image.index, model.image.time_stamp, fixture.coordinates_scale, fixture.scale,
+        grayscale is not None, _get_size(values), _get_size(fixture.orientation_marks_x),
+        _get_size(fixture.orientation_marks_y), _get_size(fixture.shape), len(plates))]
+
+    if grayscale is not None:
+        parts.append(_GRAYSCALE.pack(
+            grayscale.width, grayscale.section_length, grayscale.x1, grayscale.x2, grayscale.y1, grayscale.y2))
+        parts.append(_pack_string(grayscale.name))
+
+    parts.extend((
+        _pack_string(model.image.path),
+        _pack_string(fixture.name),
+        _pack_string(fixture.path),
+        _pack_array(values, '<f8'),
+        _pack_array(fixture.orientation_marks_x, '<f8'),
+        _pack_array(fixture.orientation_marks_y, '<f8'),
+        _pack_array(fixture.shape, '<i8'),
+        _pack_array([[getattr(plate, f) for f in _PLATE_FIELDS] for plate in plates], '<i8')))
+
+    return b''.join(parts)
+
+
+class _RecordReader(object):
+
+    def __init__(self, data):
+
+        self._data = data
+        self._position = 0
+
+    def unpack(self, layout):
+
+        values = layout.unpack_from(self._data, self._position)
+        self._position += layout.size
+        return values
+
+    def string(self):
+
+        size, = self.unpack(_STRING_SIZE)
+        if size == _MISSING:
+            return None
+        value = self._data[self._position: self._position + size]
+        self._position += size
+        return value
+
+    def array(self, size, dtype):
+
+        if size == _MISSING:
+            return None
+        values = np.frombuffer(self._data, dtype=dtype, count=size, offset=self._position)
+        self._position += values.nbytes
+        return values
+
+
+def unpack(data):
+    """Decodes a binary record into a compiled image.
+
+    :rtype: scanomatic.models.compile_project_model.CompileImageAnalysisModel
+    """
+    reader = _RecordReader(data)
+    (image_index, time_stamp, coordinates_scale, scale, has_grayscale, n_values, n_marks_x, n_marks_y,
+     n_shape, n_plates) = reader.unpack(_RECORD_HEAD)
+
+    grayscale = None
+    if has_grayscale:
+        width, section_length, x1, x2, y1, y2 = reader.unpack(_GRAYSCALE)
+        grayscale = dict(
+            name=reader.string(), width=width, section_length=section_length, x1=x1, x2=x2, y1=y1, y2=y2)
+
+    image_path = reader.string()
+    name = reader.string()
+    fixture_path = reader.string()
+    values = reader.array(n_values, '<f8')
+    marks_x = reader.array(n_marks_x, '<f8')
+    marks_y = reader.array(n_marks_y, '<f8')
+    shape = reader.array(n_shape, '<i8')
+    plates = reader.array(n_plates * len(_PLATE_FIELDS), '<i8').reshape(n_plates, len(_PLATE_FIELDS))
+
+    # The records are packed from valid models, so the models are created
+    # directly rather than by their factories
+    if grayscale is not None:
+        grayscale = GrayScaleAreaModel(values=None if values is None else values.tolist(), **grayscale)
+
+    return CompileImageAnalysisModel(
+        image=CompileImageModel(index=image_index, time_stamp=time_stamp, path=image_path),
+        fixture=FixtureModel(
+            name=name,
+            path=fixture_path,
+            grayscale=grayscale,
+            orientation_marks_x=None if marks_x is None else marks_x.tolist(),
+            orientation_marks_y=None if marks_y is None else marks_y.tolist(),
+            shape=None if shape is None else shape.tolist(),
+            coordinates_scale=coordinates_scale,
+            scale=scale,
+            plates=tuple(FixturePlateModel(**dict(zip(_PLATE_FIELDS, plate.tolist()))) for plate in plates)))
+
+
+class BinaryCompilation(object):
+    """Reads and appends compiled images of a binary compilation.
+
+    Args:
+        compilation_path: Path to the `.project.compilation` file the
+            binary compilation belongs to.
+    """
+    def __init__(self, compilation_path):
+
+        self._path, self._index_path = get_paths(compilation_path)
+
+    def __len__(self):
+
+        return len(self.index)
+
+    def __getitem__(self, position):
+        """The compiled image at a position in the order they were compiled.
+
+        :rtype: scanomatic.models.compile_project_model.CompileImageAnalysisModel
+        """
+        row = self.index[position]
+        with open(self._path, 'rb') as fh:
+            fh.seek(row['offset'])
+            return unpack(fh.read(row['size']))
+
+    @property
+    def index(self):
+        """Structured array of image index, time stamp, record offset and
+        record size of all compiled images.
+        """
+        try:
+            with open(self._index_path, 'rb') as fh:
+                data = fh.read()
+        except IOError:
+            return np.zeros((0,), dtype=INDEX_DTYPE)
+
+        # A row may be incompletely written by a concurrent append
+        return np.frombuffer(data, dtype=INDEX_DTYPE, count=len(data) // INDEX_DTYPE.itemsize)
+
+    @property
+    def time_stamps(self):
+
+        return self.index['time_stamp'].copy()
+
+    def get_image(self, image_index):
+        """The most recent compiled image with a certain image index.
+
+        :rtype: scanomatic.models.compile_project_model.CompileImageAnalysisModel
+        """
+        positions = np.flatnonzero(self.index['index'] == image_index)
+        if positions.size == 0:
+            raise KeyError(image_index)
+        return self[positions[-1]]
+
+    def load(self):
+        """All compiled images in the order they were compiled.
+
+        :rtype: tuple[scanomatic.models.compile_project_model.CompileImageAnalysisModel]
+        """
+        index = self.index
+        if not index.size:
+            return tuple()
+
+        with open(self._path, 'rb') as fh:
+            data = fh.read(index['offset'][-1] + index['size'][-1])
+
+        return tuple(unpack(data[row['offset']: row['offset'] + row['size']]) for row in index)
+
+    def append(self, model):
+        """Appends a compiled image.
+
+        :type model: scanomatic.models.compile_project_model.CompileImageAnalysisModel
+        """
+        record = pack(model)
+        with open(self._path, 'ab') as fh:
+            fh.seek(0, os.SEEK_END)
+            offset = fh.tell()
+            fh.write(record)
+
+        row = np.array([(model.image.index, model.image.time_stamp, offset, len(record))], dtype=INDEX_DTYPE)
+        with open(self._index_path, 'ab') as fh:
+            size = fh.tell()
+            if size % INDEX_DTYPE.itemsize:
+                fh.truncate(size - size % INDEX_DTYPE.itemsize)
+            fh.write(row.tobytes())
+
+    def clear(self):
+
+        for path in (self._index_path, self._path):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def convert(compilation_path):
+    """Writes the binary compilation of a text based compilation file,
+    replacing any previous binary compilation.
+
+    Returns: The number of compiled images
+    """
+    images = CompileImageAnalysisFactory.serializer.load(compilation_path)
+    path, index_path = get_paths(compilation_path)
+    records = [pack(model) for model in images]
+    index = np.zeros((len(records),), dtype=INDEX_DTYPE)
+    index['index'] = [model.image.index for model in images]
+    index['time_stamp'] = [model.image.time_stamp for model in images]
+    index['size'] = [len(record) for record in records]
+    index['offset'][1:] = np.cumsum(index['size'])[:-1]
+
+    for target, data in ((path, b''.join(records)), (index_path, index.tobytes())):
+        with open(target + '.tmp', 'wb') as fh:
+            fh.write(data)
+        os.rename(target + '.tmp', target)
+
+    _logger.info("Converted {0} compiled images of {1}".format(len(records), compilation_path))
+    return len(records)
+
+
+def load(compilation_path):
+    """Loads all compiled images of a project.
+
+    Uses the binary compilation if it is current and otherwise parses
+    the text based compilation file.
+
+    :rtype: tuple[scanomatic.models.compile_project_model.CompileImageAnalysisModel]
+    """
+    if is_current(compilation_path):
+        return BinaryCompilation(compilation_path).load()
+    return CompileImageAnalysisFactory.serializer.load(compilation_path)
@@ -4,6 +4,9 @@ from enum import Enum
 from glob import glob
 import os
 
+import numpy as np
+
+from scanomatic.io import binary_compilation
 from scanomatic.io.logger import Logger
 from scanomatic.io.paths import Paths
 from scanomatic.models.factories.compile_project_factory import (
@@ -14,7 +17,17 @@ from scanomatic.models.factories.scanning_factory import ScanningModelFactory
 FIRST_PASS_SORTING = Enum("FIRST_PASS_SORTING", names=("Index", "Time"))
 
 
+def _get_time_stamp(model):
+
+    return model.image.time_stamp
+
+
 class CompilationResults(object):
+    """The compiled images of a project.
+
+    The images not yet used are kept sorted by time stamp so that they
+    can be indexed directly.
+    """
 
     def __init__(self, compilation_path=None, compile_instructions_path=None,
                  scanner_instructions_path=None, sort_mode=FIRST_PASS_SORTING.Time):
@@ -31,6 +44,7 @@ class CompilationResults(object):
         self._used_models = []
         self._current_model = None
         self._loading_length = 0
+        self._arrays = {}
         if compile_instructions_path:
             self._load_compile_instructions(compile_instructions_path)
         if compilation_path:
@@ -44,8 +58,9 @@ class CompilationResults(object):
 
         new = cls()
         new._compilation_path = path
-        new._compile_instructions = CompileProjectFactory.copy(compile_instructions)
-        new._image_models = CompileImageAnalysisFactory.copy_iterable_of_model(list(image_models))
+        if compile_instructions is not None:
+            new._compile_instructions = CompileProjectFactory.copy(compile_instructions)
+        new._set_image_models(CompileImageAnalysisFactory.copy_iterable_of_model(list(image_models)))
         new._used_models = CompileImageAnalysisFactory.copy_iterable_of_model(list(used_models))
         new._loading_length = len(new._image_models)
         new._scanner_instructions = scan_instructions
@@ -60,6 +75,8 @@ class CompilationResults(object):
 
         """
         if path is None:
+            if self._compilation_path is None:
+                return
             try:
                 path = glob(os.path.join(os.path.dirname(self._compilation_path),
                                          Paths().scan_project_file_pattern.format('*')))[0]
@@ -79,18 +96,28 @@ class CompilationResults(object):
 
     def _load_compilation(self, path, sort_mode=FIRST_PASS_SORTING.Time):
 
-        images = CompileImageAnalysisFactory.serializer.load(path)
+        images = binary_compilation.load(path)
         self._logger.info("Loaded {0} compiled images".format(len(images)))
 
         self._reindex_plates(images)
 
         if sort_mode is FIRST_PASS_SORTING.Time:
-            self._image_models = list(CompileImageAnalysisFactory.copy_iterable_of_model_update_indices(images))
+            # The images were just loaded so there's no need to copy them
+            images = sorted(images, key=_get_time_stamp)
+            for index, image in enumerate(images):
+                image.image.index = index
+            self._set_image_models(images)
         else:
-            self._image_models = list(CompileImageAnalysisFactory.copy_iterable_of_model_update_time(images))
+            self._set_image_models(list(CompileImageAnalysisFactory.copy_iterable_of_model_update_time(images)))
 
         self._loading_length = len(self._image_models)
 
+    def _set_image_models(self, image_models):
+
+        # Sorting is linear when the models consist of already sorted runs
+        self._image_models = sorted(image_models, key=_get_time_stamp)
+        self._arrays = {}
+
     @staticmethod
     def _reindex_plates(images):
 
@@ -118,16 +145,76 @@ class CompilationResults(object):
             item %= len(self._image_models)
 
         try:
-            return sorted(self._image_models, key=lambda x: x.image.time_stamp)[item]
+            return self._image_models[item]
         except (ValueError, IndexError):
             return None
 
+    def __iter__(self):
+
+        return iter(list(self._image_models))
+
     def keys(self):
 
         if self._image_models is None:
             return []
         return range(len(self._image_models))
 
+    def _get_array(self, name, get_values):
+
+        if name not in self._arrays:
+            values = [get_values(model) for model in self._image_models]
+            length = max([len(v) for v in values if v is not None] or [0])
+            array = np.full((len(values), length), np.nan, dtype=np.float)
+            for row, value in zip(array, values):
+                if value is not None and len(value) == length:
+                    row[:] = value
+            self._arrays[name] = array
+        return self._arrays[name]
+
+    @property
+    def time_stamps(self):
+        """Time stamps of the images in time order.
+
+        :rtype: numpy.ndarray
+        """
+        if 'time_stamps' not in self._arrays:
+            self._arrays['time_stamps'] = np.fromiter(
+                (model.image.time_stamp for model in self._image_models), dtype=np.float,
+                count=len(self._image_models))
+        return self._arrays['time_stamps'].copy()
+
+    @property
+    def grayscale_values(self):
+        """Measured grayscale segment values of the images in time order.
+
+        Images lacking grayscale values have all values as NaN.
+
+        :rtype: numpy.ndarray
+        """
+        return self._get_array(
+            'grayscale_values',
+            lambda model: model.fixture.grayscale.values if model.fixture.grayscale else None).copy()
+
+    @property
+    def marker_positions(self):
+        """Detected orientation marker positions of the images in time
+        order as an array with shape (images, 2, markers), the second
+        dimension being x and y.
+
+        Images lacking markers have all positions as NaN.
+
+        :rtype: numpy.ndarray
+        """
+        def get_marks(model):
+            x = model.fixture.orientation_marks_x
+            y = model.fixture.orientation_marks_y
+            if x is None or y is None or len(x) != len(y):
+                return None
+            return list(x) + list(y)
+
+        positions = self._get_array('marker_positions', get_marks)
+        return positions.reshape(positions.shape[0], 2, positions.shape[1] // 2).copy()
+
     def __add__(self, other):
 
         """
@@ -150,7 +237,6 @@ class CompilationResults(object):
             other_image_models.append(model)
 
         other_image_models += self._image_models
-        other_image_models = sorted(other_image_models, key=lambda x: x.image.time_stamp)
 
         return CompilationResults.create_from_data(self._compilation_path, self._compile_instructions,
                                                    other_image_models, self._used_models, self._scanner_instructions)
@@ -215,7 +301,7 @@ class CompilationResults(object):
 
     def recycle(self):
 
-        self._image_models += self._used_models
+        self._set_image_models(self._image_models + self._used_models[::-1])
         self._used_models = []
         self._current_model = None
 
@@ -227,8 +313,9 @@ class CompilationResults(object):
         model = self[-1]
         self._current_model = model
         if model:
-            self._image_models.remove(model)
+            self._image_models.pop()
             self._used_models.append(model)
+            self._arrays = {}
         return model
 
     def dump(self, directory, new_name=None, force_dump_scan_instructions=False):
@@ -0,0 +1,297 @@
+"""Chunked storage of the growth data of a project.
+
+The image analysis measures every colony of every plate once per image.
+Instead of one file per image, each plate has a file of chunks of shape
+`(rows, columns, CHUNK_SIZE)` where a chunk holds `CHUNK_SIZE`
+consecutive image indices. Writing an image sets one time slice in the
+chunk of its index, adding chunks at the end of the file when needed, so
+a colony's curve or a whole plate can be read without reading the other
+plates or any unused chunks.
+
+A small index holds the time of each image, which images have been
+written and the shape of each plate. It is replaced atomically after
+the time slices have been written, so readers never see partially
+written images.
+"""
+from __future__ import absolute_import
+
+import glob
+import os
+import re
+
+import numpy as np
+
+from scanomatic.io.logger import Logger
+from scanomatic.io.paths import Paths
+from scanomatic.io.pickler import load_numpy
+
+CHUNK_SIZE = 64
+DTYPE = np.dtype('<f8')
+
+_MISSING = -1
+_logger = Logger("Growth Store")
+
+
+def get_index_path(directory_path):
+
+    return os.path.join(directory_path, Paths().image_analysis_growth_store_index)
+
+
+def get_plate_path(directory_path, plate):
+
+    return os.path.join(directory_path, Paths().image_analysis_growth_store_plate.format(plate))
+
+
+def has_store(directory_path):
+    """If there is a growth store in the directory"""
+    return os.path.isfile(get_index_path(directory_path))
+
+
+def remove_store(directory_path):
+    """Removes the growth store of a directory.
+
+    Returns: The number of removed files
+    """
+    paths = [get_index_path(directory_path)] + glob.glob(get_plate_path(directory_path, '*'))
+    removed = 0
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        removed += 1
+    return removed
+
+
+class GrowthStore(object):
+    """The growth data of the images of a project.
+
+    Args:
+        directory_path: The analysis directory of the project
+
+    Times are in hours. Reads only return the images that have been
+    written, ordered by image index.
+    """
+    def __init__(self, directory_path):
+
+        self._directory = directory_path
+        self._chunk_size = CHUNK_SIZE
+        self._times = np.array([], dtype=np.float)
+        self._written = np.array([], dtype=np.bool)
+        self._shapes = np.zeros((0, 2), dtype=np.int)
+        if has_store(directory_path):
+            self._load_index()
+
+    @property
+    def indices(self):
+        """The written image indices"""
+        return np.flatnonzero(self._written)
+
+    @property
+    def image_times(self):
+        """The time of each image index, `nan` if it isn't known"""
+        return self._times
+
+    @property
+    def times(self):
+        """The times of the written images"""
+        return self._times[self._written]
+
+    @property
+    def plates(self):
+        """The number of plates"""
+        return len(self._shapes)
+
+    def get_plate_shape(self, plate):
+        """The shape of a plate or `None` if it has no data"""
+        if plate >= self.plates or self._shapes[plate][0] == _MISSING:
+            return None
+        return tuple(self._shapes[plate])
+
+    def _load_index(self):
+
+        with np.load(get_index_path(self._directory)) as npz:
+            self._chunk_size = int(npz['chunk_size'])
+            self._times = npz['times']
+            self._written = npz['written']
+            self._shapes = npz['shapes']
+
+    def _save_index(self):
+
+        path = get_index_path(self._directory)
+        with open(path + '.tmp', 'wb') as fh:
+            np.savez(
+                fh, chunk_size=np.array(self._chunk_size), times=self._times,
+                written=self._written, shapes=self._shapes)
+        os.rename(path + '.tmp', path)
+
+    def _set_image_count(self, images):
+
+        if images > self._times.size:
+            self._times = np.r_[self._times, np.ones((images - self._times.size,)) * np.nan]
+            self._written = np.r_[self._written, np.zeros((images - self._written.size,), dtype=np.bool)]
+
+    def set_time(self, index, time):
+        """Sets the time of an image.
+
+        Args:
+            index: The image index
+            time: The time in hours
+        """
+        self._set_image_count(index + 1)
+        self._times[index] = time
+        self._save_index()
+
+    def write(self, index, plates):
+        """Writes the growth data of an image.
+
+        Args:
+            index: The image index
+            plates: The data of each plate or `None` for plates without
+                data
+
+        Raises:
+            ValueError: If a plate doesn't have the shape of previously
+                written data of the plate
+        """
+        plates = list(plates)
+        if len(plates) > self.plates:
+            self._shapes = np.r_[
+                self._shapes, np.ones((len(plates) - self.plates, 2), dtype=np.int) * _MISSING]
+
+        for plate, data in enumerate(plates):
+
+            if data is None:
+                continue
+
+            data = np.asarray(data, dtype=DTYPE)
+            shape = self.get_plate_shape(plate)
+            if shape is None:
+                self._shapes[plate] = data.shape
+            elif data.shape != shape:
+                raise ValueError("Plate {0} of shape {1} doesn't fit previous shape {2}".format(
+                    plate, data.shape, shape))
+
+            chunk = self._get_chunk(plate, index // self._chunk_size)
+            chunk[:, :, index % self._chunk_size] = data
+            chunk.flush()
+            del chunk
+
+        self._set_image_count(index + 1)
+        self._written[index] = True
+        self._save_index()
+
+    def _get_chunk_bytes(self, plate):
+
+        rows, columns = self._shapes[plate]
+        return int(rows * columns * self._chunk_size * DTYPE.itemsize)
+
+    def _get_chunk(self, plate, chunk_index):
+
+        path = get_plate_path(self._directory, plate)
+        chunk_bytes = self._get_chunk_bytes(plate)
+        chunks = os.path.getsize(path) // chunk_bytes if os.path.isfile(path) else 0
+        if chunks <= chunk_index:
+            empty = np.ones((chunk_bytes // DTYPE.itemsize,), dtype=DTYPE) * np.nan
+            with open(path, 'ab') as fh:
+                for _ in range(chunks, chunk_index + 1):
+                    empty.tofile(fh)
+
+        return np.memmap(
+            path, dtype=DTYPE, mode='r+', offset=chunk_index * chunk_bytes,
+            shape=tuple(self._shapes[plate]) + (self._chunk_size,))
+
+    def _get_plate_chunks(self, plate):
+
+        shape = self.get_plate_shape(plate)
+        path = get_plate_path(self._directory, plate)
+        if shape is None or not os.path.isfile(path):
+            return None
+        chunks = os.path.getsize(path) // self._get_chunk_bytes(plate)
+        return np.memmap(path, dtype=DTYPE, mode='r', shape=(chunks,) + shape + (self._chunk_size,))
+
+    def _get_chunk_positions(self, chunks, offset):
+
+        indices = self.indices[offset:]
+        chunk_indices = indices // self._chunk_size
+        # Images where the plate had no data may be beyond the end of its file
+        beyond = chunk_indices >= chunks.shape[0]
+        return np.where(beyond, 0, chunk_indices), indices % self._chunk_size, beyond
+
+    def read_plate(self, plate, offset=0):
+        """Reads the growth data of a plate.
+
+        Args:
+            plate: The plate index
+            offset: The number of first written images to skip
+
+        Returns:
+            Array of shape `(rows, columns, times)` or `None` if the plate
+            has no data
+        """
+        chunks = self._get_plate_chunks(plate)
+        if chunks is None:
+            return None
+
+        chunk_indices, positions, beyond = self._get_chunk_positions(chunks, offset)
+        data = np.array(chunks[chunk_indices, :, :, positions].transpose(1, 2, 0))
+        data[..., beyond] = np.nan
+        return data
+
+    def read_curve(self, plate, row, column):
+        """Reads the growth curve of a colony.
+
+        Returns:
+            Array of the curve or `None` if the plate has no data
+        """
+        chunks = self._get_plate_chunks(plate)
+        if chunks is None:
+            return None
+
+        chunk_indices, positions, beyond = self._get_chunk_positions(chunks, 0)
+        curve = np.array(chunks[chunk_indices, row, column, positions])
+        curve[beyond] = np.nan
+        return curve
+
+    def read(self, offset=0):
+        """Reads the growth data of all plates.
+
+        Args:
+            offset: The number of first written images to skip
+
+        Returns:
+            tuple of the times and the data of the plates, structured as
+            by `ImageData.convert_per_time_to_per_plate`
+        """
+        return self.times[offset:], np.array([self.read_plate(plate, offset) for plate in range(self.plates)])
+
+
+def convert(directory_path):
+    """Writes the growth store of a directory with image data files,
+    replacing any previous growth store.
+
+    Returns: The number of converted images
+    """
+    paths = Paths()
+    remove_store(directory_path)
+    store = GrowthStore(directory_path)
+
+    times_path = os.path.join(directory_path, paths.image_analysis_time_series)
+    times = load_numpy(times_path) if os.path.isfile(times_path) else np.array([], dtype=np.float)
+    for index, time in enumerate(times):
+        if np.isfinite(time):
+            store.set_time(index, time)
+
+    images = 0
+    image_pattern = re.compile(re.escape(paths.image_analysis_img_data).replace(re.escape('{0}'), r'(\d+)') + '$')
+    for path in glob.glob(os.path.join(directory_path, paths.image_analysis_img_data.format('*'))):
+
+        match = image_pattern.search(os.path.basename(path))
+        if match is None:
+            continue
+
+        store.write(int(match.group(1)), load_numpy(path))
+        images += 1
+
+    _logger.info("Converted {0} images of {1}".format(images, directory_path))
+    return images
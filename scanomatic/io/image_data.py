@@ -12,7 +12,8 @@ import numpy as np
 
 import scanomatic.io.logger as logger
 import scanomatic.io.paths as paths
-from scanomatic.io.pickler import unpickle_with_unpickler
+from scanomatic.io.growth_store import GrowthStore, has_store, remove_store
+from scanomatic.io.pickler import load_numpy
 
 #
 #
@@ -44,9 +45,6 @@ class ImageData(object):
     @staticmethod
     def _write_image(path, image_index, features, output_item, output_value):
 
-        path = os.path.join(*ImageData.directory_path_to_data_path_tuple(
-            path, image_index=image_index))
-
         if features is None:
             ImageData._LOGGER.warning("Image {0} had no data".format(image_index))
             return
@@ -91,10 +89,14 @@ class ImageData(object):
                         plate_features.index
                     ))
 
-        ImageData._LOGGER.info("Saved Image Data '{0}' with {1} plates".format(
-            path, len(plates)))
+        try:
+            GrowthStore(path).write(image_index, plates)
+        except ValueError:
+            ImageData._LOGGER.exception("Could not store image data {0} in '{1}'".format(image_index, path))
+            return False
 
-        np.save(path, plates)
+        ImageData._LOGGER.info("Saved Image Data {0} in '{1}' with {2} plates".format(
+            image_index, path, len(plates)))
         return True
 
     @staticmethod
@@ -106,28 +108,23 @@ class ImageData(object):
         """
         global _SECONDS_PER_HOUR
 
-        if not overwrite:
-            current_data = ImageData.read_times(analysis_model.output_directory)
-        else:
-            current_data = np.array([], dtype=np.float)
-
-        if not (image_model.image.index < current_data.size):
-            current_data = np.r_[
-                current_data,
-                [None] * (1 + image_model.image.index - current_data.size)].astype(np.float)
+        if overwrite:
+            remove_store(analysis_model.output_directory)
 
-        current_data[image_model.image.index] = image_model.image.time_stamp / _SECONDS_PER_HOUR
-        np.save(os.path.join(*ImageData.directory_path_to_data_path_tuple(analysis_model.output_directory, times=True)),
-                current_data)
+        GrowthStore(analysis_model.output_directory).set_time(
+            image_model.image.index, image_model.image.time_stamp / _SECONDS_PER_HOUR)
 
     @staticmethod
     def read_times(path):
 
+        if has_store(path):
+            return GrowthStore(path).image_times
+
         path = os.path.join(*ImageData.directory_path_to_data_path_tuple(path, times=True))
         ImageData._LOGGER.info("Reading times from {0}".format(
             path))
         if os.path.isfile(path):
-            return unpickle_with_unpickler(np.load, path)
+            return load_numpy(path)
         else:
             ImageData._LOGGER.warning("Times data file not found")
             return np.array([], dtype=np.float)
@@ -136,7 +133,7 @@ class ImageData(object):
     def read_image(path):
 
         if os.path.isfile(path):
-            return unpickle_with_unpickler(np.load, path)
+            return load_numpy(path)
         else:
             return None
 
@@ -237,7 +234,7 @@ class ImageData(object):
         return np.array(new_data)
 
     @staticmethod
-    def read_image_data_and_time(path):
+    def read_image_data_and_time(path, offset=0):
         """Reads all images data files in a directory and report the
         indices used and data restructured per plate.
 
@@ -245,11 +242,18 @@ class ImageData(object):
 
             path (string):  The path to the directory with the files.
 
+            offset (int):   Optional number of first time points to skip.
+
         Retruns:
 
             tuple (numpy array of time points, numpy array of data)
 
+        Uses the growth store of the directory if there is one and
+        otherwise the image data files.
         """
+        if has_store(path):
+            return GrowthStore(path).read(offset)
+
         times = ImageData.read_times(path)
 
         data = []
@@ -258,7 +262,7 @@ class ImageData(object):
 
             try:
                 time_indices.append(int(re.findall(r"\d+", p)[-1]))
-                data.append(unpickle_with_unpickler(np.load, p))
+                data.append(load_numpy(p))
             except AttributeError:
                 ImageData._LOGGER.warning(
                     "File '{0}' has no index number in it, need that!".format(
@@ -272,5 +276,35 @@ class ImageData(object):
             return None, None
 
         sort_list = np.array(time_indices).argsort()
-        return times[sort_list],  ImageData.convert_per_time_to_per_plate(
-            np.array(data)[sort_list])
+        data = ImageData.convert_per_time_to_per_plate(np.array(data)[sort_list])
+        if offset and data is not None:
+            data = np.array([None if plate is None else plate[..., offset:] for plate in data])
+        return times[sort_list][offset:], data
+
+    @staticmethod
+    def read_curve_and_time(path, plate, row, column):
+        """Reads the growth curve of a colony.
+
+        Args:
+
+            path (string):  The path to the directory with the files.
+
+            plate (int):    The plate index
+
+            row (int):      The row of the colony
+
+            column (int):   The column of the colony
+
+        Returns:
+
+            tuple (numpy array of time points, numpy array of the curve)
+
+        """
+        if has_store(path):
+            store = GrowthStore(path)
+            return store.times, store.read_curve(plate, row, column)
+
+        times, data = ImageData.read_image_data_and_time(path)
+        if data is None:
+            return None, None
+        return times, data[plate][row, column]
@@ -6,9 +6,9 @@ import os
 import numpy as np
 
 from scanomatic.image_analysis.image_basics import load_image_to_numpy
-from scanomatic.io import logger
+from scanomatic.io import binary_compilation, logger
 from scanomatic.io.paths import Paths
-from scanomatic.io.pickler import unpickle_with_unpickler
+from scanomatic.io.pickler import load_numpy
 from scanomatic.models.factories.compile_project_factory import (
     CompileImageAnalysisFactory
 )
@@ -76,10 +76,8 @@ def slice_im(plate_im, colony_position, colony_size):
 
 def _load_grid_info(analysis_directory, plate):
     # grids number +1
-    grid = unpickle_with_unpickler(
-        np.load, os.path.join(analysis_directory, Paths().grid_pattern.format(plate + 1)))
-    grid_size = unpickle_with_unpickler(
-        np.load, os.path.join(analysis_directory, Paths().grid_size_pattern.format((plate + 1))))
+    grid = load_numpy(os.path.join(analysis_directory, Paths().grid_pattern.format(plate + 1)))
+    grid_size = load_numpy(os.path.join(analysis_directory, Paths().grid_size_pattern.format((plate + 1))))
     return grid, grid_size
 
 
@@ -88,7 +86,10 @@ def load_colony_image(position, compilation_result=None, analysis_directory=None
 
     if not compilation_result:
         compilation_file = _get_project_compilation(analysis_directory, file_name=compilation_file_name)
-        compilation_result = CompileImageAnalysisFactory.serializer.load(compilation_file)[time_index]
+        if binary_compilation.is_current(compilation_file):
+            compilation_result = binary_compilation.BinaryCompilation(compilation_file)[time_index]
+        else:
+            compilation_result = CompileImageAnalysisFactory.serializer.load(compilation_file)[time_index]
         if not experiment_directory:
             experiment_directory = os.path.dirname(compilation_file)
 
@@ -144,7 +145,7 @@ def load_colony_images_for_animation(analysis_directory, position, project_compi
 
     grid, grid_size = _load_grid_info(analysis_directory, position[0])
 
-    compilation_results = CompileImageAnalysisFactory.serializer.load(project_compilation)
+    compilation_results = binary_compilation.load(project_compilation)
     compilation_results = sorted(compilation_results, key=lambda e: e.image.index)
 
     times = np.array(tuple(entry.image.time_stamp for entry in compilation_results))
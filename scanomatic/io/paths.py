@@ -112,16 +112,23 @@ class Paths(SingeltonOneInit):
         self.ui_server_phenotype_state_lock = "phenotypes_state.lock"
         self.phenotypes_csv_pattern = "phenotypes.{0}.plate_{1}.csv"
         self.phenotypes_raw_npy = "phenotypes_raw.npy"
+        self.phenotypes_raw_store = "phenotypes_raw.npz"
         self.vector_phenotypes_raw = "phenotypes_vectors_raw.npy"
         self.vector_meta_phenotypes_raw = "phenotypes_meta_vector_raw.npy"
+        self.vector_meta_phenotypes_raw_store = "phenotypes_meta_vector_raw.npz"
         self.normalized_phenotypes = "normalized_phenotypes.npy"
+        self.normalized_phenotypes_store = "normalized_phenotypes.npz"
         self.phenotypes_filter = "phenotypes_filter.npy"
+        self.phenotypes_filter_store = "phenotypes_filter.npz"
         self.phenotypes_reference_offsets = "phenotypes_reference_offsets.npy"
         self.phenotypes_filter_undo = "phenotypes_filter.undo.pickle"
+        self.phenotypes_filter_journal = "phenotypes_filter.journal.pickle"
         self.phenotypes_meta_data = "meta_data.pickle"
         self.phenotypes_meta_data_original_file_patern = "meta_data_{0}.{1}"
         self.phenotypes_input_data = "curves_raw.npy"
         self.phenotypes_input_smooth = "curves_smooth.npy"
+        self.phenotypes_input_data_plate = "curves_raw.plate_{0}.npy"
+        self.phenotypes_input_smooth_plate = "curves_smooth.plate_{0}.npy"
         self.phenotypes_extraction_params = "phenotype_params.npy"
         self.phenotype_times = "phenotype_times.npy"
 
@@ -130,10 +137,14 @@ class Paths(SingeltonOneInit):
 
         self.image_analysis_img_data = "image_{0}_data.npy"
         self.image_analysis_time_series = "time_data.npy"
+        self.image_analysis_growth_store_index = "growth_data.index.npz"
+        self.image_analysis_growth_store_plate = "growth_data.plate_{0}.dat"
 
         self.project_compilation_from_scanning_pattern_old = "{0}.project.settings"
         self.project_compilation_from_scanning_pattern = "{0}.project.compilation.original"
         self.project_compilation_pattern = "{0}.project.compilation"
+        self.project_compilation_binary_pattern = "{0}.bin"
+        self.project_compilation_binary_index_pattern = "{0}.bin.index"
         self.project_compilation_instructions_pattern = "{0}.project.compilation.instructions"
         self.project_compilation_log_pattern = "{0}.project.compilation.log"
 
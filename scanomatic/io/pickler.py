@@ -1,9 +1,14 @@
 from __future__ import absolute_import
 
 from StringIO import StringIO
-from cPickle import Unpickler, UnpicklingError, load
+from cPickle import Unpickler, UnpicklingError, dump, load
 import os
 
+import numpy as np
+from numpy.lib import format as npy_format
+
+_LEGACY_MODULES = ("scanomatic.data_processing.curve_phase_phenotypes",)
+
 
 def unpickle(path):
     """Unpickles data safely
@@ -69,6 +74,105 @@ def unpickle_with_unpickler(unpickler, path, *args, **kwargs):
     return unpickler(safe_load(path), *args, **kwargs)
 
 
+def _is_numeric_npy(path):
+    """If the file is a `.npy`-file of an array without python objects,
+    judging by its header."""
+    try:
+        with open(path, 'rb') as fh:
+            version = npy_format.read_magic(fh)
+            if version == (1, 0):
+                _, _, dtype = npy_format.read_array_header_1_0(fh)
+            elif version == (2, 0):
+                _, _, dtype = npy_format.read_array_header_2_0(fh)
+            else:
+                return False
+    except (IOError, ValueError):
+        return False
+
+    return not dtype.hasobject
+
+
+def load_numpy(path, mmap_mode=None):
+    """Loads a `.npy`-file
+
+    Arrays are read directly by numpy. Only arrays of objects that fail
+    to unpickle because they refer to refactored modules, i.e. that
+    haven't been migrated, are unpickled with the compatibility
+    handling of `unpickle_with_unpickler`.
+
+    Args:
+        path (str): Path to the file
+        mmap_mode (str): Optional mode for memory-mapping arrays of
+            numbers, see `numpy.load`
+
+    Returns: Loaded array
+    """
+    if _is_numeric_npy(path):
+        return np.load(path, mmap_mode=mmap_mode)
+
+    try:
+        return np.load(path)
+    except (ImportError, AttributeError):
+        return unpickle_with_unpickler(np.load, path)
+
+
+def _pickle_to_file(fh, data):
+
+    dump(data, fh)
+
+
+def migrate(path):
+    """Rewrites a pickle or a `.npy`-file of objects that refers to
+    refactored modules so that it no longer needs to be rewritten while
+    loading.
+
+    Args:
+        path (str): Path to the file
+
+    Returns: If the file was rewritten
+    """
+    if _is_numeric_npy(path):
+        return False
+
+    with open(path, 'rb') as fh:
+        data = fh.read()
+
+    if not any(module in data for module in _LEGACY_MODULES):
+        return False
+
+    if data.startswith(npy_format.MAGIC_PREFIX):
+        content = unpickle_with_unpickler(np.load, path)
+        save = np.save
+    else:
+        content = unpickle(path)
+        save = _pickle_to_file
+
+    with open(path + '.tmp', 'wb') as fh:
+        save(fh, content)
+    os.rename(path + '.tmp', path)
+    return True
+
+
+def migrate_directory(path):
+    """Rewrites all pickles and `.npy`-files in a directory and its
+    subdirectories that refer to refactored modules.
+
+    Args:
+        path (str): Path to the directory
+
+    Returns: The paths of the rewritten files
+    """
+    migrated = []
+    for directory, _, file_names in os.walk(path):
+        for file_name in file_names:
+            if os.path.splitext(file_name)[1] in ('.npy', '.pickle'):
+                file_path = os.path.join(directory, file_name)
+                if migrate(file_path):
+                    migrated.append(file_path)
+
+    return migrated
+
+
 class _RefactoringPhases(object):
     def __init__(self):
         """Rewrites pickled data to match refactorings
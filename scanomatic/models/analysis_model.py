@@ -76,7 +76,8 @@ class AnalysisModel(model.Model):
             chain=True,
             plate_image_inclusion=None,
             cell_count_calibration=None,
-            cell_count_calibration_id=None):
+            cell_count_calibration_id=None,
+            workers=1):
 
         if grid_model is None:
             grid_model = GridModel()
@@ -101,6 +102,7 @@ class AnalysisModel(model.Model):
         self.image_data_output_measure = image_data_output_measure
         self.chain = chain
         self.plate_image_inclusion = plate_image_inclusion
+        self.workers = workers
         super(AnalysisModel, self).__init__()
 
 
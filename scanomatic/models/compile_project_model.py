@@ -25,7 +25,7 @@ class CompileInstructionsModel(Model):
                  start_time=0.0, images=tuple(), path="", start_condition="",
                  fixture_type=FIXTURE.Local, fixture_name=None, email="",
                  overwrite_pinning_matrices=None,
-                 cell_count_calibration_id="default"):
+                 cell_count_calibration_id="default", workers=1):
 
         self.compile_action = compile_action
         self.images = images
@@ -37,6 +37,7 @@ class CompileInstructionsModel(Model):
         self.email = email
         self.overwrite_pinning_matrices = overwrite_pinning_matrices
         self.cell_count_calibration_id = cell_count_calibration_id
+        self.workers = workers
 
         super(CompileInstructionsModel, self).__init__()
 
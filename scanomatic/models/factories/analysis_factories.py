@@ -101,6 +101,7 @@ class AnalysisModelFactory(AbstractModelFactory):
         'plate_image_inclusion': (tuple, str),
         'cell_count_calibration': (tuple, float),
         'cell_count_calibration_id': str,
+        'workers': int,
     }
 
     @classmethod
@@ -151,7 +152,7 @@ class AnalysisModelFactory(AbstractModelFactory):
 
         # Add introduced but not mandatory
         keys = set(keys).union((
-            'cell_count_calibration_id', 'cell_count_calibration',
+            'cell_count_calibration_id', 'cell_count_calibration', 'workers',
         ))
 
         return super(AnalysisModelFactory, cls).all_keys_valid(keys)
@@ -284,6 +285,16 @@ class AnalysisModelFactory(AbstractModelFactory):
             return True
         return model.FIELD_TYPES.grid_images
 
+    @classmethod
+    def _validate_workers(cls, model):
+        """
+
+        :type model: scanomatic.models.analysis_model.AnalysisModel
+        """
+        if isinstance(model.workers, int) and model.workers > 0:
+            return True
+        return model.FIELD_TYPES.workers
+
     @classmethod
     def _validate_grid_model(cls, model):
         """
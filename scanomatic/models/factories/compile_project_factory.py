@@ -111,6 +111,7 @@ class CompileProjectFactory(AbstractModelFactory):
         'fixture_name': str,
         'overwrite_pinning_matrices': (tuple, tuple, int),
         'cell_count_calibration_id': str,
+        'workers': int,
     }
 
     @classmethod
@@ -198,6 +199,15 @@ class CompileProjectFactory(AbstractModelFactory):
         else:
             return model.FIELD_TYPES.fixture_type
 
+    @classmethod
+    def _validate_workers(cls, model):
+        """
+        :type model: scanomatic.models.compile_project_model.CompileInstructionsModel
+        """
+        if isinstance(model.workers, int) and model.workers > 0:
+            return True
+        return model.FIELD_TYPES.workers
+
     @classmethod
     def _validate_cell_count_calibration_id(cls, model):
         """
@@ -17,7 +17,8 @@ class FeaturesFactory(AbstractModelFactory):
         "analysis_directory": str,
         "email": email_serializer,
         "extraction_data": features_model.FeatureExtractionData,
-        "try_keep_qc": bool
+        "try_keep_qc": bool,
+        "workers": int,
     }
 
     @classmethod
@@ -33,6 +34,20 @@ class FeaturesFactory(AbstractModelFactory):
             return True
         return model.FIELD_TYPES.analysis_directory
 
+    @classmethod
+    def _validate_extraction_data(cls, model):
+
+        if isinstance(model.extraction_data, features_model.FeatureExtractionData):
+            return True
+        return model.FIELD_TYPES.extraction_data
+
+    @classmethod
+    def _validate_workers(cls, model):
+
+        if isinstance(model.workers, int) and model.workers > 0:
+            return True
+        return model.FIELD_TYPES.workers
+
     @classmethod
     def create(cls, **settings):
         """:rtype : scanomatic.models.features_model.FeaturesModel"""
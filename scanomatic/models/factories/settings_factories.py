@@ -43,6 +43,8 @@ class UIServerFactory(AbstractModelFactory):
         "port": int,
         "host": str,
         "master_key": str,
+        "phenotyper_cache_entries": int,
+        "phenotyper_cache_megabytes": int,
     }
 
     @classmethod
@@ -9,15 +9,17 @@ class FeatureExtractionData(Enum):
 
     Default = 0
     State = 1
+    Update = 2
 
 
 class FeaturesModel(model.Model):
 
     def __init__(self, analysis_directory="", email="", extraction_data=FeatureExtractionData.Default,
-                 try_keep_qc=False):
+                 try_keep_qc=False, workers=1):
 
         self.analysis_directory = analysis_directory
         self.email = email
         self.extraction_data = extraction_data
         self.try_keep_qc = try_keep_qc
+        self.workers = workers
         super(FeaturesModel, self).__init__()
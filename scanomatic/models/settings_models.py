@@ -30,11 +30,14 @@ class RPCServerModel(model.Model):
 
 class UIServerModel(model.Model):
 
-    def __init__(self, port=5000, host="0.0.0.0", master_key=None):
+    def __init__(self, port=5000, host="0.0.0.0", master_key=None, phenotyper_cache_entries=8,
+                 phenotyper_cache_megabytes=1024):
 
         self.port = port
         self.host = host
         self.master_key = master_key if master_key else str(uuid1())
+        self.phenotyper_cache_entries = phenotyper_cache_entries
+        self.phenotyper_cache_megabytes = phenotyper_cache_megabytes
         super(UIServerModel, self).__init__()
 
 
@@ -15,7 +15,7 @@ from scanomatic.io.image_loading import load_colony_images_for_animation
 from scanomatic.io.logger import Logger
 from scanomatic.io.movie_writer import MovieWriter
 from scanomatic.io.paths import Paths
-from scanomatic.io.pickler import unpickle_with_unpickler
+from scanomatic.io.pickler import load_numpy
 
 # This import is used in 3D plotting just not explicitly stupid matplotlib
 
@@ -49,15 +49,15 @@ def calculate_growth_curve(data_paths, blob_paths, background_paths=None):
 
     if background_paths is not None:
         return np.array([
-            (unpickle_with_unpickler(np.load, data) -
-             mid50_mean(unpickle_with_unpickler(np.load, data)[unpickle_with_unpickler(np.load, bg)]))[
-                unpickle_with_unpickler(np.load, blob)].sum()
+            (load_numpy(data) -
+             mid50_mean(load_numpy(data)[load_numpy(bg)]))[
+                load_numpy(blob)].sum()
             for data, blob, bg in zip(data_paths, blob_paths, background_paths)
         ])
 
     else:
         return np.array([
-            unpickle_with_unpickler(np.load, data)[unpickle_with_unpickler(np.load, blob)].sum()
+            load_numpy(data)[load_numpy(blob)].sum()
             for data, blob in zip(data_paths, blob_paths)
         ])
 
@@ -67,9 +67,9 @@ def plot_growth_curve(growth_data, position, ax=None, save_target=None):
     if ax is None:
         ax = plt.figure().gca()
 
-    times, data = ImageData.read_image_data_and_time(growth_data)
+    times, curve = ImageData.read_curve_and_time(growth_data, *position)
 
-    ax.semilogy(times, data[position[0]][position[1], position[2]], "g-", basey=2)
+    ax.semilogy(times, curve, "g-", basey=2)
     ax.set_xlim(xmin=0, xmax=times.max() + 1)
     ax.set_xlabel("Time [h]")
     ax.set_ylabel("Population size [cells]")
@@ -156,7 +156,7 @@ def animate_blob_detection(save_target, position, analysis_folder,
 
     image_ax = fig.axes[0]
     ims = []
-    data = unpickle_with_unpickler(np.load, files[0]).astype(np.float64)
+    data = load_numpy(files[0]).astype(np.float64)
     for i, ax in enumerate(fig.axes[:-1]):
         ims.append(ax.imshow(data, interpolation='nearest', vmin=0, vmax=(100 if i == 0 else 1)))
 
@@ -165,7 +165,7 @@ def animate_blob_detection(save_target, position, analysis_folder,
 
         for idx, index in enumerate(image_indices):
 
-            ims[0].set_data(unpickle_with_unpickler(np.load, files[idx]))
+            ims[0].set_data(load_numpy(files[idx]))
             base_name = files[idx][:-21]
             image_ax.set_title("Image (t={0:.1f}h)".format(
                 image_indices[index] if interval is None else image_indices[index] * interval))
@@ -173,9 +173,9 @@ def animate_blob_detection(save_target, position, analysis_folder,
             for j, ending in enumerate(('.background.filter.npy', '.blob.filter.npy',
                                         '.blob.trash.current.npy', '.blob.trash.old.npy')):
 
-                im_data = unpickle_with_unpickler(np.load, base_name + ending)
+                im_data = load_numpy(base_name + ending)
                 if im_data.ndim == 2:
-                    ims[j + 1].set_data(unpickle_with_unpickler(np.load, base_name + ending))
+                    ims[j + 1].set_data(load_numpy(base_name + ending))
 
             set_axvspan_width(polygon, curve_times[idx])
             _sqaure_ax(curve_ax)
@@ -204,7 +204,7 @@ def animate_3d_colony(save_target, position, analysis_folder,
 
     image_ax, curve_ax = fig.axes
 
-    data = unpickle_with_unpickler(np.load, files[0])
+    data = load_numpy(files[0])
     im = image_ax.imshow(data, interpolation='nearest', vmin=0, vmax=100)
 
     coords_x, coords_y = np.mgrid[0:data.shape[0], 0:data.shape[1]]
@@ -222,7 +222,7 @@ def animate_3d_colony(save_target, position, analysis_folder,
 
         for idx, index in enumerate(image_indices):
 
-            im.set_data(unpickle_with_unpickler(np.load, files[idx]))
+            im.set_data(load_numpy(files[idx]))
 
             # Added suffix length too
             base_name = files[idx][:-(10 + 11)]
@@ -230,7 +230,7 @@ def animate_3d_colony(save_target, position, analysis_folder,
             image_ax.set_title("Image (Time={0:.1f}h)".format(
                 image_indices[index] if interval is None else image_indices[index] * interval))
 
-            cells = unpickle_with_unpickler(np.load, base_name + ".image.cells.npy")
+            cells = load_numpy(base_name + ".image.cells.npy")
             if cells.ndim != 2:
                 cells = np.zeros_like(coords_y)
             else:
@@ -10,10 +10,8 @@ from types import StringTypes
 from matplotlib import pyplot as plt
 import numpy as np
 
+from scanomatic.io.first_pass_results import CompilationResults
 from scanomatic.io.movie_writer import MovieWriter
-from scanomatic.models.factories.compile_project_factory import (
-    CompileImageAnalysisFactory
-)
 
 _img_pattern = re.compile(r".*_[0-9]{4}_[0-9.]+\.tiff$")
 _time_pattern = re.compile(r'[0-9]+\.[0-9]*')
@@ -28,19 +26,24 @@ def _input_validate(f):
             if isinstance(args[0], StringTypes):
 
                 args = list(args)
-                args[0] = CompileImageAnalysisFactory.serializer.load(args[0])
+                args[0] = CompilationResults(args[0])
+
+            elif not isinstance(args[0], CompilationResults):
+
+                args = list(args)
+                args[0] = CompilationResults.create_from_data(None, None, args[0])
 
         return f(*args, **kwargs)
 
     return wrapped
 
 
+@_input_validate
 def simulate_positioning(project_compilation, positioning):
 
     assert positioning in ('detected', 'probable', 'one-time'), "Not understood positioning mode"
 
-    positions = np.array([(image.fixture.orientation_marks_x, image.fixture.orientation_marks_y)
-                          for image in project_compilation])
+    positions = project_compilation.marker_positions
 
     if positioning == "probable":
 
@@ -56,7 +59,7 @@ def simulate_positioning(project_compilation, positioning):
 @_input_validate
 def get_grayscale_variability(project_compilation):
 
-    data = np.array([i.fixture.grayscale.values for i in project_compilation])
+    data = project_compilation.grayscale_values
 
     return np.var(data, axis=0) / np.mean(data, axis=0)
 
@@ -64,22 +67,19 @@ def get_grayscale_variability(project_compilation):
 @_input_validate
 def get_grayscale_outlier_images(project_compilation, max_distance=3.0, only_image_indices=False):
 
-    data = np.array([image.fixture.grayscale.values for image in project_compilation])
+    data = project_compilation.grayscale_values
     norm = np.median(data, axis=0)
     sq_distances = np.sum((data - norm) ** 2, axis=1)
     threshold = max_distance ** 2 * np.median(sq_distances)
-    return [(i if only_image_indices else image) for i, image in enumerate(project_compilation)
-            if sq_distances[i] > threshold]
+    outliers = np.flatnonzero(sq_distances > threshold)
+    return [(i if only_image_indices else project_compilation[i]) for i in outliers]
 
 
 @_input_validate
 def plot_grayscale_histogram(project_compilation, mark_outliers=True, max_distance=3.0, save_target=None):
 
-    data = [image.fixture.grayscale.values for image in project_compilation]
-    length = max(len(v) for v in data if v is not None)
-    empty = np.zeros((length,), dtype=float) * np.inf
-    data = [empty if d is None else d for d in data]
-    data = np.array(data)
+    data = project_compilation.grayscale_values
+    data[np.isnan(data)] = np.inf
     if mark_outliers:
         outliers = get_grayscale_outlier_images(project_compilation, max_distance) if mark_outliers else []
     else:
@@ -172,7 +172,7 @@ def animate_marker_positions(project_compilation, fig=None, slice_size=201,
 @_input_validate
 def get_irregular_intervals(project_compilation, max_deviation=0.05):
 
-    return _get_irregular_intervals([i.image.time_stamp for i in project_compilation], max_deviation)
+    return _get_irregular_intervals(project_compilation.time_stamps, max_deviation)
 
 
 def get_irregular_intervals_from_file_names(directory, max_deviation=0.05):
@@ -259,8 +259,7 @@ def get_positional_marker_outlier_images(project_compilation, max_distance=4, on
 
 def _get_marker_sorted_data(project_compilation):
 
-    data = np.array([(image.fixture.orientation_marks_x, image.fixture.orientation_marks_y) for
-                     image in project_compilation])
+    data = project_compilation.marker_positions
     lengths = data.sum(axis=1)
     norm = np.median(lengths, axis=0)
     sortorder = np.argmin(np.subtract.outer(lengths, norm) ** 2, axis=-1)
@@ -9,8 +9,10 @@ import time
 
 from scanomatic.data_processing.phenotyper import remove_state_from_path
 import scanomatic.image_analysis.analysis_image as analysis_image
+import scanomatic.image_analysis.analysis_pipeline as analysis_pipeline
 from scanomatic.io.app_config import Config as AppConfig
 import scanomatic.io.first_pass_results as first_pass_results
+import scanomatic.io.growth_store as growth_store
 import scanomatic.io.image_data as image_data
 from scanomatic.io.paths import Paths
 import scanomatic.io.rpc_client as rpc_client
@@ -80,6 +82,7 @@ class AnalysisEffector(proc_effector.ProcessEffector):
 
         self._current_image_model = None
         """:type : scanomatic.models.compile_project_model.CompileImageAnalysisModel"""
+        self._analysed_images = None
         self._analysis_needs_init = True
 
     @property
@@ -128,6 +131,9 @@ class AnalysisEffector(proc_effector.ProcessEffector):
 
     def _finalize_analysis(self):
 
+        if self._analysed_images is not None:
+            self._analysed_images.close()
+
         self._logger.info("ANALYSIS, Full analysis took {0} minutes".format(
             ((time.time() - self._start_time) / 60.0)))
 
@@ -160,62 +166,74 @@ Scan-o-Matic""", self._analysis_job)
 
         self._running = False
 
-    def _analyze_image(self):
+    def _iterate_image_models(self):
+        """Yields the image models to analyse, with one time settings
+        applied, in the order they should be analysed.
 
-        scan_start_time = time.time()
-        image_model = self._first_pass_results.get_next_image_model()
+        :rtype: collections.Iterable[scanomatic.models.compile_project_model.CompileImageAnalysisModel]
+        """
+        while True:
 
-        if image_model is None:
-            self._stopping = True
-            return False
-        elif self._reference_compilation_image_model is None:
-            # Using the first recieved model / last in project as reference model.
-            # Used for one_time type of analysis settings
-            self._reference_compilation_image_model = image_model
+            image_model = self._first_pass_results.get_next_image_model()
 
-        # TODO: Verify that this isn't the thing causing the capping!
-        if (image_model.fixture.grayscale is None or
-                image_model.fixture.grayscale.values is None):
+            if image_model is None:
+                return
+            elif self._reference_compilation_image_model is None:
+                # Using the first recieved model / last in project as reference model.
+                # Used for one_time type of analysis settings
+                self._reference_compilation_image_model = image_model
 
-            self._logger.error(
-                "No grayscale analysis results for '{0}' means image not included in analysis".format(
-                image_model.image.path))
-            return True
+            # TODO: Verify that this isn't the thing causing the capping!
+            if (image_model.fixture.grayscale is None or
+                    image_model.fixture.grayscale.values is None):
 
+                self._logger.error(
+                    "No grayscale analysis results for '{0}' means image not included in analysis".format(
+                    image_model.image.path))
+                continue
 
-        # Overwrite grayscale with previous if has been requested
-        if self._analysis_job.one_time_grayscale:
+            # Overwrite grayscale with previous if has been requested
+            if self._analysis_job.one_time_grayscale:
 
-            self._logger.info("Using the grayscale detected on {0} for {1}".format(
-                self._reference_compilation_image_model.image.path,
-                image_model.image.path))
+                self._logger.info("Using the grayscale detected on {0} for {1}".format(
+                    self._reference_compilation_image_model.image.path,
+                    image_model.image.path))
 
-            image_model.fixture.grayscale = GrayScaleAreaModelFactory.copy(
-                    self._reference_compilation_image_model.fixture.grayscale)
+                image_model.fixture.grayscale = GrayScaleAreaModelFactory.copy(
+                        self._reference_compilation_image_model.fixture.grayscale)
 
-        # Overwrite plate positions if requested
-        if self._analysis_job.one_time_positioning:
+            # Overwrite plate positions if requested
+            if self._analysis_job.one_time_positioning:
 
-            self._logger.info("Using plate positions detected on {0} for {1}".format(
-                self._reference_compilation_image_model.image.path,
-                image_model.image.path))
+                self._logger.info("Using plate positions detected on {0} for {1}".format(
+                    self._reference_compilation_image_model.image.path,
+                    image_model.image.path))
 
-            image_model.fixture.orientation_marks_x = \
-                [v for v in self._reference_compilation_image_model.fixture.orientation_marks_x]
-            image_model.fixture.orientation_marks_y = \
-                [v for v in self._reference_compilation_image_model.fixture.orientation_marks_y]
-            image_model.fixture.plates = \
-                [FixturePlateFactory.copy(m) for m in self._reference_compilation_image_model.fixture.plates]
+                image_model.fixture.orientation_marks_x = \
+                    [v for v in self._reference_compilation_image_model.fixture.orientation_marks_x]
+                image_model.fixture.orientation_marks_y = \
+                    [v for v in self._reference_compilation_image_model.fixture.orientation_marks_y]
+                image_model.fixture.plates = \
+                    [FixturePlateFactory.copy(m) for m in self._reference_compilation_image_model.fixture.plates]
 
-        first_image_analysed = self._current_image_model is None
-        self._current_image_model = image_model
+            yield image_model
+
+    def _analyze_image(self):
 
-        self._logger.info("ANALYSIS, Running analysis on '{0}'".format(image_model.image.path))
+        scan_start_time = time.time()
 
-        self._image.analyse(image_model)
-        self._logger.info("Analysis took {0}, will now write out results.".format(time.time() - scan_start_time))
+        try:
+            image_model, features = next(self._analysed_images)
+        except StopIteration:
+            self._stopping = True
+            return False
+        except RuntimeError:
+            self._logger.exception("Terminating analysis since plates couldn't be analysed")
+            self._stopping = True
+            return False
 
-        features = self._image.features
+        first_image_analysed = self._current_image_model is None
+        self._current_image_model = image_model
 
         if features is None:
             self._logger.warning("Analysis features not set up correctly")
@@ -230,6 +248,16 @@ Scan-o-Matic""", self._analysis_job)
 
         return True
 
+    def _iterate_analysed_images(self):
+
+        for image_model in self._iterate_image_models():
+
+            scan_start_time = time.time()
+            self._logger.info("ANALYSIS, Running analysis on '{0}'".format(image_model.image.path))
+            self._image.analyse(image_model)
+            self._logger.info("Analysis took {0}, will now write out results.".format(time.time() - scan_start_time))
+            yield image_model, self._image.features
+
     def _setup_first_iteration(self):
 
         self._start_time = time.time()
@@ -276,6 +304,12 @@ Scan-o-Matic""", self._analysis_job)
         if not self._image.set_grid():
             self._stopping = True
 
+        if self._analysis_job.workers > 1:
+            self._analysed_images = iter(analysis_pipeline.AnalysisPipeline(
+                self._image, self._iterate_image_models(), workers=self._analysis_job.workers))
+        else:
+            self._analysed_images = self._iterate_analysed_images()
+
         self._analysis_needs_init = False
 
         self._logger.info(
@@ -322,6 +356,9 @@ Scan-o-Matic""", self._analysis_job)
         else:
             self._logger.info("Removed pre-existing time data file")
 
+        if growth_store.remove_store(self._analysis_job.output_directory):
+            self._logger.info("Removed pre-existing growth data")
+
         for i, _ in enumerate(self._analysis_job.pinning_matrices):
 
             for filename_pattern in (Paths().grid_pattern, Paths().grid_size_pattern,
@@ -5,6 +5,8 @@ import time
 
 from . import proc_effector
 from scanomatic.image_analysis import first_pass
+from scanomatic.image_analysis.compile_pipeline import CompilePipeline
+from scanomatic.io import binary_compilation
 from scanomatic.io.app_config import Config as AppConfig
 from scanomatic.io.fixtures import Fixtures, FixtureSettings
 from scanomatic.io.paths import Paths
@@ -37,6 +39,10 @@ class CompileProjectEffector(proc_effector.ProcessEffector):
         self._fixture_settings = None
         self._compile_instructions_path = None
         self._has_mailed_issues = False
+        self._compile_pipeline = None
+        self._compile_output = None
+        self._compile_binary = None
+        self._images_submitted = 0
         self._allowed_calls['progress'] = self.progress
 
     @property
@@ -115,21 +121,27 @@ class CompileProjectEffector(proc_effector.ProcessEffector):
             return super(CompileProjectEffector, self).next()
 
         if self._stopping:
+            self._close_compile_pipeline(wait=False)
             raise StopIteration()
         elif self._image_to_analyse < len(self._compile_job.images):
 
-            self._analyse_image(self._compile_job.images[self._image_to_analyse])
-            self._image_to_analyse += 1
+            if self._compile_job.workers > 1:
+                self._compile_in_pipeline()
+            else:
+                self._analyse_image(self._compile_job.images[self._image_to_analyse])
+                self._image_to_analyse += 1
             return True
 
         elif (self._compile_job.compile_action is COMPILE_ACTION.AppendAndSpawnAnalysis or
                 self._compile_job.compile_action is COMPILE_ACTION.InitiateAndSpawnAnalysis):
 
+            self._close_compile_pipeline()
             self._spawn_analysis()
             self.enact_stop()
 
         else:
 
+            self._close_compile_pipeline()
             self.enact_stop()
 
     def _analyse_image(self, compile_image_model):
@@ -139,8 +151,10 @@ class CompileProjectEffector(proc_effector.ProcessEffector):
         :type compile_image_model: scanomatic.models.compile_project_model.CompileImageModel
         """
 
+        image_model = None
         try:
 
+            binary = self._binary_compilation
             with self._compile_output_filehandle as fh:
                 issues = {}
                 try:
@@ -151,20 +165,99 @@ class CompileProjectEffector(proc_effector.ProcessEffector):
 
                 except first_pass.MarkerDetectionFailed:
 
-                    self._logger.error("Failed to detect the markers on {0} using fixture {1}".format(
-                        compile_image_model.path, self._fixture_settings.model.path))
+                    self._log_marker_detection_failed(compile_image_model)
                 except IOError:
 
-                    self._logger.error("Could not output analysis to file {0}".format(
-                        compile_image_model.path))
+                    self._log_output_failed(compile_image_model)
 
                 if issues and not self._has_mailed_issues:
                     self._mail_issues(issues)
 
+            # Appended after the text file is closed so the binary
+            # compilation stays the more recent one
+            if image_model is not None:
+                binary.append(image_model)
+
         except IOError:
 
             self._logger.critical("Could not write to project file {0}".format(self._compile_job.path))
 
+    def _compile_in_pipeline(self):
+
+        if self._compile_pipeline is None:
+
+            try:
+                self._compile_binary = self._binary_compilation
+                self._compile_output = self._compile_output_filehandle
+            except IOError:
+                self._logger.critical("Could not write to project file {0}".format(self._compile_job.path))
+                self._stopping = True
+                return
+
+            self._compile_pipeline = CompilePipeline(
+                self._fixture_settings, self._write_image_analysis, self._compile_job.workers)
+            self._images_submitted = self._image_to_analyse
+
+        while self._images_submitted < len(self._compile_job.images) and self._compile_pipeline.can_submit:
+
+            self._compile_pipeline.submit(self._compile_job.images[self._images_submitted])
+            self._images_submitted += 1
+
+        if self._compile_pipeline.failed:
+
+            self._logger.critical("Compilation of {0} failed".format(self._compile_job.path))
+            self._stopping = True
+
+    def _write_image_analysis(self, compile_image_model, image_model, issues, error):
+        """Writes the analysis of an image from the compile pipeline.
+
+        All images are appended over the same open file handle.
+        """
+        if isinstance(error, first_pass.MarkerDetectionFailed):
+
+            self._log_marker_detection_failed(compile_image_model)
+
+        elif error is not None:
+
+            self._log_output_failed(compile_image_model)
+
+        else:
+
+            try:
+                CompileImageAnalysisFactory.serializer.dump_to_filehandle(
+                    image_model, self._compile_output, as_if_appending=True)
+                self._compile_output.flush()
+            except IOError:
+                self._log_output_failed(compile_image_model)
+
+            # Appended after the text file is written so the binary
+            # compilation stays the more recent one
+            self._compile_binary.append(image_model)
+
+        if issues and not self._has_mailed_issues:
+            self._mail_issues(issues)
+
+        self._image_to_analyse += 1
+
+    def _close_compile_pipeline(self, wait=True):
+
+        if self._compile_pipeline is not None:
+            self._compile_pipeline.close(wait=wait)
+            self._compile_pipeline = None
+
+        if self._compile_output is not None:
+            self._compile_output.close()
+            self._compile_output = None
+
+    def _log_marker_detection_failed(self, compile_image_model):
+
+        self._logger.error("Failed to detect the markers on {0} using fixture {1}".format(
+            compile_image_model.path, self._fixture_settings.model.path))
+
+    def _log_output_failed(self, compile_image_model):
+
+        self._logger.error("Could not output analysis to file {0}".format(compile_image_model.path))
+
     def _mail_issues(self, issues):
         self._has_mailed_issues = True
         self._mail("Scan-o-Matic: Problems compiling project '{path}'",
@@ -183,14 +276,29 @@ All the best,
 
 Scan-o-Matic""", self._compile_job)
 
+    @property
+    def _is_initiating_compilation(self):
+
+        return ((self._compile_job.compile_action is COMPILE_ACTION.Initiate or
+                 self._compile_job.compile_action is COMPILE_ACTION.InitiateAndSpawnAnalysis) and
+                self._image_to_analyse == 0)
+
+    @property
+    def _binary_compilation(self):
+
+        binary = binary_compilation.BinaryCompilation(self._compile_job.path)
+        if self._is_initiating_compilation:
+            binary.clear()
+        elif os.path.isfile(self._compile_job.path) and not binary_compilation.is_current(self._compile_job.path):
+            binary_compilation.convert(self._compile_job.path)
+        return binary
+
     @property
     def _compile_output_filehandle(self):
 
         fh_mode = 'r+w'
 
-        if ((self._compile_job.compile_action is COMPILE_ACTION.Initiate or
-                self._compile_job.compile_action is COMPILE_ACTION.InitiateAndSpawnAnalysis) and
-                self._image_to_analyse == 0):
+        if self._is_initiating_compilation:
 
             fh_mode = 'w'
 
@@ -4,6 +4,7 @@ from functools import wraps
 import os
 import socket
 import sys
+from threading import Lock
 
 from scanomatic.generics.singleton import SingeltonOneInit
 from scanomatic.io.app_config import Config
@@ -16,11 +17,13 @@ from scanomatic.models.factories.compile_project_factory import (
 from scanomatic.models.factories.features_factory import FeaturesFactory
 import scanomatic.models.rpc_job_models as rpc_job_models
 from scanomatic.server.server import Server
-from scanomatic.server.stoppable_rpc_server import Stoppable_RPC_Server
+from scanomatic.server.stoppable_rpc_server import LATENCY_BUCKETS, Stoppable_RPC_Server
 
 _SOM_SERVER = None
 """:type : scanomatic.server.server.Server"""
 _RPC_SERVER = None
+# Admin requests change the queue and jobs, so they are handled one at a time
+_ADMIN_LOCK = Lock()
 
 
 def _verify_admin(f):
@@ -40,6 +43,7 @@ def _verify_admin(f):
             _RPC_SERVER.logger.warning("User {0} unauthorized attempt at accessing {1}".format(user_id, f))
             return False
 
+    _verify_global_admin.admin_only = True
     return _verify_global_admin
 
 
@@ -103,7 +107,9 @@ class InterfaceBuilder(SingeltonOneInit):
 
         for m in dir(self):
             if m.startswith("_server_"):
-                _RPC_SERVER.register_function(getattr(self, m), m[8:])
+                method = getattr(self, m)
+                _RPC_SERVER.register_function(
+                    method, m[8:], lock=_ADMIN_LOCK if getattr(method, 'admin_only', False) else None)
 
         _RPC_SERVER.serve_forever()
 
@@ -123,6 +129,23 @@ class InterfaceBuilder(SingeltonOneInit):
         global _SOM_SERVER
         return sanitize_communication(_SOM_SERVER.get_server_status())
 
+    @staticmethod
+    def _server_get_request_latencies(user_id=None):
+        """Gives the latency histograms of the requests to each method
+
+        Returns:
+            dictionary. The upper edges in seconds of the histogram
+                        buckets as ``buckets`` and the request counts
+                        per bucket of each method as ``methods``. The
+                        last count of each method is the requests
+                        slower than the last edge.
+        """
+        global _RPC_SERVER
+        return sanitize_communication({
+            'buckets': LATENCY_BUCKETS,
+            'methods': _RPC_SERVER.get_latency_histograms(),
+        })
+
     def _server_get_queue_status(self, user_id=None):
 
         global _SOM_SERVER
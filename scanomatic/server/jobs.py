@@ -4,8 +4,10 @@
 
 from __future__ import absolute_import
 
-from multiprocessing import Pipe
+from multiprocessing import Pipe, Process
 from types import StringTypes
+
+import psutil
 #
 # INTERNAL DEPENDENCIES
 #
@@ -116,6 +118,23 @@ class Jobs(SingeltonOneInit):
 
         self._forcingStop = value
 
+    def terminate(self):
+        """Terminates the processes, and their children, of the jobs still running.
+
+        As job processes aren't daemonic they would otherwise keep the
+        server from exiting.
+        """
+        for job, job_process in self._jobs.items():
+            if not isinstance(job_process, Process) or not job_process.is_alive():
+                continue
+            self._logger.warning("Terminating job {0}".format(job.id))
+            try:
+                for child in psutil.Process(job_process.pid).children(recursive=True):
+                    child.terminate()
+            except psutil.NoSuchProcess:
+                pass
+            job_process.terminate()
+
     def _load_from_file(self):
 
         jobs = RPC_Job_Model_Factory.serializer.load(self._paths.rpc_jobs)
@@ -184,7 +203,8 @@ class Jobs(SingeltonOneInit):
 
         :type job_process: scanomatic.server.rpcjob.RpcJob
         """
-        job_process.daemon = True
+        # Not daemonic so that jobs may start worker processes, see `terminate`
+        job_process.daemon = False
         job_process.start()
         job.pid = job_process.pid
 
@@ -39,6 +39,7 @@ class PhenotypeExtractionEffector(proc_effector.ProcessEffector):
         self._data = None
         self._analysis_base_path = None
         self._phenotyper = None
+        self._update_state = False
 
     @property
     def progress(self):
@@ -76,7 +77,12 @@ class PhenotypeExtractionEffector(proc_effector.ProcessEffector):
         self._logger.info("Loading files image data from '{0}'".format(
             self._feature_job.analysis_directory))
 
-        if self._feature_job.extraction_data is feature_factory.features_model.FeatureExtractionData.State:
+        extraction_data = self._feature_job.extraction_data
+        self._update_state = (
+            extraction_data is feature_factory.features_model.FeatureExtractionData.Update and
+            phenotyper.path_has_saved_project_state(self._feature_job.analysis_directory))
+
+        if extraction_data is feature_factory.features_model.FeatureExtractionData.State or self._update_state:
             self._times = None
             self._data = None
         else:
@@ -152,11 +158,27 @@ Scan-o-Matic""", self._feature_job)
 
         if self._feature_job.extraction_data is feature_factory.features_model.FeatureExtractionData.State:
             self._phenotyper = phenotyper.Phenotyper.LoadFromState(self._feature_job.analysis_directory)
+        elif self._update_state:
+            self._phenotyper = phenotyper.Phenotyper.LoadFromState(self._feature_job.analysis_directory)
+            try:
+                self._logger.info("Appended {0} new time points to previous extraction".format(
+                    self._phenotyper.update_from_image_data(self._feature_job.analysis_directory)))
+            except ValueError as e:
+                self._logger.error("Could not update previous extraction: {0}".format(e))
+                self.add_message(
+                    "The image data doesn't continue the previous feature extraction ({0}), "
+                    "extracting all features anew keeping the curve marks".format(e))
+                times, data = image_data.ImageData.read_image_data_and_time(self._feature_job.analysis_directory)
+                self._phenotyper.replace_growth_data(data, times)
         else:
             self._phenotyper = phenotyper.Phenotyper(
                 raw_growth_data=self._data,
                 times_data=self._times)
 
-        self._phenotype_iterator = self._phenotyper.iterate_extraction(self._feature_job.try_keep_qc)
+        if self._update_state:
+            self._phenotype_iterator = self._phenotyper.iterate_update(workers=self._feature_job.workers)
+        else:
+            self._phenotype_iterator = self._phenotyper.iterate_extraction(
+                self._feature_job.try_keep_qc, workers=self._feature_job.workers)
         self._iteration_index = 1
         self._logger.info("Starting phenotype extraction")
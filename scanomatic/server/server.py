@@ -148,6 +148,8 @@ class Server(object):
         if self._waitForJobsToTerminate:
             self._wait_on_jobs()
 
+        self._jobs.terminate()
+
         self._save_state()
 
         self.logger.info("Scan-o-Matic server shutdown complete")
@@ -1,18 +1,40 @@
 from __future__ import absolute_import
 
+from bisect import bisect_left
+from functools import wraps
 from SimpleXMLRPCServer import SimpleXMLRPCServer
-from time import sleep
+from SocketServer import ThreadingMixIn
+from threading import Lock
+import time
 
 import scanomatic.generics.decorators as decorators
 import scanomatic.io.logger as logger
 
+# Upper edges in seconds of the request latency histogram buckets, the
+# last bucket holds all slower requests.
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1., 5., 10.)
+
+
+class _ThreadedXMLRPCServer(ThreadingMixIn, SimpleXMLRPCServer):
+
+    daemon_threads = True
+
 
 class Stoppable_RPC_Server(object):
+    """XML-RPC server handling each request in its own thread.
 
+    Requests only wait for other requests to the same method, or to
+    methods registered with the same lock, so a slow call doesn't block
+    unrelated ones. The latency of each method's requests is collected
+    in histograms with the `LATENCY_BUCKETS`.
+    """
     def __init__(self, *args, **kwargs):
         self.logger = logger.Logger("RPC Server")
         self.logger.info("Starting server with {0} and {1}".format(args, kwargs))
-        self._server = SimpleXMLRPCServer(*args, **kwargs)
+        self._server = _ThreadedXMLRPCServer(*args, **kwargs)
+        self._latencies = {}
+        self._latencies_lock = Lock()
+        self._serve_lock = Lock()
         self._keepAlive = True
         self._running = False
         self._started = False
@@ -26,32 +48,81 @@ class Stoppable_RPC_Server(object):
 
     def stop(self):
 
-        self._keepAlive = False
+        with self._serve_lock:
+            self._keepAlive = False
+            serving = self._running
+        if serving:
+            self._server.shutdown()
         while self._running:
-            sleep(0.1)
+            time.sleep(0.1)
 
         self._server.server_close()
 
     def register_introspection_functions(self):
         self._server.register_introspection_functions()
 
-    def register_function(self, function, name):
+    def register_function(self, function, name, lock=None):
+        """Registers a function to be called by the clients.
 
-        self._server.register_function(function, name)
+        Args:
+            function: The function
+            name: The name the clients call the function by
+            lock: Held while the function is called, by default a lock
+                of its own, to let the function share lock with other
+                functions that mustn't run at the same time as it
+        """
+        if lock is None:
+            lock = Lock()
+
+        with self._latencies_lock:
+            self._latencies[name] = [0] * (len(LATENCY_BUCKETS) + 1)
+
+        @wraps(function)
+        def _locked_function(*args, **kwargs):
+
+            start = time.time()
+            try:
+                with lock:
+                    return function(*args, **kwargs)
+            finally:
+                self._add_latency(name, time.time() - start)
+
+        self._server.register_function(_locked_function, name)
+
+    def _add_latency(self, name, latency):
+
+        with self._latencies_lock:
+            self._latencies[name][bisect_left(LATENCY_BUCKETS, latency)] += 1
+
+    def get_latency_histograms(self):
+        """The number of requests to each method per latency bucket.
+
+        Returns: dict of method name and list of counts of the requests
+            taking at most the corresponding `LATENCY_BUCKETS` seconds,
+            with a last count of the requests taking longer
+        """
+        with self._latencies_lock:
+            return {name: list(counts) for name, counts in self._latencies.iteritems()}
 
-    @decorators.threaded
     def serve_forever(self, poll_interval=0.5):
 
-        if self._started:
-            self.logger.warning("Can only start server once")
-            return
-        elif self._running:
-            self.logger.warning("Attempted having two processes handling requests")
-            return
-
-        self._started = True
-        self._running = True
-        self._server.timeout = poll_interval
-        while self._keepAlive:
-            self._server.handle_request()
-        self._running = False
+        with self._serve_lock:
+            if self._started:
+                self.logger.warning("Can only start server once")
+                return
+            self._started = True
+            if not self._keepAlive:
+                return
+            # Once running the serving thread must enter the server's
+            # `serve_forever`, since that is what lets `stop` shut it down
+            self._running = True
+
+        self._serve_forever(poll_interval)
+
+    @decorators.threaded
+    def _serve_forever(self, poll_interval):
+
+        try:
+            self._server.serve_forever(poll_interval=poll_interval)
+        finally:
+            self._running = False
@@ -588,47 +588,23 @@ def detect_colony(ccc_identifier, image_identifier, plate, x, y):
     )
 
 
-@blueprint.route(
-    "/<ccc_identifier>/image/<image_identifier>/" +
-    "plate/<int:plate>/compress/colony/<int:x>/<int:y>", methods=["POST"])
-def compress_calibration(ccc_identifier, image_identifier, plate, x, y):
-    """Set compressed calibration entry
+def _get_colony_compression_data(data_object):
+    """Parses the compression data of a colony
 
-    Request Keys:
-        "image": The grayscale calibrated image
-        "blob": The filter indicating what is the colony
-        "background": The filter indicating what is the background
-        "override_small_background": boolean for allowing less than
-            20 pixel backgrounds
     Returns:
-
+        tuple of the cell count, image, blob filter and background
+        filter, and the reason the data isn't valid, if it isn't
     """
-    data_object = request.get_json(silent=True, force=True)
-    if not data_object:
-        data_object = request.values
-
-    image_data = calibration.get_image_json_from_ccc(
-        getcalibrationstore(), ccc_identifier, image_identifier)
-    if image_data is None:
-        return json_abort(
-            400,
-            reason="The image or CCC don't exist"
-        )
-
     try:
         image = np.array(data_object.get("image", [[]]), dtype=np.float64)
     except TypeError:
-        return json_abort(
-            400,
-            reason="Image data is not understandable as a float array"
-        )
+        return None, "Image data is not understandable as a float array"
 
     try:
         blob_filter = np.array(data_object.get("blob", [[]]), dtype=bool)
     except TypeError:
-        return json_abort(
-            400,
-            reason="Blob filter data is not understandable as a boolean " +
+        return None, (
+            "Blob filter data is not understandable as a boolean " +
             "array"
         )
 
@@ -636,46 +612,34 @@ def compress_calibration(ccc_identifier, image_identifier, plate, x, y):
         background_filter = np.array(
             data_object.get("background", [[]]), dtype=bool)
     except TypeError:
-        return json_abort(
-            400,
-            reason="Background filter data is not understandable as a " +
+        return None, (
+            "Background filter data is not understandable as a " +
             "boolean array"
         )
 
     if not valid_array_dimensions(
             2, image, blob_filter, background_filter):
-        return json_abort(
-            400,
-            reason="Supplied data does not have the correct dimensions." +
+        return None, (
+            "Supplied data does not have the correct dimensions." +
             " Image-shape is {0}, blob {1}, and bg {2}.".format(
                 image.shape, blob_filter.shape, background_filter.shape) +
             " All need to be identical shape and 2D."
         )
 
     if (blob_filter & background_filter).any():
-        return json_abort(
-            400,
-            reason="Blob and background filter may not overlap"
-        )
+        return None, "Blob and background filter may not overlap"
 
     if not blob_filter.any():
-        return json_abort(
-            400,
-            reason="Blob is empty/there's no colony detected"
-        )
+        return None, "Blob is empty/there's no colony detected"
 
     if background_filter.sum() < 3:
-        return json_abort(
-            400,
-            reason="Background must be consisting of at least 3 pixels"
-        )
+        return None, "Background must be consisting of at least 3 pixels"
 
     if background_filter.sum() < 20 and not data_object.get(
             "override_small_background", False):
 
-        return json_abort(
-            400,
-            reason="Background must be at least 20 pixels." +
+        return None, (
+            "Background must be at least 20 pixels." +
             " Currently only {0}.".format(background_filter.sum()) +
             " This check can be over-ridden."
         )
@@ -683,13 +647,46 @@ def compress_calibration(ccc_identifier, image_identifier, plate, x, y):
     try:
         cell_count = int(data_object['cell_count'])
     except KeyError:
-        return json_abort(
-            400, reason="Missing expected parameter cell_count")
+        return None, "Missing expected parameter cell_count"
     except ValueError:
-        return json_abort(400, reason="cell_count should be an integer")
+        return None, "cell_count should be an integer"
     if cell_count < 0:
+        return None, "cell_count should be greater or equal than zero"
+
+    return (cell_count, image, blob_filter, background_filter), None
+
+
+@blueprint.route(
+    "/<ccc_identifier>/image/<image_identifier>/" +
+    "plate/<int:plate>/compress/colony/<int:x>/<int:y>", methods=["POST"])
+def compress_calibration(ccc_identifier, image_identifier, plate, x, y):
+    """Set compressed calibration entry
+
+    Request Keys:
+        "image": The grayscale calibrated image
+        "blob": The filter indicating what is the colony
+        "background": The filter indicating what is the background
+        "override_small_background": boolean for allowing less than
+            20 pixel backgrounds
+    Returns:
+
+    """
+    data_object = request.get_json(silent=True, force=True)
+    if not data_object:
+        data_object = request.values
+
+    image_data = calibration.get_image_json_from_ccc(
+        getcalibrationstore(), ccc_identifier, image_identifier)
+    if image_data is None:
         return json_abort(
-            400, reason="cell_count should be greater or equal than zero")
+            400,
+            reason="The image or CCC don't exist"
+        )
+
+    colony, reason = _get_colony_compression_data(data_object)
+    if reason is not None:
+        return json_abort(400, reason=reason)
+    cell_count, image, blob_filter, background_filter = colony
 
     if calibration.set_colony_compressed_data(
             getcalibrationstore(),
@@ -708,6 +705,76 @@ def compress_calibration(ccc_identifier, image_identifier, plate, x, y):
         )
 
 
+@blueprint.route(
+    "/<ccc_identifier>/image/<image_identifier>/" +
+    "plate/<int:plate>/compress/colonies", methods=["POST"])
+def compress_calibration_plate(ccc_identifier, image_identifier, plate):
+    """Set compressed calibration entries of several colonies of a plate
+
+    All colonies are stored together, or none if any is invalid.
+
+    Request Keys:
+        "colonies": List of the colonies, each with the keys of
+            `compress_calibration` and its "x" and "y" position
+    Returns:
+
+    """
+    data_object = request.get_json(silent=True, force=True)
+    if not data_object:
+        data_object = request.values
+
+    image_data = calibration.get_image_json_from_ccc(
+        getcalibrationstore(), ccc_identifier, image_identifier)
+    if image_data is None:
+        return json_abort(
+            400,
+            reason="The image or CCC don't exist"
+        )
+
+    colonies_data = data_object.get("colonies")
+    if not isinstance(colonies_data, list) or not colonies_data:
+        return json_abort(
+            400, reason="Missing expected parameter colonies")
+
+    colonies = {}
+    for index, colony_data in enumerate(colonies_data):
+
+        try:
+            position = (int(colony_data['x']), int(colony_data['y']))
+        except (KeyError, TypeError, ValueError):
+            return json_abort(
+                400,
+                reason="Colony {0} should have integer x and y".format(index)
+            )
+
+        if position in colonies:
+            return json_abort(
+                400,
+                reason="Colony {0} at {1} is given more than once".format(
+                    index, position)
+            )
+
+        colony, reason = _get_colony_compression_data(colony_data)
+        if reason is not None:
+            return json_abort(
+                400, reason="Colony {0}: {1}".format(index, reason))
+        colonies[position] = colony
+
+    if calibration.set_plate_compressed_data(
+            getcalibrationstore(),
+            ccc_identifier, image_identifier, plate, colonies,
+            access_token=data_object.get("access_token")):
+
+        return jsonify()
+
+    else:
+
+        return json_abort(
+            401,
+            reason="Probably invalid access token"
+        )
+
+
 @blueprint.route('/<ccc_identifier>/delete', methods=['POST'])
 def delete_non_deployed_calibration(ccc_identifier):
 
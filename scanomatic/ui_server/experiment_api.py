@@ -33,11 +33,17 @@ def add_routes(app, rpc_client):
             'root', Config().paths.projects_root))
         try_keep_qc = bool(
             data_object.get("keep_qc", True))
+        try:
+            workers = int(data_object.get("workers", 1))
+        except (ValueError, TypeError):
+            return json_abort(400, reason="Bad number of workers")
         _LOGGER.info(
             "Attempting to extract features in '{0}'".format(path))
         model = FeaturesFactory.create(
             analysis_directory=path,
+            extraction_data=data_object.get("extraction_data", "Default"),
             try_keep_qc=try_keep_qc,
+            workers=workers,
         )
 
         success = (
@@ -146,6 +152,11 @@ def add_routes(app, rpc_client):
                 path_compile_instructions.replace(
                     'root', Config().paths.projects_root))
 
+        try:
+            workers = int(data_object.get("workers", 1))
+        except (ValueError, TypeError):
+            return json_abort(400, reason="Bad number of workers")
+
         _LOGGER.info(
             "Attempting to analyse '{0}' (instructions '{1}')".format(
                 path_compilation, path_compile_instructions))
@@ -157,7 +168,8 @@ def add_routes(app, rpc_client):
             cell_count_calibration_id=data_object.get("ccc"),
             one_time_positioning=bool(data_object.get(
                 'one_time_positioning', True)),
-            chain=bool(data_object.get('chain', True)))
+            chain=bool(data_object.get('chain', True)),
+            workers=workers)
 
         _LOGGER.info(
             "Created  job model {}".format(
@@ -237,6 +249,10 @@ def add_routes(app, rpc_client):
             )
         chain_steps = bool(data_object.get('chain', True))
         images = data_object.get('images', [])
+        try:
+            workers = int(data_object.get("workers", 1))
+        except (ValueError, TypeError):
+            return json_abort(400, reason="Bad number of workers")
 
         _LOGGER.info(
             "Attempting to compile on path {0}, as {1} fixture{2} (Chaining: {3}), images {4}".format(
@@ -249,7 +265,8 @@ def add_routes(app, rpc_client):
         dict_model = CompileProjectFactory.dict_from_path_and_fixture(
             path, fixture=fixture, is_local=fixture_is_local,
             compile_action=COMPILE_ACTION.InitiateAndSpawnAnalysis
-            if chain_steps else COMPILE_ACTION.Initiate)
+            if chain_steps else COMPILE_ACTION.Initiate,
+            workers=workers)
 
         n_images_in_folder = len(dict_model['images'])
 
@@ -0,0 +1,198 @@
+from __future__ import absolute_import
+
+from collections import OrderedDict, deque, namedtuple
+from threading import Lock, RLock
+
+import numpy as np
+from prometheus_client import Counter
+
+from scanomatic.data_processing import phenotyper
+
+CACHE_REQUESTS = Counter(
+    'phenotyper_cache_requests_total',
+    'Number of requested phenotyper states by cache result',
+    ['result'],
+)
+
+CACHE_REMOVALS = Counter(
+    'phenotyper_cache_removals_total',
+    'Number of phenotyper states removed from the cache by reason',
+    ['reason'],
+)
+
+CacheStats = namedtuple(
+    'CacheStats',
+    ['entries', 'size', 'hits', 'misses', 'evictions', 'invalidations'],
+)
+
+_CacheEntry = namedtuple('_CacheEntry', ['signature', 'state', 'size', 'pending'])
+
+
+def _get_size(data, seen):
+    """Approximate memory used by the arrays in nested containers.
+
+    Memory-mapped arrays are not counted since the files back them.
+    """
+    if id(data) in seen:
+        return 0
+    seen.add(id(data))
+
+    if isinstance(data, np.memmap):
+        return 0
+    elif isinstance(data, np.ndarray):
+        size = data.nbytes
+        if isinstance(data, np.ma.MaskedArray):
+            size += np.ma.getmaskarray(data).nbytes
+        if data.dtype == np.object:
+            size += sum(_get_size(item, seen) for item in data.flat)
+        return size
+    elif isinstance(data, dict):
+        return sum(_get_size(value, seen) for value in data.itervalues())
+    elif isinstance(data, (list, tuple, deque)):
+        return sum(_get_size(item, seen) for item in data)
+    return 0
+
+
+def get_state_size(state):
+    """Approximate memory used by the loaded parts of a phenotyper state.
+
+    Parts of the state that are not yet loaded are not loaded.
+    """
+    seen = set()
+    return sum(_get_size(value, seen) for value in vars(state).itervalues())
+
+
+class PhenotyperCache(object):
+    """Least recently used cache of phenotyper states loaded from projects.
+
+    A cached state is used as long as no state file of the project has
+    been modified and the project lock is held by the same key as when
+    it was cached. States that change in memory must be saved through
+    the cache, which keeps the saved state as the cached one.
+
+    Cached states are shared, so whoever uses one must hold the lock of
+    its project from getting the state until done with it.
+
+    Args:
+        max_entries: Maximum number of projects cached
+        memory_budget: Maximum approximate memory in bytes used by the
+            cached states. Memory-mapped growth data is not counted.
+    """
+    def __init__(self, max_entries=8, memory_budget=1024 ** 3):
+
+        self._max_entries = max_entries
+        self._memory_budget = memory_budget
+        self._entries = OrderedDict()
+        self._lock = Lock()
+        self._project_locks = {}
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    def __contains__(self, path):
+
+        return path in self._entries
+
+    @property
+    def stats(self):
+
+        with self._lock:
+            return CacheStats(
+                entries=len(self._entries),
+                size=sum(entry.size for entry in self._entries.itervalues()),
+                hits=self._hits,
+                misses=self._misses,
+                evictions=self._evictions,
+                invalidations=self._invalidations,
+            )
+
+    def lock(self, path):
+        """The lock to hold while using the state of a project.
+
+        Args:
+            path: The project's directory
+
+        Returns: threading.RLock
+        """
+        with self._lock:
+            if path not in self._project_locks:
+                self._project_locks[path] = RLock()
+            return self._project_locks[path]
+
+    def get(self, path, lock_key=""):
+        """Get the state of a project, loading it if not cached.
+
+        Args:
+            path: The project's directory
+            lock_key: The key currently holding the project lock
+
+        Returns: scanomatic.data_processing.phenotyper.Phenotyper
+        """
+        signature = (phenotyper.get_project_state_signature(path), lock_key)
+
+        with self._lock:
+            entry = self._entries.pop(path, None)
+            if entry is not None and entry.signature == signature:
+                self._hits += 1
+                CACHE_REQUESTS.labels('hit').inc()
+                self._entries[path] = entry
+                if entry.pending != len(entry.state._lazy_state_loaders):
+                    self._put(path, signature, entry.state)
+                return entry.state
+            elif entry is not None:
+                self._invalidations += 1
+                CACHE_REMOVALS.labels('invalidated').inc()
+
+            self._misses += 1
+            CACHE_REQUESTS.labels('miss').inc()
+
+        state = phenotyper.Phenotyper.LoadFromState(path)
+        with self._lock:
+            self._put(path, signature, state)
+        return state
+
+    def save(self, path, state, lock_key=""):
+        """Save the state of a project and cache it.
+
+        If saving fails the project is removed from the cache since the
+        state in memory may no longer match the saved state.
+
+        Args:
+            path: The project's directory
+            state: The state to save
+            lock_key: The key currently holding the project lock
+        """
+        try:
+            state.save_state(path, ask_if_overwrite=False)
+        except Exception:
+            self.invalidate(path)
+            raise
+
+        signature = (phenotyper.get_project_state_signature(path), lock_key)
+        with self._lock:
+            self._entries.pop(path, None)
+            self._put(path, signature, state)
+
+    def invalidate(self, path):
+
+        with self._lock:
+            if self._entries.pop(path, None) is not None:
+                self._invalidations += 1
+                CACHE_REMOVALS.labels('invalidated').inc()
+
+    def _put(self, path, signature, state):
+
+        self._entries[path] = _CacheEntry(
+            signature=signature,
+            state=state,
+            size=get_state_size(state),
+            pending=len(state._lazy_state_loaders),
+        )
+
+        size = sum(entry.size for entry in self._entries.itervalues())
+        while self._entries and (len(self._entries) > self._max_entries or size > self._memory_budget):
+            _, entry = self._entries.popitem(last=False)
+            size -= entry.size
+            self._evictions += 1
+            CACHE_REMOVALS.labels('evicted').inc()
@@ -11,7 +11,7 @@ import time
 import uuid
 
 from dateutil import tz
-from flask import jsonify, request, send_from_directory, Blueprint
+from flask import current_app, g, jsonify, request, send_from_directory, Blueprint
 from werkzeug.datastructures import FileStorage
 
 from scanomatic.data_processing import phenotyper
@@ -86,10 +86,22 @@ def owns_lock(lock_state):
     return lock_state is LockState.LockedByMe or lock_state is LockState.LockedByMeTemporary
 
 
+def _hold_project_lock(path):
+    """Hold the lock of the project's cached state for the rest of the request.
+
+    The cached state is shared by all requests, so the lock keeps other
+    requests from using it while it is changed and saved.
+    """
+    lock = current_app.config['phenotyper_cache'].lock(path)
+    lock.acquire()
+    g.setdefault('phenotyper_locks', []).append(lock)
+
+
 def _get_state_update_response(path, response, success=None):
 
+    _hold_project_lock(path)
     try:
-        state = phenotyper.Phenotyper.LoadFromState(path)
+        state = current_app.config['phenotyper_cache'].get(path, _read_lock_file(path)[1])
     except ImportError:
         name = None
         success = False
@@ -107,6 +119,11 @@ def _get_state_update_response(path, response, success=None):
     return state, name
 
 
+def _save_state(path, state):
+
+    current_app.config['phenotyper_cache'].save(path, state, _read_lock_file(path)[1])
+
+
 def _make_film(film_type, save_target=None, pos=None, path=None):
     code = FILM_TYPES[film_type].format(save_target=save_target, pos=pos, path=path)
     return_code = call(['python', '-c', 'from scanomatic.qc import analysis_results;analysis_results.{0}'.format(code)])
@@ -251,6 +268,11 @@ def add_routes(app):
         app (Flask): The flask app to decorate
     """
 
+    @app.teardown_request
+    def _release_project_locks(exception):
+        for lock in reversed(g.pop('phenotyper_locks', [])):
+            lock.release()
+
     @app.route("/api/results/browse/<path:project>")
     @app.route("/api/results/browse")
     def browse_for_results(project=""):
@@ -422,7 +444,7 @@ def add_routes(app):
             return jsonify(reason="Failed to save file, contact server admin.", **response)
 
         if state.load_meta_data(meta_data_path):
-            state.save_state(path, ask_if_overwrite=False)
+            _save_state(path, state)
         else:
             response['success'] = False
             response['reason'] = "Uploaded data doesn't match shapes of the plates"
@@ -642,7 +664,7 @@ def add_routes(app):
                 **response))
 
         state.remove_phenotype_from_normalization(pheno)
-        state.save_state(path, ask_if_overwrite=False)
+        _save_state(path, state)
 
         if lock_state is LockState.LockedByMeTemporary:
             _remove_lock(path)
@@ -695,7 +717,7 @@ def add_routes(app):
                 **response))
 
         state.add_phenotype_to_normalization(pheno)
-        state.save_state(path, ask_if_overwrite=False)
+        _save_state(path, state)
 
         if lock_state is LockState.LockedByMeTemporary:
             _remove_lock(path)
@@ -1009,7 +1031,7 @@ def add_routes(app):
             return jsonify(**json_response(["urls"], dict(urls=urls, **response)))
 
         had_effect = state.undo(plate)
-        state.save_state(path, ask_if_overwrite=False)
+        _save_state(path, state)
 
         if lock_state is LockState.LockedByMeTemporary:
             _remove_lock(path)
@@ -1177,7 +1199,7 @@ def add_routes(app):
                 reason="Setting mark refused, probably trying to set NoGrowth or Empty for individual phenotype.",
                 **response)
 
-        state.save_state(path, ask_if_overwrite=False)
+        _save_state(path, state)
 
         if lock_state is LockState.LockedByMeTemporary:
             _remove_lock(path)
@@ -1348,7 +1370,7 @@ def add_routes(app):
             return jsonify(**response)
 
         state.normalize_phenotypes()
-        state.save_state(path, ask_if_overwrite=False)
+        _save_state(path, state)
 
         if lock_state is LockState.LockedByMeTemporary:
             _remove_lock(path)
@@ -1421,7 +1443,7 @@ def add_routes(app):
                            **json_response(["urls"], dict(urls=urls, **response)))
 
         state.set_control_surface_offsets(offset, plate)
-        state.save_state(path, ask_if_overwrite=False)
+        _save_state(path, state)
 
         if lock_state is LockState.LockedByMeTemporary:
             _remove_lock(path)
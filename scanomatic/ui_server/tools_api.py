@@ -211,12 +211,15 @@ def add_routes(app):
                 files += glob.glob(os.path.join(path, Paths().phenotype_times))
                 files += glob.glob(os.path.join(path, Paths().phenotypes_extraction_params))
                 files += glob.glob(os.path.join(path, Paths().phenotypes_filter))
+                files += glob.glob(os.path.join(path, Paths().phenotypes_filter_store))
                 files += glob.glob(os.path.join(path, Paths().phenotypes_filter_undo))
+                files += glob.glob(os.path.join(path, Paths().phenotypes_filter_journal))
                 files += glob.glob(os.path.join(path, Paths().phenotypes_input_data))
                 files += glob.glob(os.path.join(path, Paths().phenotypes_input_smooth))
                 files += glob.glob(os.path.join(path, Paths().phenotypes_meta_data))
                 files += glob.glob(os.path.join(path, Paths().phenotypes_meta_data_original_file_patern))
                 files += glob.glob(os.path.join(path, Paths().vector_meta_phenotypes_raw))
+                files += glob.glob(os.path.join(path, Paths().vector_meta_phenotypes_raw_store))
                 files += glob.glob(os.path.join(path, Paths().vector_phenotypes_raw))
                 files += glob.glob(os.path.join(path, Paths().phenotypes_reference_offsets))
                 files += glob.glob(os.path.join(path, Paths().experiment_grid_image_pattern.format("*")))
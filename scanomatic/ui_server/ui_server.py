@@ -26,12 +26,16 @@ from . import scanners_api
 from . import scan_jobs_api
 from . import scans_api
 from .flask_prometheus import Prometheus
+from .phenotyper_cache import PhenotyperCache
 
 
 def create_app():
     app = Flask(__name__)
     Prometheus(app)
     app.config['imagestore'] = ImageStore(Config().paths.projects_root)
+    app.config['phenotyper_cache'] = PhenotyperCache(
+        max_entries=Config().ui_server.phenotyper_cache_entries,
+        memory_budget=Config().ui_server.phenotyper_cache_megabytes * 1024 ** 2)
     app.config['DATABASE_URL'] = get_database_url()
     database.setup(app)
     rpc_client = get_client(admin=True)
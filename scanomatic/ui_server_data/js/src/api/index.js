@@ -150,6 +150,23 @@ export function SetColonyCompression(cccId, imageId, plate, accessToken, colony,
     });
 }
 
+export function SetPlateCompression(cccId, imageId, plate, accessToken, colonies) {
+    return API.postJSON(
+        `/api/calibration/${cccId}/image/${imageId}/plate/${plate}/compress/colonies`,
+        {
+            access_token: accessToken,
+            colonies: colonies.map(colony => ({
+                x: colony.col,
+                y: colony.row,
+                image: colony.image,
+                blob: colony.blob,
+                background: colony.background,
+                cell_count: colony.cellCount,
+            })),
+        },
+    );
+}
+
 export function GetImageId(cccId, file, accessToken) {
     const path = `/api/calibration/${cccId}/add_image`;
     const formData = new FormData();
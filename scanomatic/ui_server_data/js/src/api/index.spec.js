@@ -154,6 +154,58 @@ describe('API', () => {
         });
     })
 
+    describe('SetPlateCompression', () => {
+        const args = [
+            'CCC42',
+            '1M4G3',
+            'PL4T3',
+            'T0P53CR3T',
+            [{
+                row: 4,
+                col: 1,
+                image: [[1, 2], [3, 4]],
+                blob: [[true, false], [false, true]],
+                background: [[false, true], [true, false]],
+                cellCount: 666,
+            }],
+        ];
+
+        it('should query the correct url', () => {
+            API.SetPlateCompression(...args);
+            expect(mostRecentRequest().url)
+                .toBe('/api/calibration/CCC42/image/1M4G3/plate/PL4T3/compress/colonies');
+        });
+
+        it('should send a POST request', () => {
+            API.SetPlateCompression(...args);
+            expect(mostRecentRequest().method).toEqual('POST');
+        });
+
+        it('should send the colonies', () => {
+            API.SetPlateCompression(...args);
+            const params = JSON.parse(mostRecentRequest().params);
+            expect(params.access_token).toEqual('T0P53CR3T');
+            expect(params.colonies).toEqual([{
+                x: 1,
+                y: 4,
+                image: [[1, 2], [3, 4]],
+                blob: [[true, false], [false, true]],
+                background: [[false, true], [true, false]],
+                cell_count: 666,
+            }]);
+        });
+
+        it('should return a promise that rejects on error', (done) => {
+            API.SetPlateCompression(...args).catch((reason) => {
+                expect(reason).toEqual('(+_+)');
+                done();
+            });
+            mostRecentRequest().respondWith({
+                status: 400, responseText: JSON.stringify({ reason: '(+_+)' }),
+            });
+        });
+    });
+
     describe('SetColonyDetection', () => {
         const args = [
             'CCC42',
@@ -7,12 +7,10 @@ import numpy as np
 
 from scanomatic.generics.purge_importing import ExpiringModule
 from scanomatic.image_analysis.image_basics import load_image_to_numpy
+from scanomatic.io import binary_compilation
 from scanomatic.io.logger import Logger
 from scanomatic.io.paths import Paths
-from scanomatic.io.pickler import unpickle_with_unpickler
-from scanomatic.models.factories.compile_project_factory import (
-    CompileImageAnalysisFactory
-)
+from scanomatic.io.pickler import load_numpy
 
 _logger = Logger("Analysis Utils")
 
@@ -45,7 +43,7 @@ def produce_grid_images(path=".", plates=None, image=None, mark_position=None, c
 
     _logger.info("Using '{0}' to produce grid images".format(os.path.basename(compilation)))
 
-    compilation = CompileImageAnalysisFactory.serializer.load(compilation)
+    compilation = binary_compilation.load(compilation)
 
     image_path = compilation[-1].image.path
     all_plates = compilation[-1].fixture.plates
@@ -77,7 +75,7 @@ def produce_grid_images(path=".", plates=None, image=None, mark_position=None, c
         grid_path = os.path.join(
             path, Paths().grid_pattern.format(plate.index))
         try:
-            grid = unpickle_with_unpickler(np.load, grid_path)
+            grid = load_numpy(grid_path)
         except IOError:
             _logger.warning("Could not find any grid: " + grid_path)
             grid = None
@@ -43,7 +43,10 @@ setup(
     },
     scripts=[
         os.path.join("scripts", p) for p in [
+            "scan-o-matic_convert_compilation",
+            "scan-o-matic_convert_image_data",
             "scan-o-matic_migrate",
+            "scan-o-matic_migrate_pickles",
             "scan-o-matic_server",
         ]
     ],
@@ -357,6 +357,102 @@ class TestCompressCalibration:
         set_colony_compressed_data.assert_not_called()
 
 
+class TestCompressCalibrationPlate:
+    url = "/calibration/ccc0/image/img0/plate/0/compress/colonies"
+
+    @pytest.fixture(autouse=True)
+    def get_image_json_from_ccc(self):
+        with mock.patch(
+            'scanomatic.ui_server.calibration_api.calibration.get_image_json_from_ccc',
+            return_value={},
+        ):
+            yield
+
+    @pytest.fixture
+    def set_plate_compressed_data(self):
+        with mock.patch(
+            'scanomatic.ui_server.calibration_api.calibration.set_plate_compressed_data'
+        ) as function:
+            yield function
+
+    @pytest.fixture
+    def params(self):
+        return {
+            'colonies': [
+                {
+                    'x': 0,
+                    'y': 1,
+                    "blob": [[0] * 20, [1] * 20],
+                    'background': [[1] * 20, [0] * 20],
+                    "cell_count": 42,
+                },
+                {
+                    'x': 2,
+                    'y': 1,
+                    "blob": [[1] * 20, [0] * 20],
+                    'background': [[0] * 20, [1] * 20],
+                    "cell_count": 7,
+                },
+            ],
+            'access_token': 'XXX'
+        }
+
+    def test_valid_params(self, client, set_plate_compressed_data, params):
+        response = client.post(self.url, data=json.dumps(params))
+        assert response.status_code == 200
+        args, kwargs = set_plate_compressed_data.call_args
+        assert args[1:4] == ('ccc0', 'img0', 0)
+        assert kwargs['access_token'] == 'XXX'
+        colonies = args[4]
+        assert sorted(colonies) == [(0, 1), (2, 1)]
+        cell_count, _, blob_filter, background_filter = colonies[(2, 1)]
+        assert cell_count == 7
+        assert np.array_equal(
+            blob_filter, np.array([[True] * 20, [False] * 20]))
+        assert np.array_equal(
+            background_filter, np.array([[False] * 20, [True] * 20]))
+
+    def test_missing_colonies(
+            self, client, set_plate_compressed_data, params):
+        del params['colonies']
+        response = client.post(self.url, data=json.dumps(params))
+        assert response.status_code == 400
+        assert (
+            json.loads(response.data)['reason']
+            == 'Missing expected parameter colonies'
+        )
+        set_plate_compressed_data.assert_not_called()
+
+    def test_missing_position(
+            self, client, set_plate_compressed_data, params):
+        del params['colonies'][1]['x']
+        response = client.post(self.url, data=json.dumps(params))
+        assert response.status_code == 400
+        assert (
+            json.loads(response.data)['reason']
+            == 'Colony 1 should have integer x and y'
+        )
+        set_plate_compressed_data.assert_not_called()
+
+    def test_repeated_position(
+            self, client, set_plate_compressed_data, params):
+        params['colonies'][1]['x'] = 0
+        response = client.post(self.url, data=json.dumps(params))
+        assert response.status_code == 400
+        set_plate_compressed_data.assert_not_called()
+
+    def test_invalid_colony(
+            self, client, set_plate_compressed_data, params):
+        params['colonies'][1]['cell_count'] = -1
+        response = client.post(self.url, data=json.dumps(params))
+        assert response.status_code == 400
+        assert (
+            json.loads(response.data)['reason']
+            == 'Colony 1: cell_count should be greater or equal than zero'
+        )
+        set_plate_compressed_data.assert_not_called()
+
+
 class TestConstructCalibration:
 
     url = '/calibration/{ccc}/construct/{power}'
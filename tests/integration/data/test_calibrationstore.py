@@ -2,6 +2,7 @@ from __future__ import absolute_import
 
 import pytest
 
+from scanomatic.data import calibrationstore
 from scanomatic.data.calibrationstore import CalibrationStore
 from scanomatic.io.ccc_data import (
     CalibrationEntryStatus, CCCImage, CCCMeasurement, CCCPlate,
@@ -696,6 +697,51 @@ class TestSetMeasurement:
             )
 
 
+class TestSetMeasurements:
+
+    def test_insert_and_replace(self, store, dbconnection):
+        store.add_calibration(make_calibration(identifier='ccc001'))
+        store.add_image_to_calibration('ccc001', 'img001')
+        store.add_plate('ccc001', 'img001', 1, make_plate())
+        store.set_measurement(
+            'ccc001', 'img001', 1, 2, 3, {
+                CCCMeasurement.source_values: [4.1, 5.2, 6.3],
+                CCCMeasurement.source_value_counts: [7, 8, 9],
+                CCCMeasurement.cell_count: 123456,
+            }
+        )
+        store.set_measurements('ccc001', 'img001', 1, {
+            (2, 3): {
+                CCCMeasurement.source_values: [4.4, 5.5, 6.6],
+                CCCMeasurement.source_value_counts: [9, 8, 7],
+                CCCMeasurement.cell_count: 654321,
+            },
+            (2, 4): {
+                CCCMeasurement.source_values: [1.1],
+                CCCMeasurement.source_value_counts: [2],
+                CCCMeasurement.cell_count: 3,
+            },
+        })
+        assert list(
+            dbconnection.execute(
+                ''' SELECT calibration_id, image_id, plate_id, col, row,
+                           source_values, source_value_counts, cell_count
+                    FROM calibration_measurements
+                    ORDER BY row
+                '''
+            )
+        ) == [
+            ('ccc001', 'img001', 1, 2, 3, [4.4, 5.5, 6.6], [9, 8, 7], 654321),
+            ('ccc001', 'img001', 1, 2, 4, [1.1], [2], 3),
+        ]
+
+    def test_empty(self, store, dbconnection):
+        store.set_measurements('ccc001', 'img001', 1, {})
+        assert list(
+            dbconnection.execute('SELECT * FROM calibration_measurements')
+        ) == []
+
+
 class TestHasMeasurementsForPlate:
 
     def test_exists(self, store):
@@ -771,3 +817,25 @@ class TestGetMeasurementsForCalibration:
             list(store.get_measurements_for_calibration('ccc001')) ==
             [measurement1, measurement2]
         )
+
+    def test_get_in_chunks(self, store, monkeypatch):
+        monkeypatch.setattr(calibrationstore, 'MEASUREMENTS_FETCH_SIZE', 2)
+        store.add_calibration(make_calibration(identifier='ccc001'))
+        store.add_image_to_calibration('ccc001', 'img001')
+        store.add_plate('ccc001', 'img001', 1, make_plate())
+        measurements = [
+            {
+                CCCMeasurement.source_values: [float(row)],
+                CCCMeasurement.source_value_counts: [row + 1],
+                CCCMeasurement.cell_count: row * 10,
+            }
+            for row in range(5)
+        ]
+        store.set_measurements('ccc001', 'img001', 1, {
+            (1, row): measurement
+            for row, measurement in enumerate(measurements)
+        })
+        assert (
+            list(store.get_measurements_for_calibration('ccc001')) ==
+            measurements
+        )
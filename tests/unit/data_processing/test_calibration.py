@@ -307,6 +307,37 @@ class TestCalculatePolynomial:
         np.testing.assert_allclose(coeffs, [3, 2, 0], rtol=0.001)
 
 
+class TestGetCalibrationMatrix:
+
+    @pytest.fixture
+    def data(self):
+        random = np.random.RandomState(0)
+        values = [np.unique(random.randint(-40, 5, size)) - random.uniform() for size in (5, 12, 1, 30)]
+        return calibration.CalibrationData(
+            source_values=[vector.tolist() for vector in values],
+            source_value_counts=[random.randint(1, 20, vector.size).tolist() for vector in values],
+            target_value=np.arange(4),
+        )
+
+    def test_gives_calculated_sizes(self, data):
+        coeffs = [3e-5, 2e-3, 4e-2, 0.9, 2e-6, 0]
+        np.testing.assert_allclose(
+            calibration.get_calibration_matrix(data, 5).dot(coeffs),
+            calibration.calculate_sizes(data, calibration.get_calibration_polynomial(coeffs)))
+
+    def test_gives_optimization_function_values(self, data):
+        guess = np.log([2, 3])
+        np.testing.assert_allclose(
+            calibration.get_calibration_matrix_residuals(guess, calibration.get_calibration_matrix(data, 2), [0] * 4),
+            -np.array(calibration.get_calibration_optimization_function(2)(data, *guess)))
+
+    def test_shared_values_are_summed(self):
+        data = calibration.CalibrationData([[1, 2], [2], []], [[3, 1], [5], []], [])
+        np.testing.assert_equal(
+            calibration.get_calibration_matrix(data, 2),
+            [[3 + 4, 3 + 2, 4], [20, 10, 5], [0, 0, 0]])
+
+
 class TestGetAllColonyData:
 
     def test_gets_all_included_colonies_in_empty_ccc(self):
@@ -923,3 +954,73 @@ class TestSetColonyCompressedData:
                 CCCMeasurement.cell_count: 1234,
             },
         )
+
+
+class TestSetPlateCompressedData:
+
+    @pytest.fixture
+    def store(self):
+        store = MagicMock(CalibrationStore)
+        store.has_calibration_with_id.return_value = True
+        store.get_calibration_by_id.return_value = make_calibration(
+            identifier='ccc000',
+            active=False,
+            access_token='password',
+        )
+        return store
+
+    @pytest.fixture
+    def colony(self):
+        image = np.array([
+            [0, 1, 1, 1],
+            [1, 1, 2, 1],
+            [1, 2, 3, 1],
+            [1, 1, 1, 9],
+        ])
+        blob_filter = np.zeros((4, 4), dtype=bool)
+        blob_filter[1:3, 1:3] = True
+        return image, blob_filter, ~blob_filter
+
+    def test_sets_all_colonies_at_once(self, store, colony):
+        image, blob_filter, background_filter = colony
+        assert calibration.set_plate_compressed_data(
+            store, 'ccc000', 'image0', 'plate0', {
+                (0, 0): (1234, image, blob_filter, background_filter),
+                (2, 1): (42, image + 1, blob_filter, background_filter),
+            },
+            access_token='password',
+        )
+        store.set_measurements.assert_called_once_with(
+            'ccc000', 'image0', 'plate0', {
+                (0, 0): {
+                    CCCMeasurement.source_values: (0, 1, 2),
+                    CCCMeasurement.source_value_counts: (1, 2, 1),
+                    CCCMeasurement.cell_count: 1234,
+                },
+                (2, 1): {
+                    CCCMeasurement.source_values: (0, 1, 2),
+                    CCCMeasurement.source_value_counts: (1, 2, 1),
+                    CCCMeasurement.cell_count: 42,
+                },
+            },
+        )
+        store.set_measurement.assert_not_called()
+
+    def test_sets_nothing_if_a_colony_is_invalid(self, store, colony):
+        image, blob_filter, background_filter = colony
+        assert not calibration.set_plate_compressed_data(
+            store, 'ccc000', 'image0', 'plate0', {
+                (0, 0): (1234, image, blob_filter, background_filter),
+                (2, 1): (
+                    42, image, blob_filter, np.zeros((4, 4), dtype=bool)),
+            },
+            access_token='password',
+        )
+        store.set_measurements.assert_not_called()
+
+    def test_bad_access_token(self, store, colony):
+        assert not calibration.set_plate_compressed_data(
+            store, 'ccc000', 'image0', 'plate0',
+            {(0, 0): (1234,) + colony}, access_token='wrong',
+        )
+        store.set_measurements.assert_not_called()
@@ -0,0 +1,170 @@
+from __future__ import absolute_import
+
+import numpy as np
+import pytest
+
+from scanomatic.data_processing import growth_phenotypes
+from scanomatic.data_processing.growth_phenotypes import Phenotypes
+from scanomatic.data_processing.phenotypes import PhenotypeDataType
+
+
+REGRESSION_SIZE = 5
+
+
+def _strided(data, size):
+
+    return np.lib.stride_tricks.as_strided(
+        data,
+        shape=data.shape[:-1] + (data.shape[-1] - (size - 1), size),
+        strides=data.strides + data.strides[-1:])
+
+
+@pytest.fixture(scope='module')
+def times():
+    return np.arange(60) / 3.
+
+
+@pytest.fixture(scope='module')
+def curves(times):
+    np.random.seed(42)
+    n = 12
+    rate = np.random.uniform(0.2, 0.6, n)[:, np.newaxis]
+    lag = np.random.uniform(1, 6, n)[:, np.newaxis]
+    data = 1e5 * np.power(
+        2, 6 / (1 + np.exp(-rate * (times - lag - 10))) +
+        np.random.normal(0, 0.01, (n, times.size)))
+    data[1, 10:14] = np.nan
+    data[2, :3] = np.nan
+    data[3, 20:40] = np.nan
+    data[4] = np.nan
+    data[5, ::2] = np.nan
+    data[6, -5:] = np.inf
+    return data
+
+
+class TestGetDerivatives:
+
+    def test_matches_per_curve_derivatives(self, curves, times):
+
+        times_strided = _strided(times, REGRESSION_SIZE)
+        curves_strided = _strided(curves, REGRESSION_SIZE)
+        slopes, errors = growth_phenotypes.get_derivatives(
+            curves_strided, times_strided)
+
+        for curve, slope, error in zip(curves_strided, slopes, errors):
+            expected_slope, expected_error = growth_phenotypes.get_derivative(
+                curve, times_strided)
+            np.testing.assert_allclose(slope, expected_slope, equal_nan=True)
+            np.testing.assert_allclose(
+                error, expected_error, equal_nan=True, atol=1e-12)
+
+
+class TestGetPhenotypesForCurves:
+
+    @pytest.mark.parametrize('phenotype', [
+        p for p in Phenotypes if PhenotypeDataType.Scalar(p)
+    ])
+    def test_matches_per_curve_phenotypes(self, curves, times, phenotype):
+
+        times_strided = _strided(times, REGRESSION_SIZE)
+        curves_strided = _strided(curves, REGRESSION_SIZE)
+        offset = (REGRESSION_SIZE - 1) / 2
+        index_for_48h = 40
+
+        result = growth_phenotypes.get_phenotypes_for_curves(
+            curves, curves_strided, times, times_strided, index_for_48h,
+            offset, (phenotype,))
+
+        for id_curve, curve in enumerate(curves):
+            if not np.isfinite(curve).any():
+                assert np.isnan(result[phenotype][id_curve])
+                continue
+            curve_data = growth_phenotypes.get_preprocessed_data_for_phenotypes(
+                curve=curve,
+                curve_strided=curves_strided[id_curve],
+                flat_times=times,
+                times_strided=times_strided,
+                index_for_48h=index_for_48h,
+                position_offset=offset)
+            expected = np.array(np.ma.filled(phenotype(**curve_data), np.nan), dtype=np.float)
+            np.testing.assert_allclose(
+                result[phenotype][id_curve], expected, equal_nan=True,
+                rtol=1e-7)
+
+    def test_skips_non_scalar_phenotypes(self, curves, times):
+
+        result = growth_phenotypes.get_phenotypes_for_curves(
+            curves, _strided(curves, REGRESSION_SIZE), times,
+            _strided(times, REGRESSION_SIZE), 40, 2,
+            (Phenotypes.GrowthVelocityVector,))
+
+        assert result == {}
+
+    def test_chapman_richards_fits_as_well_as_per_curve(self, curves, times):
+
+        result = growth_phenotypes.get_phenotypes_for_curves(
+            curves, _strided(curves, REGRESSION_SIZE), times,
+            _strided(times, REGRESSION_SIZE), 40, 2,
+            growth_phenotypes._CHAPMAN_RICHARDS_PARAMETERS)
+
+        for id_curve, curve in enumerate(np.log2(curves)):
+            if not np.isfinite(curve).any():
+                assert np.isnan(result[Phenotypes.ChapmanRichardsFit][id_curve])
+                continue
+            expected, _ = growth_phenotypes.get_fit_r_square(times, curve)
+            assert result[Phenotypes.ChapmanRichardsFit][id_curve] > expected - 1e-6
+
+
+class TestGetFitRSquares:
+
+    @staticmethod
+    def _squares(times, curve, params):
+
+        finite = np.isfinite(curve)
+        return np.square(
+            curve[finite] -
+            growth_phenotypes.get_chapman_richards_4parameter_extended_curve(
+                times[finite], *params)).sum()
+
+    def test_jacobians_match_finite_differences(self, times):
+
+        params = np.array([[1.64, -0.1, -2.46, 0.1, 15.18], [1.2, -3, -1.1, 3, 16.7]])
+        curves, jacobians = growth_phenotypes._get_chapman_richards_curves_and_jacobians(
+            times, params)
+        step = 1e-6
+        for i in range(5):
+            shifted = [params.copy(), params.copy()]
+            shifted[0][:, i] += step
+            shifted[1][:, i] -= step
+            expected = np.subtract(*(
+                growth_phenotypes.get_chapman_richards_4parameter_extended_curve(
+                    times, *(p[:, j, np.newaxis] for j in range(5)))
+                for p in shifted)) / (2 * step)
+            np.testing.assert_allclose(jacobians[:, i], expected, rtol=1e-5, atol=1e-7)
+
+    def test_fits_at_least_as_well_as_per_curve(self, curves, times):
+
+        log2_curves = np.log2(curves)
+        r_squares, params, converged = growth_phenotypes.get_fit_r_squares(times, log2_curves)
+
+        for id_curve, curve in enumerate(log2_curves):
+            expected_r_square, expected_params = growth_phenotypes.get_fit_r_square(times, curve)
+            if not np.isfinite(curve).any():
+                assert r_squares[id_curve] == expected_r_square
+                np.testing.assert_equal(params[id_curve], expected_params)
+                assert not converged[id_curve]
+                continue
+            assert converged[id_curve]
+            assert (self._squares(times, curve, params[id_curve]) <=
+                    self._squares(times, curve, expected_params) * (1 + 1e-6))
+
+    def test_warm_start_keeps_fit(self, curves, times):
+
+        log2_curves = np.log2(curves)
+        r_squares, params, _ = growth_phenotypes.get_fit_r_squares(times, log2_curves)
+        warm_r_squares, warm_params, converged = growth_phenotypes.get_fit_r_squares(
+            times, log2_curves, p0=params)
+
+        has_data = np.isfinite(log2_curves).any(axis=1)
+        assert converged[has_data].all()
+        np.testing.assert_allclose(warm_r_squares, r_squares, rtol=1e-6)
@@ -0,0 +1,102 @@
+from __future__ import absolute_import
+
+import numpy as np
+import pytest
+
+from scanomatic.data_processing.growth_phenotypes import Phenotypes
+from scanomatic.data_processing.phases.analysis import CurvePhasePhenotypes, PhaseTable
+from scanomatic.data_processing.phases.features import CurvePhaseMetaPhenotypes, extract_phenotypes
+from scanomatic.data_processing.phases.segmentation import CurvePhases
+
+
+def _linear(start, doublings, slope, intercept):
+    return {
+        CurvePhasePhenotypes.Start: start,
+        CurvePhasePhenotypes.Duration: 1.,
+        CurvePhasePhenotypes.Yield: 1.,
+        CurvePhasePhenotypes.PopulationDoublings: doublings,
+        CurvePhasePhenotypes.LinearModelSlope: slope,
+        CurvePhasePhenotypes.LinearModelIntercept: intercept,
+        CurvePhasePhenotypes.PopulationDoublingTime: np.float64(1) / slope,
+    }
+
+
+def _non_linear(start, angle, intersection):
+    return {
+        CurvePhasePhenotypes.Start: start,
+        CurvePhasePhenotypes.Duration: 1.,
+        CurvePhasePhenotypes.Yield: 1.,
+        CurvePhasePhenotypes.PopulationDoublings: 0.5,
+        CurvePhasePhenotypes.AsymptoteAngle: angle,
+        CurvePhasePhenotypes.AsymptoteIntersection: intersection,
+    }
+
+
+@pytest.fixture
+def plate():
+    plate = np.zeros((2, 2), dtype=np.object) * np.nan
+    plate[0, 0] = [
+        (CurvePhases.Flat, _linear(0., 0.1, 0.01, 17.)),
+        (CurvePhases.GrowthAcceleration, _non_linear(2., 0.4, 0.3)),
+        (CurvePhases.Impulse, _linear(4., 2., 0.5, 15.)),
+        (CurvePhases.Impulse, _linear(6., 3., 0.25, 16.)),
+        (CurvePhases.GrowthRetardation, _non_linear(8., -0.2, 0.6)),
+        (CurvePhases.Collapse, _linear(10., -1., -0.1, 20.)),
+        (CurvePhases.Undetermined, None),
+    ]
+    plate[0, 1] = [
+        (CurvePhases.Impulse, _linear(0., 1., 0.5, 17.)),
+        (CurvePhases.Flat, _linear(2., 0.1, 0., 18.)),
+    ]
+    plate[1, 0] = [(CurvePhases.Undetermined, None)]
+    return plate
+
+
+@pytest.fixture
+def phenotypes():
+    return {
+        Phenotypes.ExperimentLowPoint: np.ones((2, 2)) * 2 ** 16,
+        Phenotypes.ExperimentLowPointWhen: np.ones((2, 2)),
+    }
+
+
+@pytest.mark.parametrize('meta_phenotype, expected', (
+    (CurvePhaseMetaPhenotypes.Modalities, [[2, 1], [0, np.nan]]),
+    (CurvePhaseMetaPhenotypes.ModalitiesAlternativeModel, [[2, np.nan], [np.nan, np.nan]]),
+    (CurvePhaseMetaPhenotypes.Collapses, [[1, 0], [0, np.nan]]),
+    (CurvePhaseMetaPhenotypes.MajorImpulseYieldContribution, [[3, 1], [np.nan, np.nan]]),
+    (CurvePhaseMetaPhenotypes.FirstMinorImpulseYieldContribution, [[2, np.nan], [np.nan, np.nan]]),
+    (CurvePhaseMetaPhenotypes.MajorImpulseAveragePopulationDoublingTime, [[4, 2], [np.nan, np.nan]]),
+    (CurvePhaseMetaPhenotypes.FirstMinorImpulseAveragePopulationDoublingTime, [[2, np.nan], [np.nan, np.nan]]),
+    (CurvePhaseMetaPhenotypes.InitialAccelerationAsymptoteAngle, [[0.4, np.nan], [np.nan, np.nan]]),
+    (CurvePhaseMetaPhenotypes.InitialAccelerationAsymptoteIntersect, [[0.3, np.nan], [np.nan, np.nan]]),
+    (CurvePhaseMetaPhenotypes.FinalRetardationAsymptoteAngle, [[-0.2, np.nan], [np.nan, np.nan]]),
+    (CurvePhaseMetaPhenotypes.FinalRetardationAsymptoteIntersect, [[0.6, np.nan], [np.nan, np.nan]]),
+    (CurvePhaseMetaPhenotypes.InitialLag, [[(15 - 17) / (0.01 - 0.5), np.nan], [np.nan, np.nan]]),
+    (CurvePhaseMetaPhenotypes.TimeBeforeMajorGrowth, [[(16 - 17) / (0.01 - 0.25), 2], [np.nan, np.nan]]),
+    (CurvePhaseMetaPhenotypes.InitialLagAlternativeModel, [[0, np.nan], [np.nan, np.nan]]),
+))
+def test_extract_phenotypes(plate, phenotypes, meta_phenotype, expected):
+
+    np.testing.assert_allclose(extract_phenotypes(plate, meta_phenotype, phenotypes), expected)
+
+
+def test_extract_phenotypes_from_phase_table(plate, phenotypes):
+
+    table = PhaseTable.from_phases_phenotypes(plate)
+    for meta_phenotype in CurvePhaseMetaPhenotypes:
+        np.testing.assert_equal(
+            extract_phenotypes(table, meta_phenotype, phenotypes),
+            extract_phenotypes(plate, meta_phenotype, phenotypes))
+
+
+def test_major_impulse_flank_asymmetry(plate, phenotypes):
+
+    # Without the second impulse the major impulse is flanked by non-linear phases
+    plate[0, 0] = plate[0, 0][:3] + plate[0, 0][4:]
+    impulse_angle = np.arctan2(1, 0.5)
+    flat_angle = np.pi - np.abs(impulse_angle - np.arctan2(1, 0.))
+
+    np.testing.assert_allclose(
+        extract_phenotypes(plate, CurvePhaseMetaPhenotypes.MajorImpulseFlankAsymmetry, phenotypes),
+        [[-0.2 / 0.4, flat_angle / impulse_angle], [np.inf, np.inf]])
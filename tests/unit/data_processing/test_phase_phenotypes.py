@@ -7,7 +7,10 @@ from scanomatic.data_processing.phases.analysis import (
     _locate_segment, get_data_needed_for_segmentation, DEFAULT_THRESHOLDS,
     segment, _phenotype_phases, CurvePhasePhenotypes,
     assign_linear_phase_phenotypes, assign_common_phase_phenotypes,
-    assign_non_linear_phase_phenotypes
+    assign_non_linear_phase_phenotypes, get_phase_table, PhaseTable
+)
+from scanomatic.data_processing.phases.segmentation import (
+    CurvePhases, is_detected_linear, is_detected_non_linear, is_undetermined
 )
 from scanomatic.data_processing.phenotyper import Phenotyper
 
@@ -360,3 +363,95 @@ def test_segments():
 
         assert model.phases is not None, "Failed phases on curve " + i
         assert len(model.phases) > 0, "Zero length phases on curve " + i
+
+
+def _phenotype_phases_per_phase(model):
+    """Phenotyping one phase at a time, as the phase phenotyping used to."""
+    phenotypes = []
+    for phase in CurvePhases:
+        for left, right in _get_runs(model.phases == phase.value):
+            if is_undetermined(phase):
+                phenotypes.append((phase, None))
+                continue
+            filt = np.zeros_like(model.phases, dtype=bool)
+            filt[left: right] = True
+            data = {}
+            if is_detected_non_linear(phase):
+                assign_non_linear_phase_phenotypes(
+                    data, model, left, right, model.times[left], model.times[right - 1])
+            elif is_detected_linear(phase):
+                assign_linear_phase_phenotypes(data, model, filt)
+            assign_common_phase_phenotypes(data, model, left, right)
+            phenotypes.append((phase, data))
+    return sorted(phenotypes, key=lambda (t, p): p[CurvePhasePhenotypes.Start] if p is not None else 9999)
+
+
+def _get_runs(filt):
+    edges = np.diff(np.r_[0, filt.astype(int), 0])
+    return zip(np.flatnonzero(edges == 1), np.flatnonzero(edges == -1))
+
+
+def _assert_same_phases_phenotypes(phenotypes, expected):
+    assert [phase for phase, _ in phenotypes] == [phase for phase, _ in expected]
+    for (_, data), (_, expected_data) in zip(phenotypes, expected):
+        if expected_data is None:
+            assert data is None
+            continue
+        assert set(data) == set(expected_data)
+        for phenotype in expected_data:
+            np.testing.assert_allclose(
+                data[phenotype], np.ma.filled(expected_data[phenotype], np.nan), rtol=1e-9, atol=1e-12)
+
+
+@pytest.fixture(scope='module')
+def segmented_models():
+    phenotyper_object = build_test_phenotyper()
+    models = []
+    for i in range(phenotyper_object.number_of_curves):
+        model = build_model(phenotyper_object, i)
+        for _ in segment(model, DEFAULT_THRESHOLDS):
+            pass
+        models.append(model)
+    models[2].phases[10: 12] = CurvePhases.GrowthAcceleration.value
+    models[2].phases[12: 20] = CurvePhases.Impulse.value
+    models[2].phases[30: 31] = CurvePhases.Collapse.value
+    models[2].phases[40: 45] = CurvePhases.UndeterminedNonFlat.value
+    return models
+
+
+def test_phase_table_is_same_as_phenotyping_per_phase(segmented_models):
+
+    table = get_phase_table(segmented_models)
+
+    assert table.size == len(segmented_models)
+    for index, model in enumerate(segmented_models):
+        _assert_same_phases_phenotypes(table.get_phases_phenotypes(index), _phenotype_phases_per_phase(model))
+
+
+def test_phase_table_runs(segmented_models):
+
+    table = get_phase_table(segmented_models[2:3], colonies=[4], shape=(2, 3))
+
+    assert table.shape == (2, 3)
+    assert table.has_phases.tolist() == [False, False, False, False, True, False]
+    assert (table.colonies == 4).all()
+    np.testing.assert_equal(table.counts, [0, 0, 0, 0, len(table), 0])
+    phases = np.zeros_like(segmented_models[2].phases)
+    for phase, left, right in zip(table.phases, table.lefts, table.rights):
+        phases[left: right] = phase
+    np.testing.assert_equal(phases, segmented_models[2].phases)
+
+
+def test_phase_table_from_phases_phenotypes(segmented_models):
+
+    plate = np.zeros((2, 3), dtype=np.object) * np.nan
+    for index, model in enumerate(segmented_models[1:]):
+        plate.flat[index] = _phenotype_phases(model, 5)
+
+    table = PhaseTable.from_phases_phenotypes(plate)
+
+    assert table.shape == (2, 3)
+    assert table.has_phases.tolist() == [True] * 5 + [False]
+    for index in range(5):
+        _assert_same_phases_phenotypes(table.get_phases_phenotypes(index), plate.flat[index])
+    assert table.get_phases_phenotypes(5) == []
@@ -0,0 +1,106 @@
+from __future__ import absolute_import
+
+import os
+
+import numpy as np
+import pytest
+
+from scanomatic.data_processing import phenotype_store
+from scanomatic.data_processing.growth_phenotypes import Phenotypes
+from scanomatic.data_processing.phases.features import (
+    CurvePhaseMetaPhenotypes
+)
+
+
+@pytest.fixture
+def plate():
+    return phenotype_store.PlatePhenotypes.from_dict({
+        Phenotypes.GenerationTime: np.arange(6.).reshape(2, 3),
+        CurvePhaseMetaPhenotypes.Modalities: np.ones((2, 3)),
+    })
+
+
+class TestPlatePhenotypes:
+
+    def test_behaves_like_dict(self, plate):
+        assert len(plate) == 2
+        assert Phenotypes.GenerationTime in plate
+        assert Phenotypes.GrowthLag not in plate
+        assert set(plate.keys()) == {
+            Phenotypes.GenerationTime, CurvePhaseMetaPhenotypes.Modalities}
+        np.testing.assert_equal(
+            plate[Phenotypes.GenerationTime], np.arange(6.).reshape(2, 3))
+
+    def test_stores_phenotypes_densely(self, plate):
+        assert plate.data.shape == (2, 2, 3)
+        assert plate.shape == (2, 3)
+
+    def test_setting_positions_changes_data(self, plate):
+        plate[Phenotypes.GenerationTime][1, 1] = 42
+        assert plate[Phenotypes.GenerationTime][1, 1] == 42
+
+    def test_adds_phenotype(self, plate):
+        plate[Phenotypes.GrowthLag] = np.zeros((2, 3))
+        assert plate.data.shape == (3, 2, 3)
+        np.testing.assert_equal(plate[Phenotypes.GrowthLag], 0)
+        np.testing.assert_equal(plate[CurvePhaseMetaPhenotypes.Modalities], 1)
+
+    def test_first_phenotype_sets_shape(self):
+        plate = phenotype_store.PlatePhenotypes(np.uint8, 0)
+        plate[Phenotypes.GrowthLag] = np.ones((4, 5))
+        assert plate.shape == (4, 5)
+        assert plate.data.dtype == np.uint8
+
+    def test_rejects_phenotype_of_other_shape(self, plate):
+        with pytest.raises(ValueError):
+            plate[Phenotypes.GrowthLag] = np.zeros((3, 2))
+
+    def test_removes_phenotype(self, plate):
+        del plate[Phenotypes.GenerationTime]
+        assert list(plate) == [CurvePhaseMetaPhenotypes.Modalities]
+        np.testing.assert_equal(plate[CurvePhaseMetaPhenotypes.Modalities], 1)
+
+
+class TestAsPlatePhenotypes:
+
+    def test_converts_dicts(self):
+        plates = phenotype_store.as_plate_phenotypes(np.array([
+            None, {Phenotypes.GenerationTime: np.ones((2, 2))}]))
+        assert plates.dtype == np.object
+        assert plates[0] is None
+        assert isinstance(plates[1], phenotype_store.PlatePhenotypes)
+
+    def test_rejects_dicts_of_different_shapes(self):
+        with pytest.raises(ValueError):
+            phenotype_store.as_plate_phenotypes([{
+                Phenotypes.GenerationTime: np.ones((2, 2)),
+                Phenotypes.GrowthLag: np.ones((3, 2))}])
+
+
+class TestSaveAndLoadPlates:
+
+    def test_round_trip(self, plate, tmpdir):
+        path = os.path.join(str(tmpdir), 'plates.npz')
+        phenotype_store.save_plates(
+            path, phenotype_store.get_plates_array([None, plate]))
+        loaded = phenotype_store.load_plates(path)
+        assert len(loaded) == 2
+        assert loaded[0] is None
+        assert loaded[1].phenotypes == plate.phenotypes
+        np.testing.assert_equal(loaded[1].data, plate.data)
+
+    def test_no_plates(self, tmpdir):
+        path = os.path.join(str(tmpdir), 'plates.npz')
+        phenotype_store.save_plates(path, None)
+        assert phenotype_store.load_plates(path) is None
+
+    def test_drops_unknown_phenotypes(self, plate, tmpdir):
+        path = os.path.join(str(tmpdir), 'plates.npz')
+        phenotype_store.save_plates(path, [plate])
+        with np.load(path) as npz:
+            arrays = dict(npz.items())
+        arrays['plate_0_phenotypes'][0] = 'Phenotypes.Unknown'
+        np.savez(path, **arrays)
+        loaded = phenotype_store.load_plates(path)
+        assert loaded[0].phenotypes == plate.phenotypes[1:]
+        np.testing.assert_equal(loaded[0].data, plate.data[1:])
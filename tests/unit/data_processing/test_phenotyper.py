@@ -1,7 +1,12 @@
 from __future__ import absolute_import
+import glob
+import multiprocessing
+import os
+import time
 import numpy as np
 import pytest
 from scanomatic.data_processing import phenotyper
+from scanomatic.io.growth_store import GrowthStore
 import itertools
 
 
@@ -102,3 +107,508 @@ class TestMarkingCurve:
         assert data.filter[1, 0] == 0
         assert np.ma.is_masked(data[1, 1])
         assert data.filter[1, 1] == phenotyper.Filter.BadData.value
+
+
+class TestExtraction:
+
+    @pytest.fixture(scope='class')
+    def growth_data(self):
+        random = np.random.RandomState(7)
+        times = np.arange(48) / 2.
+        rate = random.uniform(0.3, 0.6, (3, 4, 1))
+        data = 1e5 * np.power(
+            2, 5 / (1 + np.exp(-rate * (times - 10))) +
+            random.normal(0, 0.01, (3, 4, times.size)))
+        data[0, 0] = np.nan
+        raw = np.empty((2,), dtype=np.object)
+        raw[0] = data
+        raw[1] = data[:2, :2].copy()
+        return raw, times
+
+    @staticmethod
+    def _assert_same_phenotypes(result, expected):
+        for phenotype in expected.phenotypes:
+            if phenotype not in expected:
+                continue
+            for expected_plate, plate in zip(
+                    expected.get_phenotype(phenotype, filtered=False),
+                    result.get_phenotype(phenotype, filtered=False)):
+                np.testing.assert_allclose(
+                    plate.astype(np.float), expected_plate.astype(np.float),
+                    equal_nan=True)
+
+        for plate in range(2):
+            for pos in expected.enumerate_plate_positions(plate):
+                np.testing.assert_equal(
+                    result.get_curve_phase_data(plate, *pos),
+                    expected.get_curve_phase_data(plate, *pos))
+                np.testing.assert_equal(
+                    result.get_curve_phases(plate, *pos),
+                    expected.get_curve_phases(plate, *pos))
+
+    @staticmethod
+    def _get_first(growth_data, appended):
+        raw, times = growth_data
+        first = np.empty((2,), dtype=np.object)
+        for plate in range(2):
+            first[plate] = raw[plate][..., :-appended].copy()
+        return phenotyper.Phenotyper(first, times[:-appended])
+
+    @staticmethod
+    def _write_store(path, growth_data):
+        raw, times = growth_data
+        store = GrowthStore(path)
+        for index, time in enumerate(times):
+            store.set_time(index, time)
+            store.write(index, [plate[..., index] for plate in raw])
+
+    def test_extraction_in_processes_matches_sequential(self, growth_data):
+
+        sequential = phenotyper.Phenotyper(*growth_data)
+        sequential.extract_phenotypes()
+        parallel = phenotyper.Phenotyper(*growth_data)
+        parallel.extract_phenotypes(workers=2)
+
+        self._assert_same_phenotypes(parallel, sequential)
+
+    def test_extraction_in_daemonic_process_works_serially(self, growth_data):
+
+        def extract(queue):
+            p = phenotyper.Phenotyper(*growth_data)
+            p.extract_phenotypes(workers=2)
+            queue.put(p.get_phenotype(
+                phenotyper.Phenotypes.GenerationTime, filtered=False)[1])
+
+        queue = multiprocessing.Queue()
+        process = multiprocessing.Process(target=extract, args=(queue,))
+        process.daemon = True
+        process.start()
+        result = queue.get(timeout=60)
+        process.join()
+
+        sequential = phenotyper.Phenotyper(*growth_data)
+        sequential.extract_phenotypes()
+        np.testing.assert_allclose(
+            result, sequential.get_phenotype(
+                phenotyper.Phenotypes.GenerationTime, filtered=False)[1])
+
+    def test_iterate_extraction_reports_progress(self, growth_data):
+
+        p = phenotyper.Phenotyper(*growth_data)
+        progress = list(p.iterate_extraction(workers=2))
+        assert progress == sorted(progress)
+        assert progress[-1] == 1
+
+    @pytest.mark.parametrize('workers', (1, 2))
+    def test_update_matches_extraction(self, growth_data, workers):
+
+        raw, times = growth_data
+        expected = phenotyper.Phenotyper(*growth_data)
+        list(expected.iterate_extraction())
+        updated = self._get_first(growth_data, 3)
+        list(updated.iterate_extraction())
+
+        updated.append_growth_data(
+            [plate[..., -3:] for plate in raw], times[-3:])
+        progress = list(updated.iterate_update(workers=workers))
+
+        assert progress == sorted(progress)
+        assert progress[-1] == 1
+        self._assert_same_phenotypes(updated, expected)
+
+    def test_update_keeps_unchanged_curves_and_marks(self, growth_data):
+
+        raw, times = growth_data
+        updated = self._get_first(growth_data, 3)
+        list(updated.iterate_extraction())
+        phenotype = phenotyper.Phenotypes.GenerationTime
+        previous = updated.get_phenotype(phenotype, filtered=False)[1].copy()
+        updated.add_position_mark(0, (1, 1))
+
+        updated.append_growth_data([raw[0][..., -3:], None], times[-3:])
+        updated._changed_curves[1][...] = False
+        list(updated.iterate_update())
+
+        np.testing.assert_equal(
+            updated.get_phenotype(phenotype, filtered=False)[1], previous)
+        assert updated.get_curve_phases(1, 1, 1).size == times.size
+        assert (
+            updated.get_curve_phases(1, 1, 1)[-3:] ==
+            phenotyper.CurvePhases.Undetermined.value).all()
+        assert np.ma.is_masked(updated.get_phenotype(phenotype)[0][1, 1])
+
+    def test_update_from_image_data_appends_new_images(self, growth_data, tmpdir):
+
+        path = str(tmpdir)
+        self._write_store(path, growth_data)
+        expected = phenotyper.Phenotyper(*growth_data)
+        list(expected.iterate_extraction())
+        updated = self._get_first(growth_data, 3)
+        list(updated.iterate_extraction())
+
+        assert updated.update_from_image_data(path) == 3
+        assert updated.has_smooth_growth_data
+        list(updated.iterate_update())
+
+        self._assert_same_phenotypes(updated, expected)
+
+    def test_update_from_changed_image_data_extracts_anew(self, growth_data, tmpdir):
+
+        path = str(tmpdir)
+        raw, times = growth_data
+        changed = np.empty((2,), dtype=np.object)
+        for plate in range(2):
+            changed[plate] = raw[plate].copy()
+            changed[plate][..., :5] *= 1.5
+        self._write_store(path, (changed, times))
+        expected = phenotyper.Phenotyper(changed, times)
+        list(expected.iterate_extraction())
+        updated = self._get_first(growth_data, 3)
+        list(updated.iterate_extraction())
+        updated.add_position_mark(0, (1, 1))
+
+        assert updated.update_from_image_data(path) == 3
+        assert not updated.has_smooth_growth_data
+        list(updated.iterate_update())
+
+        self._assert_same_phenotypes(updated, expected)
+        assert np.ma.is_masked(
+            updated.get_phenotype(phenotyper.Phenotypes.GenerationTime)[0][1, 1])
+
+    def test_update_without_phenotypes_extracts(self, growth_data):
+
+        expected = phenotyper.Phenotyper(*growth_data)
+        list(expected.iterate_extraction())
+        updated = phenotyper.Phenotyper(*growth_data)
+        list(updated.iterate_update())
+
+        self._assert_same_phenotypes(updated, expected)
+
+
+class TestSmoothing:
+
+    @pytest.fixture(scope='class')
+    def growth_data(self):
+        random = np.random.RandomState(11)
+        times = np.arange(60) / 3. + 0.33
+        rate = random.uniform(0.3, 0.6, (3, 4, 1))
+        data = 1e5 * np.power(
+            2, 5 / (1 + np.exp(-rate * (times - 10))) +
+            random.normal(0, 0.01, (3, 4, times.size)))
+        data[0, 0] = np.nan
+        data[0, 1, 10:16] = np.nan
+        data[0, 2, ::3] = np.nan
+        data[0, 3, :20] = np.nan
+        data[1, 0, 50:] = 0
+        raw = np.empty((1,), dtype=np.object)
+        raw[0] = data
+        return raw, times
+
+    @pytest.mark.parametrize('edge_condition', (
+        phenotyper.EdgeCondition.Reflect, phenotyper.EdgeCondition.Symmetric))
+    def test_batched_matches_weighted_multi(self, growth_data, edge_condition):
+
+        expected = phenotyper.Phenotyper(*growth_data)
+        expected._poly_smoothen_raw_growth_weighted(
+            edge_condition=edge_condition)
+        batched = phenotyper.Phenotyper(*growth_data)
+        batched._poly_smoothen_raw_growth_weighted_batched(
+            edge_condition=edge_condition)
+
+        np.testing.assert_allclose(
+            batched.smooth_growth_data[0], expected.smooth_growth_data[0],
+            rtol=1e-6, equal_nan=True)
+
+    @pytest.fixture(scope='class')
+    def long_growth_data(self):
+        random = np.random.RandomState(13)
+        times = np.arange(150) / 3.
+        data = 1e5 * np.power(
+            2, 5 / (1 + np.exp(-0.4 * (times - 20))) +
+            random.normal(0, 0.05, (2, 3, times.size)))
+        data[0, 1, 140:145] = np.nan
+        raw = np.empty((1,), dtype=np.object)
+        raw[0] = data
+        return raw, times
+
+    @pytest.mark.parametrize('smoothing', (
+        phenotyper.Smoothing.MedianGauss,
+        phenotyper.Smoothing.PolynomialWeightedMultiBatched))
+    @pytest.mark.parametrize('appended', (1, 4, 130))
+    def test_append_matches_smoothing_all(
+            self, long_growth_data, smoothing, appended):
+
+        raw, times = long_growth_data
+        expected = phenotyper.Phenotyper(*long_growth_data)
+        first = np.empty((1,), dtype=np.object)
+        first[0] = raw[0][..., :-appended].copy()
+        updated = phenotyper.Phenotyper(first, times[:-appended])
+        expected._smooth(smoothing, {})
+        updated._smooth(smoothing, {})
+
+        updated.append_growth_data(
+            [raw[0][..., -appended:]], times[-appended:])
+
+        np.testing.assert_equal(updated.times, times)
+        np.testing.assert_equal(updated.raw_growth_data[0], raw[0])
+        np.testing.assert_allclose(
+            updated.smooth_growth_data[0], expected.smooth_growth_data[0],
+            rtol=1e-10, equal_nan=True)
+
+    def test_append_with_unknown_smoothing_smooths_anew(
+            self, long_growth_data):
+
+        raw, times = long_growth_data
+        expected = phenotyper.Phenotyper(*long_growth_data)
+        expected._smoothen()
+        first = np.empty((1,), dtype=np.object)
+        first[0] = raw[0][..., :-4].copy()
+        updated = phenotyper.Phenotyper(first, times[:-4])
+        smooth = np.empty((1,), dtype=np.object)
+        smooth[0] = first[0].copy()
+        assert updated.set('smooth_growth_data', smooth)
+
+        updated.append_growth_data([raw[0][..., -4:]], times[-4:])
+
+        np.testing.assert_allclose(
+            updated.smooth_growth_data[0], expected.smooth_growth_data[0],
+            equal_nan=True)
+        assert updated._changed_curves[0].all()
+
+    def test_append_smooths_only_the_end(self):
+
+        times = np.arange(150) / 3.
+        assert phenotyper.get_smoothing_update_window(times, 149, 2, 10.2) == (116, 83)
+        assert phenotyper.get_smoothing_update_window(times, 149, 4) == (144, 139)
+        assert phenotyper.get_smoothing_update_window(times, 20, 2, 10.2) == (0, 0)
+
+    def test_append_rejects_earlier_times(self, growth_data):
+
+        p = phenotyper.Phenotyper(*growth_data)
+        with pytest.raises(ValueError):
+            p.append_growth_data([growth_data[0][0][..., -1:]], [0])
+
+    def test_append_without_smooth_data(self, growth_data):
+
+        raw, times = growth_data
+        first = np.empty((1,), dtype=np.object)
+        first[0] = raw[0][..., :-2].copy()
+        p = phenotyper.Phenotyper(first, times[:-2])
+        p.append_growth_data([None], times[-2:])
+        assert p.raw_growth_data[0].shape == raw[0].shape
+        assert np.isnan(p.raw_growth_data[0][..., -2:]).all()
+        assert not p.has_smooth_growth_data
+
+
+class TestLoadFromState:
+
+    @pytest.fixture(scope='class')
+    def extracted(self):
+        random = np.random.RandomState(3)
+        times = np.arange(48) / 2.
+        rate = random.uniform(0.3, 0.6, (3, 4, 1))
+        data = 1e5 * np.power(
+            2, 5 / (1 + np.exp(-rate * (times - 10))) +
+            random.normal(0, 0.01, (3, 4, times.size)))
+        raw = np.empty((2,), dtype=np.object)
+        raw[0] = data
+        raw[1] = data[:2, :2].copy()
+        p = phenotyper.Phenotyper(raw, times)
+        p.extract_phenotypes()
+        return p
+
+    @pytest.fixture(scope='function')
+    def state_path(self, extracted, tmpdir):
+        path = str(tmpdir)
+        extracted.save_state(path, ask_if_overwrite=False)
+        return path
+
+    @staticmethod
+    def _assert_same_state(loaded, expected):
+        for plate in range(2):
+            np.testing.assert_equal(
+                loaded.raw_growth_data[plate],
+                expected.raw_growth_data[plate])
+            np.testing.assert_equal(
+                loaded.smooth_growth_data[plate],
+                expected.smooth_growth_data[plate])
+        phenotype = phenotyper.Phenotypes.GenerationTime
+        for loaded_plate, expected_plate in zip(
+                loaded.get_phenotype(phenotype),
+                expected.get_phenotype(phenotype)):
+            np.testing.assert_equal(
+                loaded_plate.filled(), expected_plate.filled())
+            np.testing.assert_equal(
+                loaded_plate.filter, expected_plate.filter)
+
+    def test_growth_data_is_memory_mapped(self, extracted, state_path):
+        loaded = phenotyper.Phenotyper.LoadFromState(state_path)
+        assert all(
+            isinstance(plate, np.memmap) for plate in loaded.raw_growth_data)
+        assert all(
+            isinstance(plate, np.memmap)
+            for plate in loaded.smooth_growth_data)
+        self._assert_same_state(loaded, extracted)
+
+    def test_curve_fetch_does_not_load_phenotypes(self, state_path):
+        loaded = phenotyper.Phenotyper.LoadFromState(state_path)
+        loaded.smooth_growth_data[0][1, 1].tolist()
+        loaded.raw_growth_data[0][1, 1].tolist()
+        assert '_phenotypes' in loaded._lazy_state_loaders
+        assert '_vector_phenotypes' in loaded._lazy_state_loaders
+        assert loaded.get_curve_phases(0, 1, 1) is not None
+        assert '_phenotypes' in loaded._lazy_state_loaders
+        assert phenotyper.Phenotypes.GenerationTime in loaded
+        assert '_phenotypes' not in loaded._lazy_state_loaders
+
+    def test_loads_state_without_plate_files(self, extracted, state_path):
+        for path in glob.glob(os.path.join(state_path, 'curves_*.plate_*')):
+            os.remove(path)
+        loaded = phenotyper.Phenotyper.LoadFromState(state_path)
+        assert not isinstance(loaded.raw_growth_data[0], np.memmap)
+        self._assert_same_state(loaded, extracted)
+
+    def test_ignores_outdated_plate_files(self, extracted, state_path):
+        raw_path = os.path.join(state_path, 'curves_raw.npy')
+        np.save(raw_path, extracted.smooth_growth_data)
+        os.utime(raw_path, (time.time() + 10, time.time() + 10))
+        loaded = phenotyper.Phenotyper.LoadFromState(state_path)
+        np.testing.assert_equal(
+            loaded.raw_growth_data[1], extracted.smooth_growth_data[1])
+
+    def test_save_over_loaded_state(self, state_path):
+        loaded = phenotyper.Phenotyper.LoadFromState(state_path)
+        loaded.add_position_mark(0, (1, 1))
+        loaded.save_state(state_path, ask_if_overwrite=False)
+        reloaded = phenotyper.Phenotyper.LoadFromState(state_path)
+        assert isinstance(reloaded.raw_growth_data[0], np.memmap)
+        self._assert_same_state(reloaded, loaded)
+        assert np.ma.is_masked(reloaded.get_phenotype(
+            phenotyper.Phenotypes.GenerationTime)[0][1, 1])
+
+    def test_loaded_state_updates_with_saved_smoothing(
+            self, extracted, tmpdir):
+        raw, times = extracted.raw_growth_data, extracted.times
+        first = np.empty((2,), dtype=np.object)
+        for plate in range(2):
+            first[plate] = raw[plate][..., :-2].copy()
+        p = phenotyper.Phenotyper(first, times[:-2])
+        p.extract_phenotypes()
+        path = str(tmpdir)
+        p.save_state(path, ask_if_overwrite=False)
+
+        loaded = phenotyper.Phenotyper.LoadFromState(path)
+        assert loaded._smoothing is (
+            phenotyper.Smoothing.PolynomialWeightedMulti)
+        loaded.append_growth_data(
+            [plate[..., -2:] for plate in raw], times[-2:])
+        list(loaded.iterate_update())
+        loaded.save_state(path, ask_if_overwrite=False)
+
+        reloaded = phenotyper.Phenotyper.LoadFromState(path)
+        phenotype = phenotyper.Phenotypes.GenerationTime
+        for plate in range(2):
+            np.testing.assert_equal(
+                reloaded.raw_growth_data[plate], raw[plate])
+            # The updated curves are smoothed by the batched smoothing
+            np.testing.assert_allclose(
+                reloaded.smooth_growth_data[plate],
+                extracted.smooth_growth_data[plate], rtol=1e-6)
+            np.testing.assert_allclose(
+                reloaded.get_phenotype(phenotype, filtered=False)[plate],
+                extracted.get_phenotype(phenotype, filtered=False)[plate],
+                rtol=1e-6)
+
+    def test_save_over_loaded_state_only_writes_changes(self, state_path):
+        for path in glob.glob(os.path.join(state_path, '*')):
+            os.utime(path, (1000, 1000))
+        loaded = phenotyper.Phenotyper.LoadFromState(state_path)
+        loaded.add_position_mark(0, (1, 1))
+        loaded.save_state(state_path, ask_if_overwrite=False)
+        changed = set(
+            os.path.basename(path)
+            for path in glob.glob(os.path.join(state_path, '*'))
+            if os.path.getmtime(path) != 1000)
+        assert changed == {
+            'phenotype_params.npy', 'phenotypes_filter.journal.pickle'}
+        assert '_smooth_growth_data' in loaded._lazy_state_loaders
+
+    def test_reloads_journaled_marks_and_undo(self, state_path):
+        loaded = phenotyper.Phenotyper.LoadFromState(state_path)
+        loaded.add_position_mark(0, (1, 1))
+        loaded.save_state(state_path, ask_if_overwrite=False)
+        loaded.add_position_mark(1, (0, 1))
+        loaded.add_position_mark(0, (2, 2))
+        loaded.undo(0)
+        loaded.save_state(state_path, ask_if_overwrite=False)
+        reloaded = phenotyper.Phenotyper.LoadFromState(state_path)
+        self._assert_same_state(reloaded, loaded)
+        assert [len(undo) for undo in reloaded._phenotype_filter_undo] == [
+            1, 1]
+        assert reloaded._filter_journal_records == 2
+
+    def test_compacts_journal(self, state_path):
+        loaded = phenotyper.Phenotyper.LoadFromState(state_path)
+        loaded.FILTER_JOURNAL_LENGTH = 1
+        loaded.add_position_mark(0, (1, 1))
+        loaded.save_state(state_path, ask_if_overwrite=False)
+        journal_path = os.path.join(
+            state_path, 'phenotypes_filter.journal.pickle')
+        assert os.path.isfile(journal_path)
+        loaded.add_position_mark(1, (0, 1))
+        loaded.save_state(state_path, ask_if_overwrite=False)
+        assert not os.path.isfile(journal_path)
+        reloaded = phenotyper.Phenotyper.LoadFromState(state_path)
+        self._assert_same_state(reloaded, loaded)
+        assert [len(undo) for undo in reloaded._phenotype_filter_undo] == [
+            1, 1]
+
+    def test_ignores_incomplete_journal_record(self, state_path):
+        loaded = phenotyper.Phenotyper.LoadFromState(state_path)
+        loaded.add_position_mark(0, (1, 1))
+        loaded.save_state(state_path, ask_if_overwrite=False)
+        expected = loaded.get_phenotype(
+            phenotyper.Phenotypes.GenerationTime)[0].filter.copy()
+        journal_path = os.path.join(
+            state_path, 'phenotypes_filter.journal.pickle')
+        size = os.path.getsize(journal_path)
+        loaded.add_position_mark(0, (2, 2))
+        loaded.save_state(state_path, ask_if_overwrite=False)
+        with open(journal_path, 'r+b') as fh:
+            fh.truncate(size + (os.path.getsize(journal_path) - size) // 2)
+
+        reloaded = phenotyper.Phenotyper.LoadFromState(state_path)
+        np.testing.assert_equal(
+            reloaded.get_phenotype(
+                phenotyper.Phenotypes.GenerationTime)[0].filter,
+            expected)
+        reloaded.add_position_mark(1, (0, 1))
+        reloaded.save_state(state_path, ask_if_overwrite=False)
+        again_reloaded = phenotyper.Phenotyper.LoadFromState(state_path)
+        self._assert_same_state(again_reloaded, reloaded)
+        assert again_reloaded._filter_journal_records == 2
+
+    def test_save_leaves_no_temporary_files(self, state_path):
+        loaded = phenotyper.Phenotyper.LoadFromState(state_path)
+        loaded.set_control_surface_offsets(phenotyper.Offsets.UpperLeft, 0)
+        loaded.save_state(state_path, ask_if_overwrite=False)
+        assert not glob.glob(os.path.join(state_path, '*.tmp'))
+        reloaded = phenotyper.Phenotyper.LoadFromState(state_path)
+        np.testing.assert_equal(
+            reloaded.get_control_surface_offset(0),
+            loaded.get_control_surface_offset(0))
+
+    def test_saves_phenotypes_without_pickling(self, state_path):
+        assert os.path.isfile(os.path.join(state_path, 'phenotypes_raw.npz'))
+        assert not os.path.isfile(
+            os.path.join(state_path, 'phenotypes_raw.npy'))
+        with np.load(os.path.join(state_path, 'phenotypes_raw.npz')) as npz:
+            assert all(npz[key].dtype != np.object for key in npz.keys())
+
+    def test_loads_legacy_phenotypes(self, extracted, state_path):
+        os.remove(os.path.join(state_path, 'phenotypes_raw.npz'))
+        np.save(
+            os.path.join(state_path, 'phenotypes_raw.npy'),
+            np.array([dict(plate) for plate in extracted._phenotypes]))
+        loaded = phenotyper.Phenotyper.LoadFromState(state_path)
+        self._assert_same_state(loaded, extracted)
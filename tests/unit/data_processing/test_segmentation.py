@@ -0,0 +1,98 @@
+from __future__ import absolute_import
+
+import numpy as np
+import pytest
+from scipy.ndimage import label
+
+from scanomatic.data_processing.phases import segmentation
+from scanomatic.data_processing.phases.analysis import get_phase_analyses, get_phase_analysis
+from scanomatic.data_processing.phases.segmentation import (
+    DEFAULT_THRESHOLDS, CurvePhases, get_data_needed_for_segmentation,
+    get_linear_non_flat_extension_per_position, get_linear_non_flat_extensions
+)
+from scanomatic.data_processing.phenotyper import Phenotyper
+
+TIMES = 90
+
+
+def _get_extensions_per_position(model, thresholds):
+    """Scanning one position at a time, as the linearity scan used to."""
+    filt = np.ma.filled(model.phases != CurvePhases.Flat.value, False)
+    extension_lengths = np.zeros_like(filt, dtype=np.int)
+    extension_borders = {}
+    for loc in range(extension_lengths.size):
+        if not filt[loc]:
+            continue
+        candidates = segmentation.get_tangent_proximity(model, loc, thresholds) & filt
+        candidates, n_found = label(segmentation._bridge_canditates(candidates))
+        if n_found == 0 or not candidates[loc]:
+            continue
+        extension_borders[loc] = candidates == candidates[loc]
+        extension_lengths[loc] = extension_borders[loc].sum()
+    return extension_lengths, extension_borders
+
+
+@pytest.fixture(scope='module')
+def phenotyper():
+    random = np.random.RandomState(0)
+    times = np.arange(TIMES) / 3.
+    curves = []
+    for index in range(12):
+        lag, rate, gain = random.uniform(3, 12), random.uniform(0.3, 1.5), random.uniform(3, 8)
+        curve = 17 + gain / (1 + np.exp(-rate * (times - lag - gain / rate))) + random.normal(0, 0.02, TIMES)
+        curve = np.power(2, curve)
+        if index % 4 == 0:
+            curve[random.randint(0, TIMES, 4)] = np.nan
+        curves.append(curve)
+    data = np.array(curves).reshape((1, 3, 4, TIMES))
+    phenotyper = Phenotyper(data, times)
+    phenotyper._smooth_growth_data = data
+    return phenotyper
+
+
+@pytest.fixture(scope='module')
+def models(phenotyper):
+    models = [
+        get_data_needed_for_segmentation(phenotyper, 0, (row, column), DEFAULT_THRESHOLDS)
+        for row in range(3) for column in range(4)]
+    models[1].phases[10: 30] = CurvePhases.Flat.value
+    return models
+
+
+class TestLinearNonFlatExtensions:
+
+    def test_same_as_scanning_each_position(self, models):
+        for model in models:
+            expected_lengths, expected_borders = _get_extensions_per_position(model, DEFAULT_THRESHOLDS)
+            lengths, borders = get_linear_non_flat_extension_per_position(model, DEFAULT_THRESHOLDS)
+            assert expected_lengths.any()
+            np.testing.assert_equal(lengths, expected_lengths)
+            assert sorted(borders) == sorted(expected_borders)
+            for loc, elected in expected_borders.items():
+                np.testing.assert_equal(borders[loc], elected)
+
+    def test_flat_positions_have_no_extension(self, models):
+        lengths, _ = get_linear_non_flat_extension_per_position(models[1], DEFAULT_THRESHOLDS)
+        assert not lengths[10: 30].any()
+
+    def test_batched_in_chunks(self, models, monkeypatch):
+        expected, _, _ = get_linear_non_flat_extensions(models, DEFAULT_THRESHOLDS)
+        monkeypatch.setattr(segmentation, 'LINEARITY_SCAN_MAX_SIZE', 5 * TIMES ** 2)
+        lengths, lefts, rights = get_linear_non_flat_extensions(models, DEFAULT_THRESHOLDS)
+        np.testing.assert_equal(lengths, expected)
+        np.testing.assert_equal(rights - lefts, lengths)
+        assert lengths.shape == (len(models), TIMES)
+
+    def test_without_models(self):
+        lengths, _, _ = get_linear_non_flat_extensions([], DEFAULT_THRESHOLDS)
+        assert lengths.size == 0
+
+
+def test_phase_analyses_same_as_each_position(phenotyper):
+    positions = [(row, column) for row in range(3) for column in range(4)]
+    analyses = get_phase_analyses(phenotyper, 0, positions)
+    for position, (phases, phases_phenotypes) in zip(positions, analyses):
+        expected_phases, expected_phenotypes = get_phase_analysis(
+            phenotyper, 0, position, experiment_doublings=4.)
+        np.testing.assert_equal(phases, expected_phases)
+        assert repr(phases_phenotypes) == repr(expected_phenotypes)
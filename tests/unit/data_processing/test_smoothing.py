@@ -0,0 +1,74 @@
+from __future__ import absolute_import
+
+import numpy as np
+import pytest
+
+from scanomatic.data_processing.smoothing import SlidingWindowPolynomials
+
+
+POWER = 3
+
+
+@pytest.fixture(scope='module')
+def times():
+    return np.arange(30) / 2.
+
+
+@pytest.fixture(scope='module')
+def filt(times):
+    time_diffs = np.subtract.outer(times, times)
+    return np.abs(time_diffs) < 2.1
+
+
+@pytest.fixture(scope='module')
+def curves(times):
+    random = np.random.RandomState(5)
+    data = 10 + np.sin(times / 3.) + random.normal(0, 0.05, (5, times.size))
+    data[1, 5:8] = np.nan
+    data[2, ::2] = np.nan
+    data[3, 10:] = -np.inf
+    data[4] = np.nan
+    return data
+
+
+class TestSlidingWindowPolynomials:
+
+    def test_fit_matches_polyfit(self, times, filt, curves):
+
+        coeffs, residuals, variances, included = SlidingWindowPolynomials(
+            times, filt, POWER).fit(curves)
+
+        for id_curve, curve in enumerate(curves):
+            for id_window, window in enumerate(filt):
+                window = window & np.isfinite(curve)
+                assert included[id_curve, id_window] == window.any()
+                if window.sum() <= POWER + 1:
+                    continue
+                poly, (rss,), _, _, _ = np.polyfit(
+                    times[window], curve[window], POWER, full=True)
+                np.testing.assert_allclose(
+                    np.polyval(coeffs[id_curve, id_window][::-1],
+                               times[window] - times[id_window]),
+                    np.polyval(poly, times[window]))
+                np.testing.assert_allclose(
+                    residuals[id_curve, id_window], rss / window.sum(),
+                    atol=1e-12)
+                np.testing.assert_allclose(
+                    variances[id_curve, id_window], curve[window].var())
+
+    def test_smooth_is_zero_without_data(self, times, filt, curves):
+
+        smooth, _, _ = SlidingWindowPolynomials(
+            times, filt, POWER).smooth(curves, 1.5)
+
+        assert (smooth[4] == 0).all()
+        assert (smooth[3, -3:] == 0).all()
+        assert np.isfinite(smooth[:3]).all()
+
+    def test_smooth_returns_requested_windows(self, times, filt, curves):
+
+        polynomials = SlidingWindowPolynomials(times, filt, POWER)
+        smooth, _, _ = polynomials.smooth(curves, 1.5)
+        part, _, _ = polynomials.smooth(curves, 1.5, slice(5, 10))
+
+        np.testing.assert_equal(part, smooth[:, 5:10])
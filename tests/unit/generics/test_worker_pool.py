@@ -0,0 +1,32 @@
+from __future__ import absolute_import
+
+import multiprocessing
+
+import mock
+
+from scanomatic.generics.worker_pool import get_usable_workers
+
+
+def _get_usable_workers_in_daemonic_process(workers):
+
+    def run(queue):
+        queue.put(get_usable_workers(workers, mock.MagicMock()))
+
+    queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=run, args=(queue,))
+    process.daemon = True
+    process.start()
+    usable = queue.get(timeout=10)
+    process.join()
+    return usable
+
+
+def test_all_workers_usable_outside_daemonic_process():
+    logger = mock.MagicMock()
+    assert get_usable_workers(4, logger) == 4
+    logger.warning.assert_not_called()
+
+
+def test_one_worker_usable_in_daemonic_process():
+    assert _get_usable_workers_in_daemonic_process(4) == 1
+
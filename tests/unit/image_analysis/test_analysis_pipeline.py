@@ -0,0 +1,114 @@
+from __future__ import absolute_import
+
+import multiprocessing
+
+import pytest
+
+from scanomatic.image_analysis.analysis_pipeline import (
+    AnalysisPipeline, get_worker_plates
+)
+from scanomatic.models.factories.compile_project_factory import (
+    CompileImageAnalysisFactory
+)
+
+
+class _PlateFeatures(object):
+
+    def __init__(self, index):
+        self.index = index
+        self.images = []
+
+
+class _Plate(object):
+
+    def __init__(self, index):
+        self.features = _PlateFeatures(index)
+
+    def clear_features(self):
+        self.features.images.append(None)
+
+
+class _ProjectImage(object):
+    """Records which images each plate analysed, in order"""
+
+    def __init__(self, plate_indices, failing_image=None):
+        self.plate_indices = plate_indices
+        self._plates = {index: _Plate(index) for index in plate_indices}
+        self._failing_image = failing_image
+
+    def __getitem__(self, index):
+        return self._plates[index]
+
+    def get_plate_images(self, image_model):
+        if image_model.image.index == 2:
+            return None
+        return {index: image_model.image.index for index in self.plate_indices if index != 1}
+
+    def analyse_plates(self, image_model, plate_images, plate_indices):
+        if image_model.image.index == self._failing_image:
+            raise ValueError
+        for index in plate_indices:
+            if index in plate_images:
+                self[index].features.images.append(plate_images[index])
+            else:
+                self[index].clear_features()
+
+
+def _get_image_models(count):
+    return [CompileImageAnalysisFactory.create(image={'index': index}) for index in range(count)]
+
+
+@pytest.mark.parametrize('plate_indices,workers,expected', (
+    ([0, 1, 2, 3], 2, [[0, 2], [1, 3]]),
+    ([0, 1, 3], 8, [[0], [1], [3]]),
+    ([2], 1, [[2]]),
+))
+def test_get_worker_plates(plate_indices, workers, expected):
+    assert get_worker_plates(plate_indices, workers) == expected
+
+
+class TestAnalysisPipeline:
+
+    def test_yields_images_in_order(self):
+        image_models = _get_image_models(6)
+        pipeline = AnalysisPipeline(_ProjectImage([0, 1, 2]), iter(image_models), workers=2)
+        results = list(pipeline)
+        assert [image_model.image.index for image_model, _ in results] == range(6)
+        assert [features.index for _, features in results] == range(6)
+
+    def test_plates_keep_their_history(self):
+        pipeline = AnalysisPipeline(_ProjectImage([0, 1, 2]), iter(_get_image_models(5)), workers=3)
+        _, features = list(pipeline)[-1]
+        assert features.shape == (3,)
+        assert features.data[0].images == [0, 1, None, 3, 4]
+        assert features.data[1].images == [None] * 5
+        assert features.data[2].images == [0, 1, None, 3, 4]
+
+    def test_failing_worker_raises(self):
+        pipeline = AnalysisPipeline(
+            _ProjectImage([0, 1], failing_image=1), iter(_get_image_models(4)), workers=2)
+        with pytest.raises(RuntimeError):
+            list(pipeline)
+
+    def test_close_stops_workers(self):
+        pipeline = AnalysisPipeline(_ProjectImage([0, 1]), iter(_get_image_models(10)), workers=2)
+        images = iter(pipeline)
+        next(images)
+        workers = [process for process, _, _ in pipeline._workers]
+        images.close()
+        assert not any(process.is_alive() for process in workers)
+
+    def test_analyses_in_thread_in_daemonic_process(self):
+
+        def run(queue):
+            pipeline = AnalysisPipeline(_ProjectImage([0, 1, 2]), iter(_get_image_models(4)), workers=2)
+            _, features = list(pipeline)[-1]
+            queue.put([plate.images for plate in features.data])
+
+        queue = multiprocessing.Queue()
+        process = multiprocessing.Process(target=run, args=(queue,))
+        process.daemon = True
+        process.start()
+        images = queue.get(timeout=30)
+        process.join()
+        assert images == [[0, 1, None, 3], [None] * 4, [0, 1, None, 3]]
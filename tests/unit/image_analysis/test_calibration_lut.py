@@ -0,0 +1,68 @@
+from __future__ import absolute_import
+
+import numpy as np
+import pytest
+
+from scanomatic.image_analysis.calibration_lut import CalibrationLUT
+from scanomatic.image_analysis.image_basics import Image_Transpose
+
+CELL_COUNT_CALIBRATION = [
+    3.37979631088055e-05, 0.0, 0.0, 0.0, 48.9906142768851, 0.0]
+
+
+@pytest.fixture
+def transpose_polynomial():
+    return Image_Transpose(
+        sourceValues=[250, 200, 150, 100, 60, 30, 10],
+        targetValues=[0, 5, 12, 25, 45, 70, 82])
+
+
+@pytest.fixture
+def stack():
+    return np.random.RandomState(0).randint(0, 256, (6, 9, 11)).astype(np.uint8)
+
+
+def _get_exact_estimates(values, background_means, polynomial_coeffs):
+    estimates = np.asarray(background_means)[:, np.newaxis, np.newaxis] - values
+    estimates[estimates < 0] = 0
+    return np.polyval(polynomial_coeffs, estimates)
+
+
+class TestCalibrationLUT:
+
+    def test_transposes_as_polynomial(self, transpose_polynomial, stack):
+        lut = CalibrationLUT(transpose_polynomial)
+        np.testing.assert_equal(lut(stack), transpose_polynomial(stack.astype(np.float64)))
+        np.testing.assert_equal(lut(stack.astype(np.float64)), transpose_polynomial(stack.astype(np.float64)))
+
+    def test_without_polynomial_keeps_values(self, stack):
+        np.testing.assert_equal(CalibrationLUT()(stack), stack)
+
+    def test_cell_estimates_as_polynomial(self, transpose_polynomial, stack):
+        lut = CalibrationLUT(transpose_polynomial)
+        background_means = np.linspace(40, 80, stack.shape[0])
+        np.testing.assert_equal(
+            lut.get_cell_estimates(stack, background_means, CELL_COUNT_CALIBRATION),
+            _get_exact_estimates(
+                transpose_polynomial(stack.astype(np.float64)), background_means, CELL_COUNT_CALIBRATION))
+
+    def test_cell_estimate_tables_are_clipped(self):
+        tables = CalibrationLUT().get_cell_estimate_tables([10, 100])
+        assert tables.shape == (2, 256)
+        assert tables.min() == 0
+        np.testing.assert_equal(tables[:, 0], [10, 100])
+
+    def test_exact_for_8_bit_images(self, transpose_polynomial, stack):
+        lut = CalibrationLUT(transpose_polynomial)
+        assert lut.get_max_error(stack) == 0
+        assert lut.get_max_error(stack, np.ones(stack.shape[0]) * 60, CELL_COUNT_CALIBRATION) == 0
+
+    def test_error_decreases_with_resolution(self, transpose_polynomial, stack):
+        im = stack + np.random.RandomState(1).uniform(-0.5, 0.5, stack.shape)
+        im = np.clip(im, 0, 255)
+        background_means = np.ones(stack.shape[0]) * 60
+        errors = [
+            CalibrationLUT(transpose_polynomial, resolution=resolution).get_max_error(
+                im, background_means, CELL_COUNT_CALIBRATION)
+            for resolution in (1, 4, 16)]
+        assert errors[0] > errors[1] > errors[2] > 0
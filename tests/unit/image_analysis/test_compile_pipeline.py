@@ -0,0 +1,100 @@
+from __future__ import absolute_import
+
+import multiprocessing
+import time
+
+import pytest
+
+from scanomatic.image_analysis import first_pass
+from scanomatic.image_analysis.compile_pipeline import CompilePipeline
+from scanomatic.models.factories.compile_project_factory import (
+    CompileImageFactory
+)
+
+FAILING_FIXTURE = 'failing fixture'
+
+
+def _analyse(compile_image_model, fixture_settings, issues):
+    # Later images are done first
+    time.sleep(0.02 * (5 - compile_image_model.index % 5))
+    if compile_image_model.index == 3:
+        raise first_pass.MarkerDetectionFailed()
+    if compile_image_model.index == 4:
+        issues['rotation'] = 0.1
+    if compile_image_model.index == 2 and fixture_settings == FAILING_FIXTURE:
+        raise ValueError
+    return fixture_settings, compile_image_model.index
+
+
+@pytest.fixture(autouse=True)
+def analyse(monkeypatch):
+    monkeypatch.setattr(first_pass, 'analyse', _analyse)
+
+
+def _compile(pipeline, images):
+    for index in range(images):
+        while not pipeline.can_submit:
+            if pipeline.failed:
+                return
+            time.sleep(0.01)
+        pipeline.submit(CompileImageFactory.create(index=index))
+    pipeline.close()
+
+
+class TestCompilePipeline:
+
+    def test_writes_in_submitted_order(self):
+        written = []
+        _compile(CompilePipeline('fixture', lambda *args: written.append(args), workers=3), 8)
+        assert [compile_image_model.index for compile_image_model, _, _, _ in written] == range(8)
+        assert [image_model for _, image_model, _, _ in written if image_model is not None] == [
+            ('fixture', index) for index in range(8) if index != 3]
+
+    def test_passes_issues_and_marker_errors(self):
+        written = []
+        _compile(CompilePipeline('fixture', lambda *args: written.append(args), workers=2), 5)
+        _, image_model, _, error = written[3]
+        assert image_model is None
+        assert isinstance(error, first_pass.MarkerDetectionFailed)
+        assert written[4][2] == {'rotation': 0.1}
+        assert written[4][3] is None
+
+    def test_limits_images_in_flight(self):
+        pipeline = CompilePipeline('fixture', lambda *args: None, workers=2, in_flight=3)
+        for index in range(3):
+            assert pipeline.can_submit
+            pipeline.submit(CompileImageFactory.create(index=index))
+        assert not pipeline.can_submit
+        pipeline.close()
+        assert pipeline.written == 3
+
+    def test_stops_on_failing_image(self):
+        written = []
+        pipeline = CompilePipeline(FAILING_FIXTURE, lambda *args: written.append(args), workers=2)
+        _compile(pipeline, 6)
+        pipeline.close()
+        assert pipeline.failed
+        assert [compile_image_model.index for compile_image_model, _, _, _ in written] == [0, 1]
+
+    def test_close_without_waiting(self):
+        pipeline = CompilePipeline('fixture', lambda *args: None, workers=1)
+        for index in range(4):
+            pipeline.submit(CompileImageFactory.create(index=index))
+        pipeline.close(wait=False)
+        assert pipeline.written < 4
+        assert not pipeline.failed
+
+    def test_analyses_serially_in_daemonic_process(self):
+
+        def run(queue):
+            written = []
+            _compile(CompilePipeline('fixture', lambda *args: written.append(args), workers=3), 6)
+            queue.put([image_model for _, image_model, _, _ in written])
+
+        queue = multiprocessing.Queue()
+        process = multiprocessing.Process(target=run, args=(queue,))
+        process.daemon = True
+        process.start()
+        written = queue.get(timeout=30)
+        process.join()
+        assert written == [None if index == 3 else ('fixture', index) for index in range(6)]
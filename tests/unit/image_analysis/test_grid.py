@@ -1,10 +1,65 @@
 from __future__ import absolute_import
 
+from itertools import product
+
 import numpy as np
 import pytest
+from skimage.filters import threshold_otsu
 
 from scanomatic.image_analysis import grid
 
+PINNING = (8, 12)
+SPACING = 60
+
+
+def _get_plate(seed):
+    random = np.random.RandomState(seed)
+    shape = (PINNING[0] * SPACING + 20, PINNING[1] * SPACING + 20)
+    im = random.normal(200, 3, shape)
+    im += np.linspace(-30, 30, shape[1]) + np.linspace(-15, 15, shape[0])[:, np.newaxis]
+    y, x = np.ogrid[:SPACING, :SPACING]
+    for row, column in product(range(PINNING[0]), range(PINNING[1])):
+        centre = random.normal(SPACING / 2., 1, 2)
+        radius = random.uniform(10, 18)
+        im[10 + row * SPACING: 10 + (row + 1) * SPACING, 10 + column * SPACING: 10 + (column + 1) * SPACING] -= (
+            120 * ((y - centre[0]) ** 2 + (x - centre[1]) ** 2 < radius ** 2))
+    return np.clip(im, 0, 255)
+
+
+class TestGetBlockThreshold:
+
+    def test_corners_have_otsu_threshold_of_corner_blocks(self):
+        im = np.random.RandomState(0).randint(0, 255, (90, 151)).astype(np.float)
+        # 3 x 5 blocks of 30 x 30 centred on the image
+        threshold = grid.get_block_threshold(im, segments=15)
+        assert threshold.shape == im.shape
+        np.testing.assert_allclose(threshold[0, 0], threshold_otsu(im[:30, :30]))
+        np.testing.assert_allclose(threshold[-1, -1], threshold_otsu(im[60:, 120:150]))
+
+    def test_interpolates_between_blocks(self):
+        im = np.zeros((20, 40))
+        im[:, 20:] = 10
+        threshold = grid.get_block_threshold(im, segments=2)
+        np.testing.assert_allclose(threshold[:, :10], 0)
+        np.testing.assert_allclose(threshold[:, 30:], 10)
+        assert (np.diff(threshold[0, 9: 31]) > 0).all()
+        assert (threshold == threshold[0]).all()
+
+    def test_finds_colonies_on_uneven_background(self):
+        im = _get_plate(0)
+        colonies = im < grid.get_block_threshold(im, segments=100)
+        _, labels = grid.ndimage.label(grid.get_denoise_segments(colonies, iterations=3))
+        assert labels == PINNING[0] * PINNING[1]
+
+
+class TestGetAdaptiveThreshold:
+
+    def test_seed_gives_same_threshold(self):
+        im = _get_plate(1)
+        np.testing.assert_equal(
+            grid.get_adaptive_threshold(im, segments=50, sigma=5, seed=3),
+            grid.get_adaptive_threshold(im, segments=50, sigma=5, seed=3))
+
 
 class TestGetGridSpacings:
 
@@ -90,6 +145,27 @@ class TestGetGridParameters:
         assert new_spacings is None
 
 
+class TestGetGridOfSyntheticPlate:
+
+    @pytest.mark.parametrize('legacy_threshold', (False, True))
+    def test_getting_grid(self, legacy_threshold):
+        im = _get_plate(2)
+        draft_grid, _, _, _, spacings, _ = grid.get_grid(
+            im,
+            expected_spacing=(SPACING, SPACING),
+            expected_center=tuple(s / 2.0 for s in im.shape),
+            grid_shape=PINNING,
+            legacy_threshold=legacy_threshold,
+            threshold_seed=0)
+
+        assert draft_grid.shape == (2, ) + PINNING
+        np.testing.assert_allclose(spacings, SPACING, atol=1)
+        np.testing.assert_allclose(
+            draft_grid[0] - SPACING * np.arange(PINNING[0])[:, np.newaxis], 10 + SPACING / 2., atol=4)
+        np.testing.assert_allclose(
+            draft_grid[1] - SPACING * np.arange(PINNING[1]), 10 + SPACING / 2., atol=4)
+
+
 @pytest.mark.slow
 class TestGetGrid:
 
@@ -0,0 +1,138 @@
+from __future__ import absolute_import
+
+from itertools import product
+
+import numpy as np
+import pytest
+from skimage.filters import threshold_otsu
+
+from scanomatic.image_analysis import grid_array as grid_array_module
+from scanomatic.image_analysis import grid_cell_bulk
+from scanomatic.image_analysis.calibration_lut import CalibrationLUT
+from scanomatic.image_analysis.grid_cell import GridCell
+from scanomatic.image_analysis.grid_cell_extra import has_bad_filter_change
+from scanomatic.image_analysis.image_basics import Image_Transpose
+from scanomatic.models.analysis_model import COMPARTMENTS
+
+CELL_COUNT_CALIBRATION = [
+    3.37979631088055e-05, 0.0, 0.0, 0.0, 48.9906142768851, 0.0]
+PINNING = (3, 4)
+SPACING = 40
+
+
+def _get_plate(seed):
+    random = np.random.RandomState(seed)
+    im = random.normal(200, 3, (PINNING[0] * SPACING, PINNING[1] * SPACING))
+    y, x = np.ogrid[:SPACING, :SPACING]
+    for row, column in product(range(PINNING[0]), range(PINNING[1])):
+        centre = random.normal(SPACING / 2., 1, 2)
+        distances = (y - centre[0]) ** 2 + (x - centre[1]) ** 2
+        im[row * SPACING: (row + 1) * SPACING, column * SPACING: (column + 1) * SPACING] -= (
+            120 * np.exp(-distances / (2 * random.uniform(3, 8) ** 2)))
+    return np.clip(im, 0, 255).astype(np.uint8)
+
+
+def _get_grid_cells():
+    grid_cells = []
+    for row, column in product(range(PINNING[0]), range(PINNING[1])):
+        grid_cell = GridCell((0, (row, column)), CELL_COUNT_CALIBRATION)
+        grid_cell.xy1 = np.array((row * SPACING + 2, column * SPACING + 1))
+        grid_cell.xy2 = grid_cell.xy1 + SPACING - 3
+        grid_cells.append(grid_cell)
+    return grid_cells
+
+
+class TestGetOtsuThresholds:
+
+    def test_same_as_skimage(self):
+        stack = np.random.RandomState(0).randint(0, 255, (5, 11, 13)).astype(np.float)
+        stack[1] = np.linspace(3, 7.5, stack[1].size).reshape(stack[1].shape)
+        np.testing.assert_allclose(
+            grid_cell_bulk.get_otsu_thresholds(stack),
+            [threshold_otsu(image) for image in stack])
+
+    def test_single_valued_image_has_no_threshold(self):
+        stack = np.ones((2, 4, 4))
+        stack[1, 0] = 0
+        thresholds = grid_cell_bulk.get_otsu_thresholds(stack)
+        assert np.isnan(thresholds[0])
+        assert np.isfinite(thresholds[1])
+
+
+class TestApplyBlobHistory:
+
+    def test_same_as_has_bad_filter_change(self):
+        random = np.random.RandomState(1)
+        old_blobs = np.zeros((20, 15, 15), dtype=np.bool)
+        blobs = np.zeros_like(old_blobs)
+        for index in range(old_blobs.shape[0]):
+            old_centre, centre = random.randint(3, 12, (2, 2))
+            old_blobs[index, old_centre[0] - 3: old_centre[0] + 3, old_centre[1] - 3: old_centre[1] + 3] = True
+            blobs[index, centre[0] - 3: centre[0] + 3, centre[1] - 2: centre[1] + 2] = True
+        blobs[0] = False
+        old_blobs[1] = False
+
+        expected = [
+            has_bad_filter_change(old, new if new.any() else old, 1) for old, new in zip(old_blobs, blobs)]
+        reverted = grid_cell_bulk.apply_blob_history(blobs, old_blobs, 1)
+        np.testing.assert_equal(reverted, expected)
+        np.testing.assert_equal(blobs[reverted], old_blobs[reverted])
+        np.testing.assert_equal(blobs[0], old_blobs[0])
+
+
+class TestGridCellBulk:
+
+    @pytest.fixture(scope='class')
+    def analysed(self):
+        grid_cells = _get_grid_cells()
+        bulk_grid_cells = _get_grid_cells()
+        bulk = grid_cell_bulk.GridCellBulk(bulk_grid_cells, CELL_COUNT_CALIBRATION)
+        for image_index in range(3):
+            im = _get_plate(image_index)
+            for grid_cell in grid_cells:
+                grid_array_module._analyse_grid_cell(grid_cell, im, None, image_index)
+            bulk.analyse(im.astype(np.float64), image_index)
+        return grid_cells, bulk_grid_cells
+
+    @pytest.mark.parametrize('compartment', tuple(COMPARTMENTS))
+    def test_same_as_analysing_each_grid_cell(self, analysed, compartment):
+        for grid_cell, bulk_grid_cell in zip(*analysed):
+            expected = grid_cell.get_item(compartment).features.data
+            data = bulk_grid_cell.get_item(compartment).features.data
+            assert expected
+            assert set(data) == set(expected)
+            for measure, value in expected.items():
+                if value is None:
+                    assert data[measure] is None
+                else:
+                    np.testing.assert_allclose(data[measure], value, rtol=1e-10)
+
+    def test_sets_image_index(self, analysed):
+        assert all(grid_cell.image_index == 2 for grid_cell in analysed[1])
+
+    def test_without_grid_cells(self):
+        grid_cell_bulk.GridCellBulk([], None).analyse(np.ones((10, 10)), 0)
+
+    def test_calibration_lut_same_as_transposed_plate(self):
+        transpose_polynomial = Image_Transpose(
+            sourceValues=[250, 200, 150, 100, 60, 30, 10],
+            targetValues=[0, 5, 12, 25, 45, 70, 82])
+        grid_cells = _get_grid_cells()
+        lut_grid_cells = _get_grid_cells()
+        bulk = grid_cell_bulk.GridCellBulk(grid_cells, CELL_COUNT_CALIBRATION)
+        lut_bulk = grid_cell_bulk.GridCellBulk(lut_grid_cells, CELL_COUNT_CALIBRATION)
+        for image_index in range(2):
+            im = _get_plate(image_index)
+            bulk.analyse(transpose_polynomial(im.astype(np.float64)), image_index)
+            lut_bulk.analyse(im, image_index, CalibrationLUT(transpose_polynomial))
+
+        for grid_cell, lut_grid_cell in zip(grid_cells, lut_grid_cells):
+            for compartment in COMPARTMENTS:
+                expected = grid_cell.get_item(compartment).features.data
+                data = lut_grid_cell.get_item(compartment).features.data
+                assert set(data) == set(expected)
+                for measure, value in expected.items():
+                    if value is None:
+                        assert data[measure] is None
+                    else:
+                        np.testing.assert_equal(data[measure], value)
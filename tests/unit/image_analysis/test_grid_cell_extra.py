@@ -1,8 +1,18 @@
 from __future__ import absolute_import
 
 import numpy as np
+import pytest
 
+from scanomatic.generics.maths import mid50_mean, quantiles_stable
 from scanomatic.image_analysis import grid_cell_extra
+from scanomatic.models.analysis_model import COMPARTMENTS, MEASURES
+
+
+def _get_cell_image(centre=(20, 20)):
+    y, x = np.ogrid[:40, :40]
+    im = np.ones((40, 40)) * 200
+    im -= 120 * np.exp(-((y - centre[0]) ** 2 + (x - centre[1]) ** 2) / 50.)
+    return im
 
 
 def test_filter_array_is_bool():
@@ -10,3 +20,106 @@ def test_filter_array_is_bool():
     blob = grid_cell_extra.Blob(
         identifier=(0, 0, 0), grid_array=np.ones((5, 5), dtype=np.float))
     assert blob.filter_array.dtype == np.bool
+
+
+class TestHasBadFilterChange:
+
+    @pytest.mark.parametrize('offset', ((0, 0), (3, -2), (-4, 5), (0, -3), (2, 0)))
+    def test_shifted_blob_is_not_bad(self, offset):
+        old_filter = np.zeros((20, 20), dtype=np.bool)
+        old_filter[7: 13, 6: 14] = True
+        filter_array = np.roll(np.roll(old_filter, offset[0], axis=0), offset[1], axis=1)
+        assert not grid_cell_extra.has_bad_filter_change(old_filter, filter_array, 1)
+
+    def test_changed_blob_is_bad(self):
+        old_filter = np.zeros((20, 20), dtype=np.bool)
+        old_filter[7: 13, 6: 14] = True
+        filter_array = np.zeros_like(old_filter)
+        filter_array[2: 18, 9: 11] = True
+        assert grid_cell_extra.has_bad_filter_change(old_filter, filter_array, 1)
+
+    def test_empty_blob_is_bad(self):
+        old_filter = np.ones((5, 5), dtype=np.bool)
+        assert grid_cell_extra.has_bad_filter_change(old_filter, np.zeros_like(old_filter), 1)
+
+
+class TestBlob:
+
+    def test_keeps_best_blob_and_trashes_the_rest(self):
+        im = _get_cell_image()
+        im[2: 6, 30: 36] = 0
+        blob = grid_cell_extra.Blob((0, 0, COMPARTMENTS.Blob), im)
+        assert blob.filter_array[20, 20]
+        assert not blob.filter_array[4, 32]
+        assert blob.trash_array[4, 32]
+        assert not (blob.filter_array & blob.trash_array).any()
+
+    def test_candidate_blob_ranks(self):
+        blob = grid_cell_extra.Blob((0, 0, COMPARTMENTS.Blob), np.zeros((10, 10)), run_detect=False)
+        blob.filter_array[1: 3, 1: 5] = True
+        blob.filter_array[6: 9, 6: 9] = True
+        number_of_labels, qualities, centre_of_masses, _ = blob.get_candidate_blob_ranks()
+        assert number_of_labels == 2
+        assert qualities == {1: 4., 2: 9.}
+        assert centre_of_masses == {1: (1.5, 2.5), 2: (7., 7.)}
+
+    def test_detect_reuses_buffers(self):
+        blob = grid_cell_extra.Blob((0, 0, COMPARTMENTS.Blob), _get_cell_image(), run_detect=False)
+        background = grid_cell_extra.Background(
+            (0, 0, COMPARTMENTS.Background), blob.grid_array, blob, run_detect=False)
+        blob.detect(remember_trash=True)
+        background.detect()
+        buffers = [blob.filter_array, blob.trash_array, blob.old_filter, blob.old_trash, background.filter_array]
+
+        blob.grid_array = _get_cell_image((21, 19))
+        blob.detect(remember_trash=True)
+        background.detect()
+        assert all(a is b for a, b in zip(
+            buffers, [blob.filter_array, blob.trash_array, blob.old_filter, blob.old_trash, background.filter_array]))
+        assert blob.filter_array[21, 19]
+        assert not (background.filter_array & blob.filter_array).any()
+
+    def test_detect_reverts_bad_change(self):
+        blob = grid_cell_extra.Blob((0, 0, COMPARTMENTS.Blob), _get_cell_image(), run_detect=False)
+        blob.detect()
+        expected = blob.filter_array.copy()
+        im = np.ones((40, 40)) * 200
+        im[5: 35, 18: 22] = 80
+        blob.grid_array = im
+        blob.detect()
+        np.testing.assert_equal(blob.filter_array, expected)
+
+
+class TestDoAnalysis:
+
+    @pytest.mark.parametrize('size', (1, 2, 3, 4, 7, 40))
+    def test_same_as_unsorted_measures(self, size):
+        values = np.random.RandomState(size).uniform(0, 100, size)
+        cell = grid_cell_extra.Cell((0, 0, COMPARTMENTS.Total), values[np.newaxis])
+        cell.do_analysis()
+        data = cell.features.data
+        assert data[MEASURES.Count] == size
+        assert data[MEASURES.Sum] == values.sum()
+        assert data[MEASURES.Median] == np.median(values)
+        assert data[MEASURES.IQR] == quantiles_stable(values)
+        np.testing.assert_equal(data[MEASURES.IQR_Mean], mid50_mean(values))
+
+    def test_nan_values_are_excluded_from_quantiles(self):
+        values = np.arange(10, dtype=np.float)
+        values[3] = np.nan
+        cell = grid_cell_extra.Cell((0, 0, COMPARTMENTS.Total), values[np.newaxis])
+        cell.do_analysis()
+        data = cell.features.data
+        assert data[MEASURES.IQR] == quantiles_stable(values)
+        assert data[MEASURES.IQR_Mean] == mid50_mean(values)
+
+    def test_only_filtered_values_are_measured(self):
+        im = np.arange(20, dtype=np.float).reshape(4, 5)
+        blob = grid_cell_extra.Blob((0, 0, COMPARTMENTS.Blob), im, run_detect=False)
+        blob.filter_array[1: 3, 1: 3] = True
+        blob.do_analysis()
+        data = blob.features.data
+        assert data[MEASURES.Count] == 4
+        assert data[MEASURES.Sum] == 6 + 7 + 11 + 12
+        assert data[MEASURES.Median] == 9
+        assert data[MEASURES.Centroid] == (1.5, 1.5)
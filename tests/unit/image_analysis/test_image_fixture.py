@@ -0,0 +1,119 @@
+from __future__ import absolute_import
+
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+from scanomatic.image_analysis import image_fixture
+from scanomatic.image_analysis.image_fixture import FixtureImage
+from scanomatic.io.paths import Paths
+
+MARKINGS = ((100, 120), (1100, 200), (600, 1600))
+
+
+def _get_pattern():
+    return image_fixture._load_pattern(Paths().marker)[1]
+
+
+def _get_image(seed):
+    random = np.random.RandomState(seed)
+    pattern = _get_pattern()
+    im = random.normal(220, 15, (1250, 1750))
+    for _ in range(30):
+        row, column = random.randint(0, 1200), random.randint(0, 1700)
+        im[row: row + random.randint(5, 60), column: column + random.randint(5, 60)] = random.randint(0, 120)
+    for row, column in MARKINGS:
+        im[row: row + pattern.shape[0], column: column + pattern.shape[1]] = (
+            pattern + random.normal(0, 10, pattern.shape))
+    return np.clip(im, 0, 255).astype(np.uint8)
+
+
+def _get_fixture_image(im, scale=0.25):
+    return FixtureImage(image=im, pattern_image_path=Paths().marker, scale=scale)
+
+
+def _sorted_positions(positions):
+    return np.array(sorted(zip(*positions)))
+
+
+class TestFixtureImage:
+
+    @pytest.fixture(scope='class')
+    def image(self):
+        return _get_image(0)
+
+    def test_convolution_is_unchanged(self, image):
+        # Same as `scipy.signal.fftconvolve(t_img, t_mrk, mode='same')`
+        conv = _get_fixture_image(image).get_convolution()
+        t_img = (image > 127).astype(np.int8) * 2 - 1
+        t_mrk = (_get_pattern() > 0) * 2 - 1
+        padded = np.pad(t_img, [((size - 1) // 2, size // 2) for size in t_mrk.shape], 'constant')
+        flipped = t_mrk[::-1, ::-1]
+        for row, column in MARKINGS:
+            for d0, d1 in ((row, column), (row + 33, column + 33), (row + 40, column + 70)):
+                expected = (padded[d0: d0 + t_mrk.shape[0], d1: d1 + t_mrk.shape[1]] * flipped).sum()
+                assert conv[d0, d1] == expected
+
+    def test_marker_convolution_equals_convolution_around_markings(self, image):
+        fixture_image = _get_fixture_image(image)
+        conv = fixture_image.get_convolution()
+        marker_conv = fixture_image.get_marker_convolution(len(MARKINGS))
+        for row, column in MARKINGS:
+            area = (slice(row, row + 67), slice(column, column + 67))
+            np.testing.assert_equal(marker_conv[area], conv[area])
+        assert marker_conv.min() < conv.min()
+
+    @pytest.mark.parametrize('seed', (0, 1, 2))
+    def test_finds_same_markings_as_whole_convolution(self, seed):
+        image = _get_image(seed)
+        fixture_image = _get_fixture_image(image)
+        expected = fixture_image.get_best_locations(
+            fixture_image.get_convolution(), fixture_image._pattern_img.shape, len(MARKINGS),
+            refine_hit_gauss_weight_size_fraction=3.5)
+        expected = np.array(expected) * 4
+
+        positions = fixture_image.find_pattern(len(MARKINGS))
+        np.testing.assert_allclose(
+            _sorted_positions(positions), _sorted_positions((expected[:, 1], expected[:, 0])), atol=1e-6)
+        np.testing.assert_allclose(
+            _sorted_positions(positions), (np.array(MARKINGS)[:, ::-1] + 32.5) * 4, atol=1)
+
+    def test_small_image_uses_whole_convolution(self):
+        image = _get_image(0)[:200, :200]
+        fixture_image = _get_fixture_image(image)
+        np.testing.assert_equal(fixture_image.get_marker_convolution(3), fixture_image.get_convolution())
+
+    def test_pattern_is_cached(self):
+        assert _get_fixture_image(np.zeros((10, 10)))._pattern_img is _get_pattern()
+
+    def test_modified_pattern_replaces_cached(self, tmpdir):
+        path = str(tmpdir.join('marker.png'))
+        shutil.copy(Paths().marker, path)
+        os.utime(path, (1, 1))
+        pattern = image_fixture._load_pattern(path)[1]
+        os.utime(path, (2, 2))
+        assert image_fixture._load_pattern(path)[1] is not pattern
+        assert [key for key in image_fixture._patterns if key[0] == path] == [(path, 2)]
+
+
+class TestGetHitRefined:
+
+    def test_same_as_square_gaussian_weights(self):
+        conv = np.random.RandomState(0).uniform(0, 10, (23, 31))
+        local_hit = np.array((11.3, 14.8))
+        size = max(conv.shape)
+        x = np.arange(size, dtype=float)
+        gauss = np.exp(-4 * np.log(2) * ((x - local_hit[1]) ** 2 + (x[:, np.newaxis] - local_hit[0]) ** 2) /
+                       (size / 3.5) ** 2)
+        weighted = conv * gauss[: conv.shape[0], : conv.shape[1]]
+        rows, columns = np.indices(conv.shape)
+        expected = np.array(((rows * weighted).sum(), (columns * weighted).sum())) / weighted.sum() - local_hit
+        np.testing.assert_allclose(FixtureImage.get_hit_refined(local_hit, conv, None, 3.5), expected)
+
+    def test_gaussian_is_scaled_gaussian(self):
+        x = np.arange(40, dtype=float)
+        expected = np.exp(-4 * np.log(2) * (x - 17.3) ** 2 / 10. ** 2)
+        gauss = image_fixture._get_gauss(40, 10., 17.3)
+        np.testing.assert_allclose(gauss / gauss.sum(), expected / expected.sum(), rtol=1e-12)
@@ -0,0 +1,108 @@
+from __future__ import absolute_import
+
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+from scanomatic.io import binary_compilation
+from scanomatic.io.binary_compilation import BinaryCompilation
+from scanomatic.models.factories.compile_project_factory import (
+    CompileImageAnalysisFactory
+)
+
+
+@pytest.fixture
+def compilation(tmpdir):
+    path = str(tmpdir.join('test.project.compilation'))
+    shutil.copy(
+        os.path.join(
+            os.path.dirname(__file__), os.path.pardir, 'models', 'factories',
+            'data', 'test.project.compilation'),
+        path)
+    return path
+
+
+@pytest.fixture
+def images(compilation):
+    images = CompileImageAnalysisFactory.serializer.load(compilation)
+    assert images
+    return images
+
+
+def _as_dicts(images):
+    return [CompileImageAnalysisFactory.to_dict(image) for image in images]
+
+
+class TestConvert:
+
+    def test_loads_same_as_text_file(self, compilation, images):
+        assert binary_compilation.convert(compilation) == len(images)
+        assert _as_dicts(BinaryCompilation(compilation).load()) == _as_dicts(images)
+
+    def test_indexes_images(self, compilation, images):
+        binary_compilation.convert(compilation)
+        index = BinaryCompilation(compilation).index
+        np.testing.assert_equal(index['index'], [image.image.index for image in images])
+        np.testing.assert_allclose(
+            index['time_stamp'], [image.image.time_stamp for image in images])
+
+
+class TestBinaryCompilation:
+
+    def test_empty_without_files(self, compilation):
+        binary = BinaryCompilation(compilation)
+        assert len(binary) == 0
+        assert binary.load() == tuple()
+
+    def test_append_then_read_image(self, compilation, images):
+        binary = BinaryCompilation(compilation)
+        for image in images:
+            binary.append(image)
+        assert len(binary) == len(images)
+        assert _as_dicts([binary[-1]]) == _as_dicts(images[-1:])
+        assert (_as_dicts([binary.get_image(images[2].image.index)]) ==
+                _as_dicts(images[2:3]))
+
+    def test_get_unknown_image_raises_key_error(self, compilation, images):
+        binary_compilation.convert(compilation)
+        with pytest.raises(KeyError):
+            BinaryCompilation(compilation).get_image(-1)
+
+    def test_ignores_incomplete_index_row(self, compilation, images):
+        binary = BinaryCompilation(compilation)
+        binary.append(images[0])
+        _, index_path = binary_compilation.get_paths(compilation)
+        with open(index_path, 'ab') as fh:
+            fh.write(b'\x00' * 5)
+        assert len(binary) == 1
+        binary.append(images[1])
+        assert _as_dicts(binary.load()) == _as_dicts(images[:2])
+
+    def test_clear_removes_images(self, compilation, images):
+        binary_compilation.convert(compilation)
+        binary = BinaryCompilation(compilation)
+        binary.clear()
+        assert len(binary) == 0
+
+
+class TestLoad:
+
+    def test_uses_text_file_when_binary_is_outdated(self, compilation, images):
+        binary_compilation.convert(compilation)
+        BinaryCompilation(compilation).clear()
+        BinaryCompilation(compilation).append(images[0])
+        _, index_path = binary_compilation.get_paths(compilation)
+        modified = os.path.getmtime(compilation)
+        os.utime(index_path, (modified - 10, modified - 10))
+        assert not binary_compilation.is_current(compilation)
+        assert len(binary_compilation.load(compilation)) == len(images)
+
+    def test_uses_current_binary(self, compilation, images):
+        binary_compilation.convert(compilation)
+        assert binary_compilation.is_current(compilation)
+        with open(compilation, 'w'):
+            pass
+        os.utime(compilation, (0, 0))
+        assert len(binary_compilation.load(compilation)) == len(images)
@@ -0,0 +1,92 @@
+from __future__ import absolute_import
+
+import os
+
+import numpy as np
+import pytest
+
+from scanomatic.io.first_pass_results import CompilationResults
+from scanomatic.models.factories.compile_project_factory import (
+    CompileImageAnalysisFactory
+)
+
+
+@pytest.fixture
+def compilation_path():
+    return os.path.join(
+        os.path.dirname(__file__), os.path.pardir, 'models', 'factories',
+        'data', 'test.project.compilation')
+
+
+@pytest.fixture
+def compilation(compilation_path):
+    return CompilationResults(compilation_path)
+
+
+@pytest.fixture
+def shuffled(compilation_path):
+    images = CompileImageAnalysisFactory.serializer.load(compilation_path)
+    for image, time_stamp in zip(images, (30., 10., 20.)):
+        image.image.time_stamp = time_stamp
+    return CompilationResults.create_from_data(None, None, images)
+
+
+class TestGetItem:
+
+    def test_sorted_by_time(self, shuffled):
+        assert [shuffled[i].image.time_stamp for i in range(3)] == [10, 20, 30]
+        assert shuffled[-1].image.time_stamp == 30
+
+    def test_out_of_range_is_none(self, shuffled):
+        assert shuffled[3] is None
+
+    def test_iterates_in_time_order(self, shuffled):
+        assert [image.image.time_stamp for image in shuffled] == [10, 20, 30]
+
+
+class TestGetNextImageModel:
+
+    def test_uses_latest_first(self, shuffled):
+        assert shuffled.get_next_image_model().image.time_stamp == 30
+        assert shuffled.get_next_image_model().image.time_stamp == 20
+        assert shuffled.last_index == 0
+        assert shuffled.total_number_of_images == 3
+        np.testing.assert_equal(shuffled.time_stamps, [10])
+
+    def test_recycle_restores_order(self, shuffled):
+        shuffled.get_next_image_model()
+        shuffled.get_next_image_model()
+        shuffled.recycle()
+        np.testing.assert_equal(shuffled.time_stamps, [10, 20, 30])
+        assert shuffled[-1].image.time_stamp == 30
+
+
+class TestArrays:
+
+    def test_time_stamps(self, compilation):
+        np.testing.assert_equal(
+            compilation.time_stamps,
+            [compilation[i].image.time_stamp for i in range(len(compilation))])
+
+    def test_grayscale_values(self, compilation):
+        np.testing.assert_equal(
+            compilation.grayscale_values,
+            [compilation[i].fixture.grayscale.values for i in range(len(compilation))])
+
+    def test_missing_grayscale_values_are_nan(self, compilation_path):
+        images = CompileImageAnalysisFactory.serializer.load(compilation_path)
+        images[0].fixture.grayscale.values = None
+        compilation = CompilationResults.create_from_data(None, None, images)
+        assert np.isnan(compilation.grayscale_values[0]).all()
+        assert np.isfinite(compilation.grayscale_values[1:]).all()
+
+    def test_marker_positions(self, compilation):
+        positions = compilation.marker_positions
+        assert positions.shape == (len(compilation), 2, 3)
+        for image, (x, y) in zip(compilation, positions):
+            np.testing.assert_equal(x, image.fixture.orientation_marks_x)
+            np.testing.assert_equal(y, image.fixture.orientation_marks_y)
+
+    def test_arrays_are_copies(self, compilation):
+        compilation.marker_positions[:] = 0
+        assert (compilation.marker_positions != 0).all()
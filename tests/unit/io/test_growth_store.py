@@ -0,0 +1,121 @@
+from __future__ import absolute_import
+
+import os
+
+import numpy as np
+import pytest
+
+from scanomatic.io import growth_store
+from scanomatic.io.growth_store import GrowthStore
+from scanomatic.io.image_data import ImageData
+from scanomatic.io.paths import Paths
+
+SHAPES = ((2, 3), None, (4, 5))
+IMAGES = 70
+
+
+def _get_plates(index):
+    return [
+        None if shape is None else
+        np.arange(shape[0] * shape[1], dtype=np.float).reshape(shape) + 100 * index
+        for shape in SHAPES]
+
+
+@pytest.fixture
+def store_path(tmpdir):
+    path = str(tmpdir)
+    store = GrowthStore(path)
+    # Analysis writes the images latest first
+    for index in reversed(range(IMAGES)):
+        store.set_time(index, index / 3.)
+        store.write(index, _get_plates(index))
+    return path
+
+
+class TestGrowthStore:
+
+    def test_empty_without_files(self, tmpdir):
+        store = GrowthStore(str(tmpdir))
+        assert store.plates == 0
+        assert store.times.size == 0
+        assert store.read_plate(0) is None
+
+    def test_reads_times(self, store_path):
+        np.testing.assert_allclose(GrowthStore(store_path).times, np.arange(IMAGES) / 3.)
+
+    def test_reads_plate(self, store_path):
+        store = GrowthStore(store_path)
+        plate = store.read_plate(2)
+        assert plate.shape == SHAPES[2] + (IMAGES,)
+        for index in range(IMAGES):
+            np.testing.assert_equal(plate[..., index], _get_plates(index)[2])
+
+    def test_reads_plate_from_offset(self, store_path):
+        store = GrowthStore(store_path)
+        times, plates = store.read(offset=IMAGES - 2)
+        np.testing.assert_allclose(times, np.arange(IMAGES - 2, IMAGES) / 3.)
+        np.testing.assert_equal(plates[0], store.read_plate(0)[..., -2:])
+
+    def test_plate_without_data(self, store_path):
+        store = GrowthStore(store_path)
+        assert store.get_plate_shape(1) is None
+        assert store.read_plate(1) is None
+        assert store.read_curve(1, 0, 0) is None
+
+    def test_reads_curve(self, store_path):
+        np.testing.assert_equal(
+            GrowthStore(store_path).read_curve(0, 1, 2), np.arange(IMAGES) * 100 + 5)
+
+    def test_unwritten_images_are_not_read(self, tmpdir):
+        store = GrowthStore(str(tmpdir))
+        store.set_time(0, 0)
+        store.set_time(3, 1)
+        store.write(3, _get_plates(3))
+        store.set_time(1, 0.5)
+        np.testing.assert_equal(store.indices, [3])
+        np.testing.assert_equal(store.times, [1])
+        assert store.read_plate(0).shape == SHAPES[0] + (1,)
+
+    def test_plate_missing_in_late_images(self, tmpdir):
+        store = GrowthStore(str(tmpdir))
+        store.write(0, _get_plates(0))
+        store.write(IMAGES, [None, None, None])
+        curve = store.read_curve(0, 0, 0)
+        assert curve[0] == 0
+        assert np.isnan(curve[1])
+        assert np.isnan(store.read_plate(0)[..., 1]).all()
+
+    def test_only_grows_files_by_chunks(self, store_path):
+        size = os.path.getsize(growth_store.get_plate_path(store_path, 0))
+        assert size == 2 * 2 * 3 * growth_store.CHUNK_SIZE * 8
+
+    def test_shape_change_raises(self, store_path):
+        with pytest.raises(ValueError):
+            GrowthStore(store_path).write(IMAGES, [np.zeros((3, 2))])
+
+    def test_remove_store(self, store_path):
+        assert growth_store.remove_store(store_path) == 3
+        assert not growth_store.has_store(store_path)
+        assert os.listdir(store_path) == []
+
+
+class TestConvert:
+
+    def test_reads_same_as_image_data_files(self, tmpdir):
+        path = str(tmpdir)
+        paths = Paths()
+        times = np.arange(5) * 0.25
+        for index in range(5):
+            np.save(os.path.join(path, paths.image_analysis_img_data.format(index)), _get_plates(index))
+        np.save(os.path.join(path, paths.image_analysis_time_series), times)
+        expected_times, expected = ImageData.read_image_data_and_time(path)
+
+        assert growth_store.convert(path) == 5
+        converted_times, converted = ImageData.read_image_data_and_time(path)
+
+        np.testing.assert_allclose(converted_times, expected_times)
+        assert len(converted) == len(expected)
+        for plate, expected_plate in zip(converted, expected):
+            np.testing.assert_equal(plate, expected_plate)
+        np.testing.assert_equal(
+            ImageData.read_curve_and_time(path, 2, 3, 4)[1], expected[2][3, 4])
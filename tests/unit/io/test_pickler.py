@@ -0,0 +1,82 @@
+from __future__ import absolute_import
+
+import os
+
+import numpy as np
+import pytest
+
+from scanomatic.data_processing.phases.features import VectorPhenotypes
+from scanomatic.io import pickler
+
+LEGACY_MODULE = "scanomatic.data_processing.curve_phase_phenotypes"
+
+
+@pytest.fixture
+def numeric_path(tmpdir):
+    path = os.path.join(str(tmpdir), 'numeric.npy')
+    np.save(path, np.arange(12.).reshape(3, 4))
+    return path
+
+
+@pytest.fixture
+def legacy_path(tmpdir):
+    path = os.path.join(str(tmpdir), 'legacy.npy')
+    np.save(path, np.array([{VectorPhenotypes.PhasesClassifications: 42}]))
+    with open(path, 'rb') as fh:
+        data = fh.read()
+    with open(path, 'wb') as fh:
+        fh.write(data.replace(
+            "scanomatic.data_processing.phases.features", LEGACY_MODULE))
+    return path
+
+
+class TestLoadNumpy:
+
+    def test_loads_numeric_array(self, numeric_path):
+        np.testing.assert_equal(
+            pickler.load_numpy(numeric_path),
+            np.arange(12.).reshape(3, 4))
+
+    def test_memory_maps_numeric_array(self, numeric_path):
+        data = pickler.load_numpy(numeric_path, mmap_mode='r')
+        assert isinstance(data, np.memmap)
+        np.testing.assert_equal(data, np.arange(12.).reshape(3, 4))
+
+    def test_loads_legacy_object_array(self, legacy_path):
+        data = pickler.load_numpy(legacy_path)
+        assert data[0] == {VectorPhenotypes.PhasesClassifications: 42}
+
+    def test_loads_migrated_object_array_without_compatibility(
+            self, legacy_path, monkeypatch):
+        pickler.migrate(legacy_path)
+
+        def fail(*args, **kwargs):
+            raise AssertionError("Compatibility unpickling used")
+
+        monkeypatch.setattr(pickler, 'unpickle_with_unpickler', fail)
+        data = pickler.load_numpy(legacy_path)
+        assert data[0] == {VectorPhenotypes.PhasesClassifications: 42}
+
+    def test_missing_file_raises_io_error(self, tmpdir):
+        with pytest.raises(IOError):
+            pickler.load_numpy(os.path.join(str(tmpdir), 'missing.npy'))
+
+
+class TestMigrate:
+
+    def test_rewrites_legacy_object_array(self, legacy_path):
+        assert pickler.migrate(legacy_path)
+        with open(legacy_path, 'rb') as fh:
+            assert LEGACY_MODULE not in fh.read()
+        assert np.load(legacy_path)[0] == {
+            VectorPhenotypes.PhasesClassifications: 42}
+
+    def test_leaves_numeric_array(self, numeric_path):
+        mtime = os.path.getmtime(numeric_path)
+        assert not pickler.migrate(numeric_path)
+        assert os.path.getmtime(numeric_path) == mtime
+
+    def test_migrates_directory(self, legacy_path, numeric_path):
+        assert pickler.migrate_directory(
+            os.path.dirname(legacy_path)) == [legacy_path]
+        assert not pickler.migrate_directory(os.path.dirname(legacy_path))
@@ -153,3 +153,16 @@ class TestAnalysisModels:
                 AnalysisModelFactory.create()
             )
         )
+
+    def test_default_analyses_in_one_process(self):
+        assert AnalysisModelFactory.create().workers == 1
+
+    @pytest.mark.parametrize('workers,valid', (
+        (1, True),
+        (8, True),
+        (0, False),
+        ('many', False),
+    ))
+    def test_validates_workers(self, workers, valid):
+        model = AnalysisModelFactory.create(workers=workers)
+        assert ('workers' in AnalysisModelFactory.get_invalid_names(model)) is not valid
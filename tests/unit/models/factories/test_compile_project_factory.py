@@ -0,0 +1,39 @@
+from __future__ import absolute_import
+
+import mock
+import pytest
+
+from scanomatic.models.factories.compile_project_factory import (
+    CompileProjectFactory
+)
+
+
+@pytest.fixture(autouse=True)
+def active_cccs():
+    with mock.patch(
+        'scanomatic.models.factories.compile_project_factory.store_from_env',
+    ), mock.patch(
+        'scanomatic.models.factories.compile_project_factory.get_active_cccs',
+        return_value={'default': None},
+    ):
+        yield
+
+
+class TestCompileProjectFactory:
+
+    def test_default_compiles_in_one_process(self):
+
+        m = CompileProjectFactory.create()
+        assert m.workers == 1
+
+    @pytest.mark.parametrize('workers,valid', (
+        (1, True),
+        (32, True),
+        (0, False),
+        (-2, False),
+        ('many', False),
+    ))
+    def test_validates_workers(self, workers, valid):
+
+        m = CompileProjectFactory.create(workers=workers)
+        assert ('workers' in CompileProjectFactory.get_invalid_names(m)) is not valid
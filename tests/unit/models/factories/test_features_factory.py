@@ -21,3 +21,32 @@ class TestFeaturesFactory:
 
         m = FeaturesFactory.create(try_keep_qc=True)
         assert FeaturesFactory.to_dict(m).get('try_keep_qc')
+
+    def test_default_extracts_in_one_process(self):
+
+        m = FeaturesFactory.create()
+        assert m.workers == 1
+
+    @pytest.mark.parametrize('workers,valid', (
+        (1, True),
+        (32, True),
+        (0, False),
+        (-2, False),
+        ('many', False),
+    ))
+    def test_validates_workers(self, workers, valid):
+
+        m = FeaturesFactory.create(workers=workers)
+        assert ('workers' in FeaturesFactory.get_invalid_names(m)) is not valid
+
+    @pytest.mark.parametrize('extraction_data,valid', (
+        ('Default', True),
+        ('Update', True),
+        ('Live', False),
+    ))
+    def test_validates_extraction_data(self, extraction_data, valid):
+
+        m = FeaturesFactory.create(extraction_data=extraction_data)
+        assert (
+            'extraction_data' in FeaturesFactory.get_invalid_names(m)
+        ) is not valid
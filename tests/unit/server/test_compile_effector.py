@@ -0,0 +1,87 @@
+from __future__ import absolute_import
+
+import os
+import time
+
+from mock import patch
+import pytest
+
+from scanomatic.image_analysis import first_pass
+from scanomatic.io import binary_compilation
+from scanomatic.models.compile_project_model import COMPILE_ACTION
+from scanomatic.models.factories.compile_project_factory import (
+    CompileImageAnalysisFactory, CompileProjectFactory
+)
+from scanomatic.models.factories.rpc_job_factory import RPC_Job_Model_Factory
+from scanomatic.models.rpc_job_models import JOB_STATUS, JOB_TYPE
+from scanomatic.server.compile_effector import CompileProjectEffector
+
+IMAGES = 7
+TEMPLATE = os.path.join(
+    os.path.dirname(__file__), os.pardir, os.pardir, 'system', 'data', 'testproject.project.compilation')
+
+
+@pytest.fixture(scope='module')
+def image_model_template():
+    return CompileImageAnalysisFactory.serializer.load_first(TEMPLATE)
+
+
+@pytest.fixture(autouse=True)
+def analyse(monkeypatch, image_model_template):
+
+    def _analyse(compile_image_model, fixture_settings, issues):
+        time.sleep(0.01 * (IMAGES - compile_image_model.index))
+        image_model = CompileImageAnalysisFactory.copy(image_model_template)
+        image_model.image = compile_image_model
+        return image_model
+
+    monkeypatch.setattr(first_pass, 'analyse', _analyse)
+
+
+def _get_effector(tmpdir, workers):
+    images = []
+    for index in range(IMAGES):
+        path = str(tmpdir.join('project_{0:04d}_{1}.0000.tiff'.format(index, index * 1200)))
+        open(path, 'w').close()
+        images.append({'path': path, 'index': index})
+
+    compile_job = CompileProjectFactory.create(
+        compile_action=COMPILE_ACTION.Initiate, images=images, workers=workers,
+        path=str(tmpdir.join('project.project.compilation')))
+    effector = CompileProjectEffector(RPC_Job_Model_Factory.create(
+        id='test', type=JOB_TYPE.Compile, status=JOB_STATUS.Running, content_model=compile_job))
+    effector._fixture_settings = 'fixture'
+    effector._running = True
+    return effector
+
+
+def _run(effector):
+    with patch.object(effector, '_mail'):
+        while True:
+            try:
+                effector.next()
+            except StopIteration:
+                return
+            time.sleep(0.01)
+
+
+@pytest.mark.parametrize('workers', (1, 3))
+def test_compiles_images_in_order(tmpdir, workers):
+    effector = _get_effector(tmpdir, workers)
+    _run(effector)
+
+    path = effector._compile_job.path
+    image_models = CompileImageAnalysisFactory.serializer.load(path)
+    assert [image_model.image.index for image_model in image_models] == range(IMAGES)
+    assert [image_model.image.index for image_model in binary_compilation.load(path)] == range(IMAGES)
+    assert effector.progress == 1
+
+
+def test_paused_compilation_submits_no_images(tmpdir):
+    effector = _get_effector(tmpdir, 2)
+    effector.pause()
+    effector.next()
+    assert effector._compile_pipeline is None
+    effector.resume()
+    _run(effector)
+    assert effector.progress == 1
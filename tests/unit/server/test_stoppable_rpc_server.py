@@ -0,0 +1,117 @@
+from __future__ import absolute_import
+
+from threading import Event, Lock, Thread
+import xmlrpclib
+
+import pytest
+
+from scanomatic.server.stoppable_rpc_server import (
+    LATENCY_BUCKETS, Stoppable_RPC_Server
+)
+
+
+@pytest.fixture
+def server():
+    server = Stoppable_RPC_Server(('127.0.0.1', 0), logRequests=False)
+    yield server
+    server.stop()
+
+
+def _get_client(server):
+    return xmlrpclib.ServerProxy('http://127.0.0.1:{0}'.format(
+        server._server.server_address[1]))
+
+
+def _call_in_thread(server, name):
+    thread = Thread(target=lambda: getattr(_get_client(server), name)())
+    thread.daemon = True
+    thread.start()
+    return thread
+
+
+class TestStoppableRPCServer:
+
+    def test_slow_request_doesnt_block_other_methods(self, server):
+        entered = Event()
+        release = Event()
+
+        def slow():
+            entered.set()
+            return release.wait(5)
+
+        server.register_function(slow, 'slow')
+        server.register_function(lambda: 'fast', 'fast')
+        server.start()
+
+        thread = _call_in_thread(server, 'slow')
+        assert entered.wait(5)
+        assert _get_client(server).fast() == 'fast'
+        release.set()
+        thread.join(5)
+        assert not thread.is_alive()
+
+    def test_shared_lock_serializes_methods(self, server):
+        lock = Lock()
+        entered = Event()
+        release = Event()
+        calls = []
+
+        def first():
+            entered.set()
+            release.wait(5)
+            calls.append('first')
+            return True
+
+        def second():
+            calls.append('second')
+            return True
+
+        server.register_function(first, 'first', lock=lock)
+        server.register_function(second, 'second', lock=lock)
+        server.start()
+
+        first_thread = _call_in_thread(server, 'first')
+        assert entered.wait(5)
+        second_thread = _call_in_thread(server, 'second')
+        second_thread.join(0.2)
+        assert calls == []
+        release.set()
+        first_thread.join(5)
+        second_thread.join(5)
+        assert calls == ['first', 'second']
+
+    def test_latency_histograms(self, server):
+        server.register_function(lambda: True, 'ping')
+        server.register_function(lambda: True, 'unused')
+        server.start()
+
+        client = _get_client(server)
+        for _ in range(3):
+            client.ping()
+
+        histograms = server.get_latency_histograms()
+        assert sorted(histograms) == ['ping', 'unused']
+        assert len(histograms['ping']) == len(LATENCY_BUCKETS) + 1
+        assert sum(histograms['ping']) == 3
+        assert sum(histograms['unused']) == 0
+
+    def test_stop(self, server):
+        server.start()
+        server.stop()
+        assert not server.running
+
+    def test_stop_right_after_start(self):
+        for _ in range(5):
+            server = Stoppable_RPC_Server(('127.0.0.1', 0), logRequests=False)
+            server.start()
+            thread = Thread(target=server.stop)
+            thread.daemon = True
+            thread.start()
+            thread.join(5)
+            assert not thread.is_alive()
+            assert not server.running
+
+    def test_stop_before_start(self, server):
+        server.stop()
+        server.start()
+        assert not server.running
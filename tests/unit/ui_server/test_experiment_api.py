@@ -111,3 +111,41 @@ class TestFeatureExtractEndpoint:
             'analysis_directory': self.jailed_path('root/test/')
         })
         assert response.status_code == 200
+
+    @patch(
+        'scanomatic.ui_server.experiment_api.FeaturesFactory._validate_analysis_directory',
+        return_value=True)
+    def test_update_previous_extraction(self, validator_mock, test_app):
+
+        test_app.rpc_client.create_feature_extract_job.return_value = 'Hi'
+
+        response = test_app.post_json(
+            self.route,
+            {
+                'analysis_directory': 'root/test',
+                'extraction_data': 'Update',
+            },
+            follow_redirects=True
+        )
+
+        assert response.status_code == 200
+        args, _ = test_app.rpc_client.create_feature_extract_job.call_args
+        assert args[0]['extraction_data'].name == 'Update'
+
+    @patch(
+        'scanomatic.ui_server.experiment_api.FeaturesFactory._validate_analysis_directory',
+        return_value=True)
+    def test_unknown_extraction_data(self, validator_mock, test_app):
+
+        response = test_app.post_json(
+            self.route,
+            {
+                'analysis_directory': 'root/test',
+                'extraction_data': 'Live',
+            },
+            follow_redirects=True
+        )
+
+        assert response.status_code == 400
+        assert 'extraction_data' in json.loads(response.data)['reason']
+        assert not test_app.rpc_client.create_feature_extract_job.called
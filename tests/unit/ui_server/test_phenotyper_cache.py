@@ -0,0 +1,142 @@
+from __future__ import absolute_import
+
+from threading import Thread
+
+import numpy as np
+import pytest
+
+from scanomatic.data_processing.phenotyper import Phenotyper, Phenotypes
+from scanomatic.ui_server.phenotyper_cache import (
+    PhenotyperCache, get_state_size
+)
+
+
+@pytest.fixture(scope='module')
+def extracted():
+    random = np.random.RandomState(5)
+    times = np.arange(48) / 2.
+    rate = random.uniform(0.3, 0.6, (2, 3, 1))
+    data = 1e5 * np.power(
+        2, 5 / (1 + np.exp(-rate * (times - 10))) +
+        random.normal(0, 0.01, (2, 3, times.size)))
+    raw = np.empty((1,), dtype=np.object)
+    raw[0] = data
+    state = Phenotyper(raw, times)
+    state.extract_phenotypes()
+    return state
+
+
+@pytest.fixture(scope='function')
+def project(extracted, tmpdir):
+    path = str(tmpdir.mkdir('project'))
+    extracted.save_state(path, ask_if_overwrite=False)
+    return path
+
+
+@pytest.fixture(scope='function')
+def cache():
+    return PhenotyperCache()
+
+
+class TestGet:
+
+    def test_loads_once(self, cache, project):
+        state = cache.get(project)
+        assert cache.get(project) is state
+        stats = cache.stats
+        assert stats.hits == 1
+        assert stats.misses == 1
+        assert stats.entries == 1
+
+    def test_reloads_when_saved_elsewhere(self, cache, project):
+        state = cache.get(project)
+        other = Phenotyper.LoadFromState(project)
+        other.add_position_mark(0, (1, 1))
+        other.save_state(project, ask_if_overwrite=False)
+        reloaded = cache.get(project)
+        assert reloaded is not state
+        assert np.ma.is_masked(
+            reloaded.get_phenotype(Phenotypes.GenerationTime)[0][1, 1])
+        assert cache.stats.invalidations == 1
+
+    def test_reloads_when_lock_changes(self, cache, project):
+        state = cache.get(project, 'me')
+        assert cache.get(project, 'someone else') is not state
+        assert cache.stats.invalidations == 1
+
+    def test_evicts_least_recently_used(self, extracted, tmpdir):
+        cache = PhenotyperCache(max_entries=2)
+        projects = []
+        for name in ('a', 'b', 'c'):
+            path = str(tmpdir.mkdir(name))
+            extracted.save_state(path, ask_if_overwrite=False)
+            projects.append(path)
+        cache.get(projects[0])
+        cache.get(projects[1])
+        cache.get(projects[0])
+        cache.get(projects[2])
+        assert projects[0] in cache
+        assert projects[1] not in cache
+        assert cache.stats.evictions == 1
+
+    def test_respects_memory_budget(self, project):
+        cache = PhenotyperCache(memory_budget=0)
+        cache.get(project).get_phenotype(Phenotypes.GenerationTime)
+        cache.get(project)
+        assert project not in cache
+        assert cache.stats.misses == 2
+
+
+class TestSave:
+
+    def test_keeps_saved_state(self, cache, project):
+        state = cache.get(project)
+        state.add_position_mark(0, (0, 1))
+        cache.save(project, state)
+        assert cache.get(project) is state
+        assert cache.stats.hits == 1
+        assert np.ma.is_masked(Phenotyper.LoadFromState(project).get_phenotype(
+            Phenotypes.GenerationTime)[0][0, 1])
+
+    def test_invalidates_on_failure(self, cache, project, monkeypatch):
+        state = cache.get(project)
+
+        def fail(*args, **kwargs):
+            raise IOError
+
+        monkeypatch.setattr(state, 'save_state', fail)
+        with pytest.raises(IOError):
+            cache.save(project, state)
+        assert project not in cache
+
+
+class TestLock:
+
+    def test_one_lock_per_project(self, cache):
+        assert cache.lock('project') is cache.lock('project')
+        assert cache.lock('project') is not cache.lock('other')
+
+    def test_keeps_other_threads_out(self, cache):
+        acquired = []
+
+        def acquire():
+            acquired.append(cache.lock('project').acquire(False))
+
+        with cache.lock('project'):
+            thread = Thread(target=acquire)
+            thread.start()
+            thread.join(5)
+        assert acquired == [False]
+
+
+class TestGetStateSize:
+
+    def test_counts_only_loaded_data(self, project):
+        state = Phenotyper.LoadFromState(project)
+        size = get_state_size(state)
+        state.get_phenotype(Phenotypes.GenerationTime)
+        assert get_state_size(state) > size
+
+    def test_ignores_memory_mapped_growth_data(self, project, extracted):
+        state = Phenotyper.LoadFromState(project)
+        assert get_state_size(state) < extracted.raw_growth_data[0].nbytes